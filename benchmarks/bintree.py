@@ -0,0 +1,146 @@
+#!/usr/bin/python
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""
+Measure binarytree.populate() for a synthetic PKGDIR of generated
+binary packages, each with an environment.bz2 of a realistic size,
+both without a Packages file (so that every package is read) and with
+an up-to-date one. The peak resident set size of the process is also
+reported. With --baseline, the same measurements are made for the same
+PKGDIR with the pym directory of another git revision. Run it from the
+top of the source tree:
+
+	benchmarks/bintree.py --baseline <git revision>
+"""
+
+import optparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+def generate_pkgdir(pym_path, pkgdir, packages, categories, env_size):
+	sys.path.insert(0, pym_path)
+	import portage.xpak
+
+	environment = os.urandom(env_size)
+	for i in range(packages):
+		cat = "cat-%d" % (i % categories)
+		pf = "pkg%d-1" % i
+		metadata = {
+			"CATEGORY": cat, "PF": pf, "SLOT": "0", "EAPI": "5",
+			"KEYWORDS": "x86", "BUILD_TIME": str(1300000000 + i),
+			"repository": "test_repo", "IUSE": "foo bar", "USE": "foo",
+			"RDEPEND": "foo? ( cat-0/pkg0 ) bar? ( cat-1/pkg1 )",
+			"environment.bz2": environment,
+		}
+		cat_dir = os.path.join(pkgdir, cat)
+		if not os.path.isdir(cat_dir):
+			os.makedirs(cat_dir)
+		t = portage.xpak.tbz2(os.path.join(cat_dir, pf + ".tbz2"))
+		t.recompose_mem(portage.xpak.xpak_mem(metadata))
+
+def remove_index(pkgdir):
+	for name in ("Packages", "Packages.journal", "Packages.mtimes"):
+		try:
+			os.unlink(os.path.join(pkgdir, name))
+		except OSError:
+			pass
+
+def best_of(repeat, func, setup=None):
+	best = None
+	for i in range(repeat):
+		if setup is not None:
+			setup()
+		start = time.time()
+		func()
+		elapsed = time.time() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+def measure(pym_path, options):
+	sys.path.insert(0, pym_path)
+	import portage
+	from portage.dbapi.bintree import binarytree
+	from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+
+	playground = ResolverPlayground()
+	try:
+		portage.util.noiselimit = -2
+
+		def populate():
+			bintree = binarytree(pkgdir=options.pkgdir,
+				settings=playground.settings)
+			bintree.populate()
+			return bintree
+
+		no_index = best_of(options.repeat, populate,
+			setup=lambda: remove_index(options.pkgdir))
+		count = len(populate().dbapi.cpv_all())
+		index = best_of(options.repeat, populate)
+	finally:
+		playground.cleanup()
+
+	print("%s: %d packages, python %s" % (pym_path, count,
+		sys.version.split()[0]))
+	print("  populate(), no Packages file     %.3fs" % no_index)
+	print("  populate(), Packages file        %.3fs" % index)
+	print("  peak rss                         %d MiB" %
+		(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024))
+	return os.EX_OK
+
+def main(argv):
+	parser = optparse.OptionParser(usage="%prog [options]")
+	parser.add_option("--baseline", action="append", default=[],
+		help="git revision to compare against (may be given more than once)")
+	parser.add_option("--pym", default="pym",
+		help="pym directory to measure (default: %default)")
+	# The PKGDIR generated by the parent process, for --baseline.
+	parser.add_option("--pkgdir", help=optparse.SUPPRESS_HELP)
+	parser.add_option("--packages", type="int", default=10000)
+	parser.add_option("--categories", type="int", default=150)
+	parser.add_option("--env-size", type="int", default=30000,
+		help="size of the environment.bz2 of each package, in bytes")
+	parser.add_option("--repeat", type="int", default=3)
+	options, args = parser.parse_args(argv[1:])
+
+	pkgdir_tmp = None
+	if options.pkgdir is None:
+		pkgdir_tmp = tempfile.mkdtemp()
+		options.pkgdir = pkgdir_tmp
+		generate_pkgdir(options.pym, options.pkgdir, options.packages,
+			options.categories, options.env_size)
+
+	try:
+		result = measure(options.pym, options)
+		if result != os.EX_OK:
+			return result
+		for revision in options.baseline:
+			tmpdir = tempfile.mkdtemp()
+			try:
+				archive = subprocess.Popen(["git", "archive", revision,
+					"pym", "bin", "cnf"], stdout=subprocess.PIPE)
+				subprocess.check_call(["tar", "-x", "-C", tmpdir],
+					stdin=archive.stdout)
+				archive.stdout.close()
+				if archive.wait() != os.EX_OK:
+					return 1
+				sys.stdout.flush()
+				subprocess.check_call([sys.executable, argv[0],
+					"--pym", os.path.join(tmpdir, "pym"),
+					"--pkgdir", options.pkgdir,
+					"--repeat", str(options.repeat)])
+			finally:
+				shutil.rmtree(tmpdir)
+	finally:
+		if pkgdir_tmp is not None:
+			shutil.rmtree(pkgdir_tmp)
+	return os.EX_OK
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
@@ -0,0 +1,118 @@
+#!/usr/bin/python
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""
+Measure dblink.getcontents() for a large generated CONTENTS file, and
+the walk over the result that dblink.unmerge() does, which looks up each
+entry several times. With --baseline, the same measurements are made with
+the pym directory of another git revision. Run it from the top of the
+source tree:
+
+	benchmarks/contents.py --baseline <git revision>
+"""
+
+import optparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+def write_contents(path, dirs, files_per_dir):
+	with open(path, "w") as f:
+		for d in range(dirs):
+			parent = "/usr/share/bench/d%d" % d
+			f.write("dir %s\n" % parent)
+			for i in range(files_per_dir):
+				f.write("obj %s/file%d.txt %032x %d\n" %
+					(parent, i, d * files_per_dir + i, 1300000000 + i))
+
+def unmerge_walk(pkgfiles):
+	# Like dblink._unmerge_pkgfiles(), visit the entries in reverse
+	# order and look each one up about five times.
+	for objkey in sorted(pkgfiles, reverse=True):
+		file_data = pkgfiles[objkey]
+		if pkgfiles[objkey][0] not in ("dir", "fif", "dev") and \
+			pkgfiles[objkey][1] != file_data[1]:
+			pass
+		if pkgfiles[objkey][0] == "obj":
+			pkgfiles[objkey][2].lower()
+
+def best_of(repeat, func):
+	best = None
+	for i in range(repeat):
+		start = time.time()
+		func()
+		elapsed = time.time() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+def measure(pym_path, options):
+	sys.path.insert(0, pym_path)
+	from portage.dbapi.vartree import dblink
+
+	class _dblink(dblink):
+		"""
+		A dblink that only has the attributes that getcontents() needs.
+		"""
+		def __init__(self, dbdir):
+			self.dbdir = dbdir
+			self.contentscache = None
+			self.settings = {"EROOT": "/", "ROOT": "/"}
+
+	tmpdir = tempfile.mkdtemp()
+	try:
+		write_contents(os.path.join(tmpdir, "CONTENTS"),
+			options.dirs, options.files_per_dir)
+
+		build = lambda: _dblink(tmpdir).getcontents()
+		# Every walk starts from freshly loaded contents, like unmerge.
+		print("%s: %d entries, python %s" % (pym_path,
+			options.dirs * (options.files_per_dir + 1),
+			sys.version.split()[0]))
+		print("  getcontents()                    %.3fs" %
+			best_of(options.repeat, build))
+		print("  getcontents(), walk              %.3fs" %
+			best_of(options.repeat, lambda: unmerge_walk(build())))
+		print("  getcontents(), copy(), walk      %.3fs" %
+			best_of(options.repeat, lambda: unmerge_walk(build().copy())))
+	finally:
+		shutil.rmtree(tmpdir)
+
+def main(argv):
+	parser = optparse.OptionParser(usage="%prog [options]")
+	parser.add_option("--baseline", action="append", default=[],
+		help="git revision to compare against (may be given more than once)")
+	parser.add_option("--pym", default="pym",
+		help="pym directory to measure (default: %default)")
+	parser.add_option("--dirs", type="int", default=600)
+	parser.add_option("--files-per-dir", type="int", default=100)
+	parser.add_option("--repeat", type="int", default=3)
+	options, args = parser.parse_args(argv[1:])
+
+	measure(options.pym, options)
+	for revision in options.baseline:
+		tmpdir = tempfile.mkdtemp()
+		try:
+			archive = subprocess.Popen(["git", "archive", revision, "pym"],
+				stdout=subprocess.PIPE)
+			subprocess.check_call(["tar", "-x", "-C", tmpdir],
+				stdin=archive.stdout)
+			archive.stdout.close()
+			if archive.wait() != os.EX_OK:
+				return 1
+			sys.stdout.flush()
+			subprocess.check_call([sys.executable, argv[0],
+				"--pym", os.path.join(tmpdir, "pym"),
+				"--dirs", str(options.dirs),
+				"--files-per-dir", str(options.files_per_dir),
+				"--repeat", str(options.repeat)])
+		finally:
+			shutil.rmtree(tmpdir)
+	return os.EX_OK
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
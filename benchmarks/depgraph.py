@@ -0,0 +1,151 @@
+#!/usr/bin/python
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""
+Measure dependency resolution with backtrack_depgraph(), and
+depgraph._serialize_tasks(), which computes the merge order, for a
+ResolverPlayground graph of generated packages with random (but
+reproducible) dependencies. The packages are binary packages, since
+their metadata does not need to be generated. With --baseline, the
+same measurement is made with the pym directory of another git
+revision. Run it from the top of the source tree:
+
+	benchmarks/depgraph.py --baseline <git revision>
+"""
+
+import optparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+def generate_binpkgs(packages, versions, max_deps, chain, cycles, seed):
+	rng = random.Random(seed)
+	cps = ["cat-%d/pkg%d" % (i % 30, i) for i in range(packages)]
+	binpkgs = {}
+	for i, cp in enumerate(cps):
+		depend = []
+		rdepend = []
+		deps = rng.sample(cps[:i], min(i, rng.randint(0, max_deps)))
+		if i and rng.random() < chain and cps[i-1] not in deps:
+			# Long dependency chains make the graph deep, so that
+			# the merge order is selected in many small steps.
+			deps.append(cps[i-1])
+		for dep in deps:
+			if rng.random() < 0.5:
+				depend.append(dep)
+			else:
+				rdepend.append(dep)
+		binpkgs[cp] = {"DEPEND": depend, "RDEPEND": rdepend}
+		if i and rng.random() < cycles:
+			# Runtime dependencies on later packages create cycles.
+			binpkgs[rng.choice(cps[:i])]["RDEPEND"].append(cp)
+	# Every version of a package has the same dependencies.
+	versioned = {}
+	for cp, metadata in binpkgs.items():
+		for version in range(1, versions + 1):
+			versioned["%s-%d" % (cp, version)] = \
+				dict((k, " ".join(v)) for k, v in metadata.items())
+	return versioned
+
+def best_of(repeat, func):
+	best = None
+	for i in range(repeat):
+		start = time.time()
+		result = func()
+		elapsed = time.time() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best, result
+
+def measure(pym_path, options):
+	sys.path.insert(0, pym_path)
+	import portage
+	from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+	from _emerge.create_depgraph_params import create_depgraph_params
+	from _emerge.depgraph import backtrack_depgraph
+
+	binpkgs = generate_binpkgs(options.packages, options.versions,
+		options.max_deps,
+		options.chain, options.cycles, options.seed)
+	playground = ResolverPlayground(binpkgs=binpkgs)
+	try:
+		atoms = sorted(set(portage.cpv_getkey(cpv) for cpv in binpkgs))
+		myopts = {"--pretend": True, "--usepkg": True, "--usepkgonly": True}
+		portage.util.noiselimit = -2
+		params = create_depgraph_params(myopts, None)
+
+		def resolve():
+			return backtrack_depgraph(playground.settings, playground.trees,
+				myopts, params, None, atoms, None)
+
+		resolve_time, (success, depgraph, favorites) = \
+			best_of(options.repeat, resolve)
+		if not success:
+			sys.stderr.write("dependency resolution failed\n")
+			return 1
+		depgraph._resolve_conflicts()
+
+		serialize_time, (tasks, scheduler_graph) = \
+			best_of(options.repeat, depgraph._serialize_tasks)
+	finally:
+		playground.cleanup()
+
+	print("%s: %d tasks, python %s" % (pym_path, len(tasks),
+		sys.version.split()[0]))
+	print("  backtrack_depgraph()  %.3fs" % resolve_time)
+	print("  _serialize_tasks()    %.3fs" % serialize_time)
+	return os.EX_OK
+
+def main(argv):
+	parser = optparse.OptionParser(usage="%prog [options]")
+	parser.add_option("--baseline", action="append", default=[],
+		help="git revision to compare against (may be given more than once)")
+	parser.add_option("--pym", default="pym",
+		help="pym directory to measure (default: %default)")
+	parser.add_option("--packages", type="int", default=3000)
+	parser.add_option("--versions", type="int", default=1,
+		help="number of versions of each package")
+	parser.add_option("--max-deps", type="int", default=4)
+	parser.add_option("--chain", type="float", default=0.0,
+		help="probability that each package depends on the previous one")
+	parser.add_option("--cycles", type="float", default=0.0,
+		help="probability that each package is a runtime dependency "
+		"of a random earlier one")
+	parser.add_option("--seed", type="int", default=0)
+	parser.add_option("--repeat", type="int", default=3)
+	options, args = parser.parse_args(argv[1:])
+
+	result = measure(options.pym, options)
+	if result != os.EX_OK:
+		return result
+	for revision in options.baseline:
+		tmpdir = tempfile.mkdtemp()
+		try:
+			archive = subprocess.Popen(["git", "archive", revision,
+				"pym", "bin", "cnf"], stdout=subprocess.PIPE)
+			subprocess.check_call(["tar", "-x", "-C", tmpdir],
+				stdin=archive.stdout)
+			archive.stdout.close()
+			if archive.wait() != os.EX_OK:
+				return 1
+			sys.stdout.flush()
+			subprocess.check_call([sys.executable, argv[0],
+				"--pym", os.path.join(tmpdir, "pym"),
+				"--packages", str(options.packages),
+				"--versions", str(options.versions),
+				"--max-deps", str(options.max_deps),
+				"--chain", str(options.chain),
+				"--cycles", str(options.cycles),
+				"--seed", str(options.seed),
+				"--repeat", str(options.repeat)])
+		finally:
+			shutil.rmtree(tmpdir)
+	return os.EX_OK
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
@@ -0,0 +1,217 @@
+#!/usr/bin/python
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""
+Measure LinkageMapELF queries for a synthetic linkage map of about 5000
+objects: listBrokenBinaries(), findConsumers() for every library, with
+and without exclude_providers, and mapConsumers() where it exists. The
+objects are empty files with random (but reproducible) NEEDED entries,
+which are passed to rebuild() as an include_file. A checksum of the
+query results is printed, so that the results of different revisions
+can be compared. With --baseline, the same measurements are made for
+the same objects with the pym directory of another git revision. Run
+it from the top of the source tree:
+
+	benchmarks/linkmap.py --baseline <git revision>
+"""
+
+import hashlib
+import optparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+def generate_objects(objdir, libraries, binaries, opt_dirs, needed, seed):
+	"""
+	Create the objects and return the path of a NEEDED.ELF.2 file that
+	describes them. Most libraries are in usr/lib64, and the others are
+	in opt/*/lib directories that only some binaries have in their
+	runpaths. Some libraries also have an alternative provider in an
+	opt directory, and a few binaries need sonames that do not exist.
+	"""
+	rng = random.Random(seed)
+	usr_lib = os.path.join(objdir, "usr", "lib64")
+	opt_libs = [os.path.join(objdir, "opt", "a%d" % i, "lib")
+		for i in range(opt_dirs)]
+	usr_count = libraries * 3 // 4
+
+	entries = []
+	sonames = []
+	for i in range(libraries):
+		soname = "lib%d.so.1" % i
+		sonames.append(soname)
+		deps = rng.sample(sonames[:i], min(i, rng.randint(0, 3)))
+		if i < usr_count:
+			dirs = [usr_lib]
+			if i < libraries // 16:
+				dirs.append(opt_libs[i % opt_dirs])
+		else:
+			dirs = [opt_libs[i % opt_dirs]]
+		for d in dirs:
+			entries.append((os.path.join(d, soname), soname,
+				":".join([usr_lib] + [x for x in dirs if x != usr_lib]),
+				deps))
+
+	bin_dir = os.path.join(objdir, "usr", "bin")
+	for i in range(binaries):
+		runpaths = [usr_lib]
+		candidates = sonames[:usr_count]
+		if i % 2:
+			opt_lib = opt_libs[i % opt_dirs]
+			runpaths.append(opt_lib)
+			candidates = candidates + [soname
+				for j, soname in enumerate(sonames)
+				if j >= usr_count and j % opt_dirs == i % opt_dirs]
+		deps = rng.sample(candidates, min(len(candidates),
+			rng.randint(needed // 2, needed * 3 // 2)))
+		if rng.random() < 0.02:
+			deps.append("libmissing%d.so.1" % i)
+		entries.append((os.path.join(bin_dir, "bin%d" % i), "",
+			":".join(runpaths), deps))
+
+	needed_file = os.path.join(objdir, "NEEDED.ELF.2")
+	with open(needed_file, "w") as f:
+		for path, soname, runpath, deps in entries:
+			if not os.path.isdir(os.path.dirname(path)):
+				os.makedirs(os.path.dirname(path))
+			open(path, "w").close()
+			f.write("X86_64;%s;%s;%s;%s\n" %
+				(path, soname, runpath, ",".join(deps)))
+	return needed_file
+
+def best_of(repeat, func):
+	best = None
+	for i in range(repeat):
+		start = time.time()
+		result = func()
+		elapsed = time.time() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best, result
+
+def measure(pym_path, options):
+	sys.path.insert(0, pym_path)
+	import portage
+	from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+
+	needed_file = os.path.join(options.objdir, "NEEDED.ELF.2")
+	playground = ResolverPlayground()
+	try:
+		portage.util.noiselimit = -2
+		linkmap = playground.trees[playground.eroot]["vartree"].dbapi._linkmap
+		checksum = hashlib.md5()
+
+		def result_repr(result):
+			if isinstance(result, dict):
+				return repr(sorted((k, sorted(v))
+					for k, v in result.items()))
+			return repr(sorted(result))
+
+		rebuild_time, ignored = best_of(options.repeat,
+			lambda: linkmap.rebuild(include_file=needed_file))
+		libraries = sorted(linkmap.listLibraryObjects())
+		# Like preserved libraries, exclude some of the providers.
+		excluded = sorted(random.Random(options.seed).sample(libraries,
+			min(300, len(libraries))))
+		excluded_set = set(excluded)
+		exclude_providers = (lambda path: path in excluded_set,)
+
+		times = []
+		times.append(("listBrokenBinaries()",) +
+			best_of(options.repeat, linkmap.listBrokenBinaries))
+		times.append(("%d x findConsumers()" % len(libraries),) +
+			best_of(options.repeat, lambda: [linkmap.findConsumers(lib)
+			for lib in libraries]))
+		times.append(("%d x findConsumers(exclude)" % len(excluded),) +
+			best_of(options.repeat, lambda: [linkmap.findConsumers(lib,
+			exclude_providers=exclude_providers, greedy=False)
+			for lib in excluded]))
+		for name, elapsed, result in times:
+			if isinstance(result, list):
+				for x in result:
+					checksum.update(result_repr(x).encode("utf_8"))
+			else:
+				checksum.update(result_repr(result).encode("utf_8"))
+
+		map_consistent = None
+		if hasattr(linkmap, "mapConsumers"):
+			times.append(("mapConsumers(%d, exclude)" % len(excluded),) +
+				best_of(options.repeat, lambda: linkmap.mapConsumers(
+				excluded, exclude_providers=exclude_providers,
+				greedy=False)))
+			# It must agree with findConsumers() for each object.
+			consumers = dict(zip(excluded, times[2][2]))
+			map_consistent = times[3][2] == dict((lib, x)
+				for lib, x in consumers.items() if x)
+	finally:
+		playground.cleanup()
+
+	print("%s: %d objects, python %s" % (pym_path,
+		len(linkmap._obj_properties), sys.version.split()[0]))
+	print("  %-32s %.3fs" % ("rebuild()", rebuild_time))
+	for name, elapsed, result in times:
+		print("  %-32s %.3fs" % (name, elapsed))
+	print("  results checksum                 %s" % checksum.hexdigest())
+	if map_consistent is not None:
+		print("  mapConsumers() consistent        %s" % map_consistent)
+	return os.EX_OK
+
+def main(argv):
+	parser = optparse.OptionParser(usage="%prog [options]")
+	parser.add_option("--baseline", action="append", default=[],
+		help="git revision to compare against (may be given more than once)")
+	parser.add_option("--pym", default="pym",
+		help="pym directory to measure (default: %default)")
+	# The objects generated by the parent process, for --baseline.
+	parser.add_option("--objdir", help=optparse.SUPPRESS_HELP)
+	parser.add_option("--libraries", type="int", default=800)
+	parser.add_option("--binaries", type="int", default=4200)
+	parser.add_option("--opt-dirs", type="int", default=20)
+	parser.add_option("--needed", type="int", default=11,
+		help="average number of sonames needed by each binary")
+	parser.add_option("--seed", type="int", default=0)
+	parser.add_option("--repeat", type="int", default=3)
+	options, args = parser.parse_args(argv[1:])
+
+	objdir_tmp = None
+	if options.objdir is None:
+		objdir_tmp = tempfile.mkdtemp()
+		options.objdir = objdir_tmp
+		generate_objects(options.objdir, options.libraries,
+			options.binaries, options.opt_dirs, options.needed,
+			options.seed)
+
+	try:
+		result = measure(options.pym, options)
+		if result != os.EX_OK:
+			return result
+		for revision in options.baseline:
+			tmpdir = tempfile.mkdtemp()
+			try:
+				archive = subprocess.Popen(["git", "archive", revision,
+					"pym", "bin", "cnf"], stdout=subprocess.PIPE)
+				subprocess.check_call(["tar", "-x", "-C", tmpdir],
+					stdin=archive.stdout)
+				archive.stdout.close()
+				if archive.wait() != os.EX_OK:
+					return 1
+				sys.stdout.flush()
+				subprocess.check_call([sys.executable, argv[0],
+					"--pym", os.path.join(tmpdir, "pym"),
+					"--objdir", options.objdir,
+					"--seed", str(options.seed),
+					"--repeat", str(options.repeat)])
+			finally:
+				shutil.rmtree(tmpdir)
+	finally:
+		if objdir_tmp is not None:
+			shutil.rmtree(objdir_tmp)
+	return os.EX_OK
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
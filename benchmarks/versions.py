@@ -0,0 +1,144 @@
+#!/usr/bin/python
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""
+Measure version ordering for about 30000 generated cpvs with random
+(but reproducible) versions: sorting all of them with cpv_sort_key(),
+and best() for each cp, with plain strings and with _pkg_str instances,
+as dbapi methods return them. Sorting the _pkg_str versions of each cp
+with dbapi._cpv_sort_ascending(), as for cp_list(), is also measured.
+Since the parsed versions may be cached, both the first run and the
+fastest of --repeat runs are reported. With --baseline, the same
+measurements are made with the pym directory of another git revision.
+Run it from the top of the source tree:
+
+	benchmarks/versions.py --baseline <git revision>
+"""
+
+import hashlib
+import optparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+def generate_cpvs(cps, versions, seed):
+	rng = random.Random(seed)
+	suffixes = ["_alpha", "_beta", "_pre", "_rc", "_p"]
+	cpvs = []
+	for i in range(cps):
+		cp = "cat-%d/pkg%d" % (i % 150, i)
+		for j in range(versions):
+			version = ".".join(str(rng.choice([0, 1, 2, 3, 10, 2013, 9]))
+				for k in range(rng.randint(1, 4)))
+			if rng.random() < 0.1:
+				version += "." + rng.choice(["0", "01", "001"])
+			if rng.random() < 0.1:
+				version += rng.choice("abc")
+			if rng.random() < 0.3:
+				version += rng.choice(suffixes) + \
+					rng.choice(["", "1", "2", "20130101"])
+			if rng.random() < 0.3:
+				version += "-r%d" % rng.randint(1, 3)
+			cpvs.append("%s-%s" % (cp, version))
+	rng.shuffle(cpvs)
+	return cpvs
+
+def first_and_best(repeat, func):
+	times = []
+	for i in range(repeat):
+		start = time.time()
+		result = func()
+		times.append(time.time() - start)
+	return times[0], min(times), result
+
+def measure(pym_path, options):
+	sys.path.insert(0, pym_path)
+	from portage.dbapi import dbapi
+	from portage.versions import _pkg_str, best, cpv_getkey, cpv_sort_key
+
+	cpvs = generate_cpvs(options.cps, options.versions, options.seed)
+	checksum = hashlib.md5()
+	results = []
+	for input_type in ("str", "_pkg_str"):
+		if input_type == "_pkg_str":
+			cpvs = [_pkg_str(cpv) for cpv in cpvs]
+		by_cp = {}
+		for cpv in cpvs:
+			by_cp.setdefault(cpv_getkey(cpv), []).append(cpv)
+		by_cp = sorted(by_cp.values())
+
+		def sort_ascending():
+			result = []
+			for x in by_cp:
+				x = list(x)
+				dbapi._cpv_sort_ascending(x)
+				result.append(x)
+			return result
+
+		funcs = [
+			("sorted(key=cpv_sort_key())",
+				lambda: sorted(cpvs, key=cpv_sort_key())),
+			("best() per cp",
+				lambda: [best(x) for x in by_cp]),
+		]
+		if input_type == "_pkg_str":
+			funcs.append(("_cpv_sort_ascending() per cp", sort_ascending))
+
+		for name, func in funcs:
+			first, fastest, result = first_and_best(options.repeat, func)
+			results.append(("%s, %s" % (name, input_type), first, fastest))
+			checksum.update(repr([str(x) if not isinstance(x, list)
+				else [str(y) for y in x] for x in result]).encode("utf_8"))
+
+	print("%s: %d cpvs, python %s" % (pym_path, len(cpvs),
+		sys.version.split()[0]))
+	print("  %-40s %8s %8s" % ("", "first", "best"))
+	for name, first, fastest in results:
+		print("  %-40s %7.3fs %7.3fs" % (name, first, fastest))
+	print("  results checksum  %s" % checksum.hexdigest())
+	return os.EX_OK
+
+def main(argv):
+	parser = optparse.OptionParser(usage="%prog [options]")
+	parser.add_option("--baseline", action="append", default=[],
+		help="git revision to compare against (may be given more than once)")
+	parser.add_option("--pym", default="pym",
+		help="pym directory to measure (default: %default)")
+	parser.add_option("--cps", type="int", default=3000)
+	parser.add_option("--versions", type="int", default=10,
+		help="number of versions of each package")
+	parser.add_option("--seed", type="int", default=0)
+	parser.add_option("--repeat", type="int", default=3)
+	options, args = parser.parse_args(argv[1:])
+
+	result = measure(options.pym, options)
+	if result != os.EX_OK:
+		return result
+	for revision in options.baseline:
+		tmpdir = tempfile.mkdtemp()
+		try:
+			archive = subprocess.Popen(["git", "archive", revision, "pym"],
+				stdout=subprocess.PIPE)
+			subprocess.check_call(["tar", "-x", "-C", tmpdir],
+				stdin=archive.stdout)
+			archive.stdout.close()
+			if archive.wait() != os.EX_OK:
+				return 1
+			sys.stdout.flush()
+			subprocess.check_call([sys.executable, argv[0],
+				"--pym", os.path.join(tmpdir, "pym"),
+				"--cps", str(options.cps),
+				"--versions", str(options.versions),
+				"--seed", str(options.seed),
+				"--repeat", str(options.repeat)])
+		finally:
+			shutil.rmtree(tmpdir)
+	return os.EX_OK
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""
+Measure the throughput of the bundled pure python whirlpool implementation
+in MB/s, optionally comparing it with the implementation from another git
+revision. Run it from the top of the source tree:
+
+	benchmarks/whirlpool.py --baseline <git revision>
+"""
+
+import imp
+import optparse
+import os
+import subprocess
+import sys
+import time
+
+_module_path = "pym/portage/util/whirlpool.py"
+
+def load_revision(revision):
+	source = subprocess.check_output(["git", "show",
+		"%s:%s" % (revision, _module_path)])
+	module = imp.new_module("whirlpool_%s" % revision)
+	exec(compile(source, "%s:%s" % (revision, _module_path), "exec"),
+		module.__dict__)
+	return module
+
+def measure(module, data, chunk_size, repeat):
+	best = None
+	for i in range(repeat):
+		start = time.time()
+		w = module.Whirlpool()
+		for offset in range(0, len(data), chunk_size):
+			w.update(data[offset:offset+chunk_size])
+		w.hexdigest()
+		elapsed = time.time() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return len(data) / best / 1e6
+
+def main(argv):
+	parser = optparse.OptionParser(usage="%prog [options]")
+	parser.add_option("--baseline", action="append", default=[],
+		help="git revision to compare against (may be given more than once)")
+	parser.add_option("--size", type="int", default=256,
+		help="amount of data to hash, in KiB")
+	parser.add_option("--chunk-size", type="int", default=32,
+		help="size of each update() call, in KiB")
+	parser.add_option("--repeat", type="int", default=3,
+		help="number of runs, of which the fastest is reported")
+	options, args = parser.parse_args(argv[1:])
+
+	sys.path.insert(0, "pym")
+	from portage.util import whirlpool
+
+	data = os.urandom(options.size * 1024)
+	implementations = [("working tree", whirlpool)]
+	for revision in options.baseline:
+		implementations.append((revision, load_revision(revision)))
+
+	digests = set(module.Whirlpool(data).hexdigest()
+		for name, module in implementations)
+	if len(digests) != 1:
+		sys.stderr.write("digests differ between implementations\n")
+		return 1
+
+	print("python %s, %d KiB in %d KiB update() calls" %
+		(sys.version.split()[0], options.size, options.chunk_size))
+	for name, module in implementations:
+		print("  %-20s %6.2f MB/s" % (name, measure(module, data,
+			options.chunk_size * 1024, options.repeat)))
+	return os.EX_OK
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv))
@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import optparse
+import sys
+import portage
+portage._internal_caller = True
+from portage import os
+from portage.util._dyn_libs.scanelf import scan_elf_tree
+
+def command_needed(args):
+
+	usage = "usage: needed <image_dir>\n"
+
+	if len(args) != 1:
+		sys.stderr.write(usage)
+		sys.stderr.write("1 argument is required, got %s\n" % len(args))
+		return 1
+
+	image_dir = args[0]
+
+	if not os.path.isdir(image_dir):
+		sys.stderr.write(usage)
+		sys.stderr.write("Argument 1 is not a directory: '%s'\n" % \
+			image_dir)
+		return 1
+
+	# Output the same lines as scanelf -qyRF '%a;%p;%S;%r;%n', where
+	# paths are relative to image_dir.
+	image_dir = os.path.join(image_dir, "")
+	out = getattr(sys.stdout, 'buffer', sys.stdout)
+	for path, elf in scan_elf_tree(image_dir):
+		out.write(portage._unicode_encode(
+			elf.scanelf_line(path[len(image_dir):]) + "\n",
+			encoding=portage._encodings['fs'], errors='strict'))
+	out.flush()
+	return os.EX_OK
+
+def main(argv):
+
+	if argv and isinstance(argv[0], bytes):
+		for i, x in enumerate(argv):
+			argv[i] = portage._unicode_decode(x, errors='strict')
+
+	valid_commands = ('needed',)
+	description = "Read the dynamic sections of ELF files."
+	usage = "usage: %s COMMAND [args]" % \
+		os.path.basename(argv[0])
+
+	parser = optparse.OptionParser(description=description, usage=usage)
+	options, args = parser.parse_args(argv[1:])
+
+	if not args:
+		parser.error("missing command argument")
+
+	command = args[0]
+
+	if command not in valid_commands:
+		parser.error("invalid command: '%s'" % command)
+
+	if command == 'needed':
+		rval = command_needed(args[1:])
+	else:
+		raise AssertionError("invalid command: '%s'" % command)
+
+	return rval
+
+if __name__ == "__main__":
+	rval = main(sys.argv[:])
+	sys.exit(rval)
@@ -505,28 +505,35 @@ install_qa_check() {
 	# too useful not to have (it's required for things like preserve-libs), and
 	# it's tempting for ebuild authors to set RESTRICT=binchecks for packages
 	# containing pre-built binaries.
+	# When scanelf is not installed, the dynamic sections are read by
+	# elf-helper.py, which produces the same output.
+	local scan_needed
 	if type -P scanelf > /dev/null ; then
-		# Save NEEDED information after removing self-contained providers
-		rm -f "$PORTAGE_BUILDDIR"/build-info/NEEDED{,.ELF.2}
-		scanelf -qyRF '%a;%p;%S;%r;%n' "${D}" | { while IFS= read -r l; do
-			arch=${l%%;*}; l=${l#*;}
-			obj="/${l%%;*}"; l=${l#*;}
-			soname=${l%%;*}; l=${l#*;}
-			rpath=${l%%;*}; l=${l#*;}; [ "${rpath}" = "  -  " ] && rpath=""
-			needed=${l%%;*}; l=${l#*;}
-			echo "${obj} ${needed}"	>> "${PORTAGE_BUILDDIR}"/build-info/NEEDED
-			echo "${arch:3};${obj};${soname};${rpath};${needed}" >> "${PORTAGE_BUILDDIR}"/build-info/NEEDED.ELF.2
-		done }
-
-		[ -n "${QA_SONAME_NO_SYMLINK}" ] && \
-			echo "${QA_SONAME_NO_SYMLINK}" > \
-			"${PORTAGE_BUILDDIR}"/build-info/QA_SONAME_NO_SYMLINK
-
-		if has binchecks ${RESTRICT} && \
-			[ -s "${PORTAGE_BUILDDIR}/build-info/NEEDED.ELF.2" ] ; then
-			eqawarn "QA Notice: RESTRICT=binchecks prevented checks on these ELF files:"
-			eqawarn "$(while read -r x; do x=${x#*;} ; x=${x%%;*} ; echo "${x#${EPREFIX}}" ; done < "${PORTAGE_BUILDDIR}"/build-info/NEEDED.ELF.2)"
-		fi
+		scan_needed=(scanelf -qyRF '%a;%p;%S;%r;%n')
+	else
+		scan_needed=(env "PYTHONPATH=${PORTAGE_PYM_PATH}${PYTHONPATH:+:}${PYTHONPATH}"
+			"${PORTAGE_PYTHON:-/usr/bin/python}" "$PORTAGE_BIN_PATH"/elf-helper.py needed)
+	fi
+	# Save NEEDED information after removing self-contained providers
+	rm -f "$PORTAGE_BUILDDIR"/build-info/NEEDED{,.ELF.2}
+	"${scan_needed[@]}" "${D}" | { while IFS= read -r l; do
+		arch=${l%%;*}; l=${l#*;}
+		obj="/${l%%;*}"; l=${l#*;}
+		soname=${l%%;*}; l=${l#*;}
+		rpath=${l%%;*}; l=${l#*;}; [ "${rpath}" = "  -  " ] && rpath=""
+		needed=${l%%;*}; l=${l#*;}
+		echo "${obj} ${needed}"	>> "${PORTAGE_BUILDDIR}"/build-info/NEEDED
+		echo "${arch:3};${obj};${soname};${rpath};${needed}" >> "${PORTAGE_BUILDDIR}"/build-info/NEEDED.ELF.2
+	done }
+
+	[ -n "${QA_SONAME_NO_SYMLINK}" ] && \
+		echo "${QA_SONAME_NO_SYMLINK}" > \
+		"${PORTAGE_BUILDDIR}"/build-info/QA_SONAME_NO_SYMLINK
+
+	if has binchecks ${RESTRICT} && \
+		[ -s "${PORTAGE_BUILDDIR}/build-info/NEEDED.ELF.2" ] ; then
+		eqawarn "QA Notice: RESTRICT=binchecks prevented checks on these ELF files:"
+		eqawarn "$(while read -r x; do x=${x#*;} ; x=${x%%;*} ; echo "${x#${EPREFIX}}" ; done < "${PORTAGE_BUILDDIR}"/build-info/NEEDED.ELF.2)"
 	fi
 
 	local unsafe_files=$(find "${ED}" -type f '(' -perm -2002 -o -perm -4002 ')' | sed -e "s:^${ED}:/:")
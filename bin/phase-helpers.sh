@@ -656,6 +656,52 @@ __eapi4_src_install() {
 	fi
 }
 
+# @FUNCTION: __ebuild_ipc_query
+# @USAGE: <command> [args...]
+# @DESCRIPTION:
+# Send a query to portage through the .ipc_query fifo served by
+# EbuildIpcQueryDaemon, which avoids the cost of starting python for the
+# ebuild-ipc helper. The request is sent with a single write of less than
+# PIPE_BUF bytes, so it needs no lock, and the reply is read from a fifo
+# that is private to the current shell process. If the request is too
+# large or no reply arrives in time, the ebuild-ipc helper is used instead.
+__ebuild_ipc_query() {
+	local arg fmt= len=0 out err retval=
+	local query_fifo=${PORTAGE_BUILDDIR}/.ipc_query
+	local reply_fifo=${PORTAGE_BUILDDIR}/.ipc_reply_${BASHPID}
+
+	for arg in "${BASHPID}" "$@" ; do
+		[[ ${arg} == *$'\n'* ]] && len=-1 && break
+		(( len += ${#arg} + 1 ))
+		fmt+='%s\0'
+	done
+
+	if [[ -p ${query_fifo} ]] && (( len > 0 && len < 1000 )) && \
+		{ [[ -p ${reply_fifo} ]] || mkfifo -m 0600 "${reply_fifo}" ; } ; then
+		# The reply fifo is opened before the request is sent, so that
+		# the daemon can reply without blocking.
+		{
+			printf "${fmt}\n" "${BASHPID}" "$@" 1<> "${query_fifo}" && \
+			IFS= read -r -d '' -t 15 retval && \
+			IFS= read -r -d '' -t 15 out && \
+			IFS= read -r -d '' -t 15 err || retval=
+		} <> "${reply_fifo}"
+	fi
+
+	if [[ -z ${retval} ]] ; then
+		# Discard the fifo, so that a late reply can not be mistaken
+		# for the reply to a later request.
+		rm -f "${reply_fifo}"
+		"${PORTAGE_BIN_PATH}"/ebuild-ipc "$@"
+		return
+	fi
+	# Subshells have a fifo of their own, which is not reused.
+	[[ ${BASHPID} == ${EBUILD_MASTER_PID} ]] || rm -f "${reply_fifo}"
+	[[ -n ${out} ]] && printf '%s' "${out}"
+	[[ -n ${err} ]] && printf '%s' "${err}" >&2
+	return ${retval}
+}
+
 # @FUNCTION: has_version
 # @USAGE: [--host-root] <DEPEND ATOM>
 # @DESCRIPTION:
@@ -686,7 +732,7 @@ has_version() {
 		eroot=${root}
 	fi
 	if [[ -n $PORTAGE_IPC_DAEMON ]] ; then
-		"$PORTAGE_BIN_PATH"/ebuild-ipc has_version "${eroot}" "${atom}"
+		__ebuild_ipc_query has_version "${eroot}" "${atom}"
 	else
 		"${PORTAGE_BIN_PATH}/ebuild-helpers/portageq" has_version "${eroot}" "${atom}"
 	fi
@@ -738,7 +784,7 @@ best_version() {
 		eroot=${root}
 	fi
 	if [[ -n $PORTAGE_IPC_DAEMON ]] ; then
-		"$PORTAGE_BIN_PATH"/ebuild-ipc best_version "${eroot}" "${atom}"
+		__ebuild_ipc_query best_version "${eroot}" "${atom}"
 	else
 		"${PORTAGE_BIN_PATH}/ebuild-helpers/portageq" best_version "${eroot}" "${atom}"
 	fi
@@ -760,6 +806,113 @@ best_version() {
 	esac
 }
 
+# @FUNCTION: has_version_any
+# @USAGE: [--host-root] <DEPEND ATOM>...
+# @DESCRIPTION:
+# Return true if any of the given packages is installed, and echo each atom
+# that matches an installed package, one per line. This is equivalent to
+# calling has_version for each atom, but all atoms are checked in one query.
+has_version_any() {
+
+	local atom eroot host_root=false opts=() root=${ROOT}
+	if [[ $1 == --host-root ]] ; then
+		host_root=true
+		opts=( --host-root )
+		shift
+	fi
+	[[ $# -gt 0 ]] || die "${FUNCNAME[0]}: no atoms given"
+
+	if [[ -z $PORTAGE_IPC_DAEMON ]] ; then
+		# portageq only accepts one atom per call.
+		local retval=1
+		for atom in "$@" ; do
+			if has_version "${opts[@]}" "${atom}" ; then
+				echo "${atom}"
+				retval=0
+			fi
+		done
+		return ${retval}
+	fi
+
+	if ${host_root} ; then
+		if ! ___eapi_best_version_and_has_version_support_--host-root; then
+			die "${FUNCNAME[0]}: option --host-root is not supported with EAPI ${EAPI}"
+		fi
+		root=/
+	fi
+
+	if ___eapi_has_prefix_variables; then
+		eroot=${root%/}${EPREFIX}/
+	else
+		eroot=${root}
+	fi
+	__ebuild_ipc_query has_version_any "${eroot}" "$@"
+	local retval=$?
+	case "${retval}" in
+		0|1)
+			return ${retval}
+			;;
+		2)
+			die "${FUNCNAME[0]}: invalid atom in: $*"
+			;;
+		*)
+			die "${FUNCNAME[0]}: unexpected ebuild-ipc exit code: ${retval}"
+			;;
+	esac
+}
+
+# @FUNCTION: best_version_many
+# @USAGE: [--host-root] <package name>...
+# @DESCRIPTION:
+# Echo the best installed match for each of the given atoms, one per line,
+# with an empty line for each atom that matches no installed package. This
+# is equivalent to calling best_version for each atom, but all atoms are
+# looked up in one query.
+best_version_many() {
+
+	local atom eroot host_root=false opts=() root=${ROOT}
+	if [[ $1 == --host-root ]] ; then
+		host_root=true
+		opts=( --host-root )
+		shift
+	fi
+	[[ $# -gt 0 ]] || die "${FUNCNAME[0]}: no atoms given"
+
+	if [[ -z $PORTAGE_IPC_DAEMON ]] ; then
+		# portageq only accepts one atom per call.
+		for atom in "$@" ; do
+			best_version "${opts[@]}" "${atom}"
+		done
+		return 0
+	fi
+
+	if ${host_root} ; then
+		if ! ___eapi_best_version_and_has_version_support_--host-root; then
+			die "${FUNCNAME[0]}: option --host-root is not supported with EAPI ${EAPI}"
+		fi
+		root=/
+	fi
+
+	if ___eapi_has_prefix_variables; then
+		eroot=${root%/}${EPREFIX}/
+	else
+		eroot=${root}
+	fi
+	__ebuild_ipc_query best_version_many "${eroot}" "$@"
+	local retval=$?
+	case "${retval}" in
+		0)
+			return ${retval}
+			;;
+		2)
+			die "${FUNCNAME[0]}: invalid atom in: $*"
+			;;
+		*)
+			die "${FUNCNAME[0]}: unexpected ebuild-ipc exit code: ${retval}"
+			;;
+	esac
+}
+
 if ___eapi_has_master_repositories; then
 	master_repositories() {
 		local output repository=$1 retval
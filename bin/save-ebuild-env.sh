@@ -54,8 +54,8 @@ __save_ebuild_env() {
 		__has_phase_defined_up_to \
 		hasv hasq __qa_source __qa_call \
 		addread addwrite adddeny addpredict __sb_append_var \
-		use usev useq has_version portageq \
-		best_version use_with use_enable register_die_hook \
+		use usev useq has_version has_version_any portageq \
+		best_version best_version_many use_with use_enable register_die_hook \
 		keepdir unpack __strip_duplicate_slashes econf einstall \
 		__dyn_setup __dyn_unpack __dyn_clean \
 		into insinto exeinto docinto \
@@ -70,7 +70,7 @@ __save_ebuild_env() {
 		__hasg __hasgq \
 		__save_ebuild_env __set_colors __filter_readonly_variables \
 		__preprocess_ebuild_env \
-		__source_all_bashrcs \
+		__source_all_bashrcs __ebuild_ipc_query \
 		__ebuild_main __ebuild_phase __ebuild_phase_with_hooks \
 		__ebuild_arg_to_phase __ebuild_phase_funcs default \
 		__unpack_tar __unset_colors \
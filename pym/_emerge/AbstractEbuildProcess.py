@@ -7,6 +7,7 @@ import textwrap
 from _emerge.SpawnProcess import SpawnProcess
 from _emerge.EbuildBuildDir import EbuildBuildDir
 from _emerge.EbuildIpcDaemon import EbuildIpcDaemon
+from _emerge.EbuildIpcQueryDaemon import EbuildIpcQueryDaemon
 import portage
 from portage.elog import messages as elog_messages
 from portage.localization import _
@@ -19,7 +20,8 @@ from portage.util import apply_secpass_permissions
 class AbstractEbuildProcess(SpawnProcess):
 
 	__slots__ = ('phase', 'settings',) + \
-		('_build_dir', '_ipc_daemon', '_exit_command', '_exit_timeout_id')
+		('_build_dir', '_ipc_daemon', '_ipc_query_daemon',
+		'_exit_command', '_exit_timeout_id')
 	_phases_without_builddir = ('clean', 'cleanrm', 'depend', 'help',)
 	_phases_interactive_whitelist = ('config',)
 
@@ -114,8 +116,10 @@ class AbstractEbuildProcess(SpawnProcess):
 			self.settings['PORTAGE_BUILDDIR'], '.ipc_in')
 		output_fifo = os.path.join(
 			self.settings['PORTAGE_BUILDDIR'], '.ipc_out')
+		query_fifo = os.path.join(
+			self.settings['PORTAGE_BUILDDIR'], '.ipc_query')
 
-		for p in (input_fifo, output_fifo):
+		for p in (input_fifo, output_fifo, query_fifo):
 
 			st = None
 			try:
@@ -136,7 +140,7 @@ class AbstractEbuildProcess(SpawnProcess):
 				gid=portage.data.portage_gid,
 				mode=0o770, stat_cached=st)
 
-		return (input_fifo, output_fifo)
+		return (input_fifo, output_fifo, query_fifo)
 
 	def _start_ipc_daemon(self):
 		self._exit_command = ExitCommand()
@@ -145,19 +149,34 @@ class AbstractEbuildProcess(SpawnProcess):
 		commands = {
 			'available_eclasses'  : query_command,
 			'best_version'        : query_command,
+			'best_version_many'   : query_command,
 			'eclass_path'         : query_command,
 			'exit'                : self._exit_command,
 			'has_version'         : query_command,
+			'has_version_any'     : query_command,
 			'license_path'        : query_command,
 			'master_repositories' : query_command,
 			'repository_path'     : query_command,
 		}
-		input_fifo, output_fifo = self._init_ipc_fifos()
+		input_fifo, output_fifo, query_fifo = self._init_ipc_fifos()
 		self._ipc_daemon = EbuildIpcDaemon(commands=commands,
 			input_fifo=input_fifo,
 			output_fifo=output_fifo,
 			scheduler=self.scheduler)
 		self._ipc_daemon.start()
+		# has_version and best_version are also served through a text
+		# protocol, so that phase-helpers.sh can query without
+		# starting the ebuild-ipc helper.
+		self._ipc_query_daemon = EbuildIpcQueryDaemon(
+			commands={
+				'best_version'      : query_command,
+				'best_version_many' : query_command,
+				'has_version'       : query_command,
+				'has_version_any'   : query_command,
+			},
+			input_fifo=query_fifo,
+			scheduler=self.scheduler)
+		self._ipc_query_daemon.start()
 
 	def _exit_command_callback(self):
 		if self._registered:
@@ -280,6 +299,7 @@ class AbstractEbuildProcess(SpawnProcess):
 
 		if self._ipc_daemon is not None:
 			self._ipc_daemon.cancel()
+			self._ipc_query_daemon.cancel()
 			if self._exit_command.exitcode is not None:
 				self.returncode = self._exit_command.exitcode
 			else:
@@ -183,7 +183,8 @@ class Binpkg(CompositeTask):
 		pkg_path = self._pkg_path
 
 		if self._fetched_pkg:
-			self._bintree.inject(pkg.cpv, filename=pkg_path)
+			self._bintree.inject(pkg.cpv, filename=pkg_path,
+				compact=False)
 
 		logfile = self.settings.get("PORTAGE_LOG_FILE")
 		if logfile is not None and os.path.isfile(logfile):
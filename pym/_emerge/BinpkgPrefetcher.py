@@ -35,7 +35,8 @@ class BinpkgPrefetcher(CompositeTask):
 			self.wait()
 			return
 
-		self._bintree.inject(self.pkg.cpv, filename=self.pkg_path)
+		self._bintree.inject(self.pkg.cpv, filename=self.pkg_path,
+			compact=False)
 
 		self._current_task = None
 		self.returncode = os.EX_OK
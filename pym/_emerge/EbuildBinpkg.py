@@ -43,7 +43,8 @@ class EbuildBinpkg(CompositeTask):
 
 		pkg = self.pkg
 		bintree = pkg.root_config.trees["bintree"]
-		bintree.inject(pkg.cpv, filename=self._binpkg_tmpfile)
+		bintree.inject(pkg.cpv, filename=self._binpkg_tmpfile,
+			compact=False)
 
 		self._current_task = None
 		self.returncode = os.EX_OK
@@ -0,0 +1,112 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import errno
+import logging
+import re
+import stat
+from portage import os
+from portage import _encodings
+from portage import _unicode_decode
+from portage import _unicode_encode
+from portage.localization import _
+from portage.util import writemsg_level
+from _emerge.FifoIpcDaemon import FifoIpcDaemon
+
+class EbuildIpcQueryDaemon(FifoIpcDaemon):
+	"""
+	This class serves query commands such as has_version and best_version
+	to ebuild processes through a simple text protocol, which the shell
+	can speak directly, so that queries do not have to pay for starting
+	a python interpreter in the ebuild-ipc helper.
+
+	Each request is a single line, which consists of NUL terminated
+	fields. The first field identifies a reply fifo that the client has
+	created in the directory of input_fifo, named '.ipc_reply_<id>', and
+	the remaining fields are the command arguments. Since clients write
+	each request with a single write() call of at most PIPE_BUF bytes,
+	concurrent requests are not interleaved and no lock is needed.
+
+	The reply is written to the reply fifo as three NUL terminated
+	fields: the returncode, stdout and stderr of the command.
+	"""
+
+	__slots__ = ('commands', '_buf',)
+
+	# The daemon keeps a write descriptor of its own open, so that there
+	# are no hangups between requests and input_fifo never needs to be
+	# reopened (which could lose requests).
+	_input_flags = os.O_RDWR|os.O_NONBLOCK
+
+	# Requests are limited to PIPE_BUF, so a longer line is garbage.
+	_max_request_size = 4096
+
+	_reply_id_re = re.compile(r'^[0-9]+$')
+
+	def _start(self):
+		self._buf = b''
+		FifoIpcDaemon._start(self)
+
+	def _input_handler(self, fd, event):
+		data = None
+		if event & self.scheduler.IO_IN:
+			try:
+				data = os.read(fd, self._bufsize)
+			except OSError as e:
+				if e.errno != errno.EAGAIN:
+					raise
+
+		if data:
+			buf = self._buf + data
+			lines = buf.split(b'\n')
+			buf = lines.pop()
+			if len(buf) > self._max_request_size:
+				buf = b''
+			self._buf = buf
+			for line in lines:
+				self._handle_request(line)
+
+		return True
+
+	def _handle_request(self, line):
+		fields = [_unicode_decode(x, encoding=_encodings['content'],
+			errors='replace') for x in line.split(b'\0')]
+		# Each field is terminated by a NUL, so the last one is empty.
+		if len(fields) < 3 or fields.pop():
+			return
+		reply_id = fields.pop(0)
+		if self._reply_id_re.match(reply_id) is None:
+			return
+
+		cmd_handler = self.commands.get(fields[0])
+		if cmd_handler is None:
+			reply = ('', 'Invalid command: %s\n' % fields[0], 3)
+		else:
+			reply = cmd_handler(fields)
+		self._send_reply(reply_id, reply)
+
+	def _send_reply(self, reply_id, reply):
+		out, err, returncode = reply
+		reply_fifo = os.path.join(os.path.dirname(self.input_fifo),
+			'.ipc_reply_%s' % reply_id)
+		# The reply fifo is created by the client, so refuse to follow
+		# symlinks or to write anything other than a fifo. The client
+		# keeps the fifo open while it waits for the reply, so a
+		# non-blocking open only fails if the client has gone away.
+		try:
+			output_fd = os.open(reply_fifo,
+				os.O_WRONLY | os.O_NONBLOCK | os.O_NOCTTY |
+				getattr(os, 'O_NOFOLLOW', 0))
+			try:
+				if not stat.S_ISFIFO(os.fstat(output_fd).st_mode):
+					raise OSError(errno.EINVAL, os.strerror(errno.EINVAL))
+				os.write(output_fd, _unicode_encode(
+					'%d\0%s\0%s\0' % (returncode, out, err),
+					encoding=_encodings['content'], errors='backslashreplace'))
+			finally:
+				os.close(output_fd)
+		except OSError as e:
+			writemsg_level(
+				"!!! EbuildIpcQueryDaemon %s: %s: %s\n" % \
+				(_('failed to send reply'), reply_fifo, e),
+				level=logging.ERROR, noiselevel=-1)
@@ -21,13 +21,16 @@ class FifoIpcDaemon(AbstractPollTask):
 	_file_names = ("pipe_in",)
 	_files_dict = slot_dict_class(_file_names, prefix="")
 
+	# Flags used to open input_fifo.
+	_input_flags = os.O_RDONLY|os.O_NONBLOCK
+
 	def _start(self):
 		self._files = self._files_dict()
 
 		# File streams are in unbuffered mode since we do atomic
 		# read and write of whole pickles.
 		self._files.pipe_in = \
-			os.open(self.input_fifo, os.O_RDONLY|os.O_NONBLOCK)
+			os.open(self.input_fifo, self._input_flags)
 
 		# FD_CLOEXEC is enabled by default in Python >=3.4.
 		if sys.hexversion < 0x3040000 and fcntl is not None:
@@ -54,7 +57,7 @@ class FifoIpcDaemon(AbstractPollTask):
 		self.scheduler.source_remove(self._reg_id)
 		os.close(self._files.pipe_in)
 		self._files.pipe_in = \
-			os.open(self.input_fifo, os.O_RDONLY|os.O_NONBLOCK)
+			os.open(self.input_fifo, self._input_flags)
 
 		# FD_CLOEXEC is enabled by default in Python >=3.4.
 		if sys.hexversion < 0x3040000 and fcntl is not None:
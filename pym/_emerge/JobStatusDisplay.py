@@ -21,7 +21,7 @@ if sys.hexversion >= 0x3000000:
 
 class JobStatusDisplay(object):
 
-	_bound_properties = ("curval", "failed", "running")
+	_bound_properties = ("curval", "failed", "running", "waiting")
 
 	# Don't update the display unless at least this much
 	# time has passed, in units of seconds.
@@ -174,6 +174,7 @@ class JobStatusDisplay(object):
 		self.merges = 0
 		for name in self._bound_properties:
 			object.__setattr__(self, name, 0)
+		object.__setattr__(self, "waiting", "")
 
 		if self._displayed:
 			self._write(self._term_codes['newline'])
@@ -239,6 +240,7 @@ class JobStatusDisplay(object):
 		maxval_str = "%s" % (self.maxval,)
 		running_str = "%s" % (self.running,)
 		failed_str = "%s" % (self.failed,)
+		waiting_str = "%s" % (self.waiting,)
 		load_avg_str = self._load_avg_str()
 
 		color_output = io.StringIO()
@@ -274,6 +276,10 @@ class JobStatusDisplay(object):
 			f.pop_style()
 			f.add_literal_data(" failed")
 
+		if self.waiting:
+			f.add_literal_data(", waiting for ")
+			f.add_literal_data(waiting_str)
+
 		padding = self._jobs_column_width - len(plain_output.getvalue())
 		if padding > 0:
 			f.add_literal_data(padding * " ")
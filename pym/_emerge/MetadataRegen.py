@@ -45,6 +45,7 @@ class MetadataRegen(AsyncScheduler):
 		valid_pkgs = self._valid_pkgs
 		cp_set = self._cp_set
 		consumer = self._consumer
+		repo_state = {}
 
 		portage.writemsg_stdout("Regenerating cache entries...\n")
 		for cp in self._cp_iter:
@@ -65,7 +66,7 @@ class MetadataRegen(AsyncScheduler):
 					if ebuild_path is None:
 						raise AssertionError("ebuild not found for '%s%s%s'" % (cpv, _repo_separator, repo.name))
 					metadata, ebuild_hash = portdb._pull_valid_cache(
-						cpv, ebuild_path, repo_path)
+						cpv, ebuild_path, repo_path, repo_state=repo_state)
 					if metadata is not None:
 						if consumer is not None:
 							consumer(cpv, repo_path, metadata, ebuild_hash, True)
@@ -712,28 +712,28 @@ class Package(Task):
 	def __lt__(self, other):
 		if other.cp != self.cp:
 			return False
-		if portage.vercmp(self.version, other.version) < 0:
+		if self.cpv.version_key < other.cpv.version_key:
 			return True
 		return False
 
 	def __le__(self, other):
 		if other.cp != self.cp:
 			return False
-		if portage.vercmp(self.version, other.version) <= 0:
+		if self.cpv.version_key <= other.cpv.version_key:
 			return True
 		return False
 
 	def __gt__(self, other):
 		if other.cp != self.cp:
 			return False
-		if portage.vercmp(self.version, other.version) > 0:
+		if self.cpv.version_key > other.cpv.version_key:
 			return True
 		return False
 
 	def __ge__(self, other):
 		if other.cp != self.cp:
 			return False
-		if portage.vercmp(self.version, other.version) >= 0:
+		if self.cpv.version_key >= other.cpv.version_key:
 			return True
 		return False
 
@@ -42,6 +42,7 @@ from _emerge.BinpkgPrefetcher import BinpkgPrefetcher
 from _emerge.BinpkgVerifier import BinpkgVerifier
 from _emerge.Blocker import Blocker
 from _emerge.BlockerDB import BlockerDB
+from _emerge._build_history import _build_durations, _build_peak_rss
 from _emerge.clear_caches import clear_caches
 from _emerge.create_depgraph_params import create_depgraph_params
 from _emerge.create_world_atom import create_world_atom
@@ -60,6 +61,8 @@ from _emerge.MergeListItem import MergeListItem
 from _emerge.Package import Package
 from _emerge.PackageMerge import PackageMerge
 from _emerge.PollScheduler import PollScheduler
+from _emerge._resource_usage import (_mem_available, _pressure,
+	_process_tree_rss)
 from _emerge.SequentialTaskQueue import SequentialTaskQueue
 
 if sys.hexversion >= 0x3000000:
@@ -73,6 +76,10 @@ class Scheduler(PollScheduler):
 	# max time between display status updates (milliseconds)
 	_max_display_latency = 3000
 
+	# max time between memory and pressure checks with --memory-reserve
+	# and --max-pressure (milliseconds)
+	_resource_check_latency = 1000
+
 	_opts_ignore_blockers = \
 		frozenset(["--buildpkgonly",
 		"--fetchonly", "--fetch-all-uri",
@@ -193,6 +200,18 @@ class Scheduler(PollScheduler):
 		# when no other packages are building.
 		self._deep_system_deps = set()
 
+		# Holds the estimated number of seconds that it takes to complete
+		# each merge and all of the merges that depend on it, which is
+		# used to choose the next build with --jobs-order=critical-path.
+		self._critical_path = {}
+		self._build_duration_history = None
+
+		# Holds the deep dependencies of queued packages that may still
+		# delay their merge, as calculated by _dependent_on_scheduled_merges,
+		# and a reverse mapping which is used to discard completed tasks.
+		self._pending_deps = {}
+		self._pending_dep_parents = {}
+
 		# Holds packages to merge which will satisfy currently unsatisfied
 		# deep runtime dependencies of system packages. If this is not empty
 		# then no parallel builds will be spawned until it is empty. This
@@ -203,6 +222,26 @@ class Scheduler(PollScheduler):
 		self._status_display = JobStatusDisplay(
 			xterm_titles=('notitles' not in settings.features))
 		self._max_load = myopts.get("--load-average")
+		self._max_pressure = myopts.get("--max-pressure")
+		self._memory_reserve = myopts.get("--memory-reserve")
+		if self._memory_reserve is not None:
+			# megabytes to KiB
+			self._memory_reserve *= 1024
+
+		# Holds the peak resident set size (in KiB) of each running
+		# build with --memory-reserve, and the peak sizes of previous
+		# builds from emerge.log, which are used to estimate how much
+		# more memory the builds will use.
+		self._build_peak_rss = {}
+		# Holds the available memory and the resident set sizes of
+		# running builds from the most recent sample by _resource_check(),
+		# so that _choose_pkg() does not have to scan /proc every time.
+		self._memory_sample = None
+		self._peak_rss_history = None
+		self._default_peak_rss = 0
+		# Holds the reason that jobs are waiting for resources, if any,
+		# for display by JobStatusDisplay.
+		self._resource_wait = ""
 		max_jobs = myopts.get("--jobs")
 		if max_jobs is None:
 			max_jobs = 1
@@ -415,12 +454,16 @@ class Scheduler(PollScheduler):
 
 	def _set_graph_config(self, graph_config):
 
+		self._pending_deps.clear()
+		self._pending_dep_parents.clear()
+
 		if graph_config is None:
 			self._graph_config = None
 			self._pkg_cache = {}
 			self._digraph = None
 			self._mergelist = []
 			self._deep_system_deps.clear()
+			self._critical_path.clear()
 			return
 
 		self._graph_config = graph_config
@@ -442,6 +485,8 @@ class Scheduler(PollScheduler):
 		self._find_system_deps()
 		self._prune_digraph()
 		self._prevent_builddir_collisions()
+		if self.myopts.get("--jobs-order") == "critical-path":
+			self._calc_critical_path()
 		if '--debug' in self.myopts:
 			writemsg("\nscheduler digraph:\n\n", noiselevel=-1)
 			self._digraph.debug_print()
@@ -463,6 +508,57 @@ class Scheduler(PollScheduler):
 		deep_system_deps.difference_update([pkg for pkg in \
 			deep_system_deps if pkg.operation != "merge"])
 
+	def _calc_critical_path(self):
+		"""
+		For each merge, estimate how long it takes to complete the merge
+		together with the longest chain of merges that depend on it. Build
+		durations are taken from the most recent merges recorded in
+		emerge.log, and unknown durations are assumed to be the median of
+		the known ones.
+		"""
+		if self._build_duration_history is None:
+			self._build_duration_history = _build_durations(
+				os.path.join(_emerge.emergelog._emerge_log_dir, 'emerge.log'))
+		history = self._build_duration_history
+		default_duration = 1
+		if history:
+			default_duration = max(default_duration,
+				sorted(history.values())[len(history) // 2])
+
+		graph = self._digraph
+		merges = set(x for x in self._mergelist if isinstance(x, Package)
+			and x.operation == "merge" and x in graph)
+		critical_path = self._critical_path
+		critical_path.clear()
+
+		for pkg in merges:
+			if pkg in critical_path:
+				continue
+			# Iterative depth-first traversal of the merges that depend
+			# on pkg, with circular dependencies ignored.
+			traversed = set([pkg])
+			node_stack = [(pkg, iter(graph.parent_nodes(pkg)))]
+			while node_stack:
+				node, parents = node_stack[-1]
+				for parent in parents:
+					if parent in merges and parent not in critical_path and \
+						parent not in traversed:
+						traversed.add(parent)
+						node_stack.append(
+							(parent, iter(graph.parent_nodes(parent))))
+						break
+				else:
+					node_stack.pop()
+					longest = 0
+					for parent in graph.parent_nodes(node):
+						longest = max(longest, critical_path.get(parent, 0))
+					if node.type_name == "ebuild":
+						duration = history.get(node.cp, default_duration)
+					else:
+						# Binary packages are only unpacked and merged.
+						duration = 1
+					critical_path[node] = duration + longest
+
 	def _prune_digraph(self):
 		"""
 		Prune any root nodes that are irrelevant.
@@ -480,6 +576,8 @@ class Scheduler(PollScheduler):
 					removed_nodes.add(node)
 			if removed_nodes:
 				graph.difference_update(removed_nodes)
+				for node in removed_nodes:
+					self._discard_pending_deps(node)
 			if not removed_nodes:
 				break
 			removed_nodes.clear()
@@ -861,7 +959,8 @@ class Scheduler(PollScheduler):
 						continue
 
 					if fetched:
-						bintree.inject(x.cpv, filename=fetched)
+						bintree.inject(x.cpv, filename=fetched,
+							compact=False)
 					tbz2_file = bintree.getname(x.cpv)
 					infloc = os.path.join(build_dir_path, "build-info")
 					ensure_dirs(infloc)
@@ -1057,6 +1156,11 @@ class Scheduler(PollScheduler):
 
 		self._logger.log(" *** Finished. Cleaning up...")
 
+		# Make binary packages that were added during this run
+		# visible to binhost clients.
+		for root in self.trees:
+			self.trees[root]["bintree"]._pkgindex_compact()
+
 		if failed_pkgs:
 			self._failed_pkgs_all.extend(failed_pkgs)
 			del failed_pkgs[:]
@@ -1297,6 +1401,11 @@ class Scheduler(PollScheduler):
 
 	def _build_exit(self, build):
 		self._running_tasks.pop(id(build), None)
+		peak_rss = self._build_peak_rss.pop(build.pkg, None)
+		if peak_rss and build.returncode == os.EX_OK and \
+			not self._terminated_tasks:
+			self._logger.log(" ::: peak rss %s to %s: %d KiB" % \
+				(build.pkg.cpv, build.pkg.root, peak_rss))
 		if build.returncode == os.EX_OK and self._terminated_tasks:
 			# We've been interrupted, so we won't
 			# add this to the merge queue.
@@ -1338,6 +1447,7 @@ class Scheduler(PollScheduler):
 
 	def _task_complete(self, pkg):
 		self._completed_tasks.add(pkg)
+		self._discard_pending_deps(pkg)
 		self._unsatisfied_system_deps.discard(pkg)
 		self._choose_pkg_return_early = False
 		blocker_db = self._blocker_db[pkg.root]
@@ -1353,6 +1463,14 @@ class Scheduler(PollScheduler):
 			# average has changed since the last call.
 			loadavg_check_id = self._event_loop.timeout_add(
 				self._loadavg_latency, self._schedule)
+		resource_check_id = None
+		if (self._memory_reserve is not None or
+			self._max_pressure is not None) and \
+			(self._max_jobs is True or self._max_jobs > 1):
+			# Sample memory usage of running builds, and schedule
+			# when available memory or pressure may have changed.
+			resource_check_id = self._event_loop.timeout_add(
+				self._resource_check_latency, self._resource_check)
 
 		try:
 			# Populate initial event sources. Unless we're scheduling
@@ -1374,6 +1492,8 @@ class Scheduler(PollScheduler):
 			self._event_loop.source_remove(term_check_id)
 			if loadavg_check_id is not None:
 				self._event_loop.source_remove(loadavg_check_id)
+			if resource_check_id is not None:
+				self._event_loop.source_remove(resource_check_id)
 
 	def _merge(self):
 
@@ -1407,9 +1527,14 @@ class Scheduler(PollScheduler):
 	def _main_loop_cleanup(self):
 		del self._pkg_queue[:]
 		self._completed_tasks.clear()
+		self._pending_deps.clear()
+		self._pending_dep_parents.clear()
 		self._deep_system_deps.clear()
 		self._unsatisfied_system_deps.clear()
 		self._choose_pkg_return_early = False
+		self._build_peak_rss.clear()
+		self._memory_sample = None
+		self._resource_wait = ""
 		self._status_display.reset()
 		self._digraph = None
 		self._task_queues.fetch.clear()
@@ -1433,12 +1558,16 @@ class Scheduler(PollScheduler):
 				return None
 			return self._pkg_queue.pop(0)
 
-		if not self._is_work_scheduled():
+		if not self._is_work_scheduled() and not self._critical_path:
 			return self._pkg_queue.pop(0)
 
 		self._prune_digraph()
 
 		chosen_pkg = None
+		memory_wait = False
+		memory_headroom = None
+		if self._memory_reserve is not None and self._jobs:
+			memory_headroom = self._memory_headroom()
 
 		# Prefer uninstall operations when available.
 		graph = self._digraph
@@ -1449,21 +1578,51 @@ class Scheduler(PollScheduler):
 				break
 
 		if chosen_pkg is None:
-			later = set(self._pkg_queue)
-			for pkg in self._pkg_queue:
+			pkg_queue = self._pkg_queue
+			critical_path = self._critical_path
+			if critical_path:
+				# The longest remaining critical path in each suffix of
+				# the queue, so that the search can stop as soon as no
+				# later package can be preferred.
+				suffix_max = [0] * (len(pkg_queue) + 1)
+				for i in range(len(pkg_queue) - 1, -1, -1):
+					suffix_max[i] = max(suffix_max[i + 1],
+						critical_path.get(pkg_queue[i], 0))
+				chosen_length = -1
+
+			later = set(pkg_queue)
+			for i, pkg in enumerate(pkg_queue):
+				if critical_path and chosen_length >= suffix_max[i]:
+					break
 				later.remove(pkg)
 				if not self._dependent_on_scheduled_merges(pkg, later):
-					chosen_pkg = pkg
-					break
+					if memory_headroom is not None and \
+						self._expected_peak_rss(pkg) > memory_headroom:
+						# Starting this build could run out of memory,
+						# but a smaller one may fit.
+						memory_wait = True
+						continue
+					if not critical_path:
+						chosen_pkg = pkg
+						break
+					length = critical_path.get(pkg, 0)
+					if length > chosen_length:
+						chosen_pkg = pkg
+						chosen_length = length
 
 		if chosen_pkg is not None:
 			self._pkg_queue.remove(chosen_pkg)
 
 		if chosen_pkg is None:
-			# There's no point in searching for a package to
-			# choose until at least one of the existing jobs
-			# completes.
-			self._choose_pkg_return_early = True
+			if memory_wait:
+				# Memory may be released before any of the existing
+				# jobs completes, so _resource_check will retry.
+				self._resource_wait = "memory"
+			else:
+				# There's no point in searching for a package to
+				# choose until at least one of the existing jobs
+				# completes.
+				self._choose_pkg_return_early = True
 
 		return chosen_pkg
 
@@ -1482,10 +1641,28 @@ class Scheduler(PollScheduler):
 		@return: True if the package is dependent, False otherwise.
 		"""
 
+		pending_deps = self._pending_deps.get(pkg)
+		if pending_deps is None:
+			pending_deps = self._calc_pending_deps(pkg)
+
+		for node in pending_deps:
+			if node not in later:
+				return True
+		return False
+
+	def _calc_pending_deps(self, pkg):
+		"""
+		Traverse the subgraph of the given packages deep dependencies and
+		return the set of nodes that may delay its merge until they have
+		completed. The result is memoized, and completed tasks are removed
+		from it by _task_complete, since the subgraph does not change
+		while the graph config stays the same.
+		"""
 		graph = self._digraph
 		completed_tasks = self._completed_tasks
+		pending_dep_parents = self._pending_dep_parents
 
-		dependent = False
+		pending_deps = set()
 		traversed_nodes = set([pkg])
 		direct_deps = graph.child_nodes(pkg)
 		node_stack = direct_deps
@@ -1498,17 +1675,37 @@ class Scheduler(PollScheduler):
 			if not ((node.installed and node.operation == "nomerge") or \
 				(node.operation == "uninstall" and \
 				node not in direct_deps) or \
-				node in completed_tasks or \
-				node in later):
-				dependent = True
-				break
+				node in completed_tasks):
+				pending_deps.add(node)
+				pending_dep_parents.setdefault(node, set()).add(pkg)
 
 			# Don't traverse children of uninstall nodes since
 			# those aren't dependencies in the usual sense.
 			if node.operation != "uninstall":
 				node_stack.extend(graph.child_nodes(node))
 
-		return dependent
+		self._pending_deps[pkg] = pending_deps
+		return pending_deps
+
+	def _discard_pending_deps(self, node):
+		"""
+		Discard the memoized pending dependencies of a node that has
+		completed or has been removed from the graph, together with its
+		entries in the reverse mapping, and remove it from the pending
+		dependencies of other packages.
+		"""
+		pending_deps = self._pending_deps
+		pending_dep_parents = self._pending_dep_parents
+		for dep in pending_deps.pop(node, ()):
+			parents = pending_dep_parents.get(dep)
+			if parents is not None:
+				parents.discard(node)
+				if not parents:
+					del pending_dep_parents[dep]
+		for parent in pending_dep_parents.pop(node, ()):
+			deps = pending_deps.get(parent)
+			if deps is not None:
+				deps.discard(node)
 
 	def _allocate_config(self, root):
 		"""
@@ -1563,6 +1760,7 @@ class Scheduler(PollScheduler):
 			if self._schedule_tasks_imp():
 				state_change += 1
 
+			self._status_display.waiting = self._resource_wait
 			self._status_display.display()
 
 			# Cancel prefetchers if they're the only reason
@@ -1609,6 +1807,136 @@ class Scheduler(PollScheduler):
 		self._schedule()
 		return False
 
+	def _pressure_delay(self):
+		"""
+		Delay job scheduling while other jobs are running and the memory
+		or cpu pressure reported by /proc/pressure is at least the
+		percentage given by --max-pressure.
+		@rtype: bool
+		@return: True if job scheduling should be delayed, False otherwise.
+		"""
+
+		if self._jobs and self._max_pressure is not None:
+			for resource in ("memory", "cpu"):
+				try:
+					pressure = _pressure(resource)
+				except OSError:
+					continue
+				if pressure >= self._max_pressure:
+					self._resource_wait = "%s pressure" % resource
+					return True
+
+		return False
+
+	def _resource_check(self):
+		"""
+		Sample the available memory and the memory usage of running
+		builds for --memory-reserve, and schedule if jobs are waiting
+		for resources that may have become available. This always
+		returns True, for continuous scheduling via timeout_add.
+		"""
+		if self._memory_reserve is not None:
+			self._sample_memory()
+		if self._resource_wait:
+			self._schedule()
+		return True
+
+	def _running_builds(self):
+		"""
+		Return a dict which maps each package that is currently being
+		built to the process id of its current phase.
+		"""
+		builds = {}
+		for task in self._running_tasks.values():
+			if not isinstance(task, MergeListItem) or task.pkg.built:
+				continue
+			current_task = task
+			while current_task is not None and \
+				getattr(current_task, "pid", None) is None:
+				current_task = getattr(current_task, "_current_task", None)
+			if current_task is not None:
+				builds[task.pkg] = current_task.pid
+		return builds
+
+	def _sample_build_rss(self):
+		"""
+		Return a dict which maps each package that is currently being
+		built to the resident set size (in KiB) of its processes, and
+		update the peak sizes which are recorded in emerge.log when the
+		builds complete.
+		"""
+		builds = self._running_builds()
+		if not builds:
+			return {}
+		try:
+			tree_rss = _process_tree_rss(builds.values())
+		except OSError:
+			return {}
+
+		build_rss = {}
+		peak_rss = self._build_peak_rss
+		for pkg, pid in builds.items():
+			rss = tree_rss[pid]
+			build_rss[pkg] = rss
+			if rss > peak_rss.get(pkg, 0):
+				peak_rss[pkg] = rss
+		return build_rss
+
+	def _sample_memory(self):
+		"""
+		Sample the available memory and the resident set sizes of running
+		builds, for use by _memory_headroom() until the next sample.
+		"""
+		build_rss = self._sample_build_rss()
+		try:
+			available = _mem_available()
+		except OSError:
+			available = None
+		self._memory_sample = (available, build_rss)
+
+	def _expected_peak_rss(self, pkg):
+		"""
+		Estimate the peak resident set size (in KiB) of a build, from
+		the most recent build of the same package recorded in emerge.log.
+		Unknown sizes are assumed to be the median of the known ones,
+		and binary packages are assumed to need no significant memory.
+		"""
+		if pkg.built:
+			return 0
+		if self._peak_rss_history is None:
+			history = _build_peak_rss(
+				os.path.join(_emerge.emergelog._emerge_log_dir, 'emerge.log'))
+			self._peak_rss_history = history
+			if history:
+				self._default_peak_rss = \
+					sorted(history.values())[len(history) // 2]
+		return self._peak_rss_history.get(pkg.cp, self._default_peak_rss)
+
+	def _memory_headroom(self):
+		"""
+		Return the amount of memory (in KiB) that new builds may use
+		without reducing the available memory below --memory-reserve,
+		once the running builds have reached their expected peak sizes,
+		or None if the available memory is unobtainable. This uses the
+		most recent sample from _resource_check(), so builds that have
+		started since then are expected to use their whole peak size.
+		"""
+		if self._memory_sample is None:
+			self._sample_memory()
+		available, build_rss = self._memory_sample
+		if available is None:
+			return None
+
+		peak_rss = self._build_peak_rss
+		for task in self._running_tasks.values():
+			if not isinstance(task, MergeListItem) or task.pkg.built:
+				continue
+			pkg = task.pkg
+			expected = max(self._expected_peak_rss(pkg),
+				peak_rss.get(pkg, 0))
+			available -= expected - build_rss.get(pkg, 0)
+		return available - self._memory_reserve
+
 	def _schedule_tasks_imp(self):
 		"""
 		@rtype: bool
@@ -1619,6 +1947,8 @@ class Scheduler(PollScheduler):
 
 		while True:
 
+			self._resource_wait = ""
+
 			if not self._keep_scheduling():
 				return bool(state_change)
 
@@ -1626,7 +1956,8 @@ class Scheduler(PollScheduler):
 				self._merge_wait_scheduled or \
 				(self._jobs and self._unsatisfied_system_deps) or \
 				not self._can_add_job() or \
-				self._job_delay():
+				self._job_delay() or \
+				self._pressure_delay():
 				return bool(state_change)
 
 			pkg = self._choose_pkg()
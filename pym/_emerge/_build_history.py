@@ -0,0 +1,83 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import io
+import re
+
+from portage import _encodings
+from portage import _unicode_encode
+from portage.versions import catpkgsplit
+
+_merge_re = re.compile(r'^(\d+):\s+(>>> emerge|::: completed emerge) ' + \
+	r'\(\d+ of \d+\) (\S+) to (\S+)')
+
+_peak_rss_re = re.compile(r'^\d+:\s+::: peak rss (\S+) to \S+: (\d+) KiB')
+
+def _open_log(log_path):
+	try:
+		return io.open(_unicode_encode(log_path,
+			encoding=_encodings['fs'], errors='strict'),
+			mode='r', encoding=_encodings['content'], errors='replace')
+	except EnvironmentError:
+		return None
+
+def _cpv_key(cpv):
+	split = catpkgsplit(cpv)
+	if split is None:
+		return None
+	return split[0] + '/' + split[1]
+
+def _build_durations(log_path):
+	"""
+	Parse emerge.log and return a dict which maps each package name
+	(category/package) to the number of seconds that its most recent
+	merge took, measured from the start of the build to the completion
+	of the merge.
+	"""
+	durations = {}
+	started = {}
+	f = _open_log(log_path)
+	if f is None:
+		return durations
+
+	with f:
+		for line in f:
+			m = _merge_re.match(line)
+			if m is None:
+				continue
+			timestamp, event, cpv, root = m.groups()
+			timestamp = int(timestamp)
+			if event == '>>> emerge':
+				started[(cpv, root)] = timestamp
+				continue
+			start = started.pop((cpv, root), None)
+			if start is None or timestamp < start:
+				continue
+			cp = _cpv_key(cpv)
+			if cp is not None:
+				durations[cp] = timestamp - start
+
+	return durations
+
+def _build_peak_rss(log_path):
+	"""
+	Parse emerge.log and return a dict which maps each package name
+	(category/package) to the peak resident set size, in KiB, of its
+	most recent build, as recorded by emerge --memory-reserve.
+	"""
+	peak_rss = {}
+	f = _open_log(log_path)
+	if f is None:
+		return peak_rss
+
+	with f:
+		for line in f:
+			m = _peak_rss_re.match(line)
+			if m is None:
+				continue
+			cpv, rss = m.groups()
+			cp = _cpv_key(cpv)
+			if cp is not None:
+				peak_rss[cp] = int(rss)
+
+	return peak_rss
@@ -0,0 +1,124 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import resource
+
+from portage import os
+
+def _mem_available():
+	"""
+	Return the amount of memory, in KiB, that is available for starting
+	new processes without swapping, as reported by /proc/meminfo.
+	Raises OSError if the amount of available memory was unobtainable.
+	"""
+	try:
+		with open('/proc/meminfo') as f:
+			return _parse_meminfo(f)
+	except IOError:
+		raise OSError('unknown')
+
+def _parse_meminfo(lines):
+	"""
+	Return the amount of available memory, in KiB, from the lines of
+	/proc/meminfo. Raises OSError if it is not given.
+	"""
+	meminfo = {}
+	try:
+		for line in lines:
+			line_split = line.split()
+			if len(line_split) >= 2:
+				meminfo[line_split[0].rstrip(':')] = int(line_split[1])
+	except ValueError:
+		raise OSError('unknown')
+
+	if 'MemAvailable' in meminfo:
+		return meminfo['MemAvailable']
+
+	# Kernels older than 3.14 do not provide MemAvailable.
+	try:
+		return meminfo['MemFree'] + meminfo['Buffers'] + meminfo['Cached']
+	except KeyError:
+		raise OSError('unknown')
+
+def _pressure(resource):
+	"""
+	Return the percentage of time, averaged over the last 10 seconds,
+	in which some tasks were stalled waiting for the given resource
+	("cpu", "memory" or "io"), as reported by /proc/pressure.
+	Raises OSError if pressure stall information was unobtainable,
+	which is the case for kernels older than 4.20.
+	"""
+	try:
+		with open(os.path.join('/proc/pressure', resource)) as f:
+			return _parse_pressure(f)
+	except IOError:
+		raise OSError('unknown')
+
+def _parse_pressure(lines):
+	"""
+	Return the avg10 value of the "some" line of a /proc/pressure file.
+	Raises OSError if it is not given.
+	"""
+	try:
+		for line in lines:
+			line_split = line.split()
+			if not line_split or line_split[0] != 'some':
+				continue
+			for field in line_split[1:]:
+				if field.startswith('avg10='):
+					return float(field[len('avg10='):])
+	except ValueError:
+		pass
+	raise OSError('unknown')
+
+def _parse_proc_stat(stat):
+	"""
+	Return the parent process id and the resident set size, in pages,
+	from the contents of a /proc/<pid>/stat file, given as bytes.
+	Raises ValueError if they can not be parsed.
+	"""
+	# The command name is enclosed in parentheses and may
+	# contain spaces, so split the remaining fields after it.
+	fields = stat[stat.rfind(b')') + 2:].split()
+	try:
+		return int(fields[1]), int(fields[21])
+	except IndexError:
+		raise ValueError(stat)
+
+def _process_tree_rss(pids):
+	"""
+	Return a dict which maps each of the given process ids to the sum
+	of the resident set sizes, in KiB, of the process and all of its
+	descendants, as reported by /proc. Processes that have exited map
+	to 0. Raises OSError if /proc is unavailable.
+	"""
+	page_kib = resource.getpagesize() // 1024
+	children = {}
+	rss = {}
+	for name in os.listdir('/proc'):
+		if not name.isdigit():
+			continue
+		try:
+			with open('/proc/%s/stat' % name, 'rb') as f:
+				stat = f.read()
+		except IOError:
+			# The process has exited.
+			continue
+		try:
+			ppid, pages = _parse_proc_stat(stat)
+		except ValueError:
+			continue
+		pid = int(name)
+		rss[pid] = pages * page_kib
+		children.setdefault(ppid, []).append(pid)
+
+	totals = {}
+	for pid in pids:
+		total = 0
+		stack = [pid]
+		while stack:
+			node = stack.pop()
+			total += rss.get(node, 0)
+			stack.extend(children.get(node, ()))
+		totals[pid] = total
+	return totals
@@ -41,6 +41,7 @@ from portage.const import GLOBAL_CONFIG_PATH
 from portage.const import _DEPCLEAN_LIB_CHECK_DEFAULT
 from portage.dbapi.dep_expand import dep_expand
 from portage.dbapi._expand_new_virt import expand_new_virt
+from portage.dbapi._SearchIndex import SearchIndex
 from portage.dep import Atom
 from portage.eclass_cache import hashed_path
 from portage.exception import InvalidAtom, InvalidData
@@ -2197,6 +2198,17 @@ def action_sync(settings, trees, mtimedb, myopts, myaction):
 	chk_updated_cfg_files(settings["EROOT"],
 		portage.util.shlex_split(settings.get("CONFIG_PROTECT", "")))
 
+	# Update the index that is used by emerge --searchdesc now, so
+	# that the first search after sync does not have to do it.
+	search_index = os.path.join(settings["EROOT"],
+		portage.const.CACHE_PATH, "search_index.sqlite")
+	try:
+		SearchIndex(portdb, search_index).update()
+	except (CacheError, EnvironmentError,
+		portage.exception.PortageException) as e:
+		writemsg_level("!!! Unable to update %s: %s\n" % (search_index, e),
+			level=logging.WARNING, noiselevel=-1)
+
 	if myaction != "metadata":
 		postsync = os.path.join(settings["PORTAGE_CONFIGROOT"],
 			portage.USER_CONFIG_PATH, "bin", "post_sync")
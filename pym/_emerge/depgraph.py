@@ -103,6 +103,10 @@ def _wildcard_set(atoms):
 		pkgs.add(x)
 	return pkgs
 
+def _copy_dep_struct(dep_struct):
+	return [_copy_dep_struct(x) if isinstance(x, list) else x
+		for x in dep_struct]
+
 class _frozen_depgraph_config(object):
 
 	def __init__(self, settings, trees, myopts, spinner):
@@ -121,6 +125,19 @@ class _frozen_depgraph_config(object):
 		# All Package instances
 		self._pkg_cache = {}
 		self._highest_license_masked = {}
+		# Results that only depend on a package, its USE configuration
+		# and the static configuration, shared by all backtracking runs.
+		# Backtracking masks are applied to the results after lookup,
+		# and USE changes are part of the keys, so none of these are
+		# invalidated by new backtrack parameters.
+		self._reduced_deps_cache = {}
+		self._masking_status_cache = {}
+		self._match_pkgs_cache = {}
+		# Metadata of ebuilds that dependencies may resolve to is
+		# prefetched in parallel, which only pays off if more than
+		# one job is allowed.
+		self._metadata_prefetch = myopts.get("--jobs") not in (None, 1)
+		self._metadata_prefetched = set()
 		dynamic_deps = myopts.get("--dynamic-deps", "y") != "n"
 		ignore_built_slot_operator_deps = myopts.get(
 			"--ignore-built-slot-operator-deps", "n") == "y"
@@ -403,6 +420,7 @@ class _dynamic_depgraph_config(object):
 		self._circular_deps_for_display = None
 		self._dep_stack = []
 		self._dep_disjunctive_stack = []
+		self._metadata_prefetch_queue = []
 		self._unsatisfied_deps = []
 		self._initially_unsatisfied_deps = []
 		self._ignored_deps = []
@@ -578,6 +596,7 @@ class depgraph(object):
 
 	def _dynamic_deps_preload(self, fake_vartree, fakedb):
 		portdb = fake_vartree._portdb
+		repo_state = {}
 		for pkg in fake_vartree.dbapi:
 			self._spinner_update()
 			fakedb.cpv_inject(pkg)
@@ -587,7 +606,7 @@ class depgraph(object):
 				fake_vartree.dynamic_deps_preload(pkg, None)
 				continue
 			metadata, ebuild_hash = portdb._pull_valid_cache(
-				pkg.cpv, ebuild_path, repo_path)
+				pkg.cpv, ebuild_path, repo_path, repo_state=repo_state)
 			if metadata is not None:
 				fake_vartree.dynamic_deps_preload(pkg, metadata)
 			else:
@@ -613,6 +632,89 @@ class depgraph(object):
 				metadata = proc.metadata
 			self._fake_vartree.dynamic_deps_preload(self._pkg, metadata)
 
+	def _prefetch_metadata(self):
+		"""
+		Generate missing metadata for the ebuilds that the dependencies
+		of queued packages may resolve to, using parallel processes, so
+		that the following aux_get calls hit the cache instead of
+		sourcing the ebuilds one at a time.
+		"""
+		pkgs = self._dynamic_config._metadata_prefetch_queue
+		self._dynamic_config._metadata_prefetch_queue = []
+		procs = list(self._metadata_prefetch_procs(pkgs))
+		if procs:
+			scheduler = TaskScheduler(iter(procs),
+				max_jobs=self._frozen_config.myopts.get("--jobs"),
+				max_load=self._frozen_config.myopts.get("--load-average"),
+				event_loop=procs[0].portdb._event_loop)
+			scheduler.start()
+			scheduler.wait()
+
+	def _metadata_prefetch_procs(self, pkgs):
+		prefetched = self._frozen_config._metadata_prefetched
+		repo_state = {}
+		for pkg in pkgs:
+			portdb = self._frozen_config.trees[pkg.root]["porttree"].dbapi
+			cps = set()
+			for k in Package._dep_keys:
+				dep_string = pkg._metadata[k]
+				if not dep_string:
+					continue
+				try:
+					dep_struct = self._reduce_pkg_dep_string(pkg, dep_string)
+				except InvalidDependString:
+					continue
+				stack = [dep_struct]
+				while stack:
+					for x in stack.pop():
+						if isinstance(x, list):
+							stack.append(x)
+						elif isinstance(x, Atom) and not x.blocker:
+							cps.add(x.cp)
+
+			for cp in cps:
+				if (pkg.root, cp) in prefetched:
+					continue
+				prefetched.add((pkg.root, cp))
+				for repo_path in portdb.porttrees:
+					# Repositories that provide pre-generated metadata
+					# rarely need any ebuilds to be sourced, so don't
+					# spend time validating cache entries for them here.
+					if repo_path in portdb._pregen_auxdb:
+						continue
+					for cpv in portdb.cp_list(cp, mytree=[repo_path]):
+						ebuild_path = portdb.findname(cpv, mytree=repo_path)
+						if ebuild_path is None or \
+							ebuild_path in portdb._broken_ebuilds:
+							continue
+						try:
+							metadata, ebuild_hash = portdb._pull_valid_cache(
+								cpv, ebuild_path, repo_path,
+								repo_state=repo_state)
+						except KeyError:
+							continue
+						if metadata is not None:
+							continue
+						proc = EbuildMetadataPhase(cpv=cpv,
+							ebuild_hash=ebuild_hash,
+							portdb=portdb, repo_path=repo_path,
+							settings=portdb.doebuild_settings)
+						proc.addExitListener(
+							self._metadata_prefetch_proc_exit(ebuild_path))
+						yield proc
+
+	class _metadata_prefetch_proc_exit(object):
+
+		__slots__ = ('_ebuild_path',)
+
+		def __init__(self, ebuild_path):
+			self._ebuild_path = ebuild_path
+
+		def __call__(self, proc):
+			if proc.returncode != os.EX_OK:
+				# Avoid sourcing it again in aux_get.
+				proc.portdb._broken_ebuilds.add(self._ebuild_path)
+
 	def _spinner_update(self):
 		if self._frozen_config.spinner:
 			self._frozen_config.spinner.update()
@@ -1604,6 +1706,8 @@ class depgraph(object):
 		while dep_stack or dep_disjunctive_stack:
 			self._spinner_update()
 			while dep_stack:
+				if self._dynamic_config._metadata_prefetch_queue:
+					self._prefetch_metadata()
 				dep = dep_stack.pop()
 				if isinstance(dep, Package):
 					if not self._add_pkg_deps(dep,
@@ -2004,6 +2108,9 @@ class depgraph(object):
 
 		if not previously_added:
 			dep_stack.append(pkg)
+			if dep_stack is self._dynamic_config._dep_stack and \
+				self._frozen_config._metadata_prefetch:
+				self._dynamic_config._metadata_prefetch_queue.append(pkg)
 		return 1
 
 	def _check_masks(self, pkg):
@@ -2135,11 +2242,9 @@ class depgraph(object):
 						noiselevel=-1, level=logging.DEBUG)
 
 				try:
-					dep_string = portage.dep.use_reduce(dep_string,
-						uselist=self._pkg_use_enabled(pkg),
-						is_valid_flag=pkg.iuse.is_valid_flag,
-						opconvert=True, token_class=Atom,
-						eapi=pkg.eapi)
+					# Consumers may modify the structure in place.
+					dep_string = _copy_dep_struct(
+						self._reduce_pkg_dep_string(pkg, dep_string))
 				except portage.exception.InvalidDependString as e:
 					if not pkg.installed:
 						# should have been masked before it was selected
@@ -2182,6 +2287,25 @@ class depgraph(object):
 		self._dynamic_config._traversed_pkg_deps.add(pkg)
 		return 1
 
+	def _reduce_pkg_dep_string(self, pkg, dep_string):
+		"""
+		Return the result of use_reduce for a dependency string of pkg,
+		evaluated with its current USE configuration. The result is
+		shared, so callers must not modify it. Raises InvalidDependString
+		when necessary.
+		"""
+		use = frozenset(self._pkg_use_enabled(pkg))
+		cache_key = (pkg, dep_string, use)
+		reduced_deps = self._frozen_config._reduced_deps_cache.get(cache_key)
+		if reduced_deps is None:
+			reduced_deps = portage.dep.use_reduce(dep_string,
+				uselist=use,
+				is_valid_flag=pkg.iuse.is_valid_flag,
+				opconvert=True, token_class=Atom,
+				eapi=pkg.eapi)
+			self._frozen_config._reduced_deps_cache[cache_key] = reduced_deps
+		return reduced_deps
+
 	def _add_pkg_dep_string(self, pkg, dep_root, dep_priority, dep_string,
 		allow_unsatisfied):
 		_autounmask_backup = self._dynamic_config._autounmask
@@ -4176,9 +4300,50 @@ class depgraph(object):
 		checks (to avoid the expense when possible).
 		"""
 
+		# Matches for onlydeps packages depend on the graph, matches with
+		# USE deps or old-style virtuals (PROVIDE) depend on the USE
+		# configuration, and matches for installed packages may depend
+		# on the available SLOTs, so only cache the remaining ones.
+		if onlydeps or atom.use is not None or \
+			pkg_type == "installed" or atom.cp.startswith("virtual/"):
+			for pkg in self._iter_match_pkgs_imp(root_config, pkg_type,
+				atom, onlydeps=onlydeps):
+				yield pkg
+			return
+
+		# Callers often stop at the first acceptable match, so only the
+		# matching cpvs are cached, and Package instances are created
+		# as they are consumed.
+		cache_key = (root_config.root, pkg_type, atom)
+		cpv_list = self._frozen_config._match_pkgs_cache.get(cache_key)
+		if cpv_list is None:
+			db = root_config.trees[self.pkg_tree_map[pkg_type]].dbapi
+			atom_exp = dep_expand(atom, mydb=db,
+				settings=root_config.settings)
+			cpv_list = db.cp_list(atom_exp.cp)
+			# descending order
+			cpv_list.reverse()
+			cpv_list = [cpv for cpv in cpv_list
+				if match_from_list(atom_exp, [cpv])]
+			self._frozen_config._match_pkgs_cache[cache_key] = cpv_list
+		for pkg in self._iter_match_pkgs_imp(root_config, pkg_type, atom,
+			matched_cpvs=cpv_list):
+			yield pkg
+
+	def _iter_match_pkgs_imp(self, root_config, pkg_type, atom,
+		onlydeps=False, matched_cpvs=None):
+		"""
+		If matched_cpvs is given, it is the list of cpvs that match the
+		atom, in descending order, which is used instead of matching
+		the cpvs of the db again.
+		"""
+
 		db = root_config.trees[self.pkg_tree_map[pkg_type]].dbapi
 		atom_exp = dep_expand(atom, mydb=db, settings=root_config.settings)
-		cp_list = db.cp_list(atom_exp.cp)
+		if matched_cpvs is None:
+			cp_list = db.cp_list(atom_exp.cp)
+		else:
+			cp_list = matched_cpvs
 		matched_something = False
 		installed = pkg_type == 'installed'
 
@@ -4190,13 +4355,15 @@ class depgraph(object):
 			else:
 				repo_list = [atom.repo]
 
-			# descending order
-			cp_list.reverse()
+			if matched_cpvs is None:
+				# descending order
+				cp_list.reverse()
 			for cpv in cp_list:
 				# Call match_from_list on one cpv at a time, in order
 				# to avoid unnecessary match_from_list comparisons on
 				# versions that are never yielded from this method.
-				if not match_from_list(atom_exp, [cpv]):
+				if matched_cpvs is None and \
+					not match_from_list(atom_exp, [cpv]):
 					continue
 				for repo in repo_list:
 
@@ -4467,7 +4634,13 @@ class depgraph(object):
 
 		pkgsettings = self._frozen_config.pkgsettings[pkg.root]
 		root_config = self._frozen_config.roots[pkg.root]
-		mreasons = _get_masking_status(pkg, pkgsettings, root_config, use=self._pkg_use_enabled(pkg))
+		use = frozenset(self._pkg_use_enabled(pkg))
+		cache_key = (pkg, use)
+		mreasons = self._frozen_config._masking_status_cache.get(cache_key)
+		if mreasons is None:
+			mreasons = _get_masking_status(pkg, pkgsettings, root_config,
+				use=use)
+			self._frozen_config._masking_status_cache[cache_key] = mreasons
 
 		masked_by_unstable_keywords = False
 		masked_by_missing_keywords = False
@@ -4487,7 +4660,8 @@ class depgraph(object):
 			elif hint.key == "p_mask":
 				masked_by_p_mask = True
 			elif hint.key == "license":
-				missing_licenses = hint.value
+				# Copy, since the cached hint must not be modified.
+				missing_licenses = set(hint.value)
 			else:
 				masked_by_something_else = True
 
@@ -5265,6 +5439,9 @@ class depgraph(object):
 		if True:
 			if self._dynamic_config._ignored_deps:
 				self._dynamic_config._dep_stack.extend(self._dynamic_config._ignored_deps)
+				if self._frozen_config._metadata_prefetch:
+					self._dynamic_config._metadata_prefetch_queue.extend(
+						self._dynamic_config._ignored_deps)
 				self._dynamic_config._ignored_deps = []
 			if not self._create_graph(allow_unsatisfied=True):
 				return 0
@@ -6068,6 +6245,21 @@ class depgraph(object):
 		# If no nodes are selected on the last iteration, it is due to
 		# unresolved blockers or circular dependencies.
 
+		# Track the leaf nodes for each priority filter that is passed
+		# to get_nodes(), so that the loop below does not need to scan
+		# the whole graph for every batch of selected nodes. Leaf nodes
+		# for ignore_priority=None are found by a cheap scan, which costs
+		# less than keeping an index up to date while nodes are removed.
+		indexed_priorities = set([ignore_uninst_or_med])
+		for priority_range in (DepPriorityNormalRange,
+			DepPrioritySatisfiedRange):
+			indexed_priorities.update(priority_range.ignore_priority[i]
+				for i in range(priority_range.NONE,
+				priority_range.MEDIUM_SOFT + 1))
+			indexed_priorities.add(priority_range.ignore_medium)
+		indexed_priorities.discard(None)
+		mygraph.index_priorities(indexed_priorities)
+
 		while mygraph:
 			self._spinner_update()
 			selected_nodes = None
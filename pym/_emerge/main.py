@@ -137,6 +137,8 @@ def insert_optional_args(args):
 		'--jobs'       : valid_integers,
 		'--keep-going'           : y_or_n,
 		'--load-average'         : valid_floats,
+		'--max-pressure'         : valid_floats,
+		'--memory-reserve'       : valid_integers,
 		'--package-moves'        : y_or_n,
 		'--quiet'                : y_or_n,
 		'--quiet-build'          : y_or_n,
@@ -451,6 +453,13 @@ def parse_opts(tmpcmdline, silent=False):
 			"action" : "store"
 		},
 
+		"--jobs-order": {
+			"help"    : "specifies the order in which parallel builds " + \
+				"are started",
+			"type"    : "choice",
+			"choices" : ("default", "critical-path")
+		},
+
 		"--keep-going": {
 			"help"    : "continue as much as possible after an error",
 			"type"    : "choice",
@@ -466,6 +475,26 @@ def parse_opts(tmpcmdline, silent=False):
 			"action" : "store"
 		},
 
+		"--max-pressure": {
+
+			"help"   :"Specifies that no new builds should be started " + \
+				"if there are other builds running and the memory or " + \
+				"cpu pressure stall information (/proc/pressure) " + \
+				"is at least PERCENT (a floating-point number).",
+
+			"action" : "store"
+		},
+
+		"--memory-reserve": {
+
+			"help"   :"Specifies that no new builds should be started " + \
+				"if there are other builds running and the available " + \
+				"memory could drop below MEGABYTES (an integer), " + \
+				"based on the memory usage of previous builds.",
+
+			"action" : "store"
+		},
+
 		"--misspell-suggestions": {
 			"help"    : "enable package name misspell suggestions",
 			"type"    : "choice",
@@ -916,6 +945,40 @@ def parse_opts(tmpcmdline, silent=False):
 					(myoptions.load_average,))
 
 		myoptions.load_average = load_average
+
+	if myoptions.max_pressure == "True":
+		myoptions.max_pressure = None
+
+	if myoptions.max_pressure:
+		try:
+			max_pressure = float(myoptions.max_pressure)
+		except ValueError:
+			max_pressure = 0.0
+
+		if max_pressure <= 0.0 or max_pressure > 100.0:
+			max_pressure = None
+			if not silent:
+				parser.error("Invalid --max-pressure parameter: '%s'\n" % \
+					(myoptions.max_pressure,))
+
+		myoptions.max_pressure = max_pressure
+
+	if myoptions.memory_reserve == "True":
+		myoptions.memory_reserve = None
+
+	if myoptions.memory_reserve is not None:
+		try:
+			memory_reserve = int(myoptions.memory_reserve)
+		except ValueError:
+			memory_reserve = -1
+
+		if memory_reserve < 0:
+			memory_reserve = None
+			if not silent:
+				parser.error("Invalid --memory-reserve parameter: '%s'\n" % \
+					(myoptions.memory_reserve,))
+
+		myoptions.memory_reserve = memory_reserve
 	
 	if myoptions.rebuilt_binaries_timestamp:
 		try:
@@ -5,8 +5,10 @@ from __future__ import print_function
 
 import re
 import portage
-from portage import os
+from portage import os, _unicode_decode
+from portage.const import CACHE_PATH
 from portage.dbapi.porttree import _parse_uri_map
+from portage.dbapi._SearchIndex import SearchIndex
 from portage.output import  bold, bold as white, darkgreen, green, red
 from portage.util import writemsg_stdout
 
@@ -52,6 +54,11 @@ class search(object):
 
 		self._dbs.append(vardb)
 		self._portdb = portdb
+		self._search_index = None
+		if portdb in self._dbs:
+			self._search_index = SearchIndex(portdb,
+				os.path.join(self.settings["EROOT"], CACHE_PATH,
+				"search_index.sqlite"))
 
 	def _spinner_update(self):
 		if self.spinner:
@@ -71,6 +78,52 @@ class search(object):
 				pass
 		raise KeyError(args[0])
 
+	def _aux_get_many(self, cpvs, wants):
+		"""
+		Iterate over (cpv, values) tuples, querying each db in a single
+		batch for all cpvs that were not found in the preceding dbs.
+		Any cpv that is not found in any db is skipped.
+		"""
+		missing = list(cpvs)
+		for db in self._dbs:
+			if not missing:
+				break
+			found = set()
+			for cpv, values in db.aux_get_many(missing, wants):
+				found.add(cpv)
+				yield (cpv, values)
+			missing = [cpv for cpv in missing if cpv not in found]
+
+	def _desc_candidates(self, words):
+		"""
+		Use the search index to find the packages that may have a
+		DESCRIPTION that matches self.searchre. Packages from repositories
+		that are not covered by the index, packages with ebuilds that the
+		index may be out of date for, and packages that have a matching
+		DESCRIPTION in any of the other dbs, are always included.
+		Returns None if the index is unavailable.
+		"""
+		if self._search_index is None:
+			return None
+		portdb = self._portdb
+		fresh = self._search_index.update()
+		if not fresh:
+			return None
+
+		candidates = self._search_index.match_description(
+			self.searchre, words=words)
+		stale = [loc for loc in portdb.porttrees if loc not in fresh]
+		if stale:
+			candidates.update(portdb.cp_all(trees=stale))
+		for db in self._dbs:
+			if db is portdb:
+				continue
+			for cpv, (desc,) in db.aux_get_many(db.cpv_all(),
+				["DESCRIPTION"]):
+				if self.searchre.search(desc):
+					candidates.add(portage.cpv_getkey(cpv))
+		return candidates
+
 	def _findname(self, *args, **kwargs):
 		for db in self._dbs:
 			if db is not self._portdb:
@@ -133,9 +186,9 @@ class search(object):
 					matches.update(db.xmatch(level, atom))
 				else:
 					db_keys = list(db._aux_cache_keys)
-					for cpv in db.match(atom):
-						metadata = zip(db_keys,
-							db.aux_get(cpv, db_keys))
+					for cpv, values in db.aux_get_many(
+						db.match(atom), db_keys):
+						metadata = zip(db_keys, values)
 						if not self._visible(db, cpv, metadata):
 							continue
 						matches.add(cpv)
@@ -193,6 +246,15 @@ class search(object):
 		else:
 			self.searchre=re.compile(re.escape(self.searchkey), re.I)
 
+		desc_cps = None
+		if self.searchdesc:
+			words = None
+			if not regexsearch:
+				words = SearchIndex._token_re.findall(
+					_unicode_decode(self.searchkey).lower())
+			desc_cps = self._desc_candidates(words)
+
+		desc_candidates = {}
 		for package in self._cp_all():
 			self._spinner_update()
 
@@ -207,6 +269,8 @@ class search(object):
 					masked=1
 				self.matches["pkg"].append([package,masked])
 			elif self.searchdesc: # DESCRIPTION searching
+				if desc_cps is not None and package not in desc_cps:
+					continue
 				full_package = self._xmatch("bestmatch-visible", package)
 				if not full_package:
 					#no match found; we don't want to query description
@@ -216,14 +280,18 @@ class search(object):
 						continue
 					else:
 						masked=1
-				try:
-					full_desc = self._aux_get(
-						full_package, ["DESCRIPTION"])[0]
-				except KeyError:
-					print("emerge: search: aux_get() failed, skipping")
-					continue
+				desc_candidates[full_package] = masked
+
+		if desc_candidates:
+			# Fetch all descriptions in a single batch.
+			for full_package, (full_desc,) in self._aux_get_many(
+				list(desc_candidates), ["DESCRIPTION"]):
+				self._spinner_update()
+				masked = desc_candidates.pop(full_package)
 				if self.searchre.search(full_desc):
 					self.matches["desc"].append([full_package,masked])
+			for full_package in desc_candidates:
+				print("emerge: search: aux_get() failed, skipping")
 
 		self.sdict = self.setconfig.getSets()
 		for setname in self.sdict:
@@ -4,7 +4,7 @@
 import time
 
 from portage import os
-from portage.versions import best, catsplit, vercmp
+from portage.versions import best, catsplit, vercmp, _pkg_str
 from portage.dep import Atom
 from portage.localization import _
 from portage._sets.base import PackageSet
@@ -26,21 +26,27 @@ class EverythingSet(PackageSet):
 
 	def load(self):
 		myatoms = []
-		pkg_str = self._db._pkg_str
-		cp_list = self._db.cp_list
-
-		for cp in self._db.cp_all():
-			for cpv in cp_list(cp):
-				# NOTE: Create SLOT atoms even when there is only one
-				# SLOT installed, in order to avoid the possibility
-				# of unwanted upgrades as reported in bug #338959.
-				pkg = pkg_str(cpv, None)
-				atom = Atom("%s:%s" % (pkg.cp, pkg.slot))
-				if self._filter:
-					if self._filter(atom):
-						myatoms.append(atom)
-				else:
+		db = self._db
+		cp_list = db.cp_list
+		aux_keys = db._pkg_str_aux_keys
+
+		cpvs = []
+		for cp in db.cp_all():
+			cpvs.extend(cp_list(cp))
+
+		# Fetch metadata for all packages in a single batch.
+		for cpv, values in db.aux_get_many(cpvs, aux_keys):
+			# NOTE: Create SLOT atoms even when there is only one
+			# SLOT installed, in order to avoid the possibility
+			# of unwanted upgrades as reported in bug #338959.
+			pkg = _pkg_str(cpv, metadata=dict(zip(aux_keys, values)),
+				settings=db.settings)
+			atom = Atom("%s:%s" % (pkg.cp, pkg.slot))
+			if self._filter:
+				if self._filter(atom):
 					myatoms.append(atom)
+			else:
+				myatoms.append(atom)
 
 		self._setAtoms(myatoms)
 	
@@ -0,0 +1,244 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from __future__ import unicode_literals
+
+from portage.cache import fs_template
+from portage.cache import cache_errors
+import errno
+import mmap
+import stat
+import struct
+import sys
+from portage import os
+from portage import _encodings
+from portage import _unicode_decode
+from portage import _unicode_encode
+from portage.exception import InvalidData
+from portage.versions import _pkg_str
+
+if sys.hexversion >= 0x3000000:
+	long = int
+
+class database(fs_template.FsBased):
+	"""
+	Stores all cache entries in a single file, so that reading the
+	cache of a whole repository does not require an open/read/close
+	sequence for every cpv. The file consists of a header with the
+	offset of the index, followed by the entries (in the same KEY=value
+	format that is used by flat_hash) and finally the index, which maps
+	each cpv to the offset and length of its entry.
+
+	The file is memory-mapped and the index is loaded on first access.
+	Modifications are kept in memory until commit(), which writes a new
+	file and atomically replaces the old one.
+	"""
+
+	autocommits = False
+
+	_magic = b"portage-flat-pack\n"
+	_header = struct.Struct(">Q")
+
+	def __init__(self, *args, **config):
+		super(database, self).__init__(*args, **config)
+		self.location = os.path.join(self.location,
+			self.label.lstrip(os.path.sep).rstrip(os.path.sep))
+		write_keys = set(self._known_keys)
+		write_keys.add("_eclasses_")
+		write_keys.add("_%s_" % (self.validation_chf,))
+		self._write_keys = sorted(write_keys)
+		# Every commit rewrites the whole file, so only commit
+		# when the cache is explicitly synced.
+		self.sync_rate = sys.maxsize
+		self._index = None
+		self._mmap = None
+		self._mtime = None
+		self._pending = {}
+
+	def _load(self):
+		if self._index is not None:
+			return self._index
+		self._index = {}
+		try:
+			f = open(_unicode_encode(self.location,
+				encoding=_encodings['fs'], errors='strict'), 'rb')
+		except (IOError, OSError) as e:
+			if e.errno != errno.ENOENT:
+				raise cache_errors.CacheCorruption(self.location, e)
+			return self._index
+
+		try:
+			st = os.fstat(f.fileno())
+			if st.st_size < len(self._magic) + self._header.size:
+				raise cache_errors.CacheCorruption(self.location,
+					"file is truncated")
+			data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		except (EnvironmentError, ValueError) as e:
+			raise cache_errors.CacheCorruption(self.location, e)
+		finally:
+			f.close()
+
+		header_end = len(self._magic) + self._header.size
+		if data[:len(self._magic)] != self._magic:
+			data.close()
+			raise cache_errors.CacheCorruption(self.location,
+				"unrecognized file format")
+		index_offset, = self._header.unpack(
+			data[len(self._magic):header_end])
+		if index_offset < header_end or index_offset > len(data):
+			data.close()
+			raise cache_errors.CacheCorruption(self.location,
+				"invalid index offset")
+
+		index = {}
+		try:
+			for line in _unicode_decode(data[index_offset:],
+				encoding=_encodings['repo.content'],
+				errors='strict').splitlines():
+				cpv, offset, length = line.split("\t")
+				index[cpv] = (int(offset), int(length))
+		except (UnicodeDecodeError, ValueError) as e:
+			data.close()
+			raise cache_errors.CacheCorruption(self.location, e)
+
+		self._mmap = data
+		self._mtime = st[stat.ST_MTIME]
+		self._index = index
+		return index
+
+	def _getitem(self, cpv):
+		try:
+			values = self._pending[cpv]
+		except KeyError:
+			try:
+				offset, length = self._load()[cpv]
+			except KeyError:
+				raise KeyError(cpv)
+			values = _unicode_decode(self._mmap[offset:offset+length],
+				encoding=_encodings['repo.content'], errors='replace')
+		else:
+			if values is None:
+				raise KeyError(cpv)
+		lines = values.split("\n")
+		if not lines[-1]:
+			lines.pop()
+		d = self._parse_data(lines, cpv)
+		if '_mtime_' not in d:
+			# Entries that are validated by digest do not store an
+			# mtime, so use the mtime of the file, like flat_hash does.
+			if self._mtime is None:
+				try:
+					self._mtime = os.stat(self.location)[stat.ST_MTIME]
+				except OSError:
+					self._mtime = 0
+			d['_mtime_'] = self._mtime
+		return d
+
+	def _parse_data(self, data, cpv):
+		try:
+			return dict( x.split("=", 1) for x in data )
+		except ValueError as e:
+			# If a line is missing an "=", the split length is 1 instead of 2.
+			raise cache_errors.CacheCorruption(cpv, e)
+
+	def _setitem(self, cpv, values):
+		lines = []
+		for k in self._write_keys:
+			v = values.get(k)
+			if not v:
+				continue
+			# NOTE: This format string requires unicode_literals, so that
+			# k and v are coerced to unicode.
+			lines.append("%s=%s\n" % (k, v))
+		self._pending[cpv] = "".join(lines)
+
+	def _delitem(self, cpv):
+		if cpv not in self:
+			raise KeyError(cpv)
+		self._pending[cpv] = None
+
+	def __contains__(self, cpv):
+		try:
+			return self._pending[cpv] is not None
+		except KeyError:
+			return cpv in self._load()
+
+	def _iter_keys(self):
+		pending = self._pending
+		for cpv in self._load():
+			if cpv not in pending:
+				yield cpv
+		for cpv, values in pending.items():
+			if values is not None:
+				yield cpv
+
+	def __iter__(self):
+		for cpv in list(self._iter_keys()):
+			try:
+				yield _pkg_str(cpv)
+			except InvalidData:
+				continue
+
+	def _get_raw(self, cpv):
+		values = self._pending.get(cpv)
+		if values is not None:
+			return _unicode_encode(values,
+				encoding=_encodings['repo.content'],
+				errors='backslashreplace')
+		offset, length = self._index[cpv]
+		return self._mmap[offset:offset+length]
+
+	def commit(self):
+		if not self._pending:
+			return
+		if self.readonly:
+			raise cache_errors.ReadOnlyRestriction()
+
+		self._load()
+		cpvs = sorted(self._iter_keys())
+		tmp_path = "%s.%i.__update__" % (self.location, os.getpid())
+		try:
+			parent_dir = os.path.dirname(self.location)
+			if not os.path.isdir(parent_dir):
+				os.makedirs(parent_dir)
+			f = open(_unicode_encode(tmp_path,
+				encoding=_encodings['fs'], errors='strict'), 'wb')
+			try:
+				offset = len(self._magic) + self._header.size
+				f.write(self._magic)
+				f.write(self._header.pack(0))
+				index = []
+				for cpv in cpvs:
+					raw = self._get_raw(cpv)
+					f.write(raw)
+					index.append("%s\t%i\t%i\n" % (cpv, offset, len(raw)))
+					offset += len(raw)
+				f.write(_unicode_encode("".join(index),
+					encoding=_encodings['repo.content'], errors='strict'))
+				f.seek(len(self._magic))
+				f.write(self._header.pack(offset))
+			finally:
+				f.close()
+			self._ensure_access(tmp_path)
+			os.rename(tmp_path, self.location)
+		except (IOError, OSError) as e:
+			try:
+				os.unlink(tmp_path)
+			except OSError:
+				pass
+			raise cache_errors.GeneralCacheCorruption(e)
+
+		if self._mmap is not None:
+			self._mmap.close()
+		self._mmap = None
+		self._index = None
+		self._mtime = None
+		self._pending.clear()
+
+	def sync(self, rate=0):
+		self.commit()
+
+class md5_database(database):
+
+	validation_chf = 'md5'
+	store_eclass_paths = False
@@ -62,6 +62,55 @@ class _generate_hash_function(object):
 
 		return (checksum.hexdigest(), size)
 
+def _checksum_file_multi(filename, hashnames):
+	"""
+	Run several checksums against a file while reading it only once.
+	Each block of data is fed to every requested hash object, so the
+	I/O cost does not grow with the number of hashes. Hash functions
+	which do not expose a hash object (such as python-fchksum) are
+	run separately.
+
+	@param filename: File to run the checksums against
+	@type filename: String
+	@param hashnames: The names of the hash functions to run
+	@type hashnames: iterable
+	@rtype: dict
+	@return: A dictionary in the form:
+		return_value[hash_name] = (hash_result, size)
+	"""
+	results = {}
+	hashobjects = []
+	want_size = False
+	for hashname in hashnames:
+		hashfunc = hashfunc_map[hashname]
+		if hashname == "size":
+			want_size = True
+		elif isinstance(hashfunc, _generate_hash_function):
+			hashobjects.append((hashname, hashfunc._hashobject()))
+		else:
+			results[hashname] = hashfunc(filename)
+
+	if not hashobjects:
+		if want_size:
+			results["size"] = getsize(filename)
+		return results
+
+	with _open_file(filename) as f:
+		blocksize = HASHING_BLOCKSIZE
+		size = 0
+		data = f.read(blocksize)
+		while data:
+			for hashname, checksum in hashobjects:
+				checksum.update(data)
+			size = size + len(data)
+			data = f.read(blocksize)
+
+	for hashname, checksum in hashobjects:
+		results[hashname] = (checksum.hexdigest(), size)
+	if want_size:
+		results["size"] = (size, size)
+	return results
+
 # Define hash functions, try to use the best module available. Later definitions
 # override earlier ones
 
@@ -328,21 +377,21 @@ def verify_all(filename, mydict, calc_prelink=0, strict=0):
 		got = " ".join(got)
 		return False, (_("Insufficient data for checksum verification"), got, expected)
 
-	for x in sorted(mydict):
-		if   x == "size":
-			continue
-		elif x in hashfunc_map:
-			myhash = perform_checksum(filename, x, calc_prelink=calc_prelink)[0]
-			if mydict[x] != myhash:
-				if strict:
-					raise portage.exception.DigestException(
-						("Failed to verify '$(file)s' on " + \
-						"checksum type '%(type)s'") % \
-						{"file" : filename, "type" : x})
-				else:
-					file_is_ok = False
-					reason     = (("Failed on %s verification" % x), myhash,mydict[x])
-					break
+	computed = _perform_checksums(filename, verifiable_hash_types,
+		calc_prelink=calc_prelink)
+
+	for x in sorted(verifiable_hash_types):
+		myhash = computed[x][0]
+		if mydict[x] != myhash:
+			if strict:
+				raise portage.exception.DigestException(
+					("Failed to verify '$(file)s' on " + \
+					"checksum type '%(type)s'") % \
+					{"file" : filename, "type" : x})
+			else:
+				file_is_ok = False
+				reason     = (("Failed on %s verification" % x), myhash,mydict[x])
+				break
 	return file_is_ok,reason
 
 def perform_checksum(filename, hashname="MD5", calc_prelink=0):
@@ -361,6 +410,23 @@ def perform_checksum(filename, hashname="MD5", calc_prelink=0):
 	@rtype: Tuple
 	@return: The hash and size of the data
 	"""
+	if hashname not in hashfunc_map:
+		raise portage.exception.DigestException(hashname + \
+			" hash function not available (needs dev-python/pycrypto)")
+	return _perform_checksums(filename, (hashname,),
+		calc_prelink=calc_prelink)[hashname]
+
+def _perform_checksums(filename, hashnames, calc_prelink=0):
+	"""
+	Run a group of checksums against a file, reading the file only
+	once. If calc_prelink is enabled then prelink is reversed only
+	once for all of the checksums. All hash names must be present
+	in hashfunc_map.
+
+	@rtype: dict
+	@return: A dictionary in the form:
+		return_value[hash_name] = (hash_result, size)
+	"""
 	global prelink_capable
 	# Make sure filename is encoded with the correct encoding before
 	# it is passed to spawn (for prelink) and/or the hash function.
@@ -386,17 +452,13 @@ def perform_checksum(filename, hashname="MD5", calc_prelink=0):
 				# This happens during uninstallation of prelink.
 				prelink_capable = False
 		try:
-			if hashname not in hashfunc_map:
-				raise portage.exception.DigestException(hashname + \
-					" hash function not available (needs dev-python/pycrypto)")
-			myhash, mysize = hashfunc_map[hashname](myfilename)
+			return _checksum_file_multi(myfilename, hashnames)
 		except (OSError, IOError) as e:
 			if e.errno in (errno.ENOENT, errno.ESTALE):
 				raise portage.exception.FileNotFound(myfilename)
 			elif e.errno == portage.exception.PermissionDenied.errno:
 				raise portage.exception.PermissionDenied(myfilename)
 			raise
-		return myhash, mysize
 	finally:
 		if prelink_tmpfile:
 			try:
@@ -408,7 +470,8 @@ def perform_checksum(filename, hashname="MD5", calc_prelink=0):
 
 def perform_multiple_checksums(filename, hashes=["MD5"], calc_prelink=0):
 	"""
-	Run a group of checksums against a file.
+	Run a group of checksums against a file. The file is read only
+	once, regardless of the number of checksums requested.
 
 	@param filename: File to run the checksums against
 	@type filename: String
@@ -421,9 +484,13 @@ def perform_multiple_checksums(filename, hashes=["MD5"], calc_prelink=0):
 		return_value[hash_name] = (hash_result,size)
 		for each given checksum
 	"""
-	rVal = {}
+	# The hashes argument may be a generator, so only iterate it once.
+	hashes = list(hashes)
 	for x in hashes:
 		if x not in hashfunc_map:
 			raise portage.exception.DigestException(x+" hash function not available (needs dev-python/pycrypto or >=dev-lang/python-2.5)")
-		rVal[x] = perform_checksum(filename, x, calc_prelink)[0]
+	rVal = {}
+	for k, v in _perform_checksums(filename, hashes,
+		calc_prelink=calc_prelink).items():
+		rVal[k] = v[0]
 	return rVal
@@ -0,0 +1,172 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from __future__ import unicode_literals
+
+import sys
+from bisect import bisect_left
+from operator import itemgetter
+
+from portage import os
+from portage.cache.mappings import Mapping
+
+class ContentsDict(Mapping):
+	"""
+	A read-only mapping of installed paths to CONTENTS entries, as
+	returned by dblink.getcontents(). Explicit entries are kept in a
+	sorted list of paths, with a parallel list of packed entry strings
+	such as "obj <mtime> <md5>", "sym <mtime> <dest>" or "dir", which
+	are only unpacked into tuples when they are accessed. Membership
+	tests use binary search. Unpacked entries are kept in a dict, since
+	callers such as dblink.unmerge() look up the same path repeatedly.
+
+	Parent directories of all entries are implicitly present as
+	("dir",) entries, since callers such as dblink.isowner() rely on
+	them. Membership of a parent directory is determined by a prefix
+	search, and the full list of parent directories is only generated
+	when the mapping is iterated or its length is requested.
+	"""
+
+	__slots__ = ('_all_keys', '_data', '_keys', '_min_parent_depth',
+		'_parsed')
+
+	_dir_entry = ("dir",)
+
+	def __init__(self, entries=(), eroot_split_len=1):
+		"""
+		@param entries: (path, packed entry) tuples, in CONTENTS order.
+			If a path occurs more than once, the last entry wins.
+		@type entries: list
+		@param eroot_split_len: len(EROOT.split(os.sep)) - 1, since
+			parent directories are only generated below EROOT
+		@type eroot_split_len: int
+		"""
+		entries = sorted(entries, key=itemgetter(0))
+		keys = []
+		data = []
+		prev = None
+		for path, entry in entries:
+			if path == prev:
+				data[-1] = entry
+			else:
+				keys.append(path)
+				data.append(entry)
+				prev = path
+		self._keys = keys
+		self._data = data
+		self._min_parent_depth = eroot_split_len
+		self._all_keys = None
+		self._parsed = {}
+
+	def _index(self, key):
+		keys = self._keys
+		try:
+			i = bisect_left(keys, key)
+		except TypeError:
+			return -1, False
+		return i, i != len(keys) and keys[i] == key
+
+	def _is_parent(self, key, i):
+		if key.count(os.sep) < self._min_parent_depth:
+			return False
+		prefix = key + os.sep
+		keys = self._keys
+		i = bisect_left(keys, prefix, i)
+		return i != len(keys) and keys[i].startswith(prefix)
+
+	def iter_prefix(self, prefix):
+		"""
+		Iterate over explicit entries whose paths start with the given
+		prefix, in sorted order.
+		"""
+		keys = self._keys
+		i = bisect_left(keys, prefix)
+		while i < len(keys) and keys[i].startswith(prefix):
+			yield keys[i]
+			i += 1
+
+	def __getitem__(self, key):
+		entry = self._parsed.get(key)
+		if entry is None:
+			entry = self._lookup(key)
+		return entry
+
+	def _lookup(self, key):
+		i, found = self._index(key)
+		if found:
+			entry = tuple(self._data[i].split(" ", 2))
+		elif i != -1 and self._is_parent(key, i):
+			entry = self._dir_entry
+		else:
+			raise KeyError(key)
+		self._parsed[key] = entry
+		return entry
+
+	def __contains__(self, key):
+		if key in self._parsed:
+			return True
+		i, found = self._index(key)
+		return found or (i != -1 and self._is_parent(key, i))
+
+	def _get_all_keys(self):
+		"""
+		Return a sorted list of all explicit and implicit entries.
+		"""
+		if self._all_keys is None:
+			sep = os.sep
+			min_parent_depth = self._min_parent_depth
+			parents = set()
+			for path in self._keys:
+				depth = path.count(sep)
+				end = len(path)
+				while depth > min_parent_depth:
+					end = path.rfind(sep, 0, end)
+					parent = path[:end]
+					if parent in parents:
+						break
+					parents.add(parent)
+					depth -= 1
+			all_keys = [parent for parent in parents
+				if not self._index(parent)[1]]
+			all_keys.extend(self._keys)
+			# Merging two sorted runs is linear.
+			all_keys.sort()
+			self._all_keys = all_keys
+		return self._all_keys
+
+	def __iter__(self):
+		return iter(self._get_all_keys())
+
+	def __len__(self):
+		return len(self._get_all_keys())
+
+	def __bool__(self):
+		return bool(self._keys)
+
+	__nonzero__ = __bool__
+
+	def iteritems(self):
+		keys = self._keys
+		data = self._data
+		parsed = self._parsed
+		dir_entry = self._dir_entry
+		i = 0
+		for key in self._get_all_keys():
+			if i < len(keys) and keys[i] == key:
+				entry = parsed.get(key)
+				if entry is None:
+					entry = tuple(data[i].split(" ", 2))
+				yield (key, entry)
+				i += 1
+			else:
+				yield (key, dir_entry)
+
+	def copy(self):
+		"""
+		Return a modifiable dict containing all entries.
+		"""
+		return dict(self.iteritems())
+
+	if sys.hexversion >= 0x3000000:
+		items = iteritems
+		keys = __iter__
@@ -0,0 +1,150 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import bisect
+
+import portage
+portage.proxy.lazyimport.lazyimport(globals(),
+	'portage.dep:_match_slot,match_from_list',
+)
+
+from portage.versions import _get_version_key, _pkg_str, _unknown_repo
+
+class MatchIndex(object):
+	"""
+	A version-sorted index of the candidates for a single cp, which is
+	used to answer repeated match_from_list() queries for that cp. Version
+	operators are evaluated by binary search, and slot and repo
+	constraints are evaluated with the attributes of the _pkg_str
+	candidates, so that no candidate needs to be split again. Results
+	are cached by atom, and they are always returned in the order of
+	the candidates, exactly like match_from_list() would return them.
+
+	Since sorting the candidates costs more than a single linear scan,
+	the first query is passed to match_from_list(), like queries that
+	the index does not handle (blockers, wildcards, =* globs, candidates
+	that are not _pkg_str instances, or an atom for a different cp).
+	"""
+
+	__slots__ = ("candidates", "_cp", "_supported", "_sorted", "_keys",
+		"_cache")
+
+	def __init__(self, cp, candidates):
+		"""
+		@param cp: the cp of all candidates
+		@type cp: str
+		@param candidates: _pkg_str instances, as returned by cp_list()
+		@type candidates: list
+		"""
+		self.candidates = tuple(candidates)
+		self._cp = cp
+		self._supported = None
+		self._sorted = None
+		self._keys = None
+		self._cache = {}
+
+	def same_candidates(self, candidates):
+		"""
+		Return True if candidates consists of the same objects, in the
+		same order, as the candidates of this index.
+		"""
+		mine = self.candidates
+		if len(candidates) != len(mine):
+			return False
+		for x, y in zip(candidates, mine):
+			if x is not y:
+				return False
+		return True
+
+	def _is_supported(self):
+		if self._supported is None:
+			cp = self._cp
+			self._supported = all(isinstance(x, _pkg_str) and x.cp == cp
+				for x in self.candidates)
+		return self._supported
+
+	def _get_sorted(self):
+		if self._sorted is None:
+			self._sorted = sorted(enumerate(self.candidates),
+				key=lambda pos_pkg: pos_pkg[1].version_key)
+			self._keys = [x.version_key for pos, x in self._sorted]
+		return self._sorted
+
+	def _bisect(self, version, inclusive):
+		"""
+		Return the index of the first sorted candidate that has a version
+		greater than (or equal to, if inclusive) the given version.
+		"""
+		self._get_sorted()
+		if inclusive:
+			return bisect.bisect_left(self._keys, _get_version_key(version))
+		return bisect.bisect_right(self._keys, _get_version_key(version))
+
+	def match(self, atom):
+		"""
+		Equivalent to match_from_list(atom, self.candidates).
+
+		@param atom: the package atom to match
+		@type atom: Atom
+		@rtype: list
+		"""
+		cache_key = (atom, atom.unevaluated_atom)
+		try:
+			return list(self._cache[cache_key])
+		except KeyError:
+			pass
+
+		operator = atom.operator
+		if not self._cache or atom.blocker or atom.extended_syntax or \
+			atom.cp != self._cp or operator == "=*" or \
+			not self._is_supported():
+			result = match_from_list(atom, self.candidates)
+		else:
+			result = self._match(atom, operator)
+		self._cache[cache_key] = tuple(result)
+		return result
+
+	def _match(self, atom, operator):
+		if operator is None:
+			matches = self.candidates
+		else:
+			sorted_candidates = self._get_sorted()
+			version = atom.version
+			if operator == "=":
+				selected = sorted_candidates[self._bisect(version, True):
+					self._bisect(version, False)]
+			elif operator == ">":
+				selected = sorted_candidates[self._bisect(version, False):]
+			elif operator == ">=":
+				selected = sorted_candidates[self._bisect(version, True):]
+			elif operator == "<":
+				selected = sorted_candidates[:self._bisect(version, True)]
+			elif operator == "<=":
+				selected = sorted_candidates[:self._bisect(version, False)]
+			elif operator == "~":
+				# All revisions of a version are adjacent, since the
+				# revision is compared last.
+				ver = atom.cpv.cpv_split[2]
+				ver_key = _get_version_key(ver)[:3]
+				selected = []
+				for pos_pkg in sorted_candidates[self._bisect(ver, True):]:
+					if pos_pkg[1].version_key[:3] != ver_key:
+						break
+					if pos_pkg[1].cpv_split[2] == ver:
+						selected.append(pos_pkg)
+			else:
+				return match_from_list(atom, self.candidates)
+			matches = [x for pos, x in sorted(selected)]
+
+		if atom.slot is not None:
+			matches = [x for x in matches
+				if not hasattr(x, "slot") or _match_slot(atom, x)]
+
+		# USE dependencies are not checked here, since match_from_list()
+		# ignores them for candidates that do not have a use attribute.
+
+		if atom.repo:
+			matches = [x for x in matches
+				if getattr(x, "repo", None) in (None, _unknown_repo, atom.repo)]
+
+		return list(matches)
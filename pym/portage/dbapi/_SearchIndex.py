@@ -0,0 +1,411 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from __future__ import unicode_literals
+
+import hashlib
+import re
+import stat
+import sys
+import time
+
+from portage import os
+from portage.cache.cache_errors import CacheError
+from portage.dbapi.porttree import _eclass_validation_cache
+from portage.eclass_cache import hashed_path
+from portage.exception import FileNotFound, PermissionDenied
+from portage.util._SqliteStore import SqliteStore
+from portage.versions import catsplit, cpv_getkey
+
+if sys.hexversion >= 0x3000000:
+	_unicode = str
+else:
+	_unicode = unicode
+
+class SearchIndex(SqliteStore):
+	"""
+	A persistent sqlite index of the DESCRIPTION, HOMEPAGE and LICENSE
+	metadata of every ebuild, which allows emerge --searchdesc to narrow
+	down the packages that it needs to pull metadata for. The index is
+	built from the pregenerated metadata cache of each repository, and
+	it is updated incrementally: only cache categories whose directory
+	mtime has changed are read again (single-file cache formats are read
+	again as a whole when the file changes).
+
+	Each word of the indexed fields, the package name and the category
+	is stored in a postings list, which is used to select candidates
+	for literal search keys. Regular expressions are matched against
+	the indexed descriptions. Since ebuilds in a repository may have
+	been modified without updating its pregenerated cache, the mtimes
+	of the ebuild and the package directory are recorded for each
+	entry that is valid when it is indexed, and packages for which
+	these have changed since then are always reported as candidates.
+	Results are only suitable for narrowing down candidates, which
+	callers must check against the real metadata. Repositories without
+	a pregenerated cache, or for which the index is stale and can not
+	be updated, are omitted from results, so callers need to check all
+	of their packages.
+	"""
+
+	_version = "2"
+	_fields = ("DESCRIPTION", "HOMEPAGE", "LICENSE")
+	_token_re = re.compile(r'\w+', re.UNICODE)
+
+	# Stay below the default SQLITE_MAX_VARIABLE_NUMBER of 999.
+	_max_query_args = 500
+
+	def __init__(self, portdb, filename):
+		self._portdb = portdb
+		SqliteStore.__init__(self, filename)
+		self._fresh = None
+		self._vocabulary = None
+
+	def _create_tables(self, cursor):
+		for table in ("postings", "packages", "sections", "metadata"):
+			cursor.execute("DROP TABLE IF EXISTS %s" % table)
+		cursor.execute("CREATE TABLE metadata "
+			"(key TEXT PRIMARY KEY, value TEXT)")
+		cursor.execute("CREATE TABLE sections "
+			"(location TEXT, section TEXT, fingerprint TEXT, "
+			"PRIMARY KEY (location, section))")
+		# The mtimes are NULL for entries that are not known to be valid.
+		cursor.execute("CREATE TABLE packages "
+			"(pkg_id INTEGER PRIMARY KEY, location TEXT, section TEXT, "
+			"cp TEXT, cpv TEXT, ebuild_mtime INTEGER, dir_mtime INTEGER, "
+			"description TEXT, homepage TEXT, license TEXT)")
+		cursor.execute("CREATE TABLE postings (token TEXT, pkg_id INTEGER)")
+		cursor.execute("CREATE INDEX packages_section "
+			"ON packages (location, section)")
+		cursor.execute("CREATE INDEX postings_token ON postings (token)")
+		cursor.execute("CREATE INDEX postings_pkg_id ON postings (pkg_id)")
+		cursor.execute("INSERT INTO metadata (key, value) VALUES (?, ?)",
+			("version", self._version))
+
+	def _eclass_fingerprint(self, eclass_db):
+		"""
+		Return a fingerprint of the eclasses of a repository, since
+		cache entries are only valid for the eclasses that they were
+		generated with.
+		"""
+		eclasses = []
+		for name, ebuild_hash in eclass_db.eclasses.items():
+			eclasses.append("%s %s %d" %
+				(name, ebuild_hash.location, ebuild_hash.mtime))
+		eclasses.sort()
+		return hashlib.md5("\n".join(eclasses).encode("utf_8")).hexdigest()
+
+	def _cache_sections(self, cache, eclass_fingerprint):
+		"""
+		Return a dict that maps each section of the given cache (a
+		category, or "" for single-file caches) to a fingerprint that
+		changes whenever an entry in that section is written or deleted,
+		or an eclass is modified. Returns None if the cache does not
+		exist.
+		"""
+		location = cache.location
+		try:
+			st = os.stat(location)
+		except OSError:
+			return None
+
+		if not stat.S_ISDIR(st.st_mode):
+			return {"": "%r %d %s" %
+				(st.st_mtime, st.st_size, eclass_fingerprint)}
+
+		sections = {}
+		try:
+			names = os.listdir(location)
+		except OSError:
+			return None
+		for name in names:
+			try:
+				st = os.stat(os.path.join(location, name))
+			except OSError:
+				continue
+			if stat.S_ISDIR(st.st_mode):
+				sections[name] = "%r %s" % (st.st_mtime, eclass_fingerprint)
+		return sections
+
+	def _iter_section(self, cache, section):
+		if not section:
+			for cpv in cache:
+				yield cpv
+			return
+		try:
+			names = os.listdir(os.path.join(cache.location, section))
+		except OSError:
+			return
+		for name in names:
+			if not name.startswith("."):
+				yield section + "/" + name
+
+	@staticmethod
+	def _mtime(path):
+		"""
+		Return the integer mtime of the given path, or None if it does
+		not exist.
+		"""
+		try:
+			return os.stat(path)[stat.ST_MTIME]
+		except OSError:
+			return None
+
+	def _index_section(self, cursor, cache, eclass_db, location, section):
+		"""
+		Index the entries of a section of the given cache. Returns False
+		if the mtimes of some of them were too recent to be recorded, in
+		which case the section should be indexed again later.
+		"""
+		# A file that was modified within the last couple of seconds
+		# may be modified again without a change of its mtime, so the
+		# mtimes of such entries are not recorded.
+		racy_mtime = time.time() - 2
+		complete = True
+		dir_mtimes = {}
+		for cpv in self._iter_section(cache, section):
+			try:
+				metadata = cache[cpv]
+			except (KeyError, CacheError):
+				continue
+			cp = cpv_getkey(cpv)
+			if cp is None:
+				continue
+
+			try:
+				dir_mtime = dir_mtimes[cp]
+			except KeyError:
+				dir_mtime = self._mtime(os.path.join(location, cp))
+				if dir_mtime is not None and dir_mtime >= racy_mtime:
+					dir_mtime = None
+					complete = False
+				dir_mtimes[cp] = dir_mtime
+
+			ebuild_mtime = None
+			ebuild_hash = hashed_path(os.path.join(location, cp,
+				catsplit(cpv)[1] + ".ebuild"))
+			try:
+				if ebuild_hash.mtime >= racy_mtime:
+					complete = False
+				elif cache.validate_entry(metadata, ebuild_hash, eclass_db):
+					ebuild_mtime = ebuild_hash.mtime
+			except (FileNotFound, PermissionDenied):
+				pass
+
+			values = [metadata.get(k, "") for k in self._fields]
+			cursor.execute("INSERT INTO packages (location, section, "
+				"cp, cpv, ebuild_mtime, dir_mtime, "
+				"description, homepage, license) "
+				"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+				[location, section, cp, cpv, ebuild_mtime, dir_mtime] + values)
+			pkg_id = cursor.lastrowid
+			tokens = set()
+			for text in [cp] + values:
+				tokens.update(self._token_re.findall(text.lower()))
+			cursor.executemany("INSERT INTO postings (token, pkg_id) "
+				"VALUES (?, ?)", ((token, pkg_id) for token in tokens))
+		return complete
+
+	def _remove_section(self, cursor, location, section):
+		cursor.execute("DELETE FROM postings WHERE pkg_id IN "
+			"(SELECT pkg_id FROM packages WHERE location = ? AND section = ?)",
+			(location, section))
+		cursor.execute("DELETE FROM packages "
+			"WHERE location = ? AND section = ?", (location, section))
+		cursor.execute("DELETE FROM sections "
+			"WHERE location = ? AND section = ?", (location, section))
+
+	def update(self):
+		"""
+		Bring the index up to date with the pregenerated metadata cache
+		of each repository, if permitted.
+
+		@rtype: set
+		@return: locations of the repositories for which the index is
+			up to date
+		"""
+		self._fresh = set()
+		self._vocabulary = None
+		connection = self._connect()
+		if connection is None:
+			return self._fresh
+
+		portdb = self._portdb
+		try:
+			cursor = connection.cursor()
+			cursor.execute("SELECT location, section, fingerprint "
+				"FROM sections")
+			indexed = {}
+			for location, section, fingerprint in cursor.fetchall():
+				indexed.setdefault(location, {})[section] = fingerprint
+
+			modified = False
+			for location in portdb.porttrees:
+				cache = portdb._pregen_auxdb.get(location)
+				sections = None
+				if cache is not None:
+					eclass_db = portdb._repo_auxdbs(location)[1]
+					sections = self._cache_sections(cache,
+						self._eclass_fingerprint(eclass_db))
+				old_sections = indexed.pop(location, {})
+
+				if sections is None:
+					if old_sections and self._writable:
+						for section in old_sections:
+							self._remove_section(cursor, location, section)
+						modified = True
+					continue
+
+				if old_sections == sections:
+					self._fresh.add(location)
+					continue
+				if not self._writable:
+					continue
+
+				for section, fingerprint in old_sections.items():
+					if sections.get(section) != fingerprint:
+						self._remove_section(cursor, location, section)
+				eclass_db = _eclass_validation_cache(eclass_db)
+				for section, fingerprint in sections.items():
+					if old_sections.get(section) != fingerprint:
+						if not self._index_section(cursor, cache, eclass_db,
+							location, section):
+							# Never matches, so that it is indexed again.
+							fingerprint = ""
+						cursor.execute("INSERT INTO sections "
+							"(location, section, fingerprint) VALUES (?, ?, ?)",
+							(location, section, fingerprint))
+				self._fresh.add(location)
+				modified = True
+
+			if self._writable:
+				# Discard repositories that are no longer configured.
+				for location, old_sections in indexed.items():
+					for section in old_sections:
+						self._remove_section(cursor, location, section)
+					modified = True
+
+			if modified:
+				connection.commit()
+		except self._db_error:
+			self._disable()
+			self._fresh = set()
+
+		return self._fresh
+
+	def _get_vocabulary(self, cursor):
+		if self._vocabulary is None:
+			cursor.execute("SELECT DISTINCT token FROM postings")
+			self._vocabulary = [row[0] for row in cursor.fetchall()]
+		return self._vocabulary
+
+	def match_description(self, regex, words=None):
+		"""
+		Return the cps that have at least one indexed ebuild with a
+		DESCRIPTION that matches the given compiled regular expression,
+		together with all cps for which the index may be out of date.
+		If words is given, the postings lists are used to select
+		candidates that contain every word as part of an indexed token.
+		Only repositories that are reported as up to date by update()
+		are considered.
+
+		@param regex: compiled regular expression
+		@type regex: re.RegexObject
+		@param words: lower case words that a match must contain
+		@type words: list
+		@rtype: set
+		"""
+		if self._fresh is None:
+			self.update()
+		cps = set()
+		if not self._fresh:
+			return cps
+
+		fresh = self._fresh
+		cursor = self._connection.cursor()
+		max_args = self._max_query_args
+		try:
+			if words:
+				vocabulary = self._get_vocabulary(cursor)
+				pkg_ids = None
+				for word in words:
+					tokens = [token for token in vocabulary if word in token]
+					word_pkg_ids = set()
+					for i in range(0, len(tokens), max_args):
+						chunk = tokens[i:i+max_args]
+						cursor.execute("SELECT pkg_id FROM postings "
+							"WHERE token IN (%s)" % ",".join("?" * len(chunk)),
+							chunk)
+						word_pkg_ids.update(row[0] for row in cursor.fetchall())
+					if pkg_ids is None:
+						pkg_ids = word_pkg_ids
+					else:
+						pkg_ids.intersection_update(word_pkg_ids)
+					if not pkg_ids:
+						break
+
+				pkg_ids = list(pkg_ids)
+				rows = []
+				for i in range(0, len(pkg_ids), max_args):
+					chunk = pkg_ids[i:i+max_args]
+					cursor.execute("SELECT location, cp, description "
+						"FROM packages WHERE pkg_id IN (%s)" %
+						",".join("?" * len(chunk)), chunk)
+					rows.extend(cursor.fetchall())
+			else:
+				cursor.execute("SELECT location, cp, description FROM packages")
+				rows = cursor.fetchall()
+		except self._db_error:
+			self._disable()
+			self._fresh = set()
+			return cps
+
+		for location, cp, description in rows:
+			if location in fresh and cp not in cps and \
+				regex.search(description) is not None:
+				cps.add(_unicode(cp))
+
+		try:
+			cps.update(self._unverified_cps(cursor, cps))
+		except self._db_error:
+			self._disable()
+			self._fresh = set()
+			return set()
+		return cps
+
+	def _unverified_cps(self, cursor, exclude):
+		"""
+		Return the cps from up to date repositories, other than those in
+		exclude, for which the index may not reflect the current ebuilds:
+		packages with entries that were not valid when they were indexed,
+		with ebuilds that have been modified, added or removed since, and
+		packages that are missing from the index.
+		"""
+		fresh = self._fresh
+		unverified = set()
+		indexed = {}
+		dir_mtimes = {}
+		cursor.execute("SELECT location, cp, cpv, ebuild_mtime, dir_mtime "
+			"FROM packages")
+		for location, cp, cpv, ebuild_mtime, dir_mtime in cursor.fetchall():
+			if location not in fresh:
+				continue
+			cp = _unicode(cp)
+			indexed.setdefault(location, set()).add(cp)
+			if cp in exclude or cp in unverified:
+				continue
+			pkg_dir = os.path.join(location, cp)
+			try:
+				current_dir_mtime = dir_mtimes[pkg_dir]
+			except KeyError:
+				current_dir_mtime = dir_mtimes[pkg_dir] = self._mtime(pkg_dir)
+			if ebuild_mtime is None or dir_mtime != current_dir_mtime or \
+				ebuild_mtime != self._mtime(os.path.join(pkg_dir,
+				catsplit(cpv)[1] + ".ebuild")):
+				unverified.add(cp)
+
+		for location in fresh:
+			location_indexed = indexed.get(location, ())
+			for cp in self._portdb.cp_all(trees=[location]):
+				if cp not in location_indexed and cp not in exclude:
+					unverified.add(cp)
+		return unverified
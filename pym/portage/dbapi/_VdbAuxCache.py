@@ -0,0 +1,152 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from __future__ import unicode_literals
+
+import json
+import sys
+
+from portage.util._SqliteStore import SqliteStore
+
+if sys.hexversion >= 0x3000000:
+	_unicode = str
+else:
+	_unicode = unicode
+
+class VdbAuxCache(SqliteStore):
+	"""
+	A persistent sqlite store for the metadata that vardbapi.aux_get()
+	caches for each installed package. Every row holds the mtime of the
+	package directory together with a JSON encoded metadata dict, and
+	rows are only loaded when the corresponding cpv is requested, so
+	opening the cache does not require reading the whole file.
+
+	Modified entries are kept in memory until flush() is called, which
+	writes only those rows (and discards rows of packages that are no
+	longer installed) in a single transaction. The store is only
+	modified when the current user has superuser privileges. If sqlite
+	is unavailable or the file can not be opened, the cache silently
+	degrades to an in-memory dict, since it is completely disposable.
+	"""
+
+	_version = "2"
+
+	# Stay below the default SQLITE_MAX_VARIABLE_NUMBER of 999.
+	_max_query_args = 500
+
+	def __init__(self, filename):
+		SqliteStore.__init__(self, filename)
+		self._entries = {}
+		self.modified = set()
+
+	def _create_tables(self, cursor):
+		for table in ("packages", "metadata"):
+			cursor.execute("DROP TABLE IF EXISTS %s" % table)
+		cursor.execute("CREATE TABLE metadata "
+			"(key TEXT PRIMARY KEY, value TEXT)")
+		cursor.execute("CREATE TABLE packages "
+			"(cpv TEXT PRIMARY KEY, mtime REAL, data TEXT)")
+		cursor.execute("INSERT INTO metadata (key, value) VALUES (?, ?)",
+			("version", self._version))
+
+	def get(self, cpv):
+		"""
+		@rtype: tuple
+		@return: a (mtime, metadata) tuple, or None if cpv is not cached
+		"""
+		try:
+			return self._entries[cpv]
+		except KeyError:
+			pass
+
+		entry = None
+		connection = self._connect()
+		if connection is not None:
+			try:
+				cursor = connection.cursor()
+				cursor.execute("SELECT mtime, data FROM packages "
+					"WHERE cpv = ?", (_unicode(cpv),))
+				row = cursor.fetchone()
+			except self._db_error:
+				self._disable()
+				row = None
+			if row is not None:
+				entry = self._decode(row[0], row[1])
+
+		self._entries[cpv] = entry
+		return entry
+
+	def prefetch(self, cpvs):
+		"""
+		Load the entries of the given cpvs with as few queries as
+		possible, so that subsequent get() calls for them do not need
+		to query the database individually.
+		"""
+		entries = self._entries
+		cpvs = [_unicode(cpv) for cpv in cpvs if cpv not in entries]
+		if not cpvs:
+			return
+		connection = self._connect()
+		if connection is None:
+			return
+
+		loaded = dict.fromkeys(cpvs)
+		max_args = self._max_query_args
+		try:
+			cursor = connection.cursor()
+			for i in range(0, len(cpvs), max_args):
+				chunk = cpvs[i:i+max_args]
+				cursor.execute("SELECT cpv, mtime, data FROM packages "
+					"WHERE cpv IN (%s)" % ",".join("?" * len(chunk)), chunk)
+				for cpv, mtime, data in cursor.fetchall():
+					loaded[cpv] = self._decode(mtime, data)
+		except self._db_error:
+			self._disable()
+			return
+		entries.update(loaded)
+
+	def _decode(self, mtime, data):
+		try:
+			metadata = json.loads(data)
+		except ValueError:
+			return None
+		if not isinstance(metadata, dict):
+			return None
+		return (mtime, metadata)
+
+	def __setitem__(self, cpv, entry):
+		"""
+		@param entry: a (mtime, metadata) tuple
+		@type entry: tuple
+		"""
+		cpv = _unicode(cpv)
+		self._entries[cpv] = entry
+		self.modified.add(cpv)
+
+	def flush(self, valid_cpvs):
+		"""
+		Write modified entries and discard entries for packages that
+		are not in valid_cpvs.
+
+		@param valid_cpvs: cpvs of all installed packages
+		@type valid_cpvs: set
+		"""
+		connection = self._connect()
+		if connection is None or not self._writable:
+			return
+		try:
+			cursor = connection.cursor()
+			cursor.executemany("INSERT OR REPLACE INTO packages "
+				"(cpv, mtime, data) VALUES (?, ?, ?)",
+				((cpv, self._entries[cpv][0],
+				json.dumps(self._entries[cpv][1], sort_keys=True))
+				for cpv in self.modified if cpv in valid_cpvs))
+			cursor.execute("SELECT cpv FROM packages")
+			stale = [(cpv,) for (cpv,) in cursor.fetchall()
+				if cpv not in valid_cpvs]
+			cursor.executemany("DELETE FROM packages WHERE cpv = ?", stale)
+			connection.commit()
+		except self._db_error:
+			self._disable()
+			return
+		self.modified.clear()
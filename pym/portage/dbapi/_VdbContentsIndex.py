@@ -0,0 +1,232 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from __future__ import unicode_literals
+
+import sys
+
+import portage
+from portage import os
+from portage import _encodings
+from portage import _unicode_decode
+from portage.util._SqliteStore import SqliteStore
+
+if sys.hexversion >= 0x3000000:
+	_unicode = str
+else:
+	_unicode = unicode
+
+class VdbContentsIndex(SqliteStore):
+	"""
+	A persistent sqlite index that maps installed paths to the packages
+	that own them, so that ownership queries do not need to parse the
+	CONTENTS of every candidate package. Each indexed package is
+	recorded together with its (cpv, COUNTER, _mtime_) hash, which is
+	validated against the vdb by sync() before the index is used.
+
+	Paths are stored relative to ROOT, in the same form as keys of
+	dblink.getcontents() with the ROOT prefix removed (this includes
+	implicitly generated parent directory entries). The index is only
+	modified when the current user has superuser privileges. If it is
+	stale and cannot be updated, or if sqlite is unavailable, sync()
+	returns False and callers are expected to fall back to parsing
+	CONTENTS.
+	"""
+
+	_version = "1"
+
+	def __init__(self, vardb, filename):
+		self._vardb = vardb
+		self._root = vardb.settings['ROOT']
+		self._root_len = len(self._root) - 1
+		SqliteStore.__init__(self, filename)
+
+	def _create_tables(self, cursor):
+		for table in ("paths", "packages", "metadata"):
+			cursor.execute("DROP TABLE IF EXISTS %s" % table)
+		cursor.execute("CREATE TABLE metadata "
+			"(key TEXT PRIMARY KEY, value TEXT)")
+		cursor.execute("CREATE TABLE packages "
+			"(pkg_id INTEGER PRIMARY KEY, cpv TEXT UNIQUE, "
+			"counter INTEGER, mtime REAL)")
+		cursor.execute("CREATE TABLE paths "
+			"(path TEXT, base_name TEXT, pkg_id INTEGER)")
+		cursor.execute("CREATE INDEX paths_path ON paths (path)")
+		cursor.execute("CREATE INDEX paths_base_name ON paths (base_name)")
+		cursor.execute("CREATE INDEX paths_pkg_id ON paths (pkg_id)")
+		cursor.execute("INSERT INTO metadata (key, value) VALUES (?, ?)",
+			("version", self._version))
+
+	def sync(self, hash_pkg):
+		"""
+		Ensure that the index corresponds to the packages that are
+		currently installed, indexing any packages that are missing
+		and discarding stale ones.
+
+		@param hash_pkg: callable that returns a (cpv, counter, mtime)
+			tuple for a given installed cpv
+		@type hash_pkg: callable
+		@rtype: bool
+		@return: True if the index is valid and can be used for queries
+		"""
+		connection = self._connect()
+		if connection is None:
+			return False
+
+		try:
+			cursor = connection.cursor()
+			cursor.execute("SELECT cpv, counter, mtime FROM packages")
+			cached = set((_unicode(cpv), counter, mtime)
+				for cpv, counter, mtime in cursor.fetchall())
+
+			current = set()
+			for cpv in self._vardb.cpv_all():
+				try:
+					current.add(hash_pkg(cpv))
+				except KeyError:
+					# Removed concurrently.
+					pass
+
+			stale = cached.difference(current)
+			uncached = current.difference(cached)
+			if not stale and not uncached:
+				return True
+			if not self._writable:
+				return False
+
+			for cpv, counter, mtime in stale:
+				self._remove(cursor, cpv)
+			for pkg_hash in uncached:
+				self._add(cursor, pkg_hash,
+					self._vardb._dblink(pkg_hash[0]).getcontents())
+			connection.commit()
+		except self._db_error:
+			self._disable()
+			return False
+
+		return True
+
+	def add(self, pkg_hash, contents):
+		"""
+		Index the contents of a newly installed package, replacing
+		any previous entry for the same cpv.
+		"""
+		connection = self._connect()
+		if connection is None or not self._writable:
+			return
+		try:
+			cursor = connection.cursor()
+			self._add(cursor, pkg_hash, contents)
+			connection.commit()
+		except self._db_error:
+			self._disable()
+
+	def remove(self, cpv):
+		"""
+		Discard the index entry of an uninstalled package.
+		"""
+		connection = self._connect()
+		if connection is None or not self._writable:
+			return
+		try:
+			cursor = connection.cursor()
+			self._remove(cursor, cpv)
+			connection.commit()
+		except self._db_error:
+			self._disable()
+
+	def _add(self, cursor, pkg_hash, contents):
+		cpv, counter, mtime = pkg_hash
+		cpv = _unicode(cpv)
+		self._remove(cursor, cpv)
+		cursor.execute("INSERT INTO packages (cpv, counter, mtime) "
+			"VALUES (?, ?, ?)", (cpv, counter, mtime))
+		pkg_id = cursor.lastrowid
+		root_len = self._root_len
+		basename = os.path.basename
+		sep = os.sep
+		cursor.executemany("INSERT INTO paths (path, base_name, pkg_id) "
+			"VALUES (?, ?, ?)",
+			((path[root_len:], basename(path[root_len:].rstrip(sep)), pkg_id)
+			for path in contents))
+
+	def _remove(self, cursor, cpv):
+		cpv = _unicode(cpv)
+		cursor.execute("DELETE FROM paths WHERE pkg_id IN "
+			"(SELECT pkg_id FROM packages WHERE cpv = ?)", (cpv,))
+		cursor.execute("DELETE FROM packages WHERE cpv = ?", (cpv,))
+
+	def iter_owners(self, path_list):
+		"""
+		Iterate over (cpv, path) tuples for the given paths, with the
+		same semantics as vardbapi._owners_db.iter_owners(). A path
+		that does not start with a slash is treated as a basename. This
+		method should only be called after sync() has returned True.
+		"""
+		root = self._root
+		root_len = self._root_len
+		eroot_len = len(self._vardb._eroot)
+		cursor = self._connection.cursor()
+		dir_stats = {}
+
+		def dir_inode(path):
+			try:
+				return dir_stats[path]
+			except KeyError:
+				pass
+			try:
+				st = os.stat(path)
+			except (OSError, UnicodeEncodeError):
+				inode = None
+			else:
+				inode = (st.st_dev, st.st_ino)
+			dir_stats[path] = inode
+			return inode
+
+		for path in path_list:
+			path = _unicode_decode(path,
+				encoding=_encodings['content'], errors='strict')
+			is_basename = os.sep != path[:1]
+			if is_basename:
+				name = path
+			else:
+				name = os.path.basename(path.rstrip(os.sep))
+
+			if not name:
+				continue
+
+			try:
+				cursor.execute("SELECT packages.cpv, paths.path "
+					"FROM paths JOIN packages "
+					"ON paths.pkg_id = packages.pkg_id "
+					"WHERE paths.base_name = ?", (name,))
+				rows = cursor.fetchall()
+			except self._db_error:
+				rows = []
+
+			if is_basename:
+				for cpv, p in rows:
+					yield (cpv, (root[:root_len] + p)[eroot_len:])
+				continue
+
+			# Mirror dblink._match_contents(): an exact match is
+			# sufficient, and otherwise the parent directory inodes are
+			# compared in order to account for symlinked directories.
+			destfile = portage.util.normalize_path(
+				os.path.join(root, path.lstrip(os.sep)))
+			key = destfile[root_len:]
+			parent_inode = None
+			owners = set()
+			for cpv, p in rows:
+				if cpv in owners:
+					continue
+				if p != key:
+					if parent_inode is None:
+						parent_inode = dir_inode(os.path.dirname(destfile))
+						if parent_inode is None:
+							parent_inode = False
+					if not parent_inode or parent_inode != \
+						dir_inode(root[:root_len] + os.path.dirname(p)):
+						continue
+				owners.add(cpv)
+				yield (cpv, path)
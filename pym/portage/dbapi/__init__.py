@@ -12,12 +12,13 @@ portage.proxy.lazyimport.lazyimport(globals(),
 	'portage.dbapi.dep_expand:dep_expand@_dep_expand',
 	'portage.dep:Atom,match_from_list,_match_slot',
 	'portage.output:colorize',
-	'portage.util:cmp_sort_key,writemsg',
-	'portage.versions:catsplit,catpkgsplit,vercmp,_pkg_str',
+	'portage.util:writemsg',
+	'portage.versions:catsplit,catpkgsplit,vercmp,_get_version_key,_pkg_str',
 )
 
 from portage import os
 from portage import auxdbkeys
+from portage.dbapi._MatchIndex import MatchIndex
 from portage.eapi import _get_eapi_attrs
 from portage.exception import InvalidData
 from portage.localization import _
@@ -26,6 +27,7 @@ from _emerge.Package import Package
 class dbapi(object):
 	_category_re = re.compile(r'^\w[-.+\w]*$', re.UNICODE)
 	_categories = None
+	_match_indexes = None
 	_use_mutable = False
 	_known_keys = frozenset(x for x in auxdbkeys
 		if not x.startswith("UNUSED_0"))
@@ -57,6 +59,10 @@ class dbapi(object):
 	def _cmp_cpv(cpv1, cpv2):
 		return vercmp(cpv1.version, cpv2.version)
 
+	@staticmethod
+	def _cpv_version_key(cpv):
+		return _get_version_key(cpv.version)
+
 	@staticmethod
 	def _cpv_sort_ascending(cpv_list):
 		"""
@@ -67,7 +73,7 @@ class dbapi(object):
 			# If the cpv includes explicit -r0, it has to be preserved
 			# for consistency in findname and aux_get calls, so use a
 			# dict to map strings back to their original values.
-			cpv_list.sort(key=cmp_sort_key(dbapi._cmp_cpv))
+			cpv_list.sort(key=dbapi._cpv_version_key)
 
 	def cpv_all(self):
 		"""Return all CPVs in the db
@@ -106,7 +112,29 @@ class dbapi(object):
 			["0",">=sys-libs/bar-1.0","http://www.foo.com"] or [] if mycpv not found'
 		"""
 		raise NotImplementedError
-	
+
+	def aux_get_many(self, cpvs, mylist, myrepo=None):
+		"""Iterate over the metadata keys in mylist for each of the given cpvs
+		Args:
+			cpvs - an iterable of cpvs, such as ["sys-apps/foo-1.0", ...]
+			mylist - ["SLOT","DEPEND","HOMEPAGE"]
+			myrepo - The repository name.
+		Returns:
+			an iterator over (cpv, values) tuples, where values is the list
+			that aux_get would return for cpv. Any cpv for which aux_get
+			would raise KeyError is skipped. Subclasses override this in
+			order to share work between lookups.
+		"""
+		for cpv in cpvs:
+			try:
+				if myrepo is None:
+					values = self.aux_get(cpv, mylist)
+				else:
+					values = self.aux_get(cpv, mylist, myrepo=myrepo)
+			except KeyError:
+				continue
+			yield (cpv, values)
+
 	def aux_update(self, cpv, metadata_updates):
 		"""
 		Args:
@@ -130,8 +158,25 @@ class dbapi(object):
 		return list(self._iter_match(mydep,
 			self.cp_list(mydep.cp, use_cache=use_cache)))
 
+	def _match_from_list(self, atom, cpv_list):
+		"""
+		Equivalent to match_from_list(atom, cpv_list). The MatchIndex of
+		the candidates for atom.cp is kept for as long as cp_list()
+		returns the same candidates, so that repeated queries find
+		version ranges by binary search, and results are cached by atom.
+		"""
+		if self._match_indexes is None:
+			self._match_indexes = {}
+		index = self._match_indexes.get(atom.cp)
+		if index is None or not index.same_candidates(cpv_list):
+			index = MatchIndex(atom.cp, cpv_list)
+			self._match_indexes[atom.cp] = index
+		return index.match(atom)
+
 	def _iter_match(self, atom, cpv_iter):
-		cpv_iter = iter(match_from_list(atom, cpv_iter))
+		if not isinstance(cpv_iter, list):
+			cpv_iter = list(cpv_iter)
+		cpv_iter = iter(self._match_from_list(atom, cpv_iter))
 		if atom.repo:
 			cpv_iter = self._iter_match_repo(atom, cpv_iter)
 		if atom.slot:
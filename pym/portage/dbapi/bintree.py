@@ -18,6 +18,7 @@ portage.proxy.lazyimport.lazyimport(globals(),
 	'portage.util:atomic_ofstream,ensure_dirs,normalize_path,' + \
 		'writemsg,writemsg_stdout',
 	'portage.util.listdir:listdir',
+	'portage.util._threads:thread_imap',
 	'portage.util._urlopen:urlopen@_urlopen',
 	'portage.versions:best,catpkgsplit,catsplit,_pkg_str',
 )
@@ -43,6 +44,7 @@ import subprocess
 import sys
 import tempfile
 import textwrap
+import time
 import traceback
 import warnings
 from gzip import GzipFile
@@ -52,6 +54,11 @@ try:
 except ImportError:
 	from urlparse import urlparse
 
+try:
+	import threading
+except ImportError:
+	import dummy_threading as threading
+
 if sys.hexversion >= 0x3000000:
 	_unicode = str
 	basestring = str
@@ -64,6 +71,30 @@ class UseCachedCopyOfRemoteIndex(Exception):
 	# then fetching the remote index can be skipped.
 	pass
 
+class _RemotePkgindexFetch(object):
+	"""
+	Holds the state and result of fetching the Packages index of one
+	PORTAGE_BINHOST, as filled in by binarytree._fetch_remote_pkgindex.
+	"""
+
+	__slots__ = ("base_url", "exception", "f", "local_timestamp",
+		"messages", "pkgindex", "pkgindex_file", "proc", "tmp_filename",
+		"up_to_date", "url", "use_cached")
+
+	def __init__(self, base_url):
+		self.base_url = base_url
+		self.exception = None
+		self.f = None
+		self.local_timestamp = None
+		self.messages = []
+		self.pkgindex = None
+		self.pkgindex_file = None
+		self.proc = None
+		self.tmp_filename = None
+		self.up_to_date = False
+		self.url = None
+		self.use_cached = False
+
 class bindbapi(fakedbapi):
 	_known_keys = frozenset(list(fakedbapi._known_keys) + \
 		["CHOST", "repository", "USE"])
@@ -120,20 +151,34 @@ class bindbapi(fakedbapi):
 			if not os.path.exists(tbz2_path):
 				raise KeyError(mycpv)
 			metadata_bytes = portage.xpak.tbz2(tbz2_path).get_data()
-			def getitem(k):
-				v = metadata_bytes.get(_unicode_encode(k,
-					encoding=_encodings['repo.content'],
-					errors='backslashreplace'))
-				if v is not None:
-					v = _unicode_decode(v,
-						encoding=_encodings['repo.content'], errors='replace')
-				return v
+			getitem = self._xpak_getitem(metadata_bytes)
 		else:
 			getitem = self.bintree._remotepkgs[mycpv].get
-		mydata = {}
 		mykeys = wants
 		if cache_me:
 			mykeys = self._aux_cache_keys.union(wants)
+		mydata = self._aux_get_data(getitem, mykeys)
+
+		if cache_me:
+			aux_cache = self._aux_cache_slot_dict()
+			for x in self._aux_cache_keys:
+				aux_cache[x] = mydata.get(x, '')
+			self._aux_cache[mycpv] = aux_cache
+		return [mydata.get(x, '') for x in wants]
+
+	def _xpak_getitem(self, metadata_bytes):
+		def getitem(k):
+			v = metadata_bytes.get(_unicode_encode(k,
+				encoding=_encodings['repo.content'],
+				errors='backslashreplace'))
+			if v is not None:
+				v = _unicode_decode(v,
+					encoding=_encodings['repo.content'], errors='replace')
+			return v
+		return getitem
+
+	def _aux_get_data(self, getitem, mykeys):
+		mydata = {}
 		for x in mykeys:
 			myval = getitem(x)
 			# myval is None if the key doesn't exist
@@ -143,12 +188,14 @@ class bindbapi(fakedbapi):
 
 		if not mydata.setdefault('EAPI', '0'):
 			mydata['EAPI'] = '0'
+		return mydata
 
-		if cache_me:
-			aux_cache = self._aux_cache_slot_dict()
-			for x in self._aux_cache_keys:
-				aux_cache[x] = mydata.get(x, '')
-			self._aux_cache[mycpv] = aux_cache
+	def _xpak_aux_get(self, metadata_bytes, wants):
+		"""
+		Like aux_get, but takes the metadata from xpak data that has
+		already been read, as returned by portage.xpak.get_tbz2_data.
+		"""
+		mydata = self._aux_get_data(self._xpak_getitem(metadata_bytes), wants)
 		return [mydata.get(x, '') for x in wants]
 
 	def aux_update(self, cpv, values):
@@ -302,6 +349,18 @@ class binarytree(object):
 			self._pkgindex_version = 0
 			self._pkgindex_hashes = ["MD5","SHA1"]
 			self._pkgindex_file = os.path.join(self.pkgdir, "Packages")
+			# Entries added by inject with compact=False are appended to
+			# this journal, which is merged into the Packages file once it
+			# grows beyond 1/_pkgindex_journal_ratio of its size, and by
+			# _pkgindex_compact.
+			self._pkgindex_journal_file = self._pkgindex_file + ".journal"
+			self._pkgindex_journal_ratio = 10
+			# Holds the mtimes of the directories of PKGDIR as of the
+			# last scan, for FEATURES=binpkg-trust-index.
+			self._pkgindex_dir_mtimes_file = self._pkgindex_file + ".mtimes"
+			# Number of threads used to read package files, when the
+			# index has to be rebuilt.
+			self._pkg_read_threads = 8
 			self._pkgindex_keys = self.dbapi._aux_cache_keys.copy()
 			self._pkgindex_keys.update(["CPV", "MTIME", "SIZE"])
 			self._pkgindex_aux_keys = \
@@ -609,8 +668,13 @@ class binarytree(object):
 		_movefile(src_path, dest_path, mysettings=self.settings)
 		self._pkg_paths[cpv] = mypath
 
-	def populate(self, getbinpkgs=0):
-		"populates the binarytree"
+	def populate(self, getbinpkgs=0, full_scan=False):
+		"""
+		Populates the binarytree.
+		@param full_scan: scan all binary packages, even if
+			FEATURES=binpkg-trust-index is enabled
+		@type full_scan: bool
+		"""
 
 		if self._populating:
 			return
@@ -621,13 +685,13 @@ class binarytree(object):
 				pkgindex_lock = lockfile(self._pkgindex_file,
 					wantnewlockfile=1)
 			self._populating = True
-			self._populate(getbinpkgs)
+			self._populate(getbinpkgs, full_scan=full_scan)
 		finally:
 			if pkgindex_lock:
 				unlockfile(pkgindex_lock)
 			self._populating = False
 
-	def _populate(self, getbinpkgs=0):
+	def _populate(self, getbinpkgs=0, full_scan=False):
 		if (not os.path.isdir(self.pkgdir) and not getbinpkgs):
 			return 0
 
@@ -654,8 +718,50 @@ class binarytree(object):
 			metadata = {}
 			for d in pkgindex.packages:
 				metadata[d["CPV"]] = d
-			update_pkgindex = False
+
+			# With FEATURES=binpkg-trust-index, index entries are used
+			# without checking the files, for directories with the same
+			# mtime as when the index was last found to be consistent.
+			dir_mtimes = None
+			recorded_timestamp = None
+			recorded_mtimes = {}
+			trusted_dirs = {}
+			if "binpkg-trust-index" in self.settings.features:
+				dir_mtimes = {}
+				for mydir in dirs:
+					try:
+						dir_mtimes[mydir] = os.stat(
+							os.path.join(self.pkgdir, mydir)).st_mtime
+					except OSError:
+						pass
+				recorded_timestamp, recorded_mtimes = \
+					self._load_pkgindex_dir_mtimes()
+			if dir_mtimes and not full_scan and recorded_timestamp and \
+				recorded_timestamp == header.get("TIMESTAMP"):
+				for mydir, mtime in dir_mtimes.items():
+					if recorded_mtimes.get(mydir) == mtime:
+						trusted_dirs[mydir] = []
+				for d in metadata.values():
+					mypath = d.get("PATH") or d["CPV"] + ".tbz2"
+					mydir = mypath.split("/", 1)[0]
+					entries = trusted_dirs.get(mydir)
+					if entries is None:
+						continue
+					if self._pkgindex_keys.difference(d):
+						# Incomplete entries require a scan.
+						del trusted_dirs[mydir]
+					else:
+						entries.append((mypath, d))
+
+			# Match the package files against the index first, so that
+			# the xpak segments of the remaining packages can be read in
+			# parallel, in the order that they are processed below.
+			dir_files = {}
+			read_paths = []
 			for mydir in dirs:
+				if mydir in trusted_dirs:
+					continue
+				files = dir_files[mydir] = []
 				for myfile in listdir(os.path.join(self.pkgdir, mydir)):
 					if not myfile.endswith(".tbz2"):
 						continue
@@ -680,8 +786,8 @@ class binarytree(object):
 								pf_index.setdefault(
 									mypf, []).append(metadata[mycpv])
 						possibilities = pf_index.get(myfile[:-5])
+					match = None
 					if possibilities:
-						match = None
 						for d in possibilities:
 							try:
 								if long(d["MTIME"]) != s[stat.ST_MTIME]:
@@ -696,39 +802,72 @@ class binarytree(object):
 							if not self._pkgindex_keys.difference(d):
 								match = d
 								break
-						if match:
-							mycpv = match["CPV"]
-							if mycpv in pkg_paths:
-								# discard duplicates (All/ is preferred)
-								continue
-							mycpv = _pkg_str(mycpv)
-							pkg_paths[mycpv] = mypath
-							# update the path if the package has been moved
-							oldpath = d.get("PATH")
-							if oldpath and oldpath != mypath:
-								update_pkgindex = True
-							if mypath != mycpv + ".tbz2":
-								d["PATH"] = mypath
-								if not oldpath:
-									update_pkgindex = True
-							else:
-								d.pop("PATH", None)
-								if oldpath:
-									update_pkgindex = True
-							self.dbapi.cpv_inject(mycpv)
-							if not self.dbapi._aux_cache_keys.difference(d):
-								aux_cache = self.dbapi._aux_cache_slot_dict()
-								for k in self.dbapi._aux_cache_keys:
-									aux_cache[k] = d[k]
-								self.dbapi._aux_cache[mycpv] = aux_cache
+					readable = True
+					if match is None:
+						readable = os.access(full_path, os.R_OK)
+						if readable:
+							read_paths.append(full_path)
+					files.append((myfile, mypath, full_path, s, match,
+						readable))
+
+			xpak_data = thread_imap(portage.xpak.get_tbz2_data,
+				read_paths, self._pkg_read_threads)
+
+			update_pkgindex = False
+			for mydir in dirs:
+				entries = trusted_dirs.get(mydir)
+				if entries is not None:
+					for mypath, d in entries:
+						mycpv = d["CPV"]
+						if mycpv in pkg_paths:
+							# discard duplicates (All/ is preferred)
 							continue
-					if not os.access(full_path, os.R_OK):
+						mycpv = _pkg_str(mycpv)
+						pkg_paths[mycpv] = mypath
+						self.dbapi.cpv_inject(mycpv)
+						if not self.dbapi._aux_cache_keys.difference(d):
+							aux_cache = self.dbapi._aux_cache_slot_dict()
+							for k in self.dbapi._aux_cache_keys:
+								aux_cache[k] = d[k]
+							self.dbapi._aux_cache[mycpv] = aux_cache
+					continue
+
+				for myfile, mypath, full_path, s, match, readable in \
+					dir_files[mydir]:
+					if match:
+						d = match
+						mycpv = match["CPV"]
+						if mycpv in pkg_paths:
+							# discard duplicates (All/ is preferred)
+							continue
+						mycpv = _pkg_str(mycpv)
+						pkg_paths[mycpv] = mypath
+						# update the path if the package has been moved
+						oldpath = d.get("PATH")
+						if oldpath and oldpath != mypath:
+							update_pkgindex = True
+						if mypath != mycpv + ".tbz2":
+							d["PATH"] = mypath
+							if not oldpath:
+								update_pkgindex = True
+						else:
+							d.pop("PATH", None)
+							if oldpath:
+								update_pkgindex = True
+						self.dbapi.cpv_inject(mycpv)
+						if not self.dbapi._aux_cache_keys.difference(d):
+							aux_cache = self.dbapi._aux_cache_slot_dict()
+							for k in self.dbapi._aux_cache_keys:
+								aux_cache[k] = d[k]
+							self.dbapi._aux_cache[mycpv] = aux_cache
+						continue
+					if not readable:
 						writemsg(_("!!! Permission denied to read " \
 							"binary package: '%s'\n") % full_path,
 							noiselevel=-1)
 						self.invalids.append(myfile[:-5])
 						continue
-					metadata_bytes = portage.xpak.tbz2(full_path).get_data()
+					metadata_bytes = next(xpak_data)
 					mycat = _unicode_decode(metadata_bytes.get(b"CATEGORY", ""),
 						encoding=_encodings['repo.content'], errors='replace')
 					mypf = _unicode_decode(metadata_bytes.get(b"PF", ""),
@@ -801,7 +940,8 @@ class binarytree(object):
 					d["SIZE"] = str(s.st_size)
 
 					d.update(zip(self._pkgindex_aux_keys,
-						self.dbapi.aux_get(mycpv, self._pkgindex_aux_keys)))
+						self.dbapi._xpak_aux_get(metadata_bytes,
+						self._pkgindex_aux_keys)))
 					try:
 						self._eval_use_flags(mycpv, d)
 					except portage.exception.InvalidDependString:
@@ -835,6 +975,13 @@ class binarytree(object):
 				self._update_pkgindex_header(pkgindex.header)
 				self._pkgindex_write(pkgindex)
 
+			timestamp = pkgindex.header.get("TIMESTAMP")
+			if dir_mtimes and timestamp and \
+				(timestamp != recorded_timestamp or
+				dir_mtimes != recorded_mtimes) and \
+				os.access(self.pkgdir, os.W_OK):
+				self._save_pkgindex_dir_mtimes(timestamp, dir_mtimes)
+
 		if getbinpkgs and not self.settings["PORTAGE_BINHOST"]:
 			writemsg(_("!!! PORTAGE_BINHOST unset, but use is requested.\n"),
 				noiselevel=-1)
@@ -843,184 +990,78 @@ class binarytree(object):
 			self.populated=1
 			return
 		self._remotepkgs = {}
-		for base_url in self.settings["PORTAGE_BINHOST"].split():
-			parsed_url = urlparse(base_url)
-			host = parsed_url.netloc
-			port = parsed_url.port
-			user = None
-			passwd = None
-			user_passwd = ""
-			if "@" in host:
-				user, host = host.split("@", 1)
-				user_passwd = user + "@"
-				if ":" in user:
-					user, passwd = user.split(":", 1)
-			port_args = []
-			if port is not None:
-				port_str = ":%s" % (port,)
-				if host.endswith(port_str):
-					host = host[:-len(port_str)]
-			pkgindex_file = os.path.join(self.settings["EROOT"], CACHE_PATH, "binhost",
-				host, parsed_url.path.lstrip("/"), "Packages")
-			pkgindex = self._new_pkgindex()
-			try:
-				f = io.open(_unicode_encode(pkgindex_file,
-					encoding=_encodings['fs'], errors='strict'),
-					mode='r', encoding=_encodings['repo.content'],
-					errors='replace')
-				try:
-					pkgindex.read(f)
-				finally:
-					f.close()
-			except EnvironmentError as e:
-				if e.errno != errno.ENOENT:
-					raise
-			local_timestamp = pkgindex.header.get("TIMESTAMP", None)
-			remote_timestamp = None
-			rmt_idx = self._new_pkgindex()
-			proc = None
-			tmp_filename = None
-			try:
-				# urlparse.urljoin() only works correctly with recognized
-				# protocols and requires the base url to have a trailing
-				# slash, so join manually...
-				url = base_url.rstrip("/") + "/Packages"
-				f = None
-
-				# Don't use urlopen for https, since it doesn't support
-				# certificate/hostname verification (bug #469888).
-				if parsed_url.scheme not in ('https',):
-					try:
-						f = _urlopen(url, if_modified_since=local_timestamp)
-						if hasattr(f, 'headers') and f.headers.get('timestamp', ''):
-							remote_timestamp = f.headers.get('timestamp')
-					except IOError as err:
-						if hasattr(err, 'code') and err.code == 304: # not modified (since local_timestamp)
-							raise UseCachedCopyOfRemoteIndex()
-
-						if parsed_url.scheme in ('ftp', 'http', 'https'):
-							# This protocol is supposedly supported by urlopen,
-							# so apparently there's a problem with the url
-							# or a bug in urlopen.
-							if self.settings.get("PORTAGE_DEBUG", "0") != "0":
-								traceback.print_exc()
-
-							raise
-
-				if f is None:
-
-					path = parsed_url.path.rstrip("/") + "/Packages"
-
-					if parsed_url.scheme == 'ssh':
-						# Use a pipe so that we can terminate the download
-						# early if we detect that the TIMESTAMP header
-						# matches that of the cached Packages file.
-						ssh_args = ['ssh']
-						if port is not None:
-							ssh_args.append("-p%s" % (port,))
-						# NOTE: shlex evaluates embedded quotes
-						ssh_args.extend(portage.util.shlex_split(
-							self.settings.get("PORTAGE_SSH_OPTS", "")))
-						ssh_args.append(user_passwd + host)
-						ssh_args.append('--')
-						ssh_args.append('cat')
-						ssh_args.append(path)
-
-						proc = subprocess.Popen(ssh_args,
-							stdout=subprocess.PIPE)
-						f = proc.stdout
-					else:
-						setting = 'FETCHCOMMAND_' + parsed_url.scheme.upper()
-						fcmd = self.settings.get(setting)
-						if not fcmd:
-							fcmd = self.settings.get('FETCHCOMMAND')
-							if not fcmd:
-								raise EnvironmentError("FETCHCOMMAND is unset")
-
-						fd, tmp_filename = tempfile.mkstemp()
-						tmp_dirname, tmp_basename = os.path.split(tmp_filename)
-						os.close(fd)
-
-						fcmd_vars = {
-							"DISTDIR": tmp_dirname,
-							"FILE": tmp_basename,
-							"URI": url
-						}
-
-						for k in ("PORTAGE_SSH_OPTS",):
-							try:
-								fcmd_vars[k] = self.settings[k]
-							except KeyError:
-								pass
-
-						success = portage.getbinpkg.file_get(
-							fcmd=fcmd, fcmd_vars=fcmd_vars)
-						if not success:
-							raise EnvironmentError("%s failed" % (setting,))
-						f = open(tmp_filename, 'rb')
-
-				f_dec = codecs.iterdecode(f,
-					_encodings['repo.content'], errors='replace')
+		fetches = [_RemotePkgindexFetch(base_url)
+			for base_url in self.settings["PORTAGE_BINHOST"].split()]
+		if len(fetches) > 1:
+			# Fetch all of the indexes concurrently, since most of the
+			# time is spent waiting for the binhosts. Results are
+			# processed in PORTAGE_BINHOST order below.
+			threads = []
+			for fetch in fetches:
+				thread = threading.Thread(
+					target=self._fetch_remote_pkgindex, args=(fetch,))
+				thread.daemon = True
+				thread.start()
+				threads.append(thread)
+			for thread in threads:
+				# Join with a timeout, so that KeyboardInterrupt
+				# is delivered.
+				while thread.is_alive():
+					thread.join(1)
+		else:
+			for fetch in fetches:
+				self._fetch_remote_pkgindex(fetch)
+
+		for fetch in fetches:
+			base_url = fetch.base_url
+			url = fetch.url
+			f = fetch.f
+			if f is not None:
+				# Timeout after 5 seconds, in case close() blocks
+				# indefinitely (see bug #350139).
 				try:
-					rmt_idx.readHeader(f_dec)
-					if not remote_timestamp: # in case it had not been read from HTTP header
-						remote_timestamp = rmt_idx.header.get("TIMESTAMP", None)
-					if not remote_timestamp:
-						# no timestamp in the header, something's wrong
-						pkgindex = None
-						writemsg(_("\n\n!!! Binhost package index " \
-						" has no TIMESTAMP field.\n"), noiselevel=-1)
-					else:
-						if not self._pkgindex_version_supported(rmt_idx):
-							writemsg(_("\n\n!!! Binhost package index version" \
-							" is not supported: '%s'\n") % \
-							rmt_idx.header.get("VERSION"), noiselevel=-1)
-							pkgindex = None
-						elif local_timestamp != remote_timestamp:
-							rmt_idx.readBody(f_dec)
-							pkgindex = rmt_idx
-				finally:
-					# Timeout after 5 seconds, in case close() blocks
-					# indefinitely (see bug #350139).
 					try:
-						try:
-							AlarmSignal.register(5)
-							f.close()
-						finally:
-							AlarmSignal.unregister()
-					except AlarmSignal:
-						writemsg("\n\n!!! %s\n" % \
-							_("Timed out while closing connection to binhost"),
-							noiselevel=-1)
-			except UseCachedCopyOfRemoteIndex:
-				writemsg_stdout("\n")
-				writemsg_stdout(
-					colorize("GOOD", _("Local copy of remote index is up-to-date and will be used.")) + \
-					"\n")
-				rmt_idx = pkgindex
-			except EnvironmentError as e:
-				writemsg(_("\n\n!!! Error fetching binhost package" \
-					" info from '%s'\n") % _hide_url_passwd(base_url))
-				writemsg("!!! %s\n\n" % str(e))
-				del e
-				pkgindex = None
+						AlarmSignal.register(5)
+						f.close()
+					finally:
+						AlarmSignal.unregister()
+				except AlarmSignal:
+					writemsg("\n\n!!! %s\n" % \
+						_("Timed out while closing connection to binhost"),
+						noiselevel=-1)
+			proc = fetch.proc
 			if proc is not None:
 				if proc.poll() is None:
 					proc.kill()
 					proc.wait()
-				proc = None
-			if tmp_filename is not None:
+			if fetch.tmp_filename is not None:
 				try:
-					os.unlink(tmp_filename)
+					os.unlink(fetch.tmp_filename)
 				except OSError:
 					pass
-			if pkgindex is rmt_idx:
+			if fetch.exception is not None:
+				raise fetch.exception
+			for msg in fetch.messages:
+				writemsg(msg, noiselevel=-1)
+			if fetch.up_to_date:
+				writemsg_stdout("\n")
+				writemsg_stdout(
+					colorize("GOOD", _("Local copy of remote index is up-to-date and will be used.")) + \
+					"\n")
+
+			pkgindex = fetch.pkgindex
+			if fetch.use_cached:
+				pkgindex = self._load_remote_pkgindex_cache(
+					fetch.pkgindex_file, fetch.local_timestamp)
+			elif pkgindex is not None:
 				pkgindex.modified = False # don't update the header
+				pkgindex_file = fetch.pkgindex_file
 				try:
 					ensure_dirs(os.path.dirname(pkgindex_file))
 					f = atomic_ofstream(pkgindex_file)
 					pkgindex.write(f)
 					f.close()
+					self._save_remote_pkgindex_cache(pkgindex_file, pkgindex)
 				except (IOError, PortageException):
 					if os.access(os.path.dirname(pkgindex_file), os.W_OK):
 						raise
@@ -1069,7 +1110,222 @@ class binarytree(object):
 
 		self.populated=1
 
-	def inject(self, cpv, filename=None):
+	def _fetch_remote_pkgindex(self, fetch):
+		"""
+		Fetch the Packages index of the binhost given by fetch.base_url,
+		unless the cached copy is up-to-date. This may be called from
+		a separate thread, so messages are stored in fetch.messages and
+		the connection is closed later by _populate.
+		"""
+		try:
+			self._fetch_remote_pkgindex_imp(fetch)
+		except (SystemExit, KeyboardInterrupt):
+			raise
+		except Exception as e:
+			fetch.exception = e
+
+	def _fetch_remote_pkgindex_imp(self, fetch):
+		base_url = fetch.base_url
+		parsed_url = urlparse(base_url)
+		host = parsed_url.netloc
+		port = parsed_url.port
+		user = None
+		passwd = None
+		user_passwd = ""
+		if "@" in host:
+			user, host = host.split("@", 1)
+			user_passwd = user + "@"
+			if ":" in user:
+				user, passwd = user.split(":", 1)
+		port_args = []
+		if port is not None:
+			port_str = ":%s" % (port,)
+			if host.endswith(port_str):
+				host = host[:-len(port_str)]
+		pkgindex_file = os.path.join(self.settings["EROOT"], CACHE_PATH, "binhost",
+			host, parsed_url.path.lstrip("/"), "Packages")
+		fetch.pkgindex_file = pkgindex_file
+		# Only read the header of the cached copy here, since the
+		# body is only needed if the remote index has not changed.
+		pkgindex = self._new_pkgindex()
+		try:
+			f = io.open(_unicode_encode(pkgindex_file,
+				encoding=_encodings['fs'], errors='strict'),
+				mode='r', encoding=_encodings['repo.content'],
+				errors='replace')
+			try:
+				pkgindex.readHeader(f)
+			finally:
+				f.close()
+		except EnvironmentError as e:
+			if e.errno != errno.ENOENT:
+				raise
+		local_timestamp = pkgindex.header.get("TIMESTAMP", None)
+		fetch.local_timestamp = local_timestamp
+		remote_timestamp = None
+		rmt_idx = self._new_pkgindex()
+		try:
+			# urlparse.urljoin() only works correctly with recognized
+			# protocols and requires the base url to have a trailing
+			# slash, so join manually...
+			url = base_url.rstrip("/") + "/Packages"
+			fetch.url = url
+			f = None
+
+			# Don't use urlopen for https, since it doesn't support
+			# certificate/hostname verification (bug #469888).
+			if parsed_url.scheme not in ('https',):
+				try:
+					f = _urlopen(url, if_modified_since=local_timestamp)
+					if hasattr(f, 'headers') and f.headers.get('timestamp', ''):
+						remote_timestamp = f.headers.get('timestamp')
+				except IOError as err:
+					if hasattr(err, 'code') and err.code == 304: # not modified (since local_timestamp)
+						raise UseCachedCopyOfRemoteIndex()
+
+					if parsed_url.scheme in ('ftp', 'http', 'https'):
+						# This protocol is supposedly supported by urlopen,
+						# so apparently there's a problem with the url
+						# or a bug in urlopen.
+						if self.settings.get("PORTAGE_DEBUG", "0") != "0":
+							traceback.print_exc()
+
+						raise
+
+			if f is None:
+
+				path = parsed_url.path.rstrip("/") + "/Packages"
+
+				if parsed_url.scheme == 'ssh':
+					# Use a pipe so that we can terminate the download
+					# early if we detect that the TIMESTAMP header
+					# matches that of the cached Packages file.
+					ssh_args = ['ssh']
+					if port is not None:
+						ssh_args.append("-p%s" % (port,))
+					# NOTE: shlex evaluates embedded quotes
+					ssh_args.extend(portage.util.shlex_split(
+						self.settings.get("PORTAGE_SSH_OPTS", "")))
+					ssh_args.append(user_passwd + host)
+					ssh_args.append('--')
+					ssh_args.append('cat')
+					ssh_args.append(path)
+
+					fetch.proc = subprocess.Popen(ssh_args,
+						stdout=subprocess.PIPE)
+					f = fetch.proc.stdout
+				else:
+					setting = 'FETCHCOMMAND_' + parsed_url.scheme.upper()
+					fcmd = self.settings.get(setting)
+					if not fcmd:
+						fcmd = self.settings.get('FETCHCOMMAND')
+						if not fcmd:
+							raise EnvironmentError("FETCHCOMMAND is unset")
+
+					fd, fetch.tmp_filename = tempfile.mkstemp()
+					tmp_dirname, tmp_basename = os.path.split(fetch.tmp_filename)
+					os.close(fd)
+
+					fcmd_vars = {
+						"DISTDIR": tmp_dirname,
+						"FILE": tmp_basename,
+						"URI": url
+					}
+
+					for k in ("PORTAGE_SSH_OPTS",):
+						try:
+							fcmd_vars[k] = self.settings[k]
+						except KeyError:
+							pass
+
+					success = portage.getbinpkg.file_get(
+						fcmd=fcmd, fcmd_vars=fcmd_vars)
+					if not success:
+						raise EnvironmentError("%s failed" % (setting,))
+					f = open(fetch.tmp_filename, 'rb')
+
+			# The connection is closed by _populate.
+			fetch.f = f
+			f_dec = codecs.iterdecode(f,
+				_encodings['repo.content'], errors='replace')
+			rmt_idx.readHeader(f_dec)
+			if not remote_timestamp: # in case it had not been read from HTTP header
+				remote_timestamp = rmt_idx.header.get("TIMESTAMP", None)
+			if not remote_timestamp:
+				# no timestamp in the header, something's wrong
+				fetch.messages.append(_("\n\n!!! Binhost package index " \
+				" has no TIMESTAMP field.\n"))
+			else:
+				if not self._pkgindex_version_supported(rmt_idx):
+					fetch.messages.append(_("\n\n!!! Binhost package index version" \
+					" is not supported: '%s'\n") % \
+					rmt_idx.header.get("VERSION"))
+				elif local_timestamp != remote_timestamp:
+					rmt_idx.readBody(f_dec)
+					fetch.pkgindex = rmt_idx
+				else:
+					fetch.use_cached = True
+		except UseCachedCopyOfRemoteIndex:
+			fetch.up_to_date = True
+			fetch.use_cached = True
+		except EnvironmentError as e:
+			fetch.messages.append(_("\n\n!!! Error fetching binhost package" \
+				" info from '%s'\n") % _hide_url_passwd(base_url))
+			fetch.messages.append("!!! %s\n\n" % str(e))
+
+	def _load_remote_pkgindex_cache(self, pkgindex_file, timestamp):
+		"""
+		Load the cached copy of a remote Packages index, preferably from
+		the pickled copy that is saved by _save_remote_pkgindex_cache,
+		which is valid if it has the same TIMESTAMP.
+		@rtype: PackageIndex
+		@return: the cached index, or None if it is unavailable.
+		"""
+		pickle_file = pkgindex_file + ".pickle"
+		pkgindex = self._new_pkgindex()
+		try:
+			f = open(_unicode_encode(pickle_file,
+				encoding=_encodings['fs'], errors='strict'), mode='rb')
+			try:
+				pkgindex.readPickle(f)
+			finally:
+				f.close()
+		except (SystemExit, KeyboardInterrupt):
+			raise
+		except Exception:
+			pkgindex = None
+		if pkgindex is not None and timestamp is not None and \
+			pkgindex.header.get("TIMESTAMP") == timestamp:
+			return pkgindex
+
+		pkgindex = self._new_pkgindex()
+		try:
+			f = io.open(_unicode_encode(pkgindex_file,
+				encoding=_encodings['fs'], errors='strict'),
+				mode='r', encoding=_encodings['repo.content'],
+				errors='replace')
+			try:
+				pkgindex.read(f)
+			finally:
+				f.close()
+		except EnvironmentError as e:
+			if e.errno != errno.ENOENT:
+				raise
+			return None
+		self._save_remote_pkgindex_cache(pkgindex_file, pkgindex)
+		return pkgindex
+
+	def _save_remote_pkgindex_cache(self, pkgindex_file, pkgindex):
+		try:
+			f = atomic_ofstream(pkgindex_file + ".pickle", mode="wb")
+			pkgindex.writePickle(f)
+			f.close()
+		except (IOError, OSError, PortageException):
+			# The current user doesn't have permission to cache the
+			# file, but that's alright.
+			pass
+
+	def inject(self, cpv, filename=None, compact=True):
 		"""Add a freshly built package to the database.  This updates
 		$PKGDIR/Packages with the new package metadata (including MD5).
 		@param cpv: The cpv of the new package to inject
@@ -1077,6 +1333,11 @@ class binarytree(object):
 		@param filename: File path of the package to inject, or None if it's
 			already in the location returned by getname()
 		@type filename: string
+		@param compact: If False, the new package metadata may be appended
+			to a journal instead, which the caller is responsible for
+			merging into $PKGDIR/Packages by calling _pkgindex_compact
+			(the Scheduler does this when it has finished).
+		@type compact: bool
 		@rtype: None
 		"""
 		mycat, mypkg = catsplit(cpv)
@@ -1128,10 +1389,6 @@ class binarytree(object):
 				self.getname(cpv).split(os.path.sep)[-2] == "All":
 				self._create_symlink(cpv)
 				created_symlink = True
-			pkgindex = self._load_pkgindex()
-
-			if not self._pkgindex_version_supported(pkgindex):
-				pkgindex = self._new_pkgindex()
 
 			# Discard remote metadata to ensure that _pkgindex_entry
 			# gets the local metadata. This also updates state for future
@@ -1152,6 +1409,20 @@ class binarytree(object):
 				del self._pkg_paths[cpv]
 				return
 
+			# Unless an entry needs to be removed for a package that was
+			# just overwritten by a symlink, append the entry to the
+			# journal, so that the time spent holding the lock does not
+			# depend on the size of the index.
+			if not compact and not created_symlink and \
+				not self._pkgindex_journal_full():
+				self._pkgindex_journal_append(d)
+				return
+
+			pkgindex = self._load_pkgindex()
+
+			if not self._pkgindex_version_supported(pkgindex):
+				pkgindex = self._new_pkgindex()
+
 			# If found, remove package(s) with duplicate path.
 			path = d.get("PATH", "")
 			for i in range(len(pkgindex.packages) - 1, -1, -1):
@@ -1178,6 +1449,7 @@ class binarytree(object):
 				unlockfile(pkgindex_lock)
 
 	def _pkgindex_write(self, pkgindex):
+		old_timestamp = pkgindex.header.get("TIMESTAMP")
 		contents = codecs.getwriter(_encodings['repo.content'])(io.BytesIO())
 		pkgindex.write(contents)
 		contents = contents.getvalue()
@@ -1200,24 +1472,174 @@ class binarytree(object):
 			# some seconds might have elapsed since TIMESTAMP
 			os.utime(fname, (atime, mtime))
 
-	def _pkgindex_entry(self, cpv):
+		# The journal has been merged by _load_pkgindex.
+		try:
+			os.unlink(self._pkgindex_journal_file)
+		except OSError as e:
+			if e.errno not in (errno.ENOENT, errno.ESTALE):
+				raise
+
+		# Entries are only added or removed along with files, which
+		# changes the mtimes of their directories, so the recorded
+		# mtimes remain valid for the new index, except for racy ones
+		# that _save_pkgindex_dir_mtimes discards.
+		timestamp, dir_mtimes = self._load_pkgindex_dir_mtimes()
+		if timestamp is not None:
+			if timestamp == old_timestamp:
+				self._save_pkgindex_dir_mtimes(
+					pkgindex.header["TIMESTAMP"], dir_mtimes)
+			else:
+				try:
+					os.unlink(self._pkgindex_dir_mtimes_file)
+				except OSError:
+					pass
+
+	def _load_pkgindex_dir_mtimes(self):
+		"""
+		@rtype: tuple
+		@return: the TIMESTAMP of the index and a dict of directory
+			mtimes, as saved by _save_pkgindex_dir_mtimes, or (None, {})
+			if they are unavailable.
+		"""
+		timestamp = None
+		dir_mtimes = {}
+		try:
+			f = io.open(_unicode_encode(self._pkgindex_dir_mtimes_file,
+				encoding=_encodings['fs'], errors='strict'),
+				mode='r', encoding=_encodings['repo.content'],
+				errors='replace')
+		except EnvironmentError:
+			return timestamp, dir_mtimes
+
+		with f:
+			for line in f:
+				line = line.rstrip("\n").split(": ", 1)
+				if len(line) != 2:
+					continue
+				k, v = line
+				if k == "TIMESTAMP":
+					timestamp = v
+					continue
+				try:
+					dir_mtimes[k] = float(v)
+				except ValueError:
+					return None, {}
+		return timestamp, dir_mtimes
+
+	def _save_pkgindex_dir_mtimes(self, timestamp, dir_mtimes):
+		# A directory that was modified within the last couple of
+		# seconds may be modified again without a change of its
+		# mtime, so such directories are scanned again next time.
+		now = time.time()
+		try:
+			f = atomic_ofstream(self._pkgindex_dir_mtimes_file)
+			f.write("TIMESTAMP: %s\n" % (timestamp,))
+			for mydir, mtime in sorted(dir_mtimes.items()):
+				if now - mtime < 2:
+					continue
+				f.write("%s: %r\n" % (mydir, mtime))
+			f.close()
+			self._file_permissions(self._pkgindex_dir_mtimes_file)
+		except (IOError, OSError, PortageException):
+			pass
+
+	def _pkgindex_journal_full(self):
+		"""
+		@rtype: bool
+		@return: True if the journal should be merged into the Packages
+			file, False otherwise.
+		"""
+		try:
+			index_size = os.stat(self._pkgindex_file).st_size
+		except OSError:
+			# Always create a Packages file for clients.
+			return True
+		try:
+			journal_size = os.stat(self._pkgindex_journal_file).st_size
+		except OSError:
+			journal_size = 0
+		return journal_size * self._pkgindex_journal_ratio >= index_size
+
+	def _pkgindex_journal_append(self, d):
+		contents = codecs.getwriter(_encodings['repo.content'])(io.BytesIO())
+		self._new_pkgindex().writeEntry(contents, d)
+		contents = contents.getvalue()
+		# Write the entry with a single call, so that concurrent readers
+		# never see a partial entry.
+		fd = os.open(_unicode_encode(self._pkgindex_journal_file,
+			encoding=_encodings['fs'], errors='strict'),
+			os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+		try:
+			os.write(fd, contents)
+		finally:
+			os.close(fd)
+		self._file_permissions(self._pkgindex_journal_file)
+
+	def _pkgindex_compact(self):
+		"""
+		Merge the journal into the Packages file, if there is a journal,
+		so that clients see packages that have been added by inject.
+		"""
+		if not os.path.exists(self._pkgindex_journal_file) or \
+			not os.access(self.pkgdir, os.W_OK):
+			return
+		pkgindex_lock = None
+		try:
+			pkgindex_lock = lockfile(self._pkgindex_file,
+				wantnewlockfile=1)
+			pkgindex = self._load_pkgindex()
+			if not self._pkgindex_version_supported(pkgindex):
+				# Entries will be regenerated by populate.
+				return
+			self._update_pkgindex_header(pkgindex.header)
+			self._pkgindex_write(pkgindex)
+		finally:
+			if pkgindex_lock:
+				unlockfile(pkgindex_lock)
+
+	def _read_pkgindex_entry(self, pkg_path):
+		"""
+		Reads the xpak data, checksums and stat of a package file, for
+		_pkgindex_entry. This does not modify any state, so that it can
+		be called from other threads.
+		@rtype: tuple
+		@return: (xpak data, checksums, stat result)
+		"""
+		metadata_bytes = portage.xpak.get_tbz2_data(pkg_path)
+		digests = perform_multiple_checksums(
+			pkg_path, hashes=self._pkgindex_hashes)
+		return metadata_bytes, digests, os.stat(pkg_path)
+
+	def _read_pkgindex_entries(self, cpvs):
+		"""
+		Generates the results of _read_pkgindex_entry for the given
+		packages, in order, reading the package files in parallel.
+		"""
+		return thread_imap(self._read_pkgindex_entry,
+			[self.getname(cpv) for cpv in cpvs], self._pkg_read_threads)
+
+	def _pkgindex_entry(self, cpv, pkg_data=None):
 		"""
 		Performs checksums and evaluates USE flag conditionals.
 		Raises InvalidDependString if necessary.
+		@param pkg_data: the result of _read_pkgindex_entry for this
+			package, if it has been read already
+		@type pkg_data: tuple
 		@rtype: dict
 		@return: a dict containing entry for the give cpv.
 		"""
 
-		pkg_path = self.getname(cpv)
+		if pkg_data is None:
+			pkg_data = self._read_pkgindex_entry(self.getname(cpv))
+		metadata_bytes, digests, st = pkg_data
 
 		d = dict(zip(self._pkgindex_aux_keys,
-			self.dbapi.aux_get(cpv, self._pkgindex_aux_keys)))
+			self.dbapi._xpak_aux_get(metadata_bytes,
+			self._pkgindex_aux_keys)))
 
-		d.update(perform_multiple_checksums(
-			pkg_path, hashes=self._pkgindex_hashes))
+		d.update(digests)
 
 		d["CPV"] = cpv
-		st = os.stat(pkg_path)
 		d["MTIME"] = str(st[stat.ST_MTIME])
 		d["SIZE"] = str(st.st_size)
 
@@ -1406,8 +1828,48 @@ class binarytree(object):
 				pkgindex.read(f)
 			finally:
 				f.close()
+
+		try:
+			f = io.open(_unicode_encode(self._pkgindex_journal_file,
+				encoding=_encodings['fs'], errors='strict'),
+				mode='r', encoding=_encodings['repo.content'],
+				errors='replace')
+		except EnvironmentError:
+			pass
+		else:
+			journal = self._new_pkgindex()
+			try:
+				journal.readBody(f)
+			finally:
+				f.close()
+			if journal.packages:
+				self._pkgindex_apply_journal(pkgindex, journal.packages)
 		return pkgindex
 
+	@staticmethod
+	def _pkgindex_apply_journal(pkgindex, entries):
+		"""
+		Apply journal entries in the same way as inject, where an entry
+		replaces any entry with the same PATH, or with the same CPV
+		and the default path.
+		"""
+		def entry_key(d):
+			path = d.get("PATH", "")
+			if path:
+				return ("PATH", path)
+			return ("CPV", d["CPV"])
+
+		journal = {}
+		for d in entries:
+			journal[entry_key(d)] = d
+		packages = [d for d in pkgindex.packages
+			if entry_key(d) not in journal]
+		# Keep the order in which the entries were appended.
+		for d in entries:
+			if journal.get(entry_key(d)) is d:
+				packages.append(d)
+		pkgindex.packages[:] = packages
+
 	def _get_digests(self, pkg):
 
 		try:
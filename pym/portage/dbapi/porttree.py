@@ -12,7 +12,7 @@ portage.proxy.lazyimport.lazyimport(globals(),
 	'portage.checksum',
 	'portage.data:portage_gid,secpass',
 	'portage.dbapi.dep_expand:dep_expand',
-	'portage.dep:Atom,dep_getkey,match_from_list,use_reduce,_match_slot',
+	'portage.dep:Atom,dep_getkey,use_reduce,_match_slot',
 	'portage.package.ebuild.doebuild:doebuild',
 	'portage.util:ensure_dirs,shlex_split,writemsg,writemsg_level',
 	'portage.util.listdir:listdir',
@@ -100,6 +100,37 @@ class _dummy_list(list):
 		except ValueError:
 			pass
 
+class _eclass_validation_cache(object):
+	"""
+	Wraps an eclass_cache instance, and memoizes the results of
+	validate_and_rewrite_cache() for each distinct set of eclasses,
+	since many cache entries inherit the same eclasses.
+	"""
+
+	__slots__ = ('_eclass_db', '_results')
+
+	def __init__(self, eclass_db):
+		self._eclass_db = eclass_db
+		self._results = {}
+
+	def validate_and_rewrite_cache(self, ec_dict, chf_type, stores_paths):
+		if not isinstance(ec_dict, dict):
+			return None
+		try:
+			key = (chf_type, stores_paths, frozenset(ec_dict.items()))
+			result = self._results[key]
+		except TypeError:
+			return self._eclass_db.validate_and_rewrite_cache(
+				ec_dict, chf_type, stores_paths)
+		except KeyError:
+			result = self._eclass_db.validate_and_rewrite_cache(
+				ec_dict, chf_type, stores_paths)
+			self._results[key] = result
+		if result:
+			# The caller may store the result in a cache entry.
+			result = result.copy()
+		return result
+
 class portdbapi(dbapi):
 	"""this tree will scan a portage directory located at root (passed to init)"""
 	portdbapi_instances = _dummy_list()
@@ -418,18 +449,11 @@ class portdbapi(dbapi):
 				# a traceback for debugging purposes.
 				traceback.print_exc()
 
-	def _pull_valid_cache(self, cpv, ebuild_path, repo_path):
-		try:
-			ebuild_hash = eclass_cache.hashed_path(ebuild_path)
-			# snag mtime since we use it later, and to trigger stat failure
-			# if it doesn't exist
-			ebuild_hash.mtime
-		except FileNotFound:
-			writemsg(_("!!! aux_get(): ebuild for " \
-				"'%s' does not exist at:\n") % (cpv,), noiselevel=-1)
-			writemsg("!!!            %s\n" % ebuild_path, noiselevel=-1)
-			raise KeyError(cpv)
-
+	def _repo_auxdbs(self, repo_path):
+		"""
+		Return the cache instances for the given repository, in the order
+		that they should be queried, together with its eclass_cache.
+		"""
 		# Pull pre-generated metadata from the metadata/cache/
 		# directory if it exists and is valid, otherwise fall
 		# back to the normal writable cache.
@@ -442,6 +466,31 @@ class portdbapi(dbapi):
 			auxdbs.append(ro_auxdb)
 		auxdbs.append(self.auxdb[repo_path])
 		eclass_db = self.repositories.get_repo_for_location(repo_path).eclass_db
+		return auxdbs, eclass_db
+
+	def _pull_valid_cache(self, cpv, ebuild_path, repo_path, repo_state=None):
+		try:
+			ebuild_hash = eclass_cache.hashed_path(ebuild_path)
+			# snag mtime since we use it later, and to trigger stat failure
+			# if it doesn't exist
+			ebuild_hash.mtime
+		except FileNotFound:
+			writemsg(_("!!! aux_get(): ebuild for " \
+				"'%s' does not exist at:\n") % (cpv,), noiselevel=-1)
+			writemsg("!!!            %s\n" % ebuild_path, noiselevel=-1)
+			raise KeyError(cpv)
+
+		if repo_state is None:
+			auxdbs, eclass_db = self._repo_auxdbs(repo_path)
+		else:
+			# Share the cache instances and eclass validation
+			# results between lookups (see aux_get_many).
+			try:
+				auxdbs, eclass_db = repo_state[repo_path]
+			except KeyError:
+				auxdbs, eclass_db = self._repo_auxdbs(repo_path)
+				eclass_db = _eclass_validation_cache(eclass_db)
+				repo_state[repo_path] = (auxdbs, eclass_db)
 
 		for auxdb in auxdbs:
 			try:
@@ -475,6 +524,25 @@ class portdbapi(dbapi):
 		"stub code for returning auxilliary db information, such as SLOT, DEPEND, etc."
 		'input: "sys-apps/foo-1.0",["SLOT","DEPEND","HOMEPAGE"]'
 		'return: ["0",">=sys-libs/bar-1.0","http://www.foo.com"] or raise KeyError if error'
+		return self._aux_get(mycpv, mylist, mytree, myrepo, None)
+
+	def aux_get_many(self, cpvs, mylist, mytree=None, myrepo=None):
+		"""
+		Iterate over (cpv, values) tuples, where values is the list that
+		aux_get would return for cpv. Any cpv for which aux_get would
+		raise KeyError is skipped. The cache instances of each repository
+		are looked up only once, and eclass validation is performed only
+		once for each distinct set of inherited eclasses.
+		"""
+		repo_state = {}
+		for cpv in cpvs:
+			try:
+				values = self._aux_get(cpv, mylist, mytree, myrepo, repo_state)
+			except KeyError:
+				continue
+			yield (cpv, values)
+
+	def _aux_get(self, mycpv, mylist, mytree, myrepo, repo_state):
 		cache_me = False
 		if myrepo is not None:
 			mytree = self.treemap.get(myrepo)
@@ -510,7 +578,8 @@ class portdbapi(dbapi):
 				_("ebuild not found for '%s'") % mycpv, noiselevel=1)
 			raise KeyError(mycpv)
 
-		mydata, ebuild_hash = self._pull_valid_cache(mycpv, myebuild, mylocation)
+		mydata, ebuild_hash = self._pull_valid_cache(mycpv, myebuild,
+			mylocation, repo_state=repo_state)
 		doregen = mydata is None
 
 		if doregen:
@@ -858,7 +927,7 @@ class portdbapi(dbapi):
 				level = "match-all"
 				myval = self.cp_list(mykey, mytree=mytree)
 			else:
-				myval = match_from_list(mydep,
+				myval = self._match_from_list(mydep,
 					self.cp_list(mykey, mytree=mytree))
 
 		elif level in ("bestmatch-visible", "match-all", "match-visible",
@@ -869,7 +938,7 @@ class portdbapi(dbapi):
 			if mydep == mykey:
 				mylist = self.cp_list(mykey, mytree=mytree)
 			else:
-				mylist = match_from_list(mydep,
+				mylist = self._match_from_list(mydep,
 					self.cp_list(mykey, mytree=mytree))
 
 			visibility_filter = level not in ("match-all", "minimum-all")
@@ -13,6 +13,8 @@ portage.proxy.lazyimport.lazyimport(globals(),
 	'portage.data:portage_gid,portage_uid,secpass',
 	'portage.dbapi.dep_expand:dep_expand',
 	'portage.dbapi._MergeProcess:MergeProcess',
+	'portage.dbapi._VdbAuxCache:VdbAuxCache',
+	'portage.dbapi._VdbContentsIndex:VdbContentsIndex',
 	'portage.dbapi._SyncfsProcess:SyncfsProcess',
 	'portage.dep:dep_getkey,isjustname,isvalidatom,match_from_list,' + \
 	 	'use_reduce,_slot_separator,_repo_separator',
@@ -46,9 +48,10 @@ portage.proxy.lazyimport.lazyimport(globals(),
 from portage.const import CACHE_PATH, CONFIG_MEMORY_FILE, \
 	PORTAGE_PACKAGE_ATOM, PRIVATE_PATH, VDB_PATH
 from portage.dbapi import dbapi
-from portage.exception import CommandNotFound, \
-	InvalidData, InvalidLocation, InvalidPackageName, \
-	FileNotFound, PermissionDenied, UnsupportedAPIException
+from portage.dbapi._ContentsDict import ContentsDict
+from portage.exception import InvalidData, InvalidLocation, \
+	InvalidPackageName, FileNotFound, PermissionDenied, \
+	UnsupportedAPIException
 from portage.localization import _
 
 from portage import abssymlink, _movefile, bsd_chflags
@@ -86,11 +89,6 @@ import textwrap
 import time
 import warnings
 
-try:
-	import cPickle as pickle
-except ImportError:
-	import pickle
-
 if sys.hexversion >= 0x3000000:
 	basestring = str
 	long = int
@@ -105,13 +103,6 @@ class vardbapi(dbapi):
 	_excluded_dirs = re.compile(r'^(\..*|-MERGING-.*|' + \
 		"|".join(_excluded_dirs) + r')$')
 
-	_aux_cache_version        = "1"
-	_owners_cache_version     = "1"
-
-	# Number of uncached packages to trigger cache update, since
-	# it's wasteful to update it for every vdb change.
-	_aux_cache_threshold = 5
-
 	_aux_cache_keys_re = re.compile(r'^NEEDED\..*$')
 	_aux_multi_line_re = re.compile(r'^(CONTENTS|NEEDED\..*)$')
 
@@ -127,9 +118,9 @@ class vardbapi(dbapi):
 		# have been added or removed.
 		self._pkgs_changed = False
 
-		# The _aux_cache_threshold doesn't work as designed
-		# if the cache is flushed from a subprocess, so we
-		# use this to avoid waste vdb cache updates.
+		# The cache is flushed by the main process, so we
+		# use this to avoid wasteful vdb cache updates from
+		# subprocesses.
 		self._flush_cache_enabled = True
 
 		#cache for category directory mtimes
@@ -173,7 +164,14 @@ class vardbapi(dbapi):
 			])
 		self._aux_cache_obj = None
 		self._aux_cache_filename = os.path.join(self._eroot,
-			CACHE_PATH, "vdb_metadata.pickle")
+			CACHE_PATH, "vdb_metadata.sqlite")
+		# Basename hash table for owner lookups, which is only
+		# used when the persistent contents index is unavailable.
+		self._owners_base_names = {}
+		self._contents_index_filename = os.path.join(self._eroot,
+			CACHE_PATH, "vdb_contents.sqlite")
+		self._linkmap_index_filename = os.path.join(self._eroot,
+			CACHE_PATH, "vdb_needed.sqlite")
 		self._counter_path = os.path.join(self._eroot,
 			CACHE_PATH, "counter")
 
@@ -481,14 +479,33 @@ class vardbapi(dbapi):
 		self.matchcache.clear()
 		self.cpcache.clear()
 		self._aux_cache_obj = None
+		self._owners_base_names.clear()
 
 	def _add(self, pkg_dblink):
 		self._pkgs_changed = True
 		self._clear_pkg_cache(pkg_dblink)
+		self._owners._index_add(pkg_dblink)
+		if self._linkmap_index_used(pkg_dblink):
+			self._linkmap._index_add(pkg_dblink)
 
 	def _remove(self, pkg_dblink):
 		self._pkgs_changed = True
 		self._clear_pkg_cache(pkg_dblink)
+		self._owners._index_remove(pkg_dblink)
+		if self._linkmap_index_used(pkg_dblink):
+			self._linkmap._index_remove(pkg_dblink)
+
+	def _linkmap_index_used(self, pkg_dblink):
+		"""
+		Return True if the linkmap is rebuilt during merges, under the
+		same conditions as dblink._linkmap_rebuild(). Otherwise, its
+		index is not updated for each merge and unmerge, since it
+		catches up with the vdb when it is next used.
+		"""
+		return self._linkmap is not None and \
+			self._plib_registry is not None and \
+			("preserve-libs" in pkg_dblink.settings.features or \
+			self._plib_registry.hasEntries())
 
 	def _clear_pkg_cache(self, pkg_dblink):
 		# Due to 1 second mtime granularity in <python-2.5, mtime checks
@@ -525,7 +542,7 @@ class vardbapi(dbapi):
 			# clear cache entry
 			self.mtdircache[mycat] = curmtime
 			self.matchcache[mycat] = {}
-		if mydep not in self.matchcache[mycat]:
+		if cache_key not in self.matchcache[mycat]:
 			mymatch = list(self._iter_match(mydep,
 				self.cp_list(mydep.cp, use_cache=use_cache)))
 			self.matchcache[mycat][cache_key] = mymatch
@@ -536,110 +553,34 @@ class vardbapi(dbapi):
 
 	def flush_cache(self):
 		"""If the current user has permission and the internal aux_get cache has
-		been updated, save it to disk and mark it unmodified.  This is called
-		by emerge after it has loaded the full vdb for use in dependency
-		calculations.  Currently, the cache is only written if the user has
-		superuser privileges (since that's required to obtain a lock), but all
-		users have read access and benefit from faster metadata lookups (as
-		long as at least part of the cache is still valid)."""
+		been updated, save the modified entries to disk and mark them
+		unmodified.  This is called by emerge after it has loaded the full vdb
+		for use in dependency calculations.  Currently, the cache is only
+		written if the user has superuser privileges (since that's required to
+		obtain a lock), but all users have read access and benefit from faster
+		metadata lookups (as long as at least part of the cache is still
+		valid)."""
 		if self._flush_cache_enabled and \
-			self._aux_cache is not None and \
-			len(self._aux_cache["modified"]) >= self._aux_cache_threshold and \
+			self._aux_cache.modified and \
 			secpass >= 2:
-			self._owners.populate() # index any unindexed contents
-			valid_nodes = set(self.cpv_all())
-			for cpv in list(self._aux_cache["packages"]):
-				if cpv not in valid_nodes:
-					del self._aux_cache["packages"][cpv]
-			del self._aux_cache["modified"]
-			try:
-				f = atomic_ofstream(self._aux_cache_filename, 'wb')
-				pickle.dump(self._aux_cache, f, protocol=2)
-				f.close()
-				apply_secpass_permissions(
-					self._aux_cache_filename, gid=portage_gid, mode=0o644)
-			except (IOError, OSError) as e:
-				pass
-			self._aux_cache["modified"] = set()
+			self._aux_cache.flush(set(self.cpv_all()))
 
 	@property
 	def _aux_cache(self):
 		if self._aux_cache_obj is None:
-			self._aux_cache_init()
+			self._aux_cache_obj = VdbAuxCache(self._aux_cache_filename)
 		return self._aux_cache_obj
 
-	def _aux_cache_init(self):
-		aux_cache = None
-		open_kwargs = {}
-		if sys.hexversion >= 0x3000000 and sys.hexversion < 0x3020000:
-			# Buffered io triggers extreme performance issues in
-			# Unpickler.load() (problem observed with python-3.0.1).
-			# Unfortunately, performance is still poor relative to
-			# python-2.x, but buffering makes it much worse (problem
-			# appears to be solved in Python >=3.2 at least).
-			open_kwargs["buffering"] = 0
-		try:
-			with open(_unicode_encode(self._aux_cache_filename,
-				encoding=_encodings['fs'], errors='strict'),
-				mode='rb', **open_kwargs) as f:
-				mypickle = pickle.Unpickler(f)
-				try:
-					mypickle.find_global = None
-				except AttributeError:
-					# TODO: If py3k, override Unpickler.find_class().
-					pass
-				aux_cache = mypickle.load()
-		except (SystemExit, KeyboardInterrupt):
-			raise
-		except Exception as e:
-			if isinstance(e, EnvironmentError) and \
-				getattr(e, 'errno', None) in (errno.ENOENT, errno.EACCES):
-				pass
-			else:
-				writemsg(_("!!! Error loading '%s': %s\n") % \
-					(self._aux_cache_filename, e), noiselevel=-1)
-			del e
-
-		if not aux_cache or \
-			not isinstance(aux_cache, dict) or \
-			aux_cache.get("version") != self._aux_cache_version or \
-			not aux_cache.get("packages"):
-			aux_cache = {"version": self._aux_cache_version}
-			aux_cache["packages"] = {}
-
-		owners = aux_cache.get("owners")
-		if owners is not None:
-			if not isinstance(owners, dict):
-				owners = None
-			elif "version" not in owners:
-				owners = None
-			elif owners["version"] != self._owners_cache_version:
-				owners = None
-			elif "base_names" not in owners:
-				owners = None
-			elif not isinstance(owners["base_names"], dict):
-				owners = None
-
-		if owners is None:
-			owners = {
-				"base_names" : {},
-				"version"    : self._owners_cache_version
-			}
-			aux_cache["owners"] = owners
-
-		aux_cache["modified"] = set()
-		self._aux_cache_obj = aux_cache
-
 	def aux_get(self, mycpv, wants, myrepo = None):
 		"""This automatically caches selected keys that are frequently needed
 		by emerge for dependency calculations.  The cached metadata is
 		considered valid if the mtime of the package directory has not changed
-		since the data was cached.  The cache is stored in a pickled dict
-		object with the following format:
-
-		{version:"1", "packages":{cpv1:(mtime,{k1,v1, k2,v2, ...}), cpv2...}}
+		since the data was cached.  The cache is stored in an sqlite database
+		that maps each cpv to a (mtime, {k1:v1, k2:v2, ...}) tuple, and
+		entries are loaded individually as they are requested (see
+		VdbAuxCache).
 
-		If an error occurs while loading the cache pickle or the version is
+		If an error occurs while loading the cache or the version is
 		unrecognized, the cache will simple be recreated from scratch (it is
 		completely disposable).
 		"""
@@ -665,7 +606,7 @@ class vardbapi(dbapi):
 			raise KeyError(mycpv)
 		# Use float mtime when available.
 		mydir_mtime = mydir_stat.st_mtime
-		pkg_data = self._aux_cache["packages"].get(mycpv)
+		pkg_data = self._aux_cache.get(mycpv)
 		pull_me = cache_these.union(wants)
 		mydata = {"_mtime_" : mydir_mtime}
 		cache_valid = False
@@ -690,11 +631,6 @@ class vardbapi(dbapi):
 				cache_valid = cache_mtime == mydir_stat[stat.ST_MTIME]
 
 		if cache_valid:
-			# Migrate old metadata to unicode.
-			for k, v in metadata.items():
-				metadata[k] = _unicode_decode(v,
-					encoding=_encodings['repo.content'], errors='replace')
-
 			mydata.update(metadata)
 			pull_me.difference_update(mydata)
 
@@ -708,9 +644,7 @@ class vardbapi(dbapi):
 					cache_data.update(metadata)
 				for aux_key in cache_these:
 					cache_data[aux_key] = mydata[aux_key]
-				self._aux_cache["packages"][_unicode(mycpv)] = \
-					(mydir_mtime, cache_data)
-				self._aux_cache["modified"].add(mycpv)
+				self._aux_cache[mycpv] = (mydir_mtime, cache_data)
 
 		eapi_attrs = _get_eapi_attrs(mydata['EAPI'])
 		if _get_slot_re(eapi_attrs).match(mydata['SLOT']) is None:
@@ -720,6 +654,17 @@ class vardbapi(dbapi):
 
 		return [mydata[x] for x in wants]
 
+	def aux_get_many(self, cpvs, wants, myrepo=None):
+		"""
+		Iterate over (cpv, values) tuples, where values is the list that
+		aux_get would return for cpv. Any cpv for which aux_get would
+		raise KeyError is skipped. The aux cache entries of all cpvs are
+		loaded together, instead of one query per cpv.
+		"""
+		cpvs = list(cpvs)
+		self._aux_cache.prefetch(cpvs)
+		return dbapi.aux_get_many(self, cpvs, wants, myrepo=myrepo)
+
 	def _aux_get(self, mycpv, wants, st=None):
 		mydir = self.getpath(mycpv)
 		if st is None:
@@ -965,8 +910,8 @@ class vardbapi(dbapi):
 
 			# Since we hold a lock, this is a good opportunity
 			# to flush the cache. Note that this will only
-			# flush the cache periodically in the main process
-			# when _aux_cache_threshold is exceeded.
+			# flush the cache in the main process, since it is
+			# disabled in MergeProcess.
 			self.flush_cache()
 		finally:
 			self.unlock()
@@ -1057,8 +1002,6 @@ class vardbapi(dbapi):
 			for x in contents:
 				self._add_path(x[eroot_len:], pkg_hash)
 
-			self._vardb._aux_cache["modified"].add(cpv)
-
 		def _add_path(self, path, pkg_hash):
 			"""
 			Empty path is a code that represents empty contents.
@@ -1070,7 +1013,7 @@ class vardbapi(dbapi):
 			else:
 				name = path
 			name_hash = self._hash_str(name)
-			base_names = self._vardb._aux_cache["owners"]["base_names"]
+			base_names = self._vardb._owners_base_names
 			pkgs = base_names.get(name_hash)
 			if pkgs is None:
 				pkgs = {}
@@ -1102,14 +1045,46 @@ class vardbapi(dbapi):
 
 		def __init__(self, vardb):
 			self._vardb = vardb
+			self._contents_index_obj = None
+
+		@property
+		def _contents_index(self):
+			if self._contents_index_obj is None:
+				self._contents_index_obj = VdbContentsIndex(self._vardb,
+					self._vardb._contents_index_filename)
+			return self._contents_index_obj
+
+		def _sync_contents_index(self):
+			"""
+			Bring the persistent contents index up to date. When this
+			fails, callers fall back to the basename hash table that is
+			kept in memory.
+
+			@rtype: bool
+			@return: True if the contents index can be used for queries
+			"""
+			owners_cache = vardbapi._owners_cache(self._vardb)
+			return self._contents_index.sync(owners_cache._hash_pkg)
+
+		def _index_add(self, pkg_dblink):
+			try:
+				pkg_hash = vardbapi._owners_cache(
+					self._vardb)._hash_pkg(pkg_dblink.mycpv)
+			except KeyError:
+				return
+			self._contents_index.add(pkg_hash, pkg_dblink.getcontents())
+
+		def _index_remove(self, pkg_dblink):
+			self._contents_index.remove(pkg_dblink.mycpv)
 
 		def populate(self):
-			self._populate()
+			if not self._sync_contents_index():
+				self._populate()
 
 		def _populate(self):
 			owners_cache = vardbapi._owners_cache(self._vardb)
 			cached_hashes = set()
-			base_names = self._vardb._aux_cache["owners"]["base_names"]
+			base_names = self._vardb._owners_base_names
 
 			# Take inventory of all cached package hashes.
 			for name, hash_values in list(base_names.items()):
@@ -1180,12 +1155,23 @@ class vardbapi(dbapi):
 
 			if not isinstance(path_iter, list):
 				path_iter = list(path_iter)
+
+			if self._sync_contents_index():
+				dblink_cache = {}
+				for cpv, path in self._contents_index.iter_owners(path_iter):
+					pkg_dblink = dblink_cache.get(cpv)
+					if pkg_dblink is None:
+						pkg_dblink = self._vardb._dblink(cpv)
+						dblink_cache[cpv] = pkg_dblink
+					yield (pkg_dblink, path)
+				return
+
 			owners_cache = self._populate()
 			vardb = self._vardb
 			root = vardb._eroot
 			hash_pkg = owners_cache._hash_pkg
 			hash_str = owners_cache._hash_str
-			base_names = self._vardb._aux_cache["owners"]["base_names"]
+			base_names = self._vardb._owners_base_names
 
 			dblink_cache = {}
 
@@ -1512,7 +1498,6 @@ class dblink(object):
 		self.contentscache = None
 		self._contents_inodes = None
 		self._contents_basenames = None
-		self._linkmap_broken = False
 		self._device_path_map = {}
 		self._hardlink_merge_map = {}
 		self._hash_key = (self._eroot, self.mycpv)
@@ -1613,11 +1598,16 @@ class dblink(object):
 	def getcontents(self):
 		"""
 		Get the installed files of a given package (aka what that package installed)
+
+		@rtype: ContentsDict
+		@return: a read-only mapping that is shared by all callers, so
+			use its copy() method in order to obtain a modifiable dict
 		"""
 		contents_file = os.path.join(self.dbdir, "CONTENTS")
 		if self.contentscache is not None:
 			return self.contentscache
-		pkgfiles = {}
+		# used to generate parent dir entries
+		eroot_split_len = len(self.settings["EROOT"].split(os.sep)) - 1
 		try:
 			with io.open(_unicode_encode(contents_file,
 				encoding=_encodings['fs'], errors='strict'),
@@ -1628,10 +1618,12 @@ class dblink(object):
 			if e.errno != errno.ENOENT:
 				raise
 			del e
-			self.contentscache = pkgfiles
-			return pkgfiles
+			self.contentscache = ContentsDict(
+				eroot_split_len=eroot_split_len)
+			return self.contentscache
 
 		null_byte = "\0"
+		sep = os.sep
 		normalize_needed = self._normalize_needed
 		contents_re = self._contents_re
 		obj_index = contents_re.groupindex['obj']
@@ -1644,9 +1636,7 @@ class dblink(object):
 		myroot = self.settings['ROOT']
 		if myroot == os.path.sep:
 			myroot = None
-		# used to generate parent dir entries
-		dir_entry = ("dir",)
-		eroot_split_len = len(self.settings["EROOT"].split(os.sep)) - 1
+		entries = []
 		pos = 0
 		errors = []
 		for pos, line in enumerate(mylines):
@@ -1660,14 +1650,17 @@ class dblink(object):
 				errors.append((pos + 1, _("Unrecognized CONTENTS entry")))
 				continue
 
+			# Entries are packed into strings that ContentsDict splits
+			# into tuples on access.
 			if m.group(obj_index) is not None:
 				base = obj_index
 				#format: type, mtime, md5sum
-				data = (m.group(base+1), m.group(base+4), m.group(base+3))
+				data = "%s %s %s" % (m.group(base+1), m.group(base+4),
+					m.group(base+3))
 			elif m.group(dir_index) is not None:
 				base = dir_index
 				#format: type
-				data = (m.group(base+1),)
+				data = m.group(base+1)
 			elif m.group(sym_index) is not None:
 				base = sym_index
 				if m.group(oldsym_index) is None:
@@ -1675,7 +1668,8 @@ class dblink(object):
 				else:
 					mtime = m.group(base+8)
 				#format: type, mtime, dest
-				data = (m.group(base+1), mtime, m.group(base+3))
+				data = "%s %s %s" % (m.group(base+1), mtime,
+					m.group(base+3))
 			else:
 				# This won't happen as long the regular expression
 				# is written to only match valid entries.
@@ -1683,41 +1677,36 @@ class dblink(object):
 					"in CONTENTS entry: '%s'") % line)
 
 			path = m.group(base+2)
-			if normalize_needed.search(path) is not None:
+			# Avoid the relatively expensive normalize_needed search
+			# for the common case of paths that are already normalized.
+			if (path[:1] != sep or path[-1:] == sep or
+				"//" in path or "/." in path) and \
+				normalize_needed.search(path) is not None:
 				path = normalize_path(path)
-				if not path.startswith(os.path.sep):
-					path = os.path.sep + path
+				if not path.startswith(sep):
+					path = sep + path
 
 			if myroot is not None:
-				path = os.path.join(myroot, path.lstrip(os.path.sep))
-
-			# Implicitly add parent directories, since we can't necessarily
-			# assume that they are explicitly listed in CONTENTS, and it's
-			# useful for callers if they can rely on parent directory entries
-			# being generated here (crucial for things like dblink.isowner()).
-			path_split = path.split(os.sep)
-			path_split.pop()
-			while len(path_split) > eroot_split_len:
-				parent = os.sep.join(path_split)
-				if parent in pkgfiles:
-					break
-				pkgfiles[parent] = dir_entry
-				path_split.pop()
+				path = os.path.join(myroot, path.lstrip(sep))
 
-			pkgfiles[path] = data
+			entries.append((path, data))
 
 		if errors:
 			writemsg(_("!!! Parse error in '%s'\n") % contents_file, noiselevel=-1)
 			for pos, e in errors:
 				writemsg(_("!!!   line %d: %s\n") % (pos, e), noiselevel=-1)
-		self.contentscache = pkgfiles
-		return pkgfiles
+		# Parent directories are implicitly included, since we can't
+		# necessarily assume that they are explicitly listed in CONTENTS,
+		# and it's useful for callers if they can rely on parent directory
+		# entries being generated (crucial for things like dblink.isowner()).
+		self.contentscache = ContentsDict(entries,
+			eroot_split_len=eroot_split_len)
+		return self.contentscache
 
 	def _prune_plib_registry(self, unmerge=False,
 		needed=None, preserve_paths=None):
 		# remove preserved libraries that don't have any consumers left
-		if not (self._linkmap_broken or
-			self.vartree.dbapi._linkmap is None or
+		if not (self.vartree.dbapi._linkmap is None or
 			self.vartree.dbapi._plib_registry is None):
 			self.vartree.dbapi._fs_lock()
 			plib_registry = self.vartree.dbapi._plib_registry
@@ -2146,6 +2135,10 @@ class dblink(object):
 
 		if pkgfiles:
 			self.updateprotect()
+			if isinstance(pkgfiles, ContentsDict):
+				# Each entry is looked up several times below, which is
+				# faster with a plain dict of unpacked entries.
+				pkgfiles = pkgfiles.copy()
 			mykeys = list(pkgfiles)
 			mykeys.sort()
 			mykeys.reverse()
@@ -2859,23 +2852,15 @@ class dblink(object):
 
 	def _linkmap_rebuild(self, **kwargs):
 		"""
-		Rebuild the self._linkmap if it's not broken due to missing
-		scanelf binary. Also, return early if preserve-libs is disabled
+		Rebuild the self._linkmap, unless preserve-libs is disabled
 		and the preserve-libs registry is empty.
 		"""
-		if self._linkmap_broken or \
-			self.vartree.dbapi._linkmap is None or \
+		if self.vartree.dbapi._linkmap is None or \
 			self.vartree.dbapi._plib_registry is None or \
 			("preserve-libs" not in self.settings.features and \
 			not self.vartree.dbapi._plib_registry.hasEntries()):
 			return
-		try:
-			self.vartree.dbapi._linkmap.rebuild(**kwargs)
-		except CommandNotFound as e:
-			self._linkmap_broken = True
-			self._display_merge(_("!!! Disabling preserve-libs " \
-				"due to error: Command Not Found: %s\n") % (e,),
-				level=logging.ERROR, noiselevel=-1)
+		self.vartree.dbapi._linkmap.rebuild(**kwargs)
 
 	def _find_libs_to_preserve(self, unmerge=False):
 		"""
@@ -2884,8 +2869,7 @@ class dblink(object):
 		self._installed_instance. Otherwise, paths are selected from
 		self.
 		"""
-		if self._linkmap_broken or \
-			self.vartree.dbapi._linkmap is None or \
+		if self.vartree.dbapi._linkmap is None or \
 			self.vartree.dbapi._plib_registry is None or \
 			(not unmerge and self._installed_instance is None) or \
 			not self._preserve_libs:
@@ -2914,9 +2898,7 @@ class dblink(object):
 				path_node_map[path] = node
 			return node
 
-		consumer_map = {}
-		provider_nodes = set()
-		# Create provider nodes and add them to the graph.
+		candidates = []
 		for f_abs in old_contents:
 
 			if os is _os_merge:
@@ -2940,13 +2922,15 @@ class dblink(object):
 				# We have an indentically named replacement file,
 				# so we don't try to preserve the old copy.
 				continue
-			try:
-				consumers = linkmap.findConsumers(f,
-					exclude_providers=(installed_instance.isowner,))
-			except KeyError:
-				continue
-			if not consumers:
-				continue
+			candidates.append(f)
+
+		consumer_map = {}
+		provider_nodes = set()
+		# Create provider nodes and add them to the graph. The consumers
+		# of all candidates are found at once, so that ownership of each
+		# alternative provider is only checked once.
+		for f, consumers in linkmap.mapConsumers(candidates,
+			exclude_providers=(installed_instance.isowner,)).items():
 			provider_node = path_to_node(f)
 			lib_graph.add(provider_node, None)
 			provider_nodes.add(provider_node)
@@ -3056,8 +3040,7 @@ class dblink(object):
 		Find preserved libraries that don't have any consumers left.
 		"""
 
-		if self._linkmap_broken or \
-			self.vartree.dbapi._linkmap is None or \
+		if self.vartree.dbapi._linkmap is None or \
 			self.vartree.dbapi._plib_registry is None or \
 			not self.vartree.dbapi._plib_registry.hasEntries():
 			return {}
@@ -3093,12 +3076,15 @@ class dblink(object):
 				lib_graph.add(preserved_node, None)
 				preserved_paths.add(f)
 				preserved_nodes.add(preserved_node)
-				for c in self.vartree.dbapi._linkmap.findConsumers(f):
-					consumer_node = path_to_node(c)
-					if not consumer_node.file_exists():
-						continue
-					# Note that consumers may also be providers.
-					lib_graph.add(preserved_node, consumer_node)
+
+		for f, consumers in linkmap.mapConsumers(preserved_paths).items():
+			preserved_node = path_to_node(f)
+			for c in consumers:
+				consumer_node = path_to_node(c)
+				if not consumer_node.file_exists():
+					continue
+				# Note that consumers may also be providers.
+				lib_graph.add(preserved_node, consumer_node)
 
 		# Eliminate consumers having providers with the same soname as an
 		# installed library that is not preserved. This eliminates
@@ -4063,8 +4049,7 @@ class dblink(object):
 
 		preserve_paths = set()
 		needed = None
-		if not (self._linkmap_broken or linkmap is None or
-			plib_registry is None):
+		if not (linkmap is None or plib_registry is None):
 			self.vartree.dbapi._fs_lock()
 			plib_registry.lock()
 			try:
@@ -4114,7 +4099,6 @@ class dblink(object):
 			showMessage(_(">>> Safely unmerging already-installed instance...\n"))
 			emerge_log(_(" === Unmerging... (%s)") % (dblnk.mycpv,))
 			others_in_slot.remove(dblnk) # dblnk will unmerge itself now
-			dblnk._linkmap_broken = self._linkmap_broken
 			dblnk.settings["REPLACED_BY_VERSION"] = portage.versions.cpv_getversion(self.mycpv)
 			dblnk.settings.backup_changes("REPLACED_BY_VERSION")
 			unmerge_rval = dblnk.unmerge(ldpath_mtimes=prev_mtimes,
@@ -223,7 +223,12 @@ def cpvequal(cpv1, cpv2):
 		split1[1] != split2[1]:
 		return False
 
-	return vercmp(cpv1.version, cpv2.version) == 0
+	try:
+		return cpv1.version_key == cpv2.version_key
+	except AttributeError:
+		# Objects such as Package instances have a cpv_split attribute,
+		# but no version_key.
+		return vercmp(cpv1.version, cpv2.version) == 0
 
 def strip_empty(myarr):
 	"""
@@ -2212,6 +2217,7 @@ def match_from_list(mydep, candidate_list):
 			mylist.append(x)
 
 	elif operator in [">", ">=", "<", "<="]:
+		mydep_key = mydep.cpv.version_key
 		for x in candidate_list:
 			if hasattr(x, 'cp'):
 				pkg = x
@@ -2223,24 +2229,20 @@ def match_from_list(mydep, candidate_list):
 
 			if pkg.cp != mydep.cp:
 				continue
-			try:
-				result = vercmp(pkg.version, mydep.version)
-			except ValueError: # pkgcmp may return ValueError during int() conversion
-				writemsg(_("\nInvalid package name: %s\n") % x, noiselevel=-1)
-				raise
-			if result is None:
+			result = pkg.cpv.version_key
+			if result is None or mydep_key is None:
 				continue
 			elif operator == ">":
-				if result > 0:
+				if result > mydep_key:
 					mylist.append(x)
 			elif operator == ">=":
-				if result >= 0:
+				if result >= mydep_key:
 					mylist.append(x)
 			elif operator == "<":
-				if result < 0:
+				if result < mydep_key:
 					mylist.append(x)
 			elif operator == "<=":
-				if result <= 0:
+				if result <= mydep_key:
 					mylist.append(x)
 			else:
 				raise KeyError(_("Unknown operator: %s") % mydep)
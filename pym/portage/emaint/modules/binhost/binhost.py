@@ -23,7 +23,7 @@ class BinhostHandler(object):
 	def __init__(self):
 		eroot = portage.settings['EROOT']
 		self._bintree = portage.db[eroot]["bintree"]
-		self._bintree.populate()
+		self._bintree.populate(full_scan=True)
 		self._pkgindex_file = self._bintree._pkgindex_file
 		self._pkgindex = self._bintree._load_pkgindex()
 
@@ -106,13 +106,14 @@ class BinhostHandler(object):
 				missing.append(cpv)
 
 		stale = set(metadata).difference(cpv_all)
-		if missing or stale:
+		if missing or stale or \
+			os.path.exists(bintree._pkgindex_journal_file):
 			from portage import locks
 			pkgindex_lock = locks.lockfile(
 				self._pkgindex_file, wantnewlockfile=1)
 			try:
 				# Repopulate with lock held.
-				bintree._populate()
+				bintree._populate(full_scan=True)
 				cpv_all = self._bintree.dbapi.cpv_all()
 				cpv_all.sort()
 
@@ -131,9 +132,11 @@ class BinhostHandler(object):
 						missing.append(cpv)
 
 				maxval = len(missing)
+				pkg_data = bintree._read_pkgindex_entries(missing)
 				for i, cpv in enumerate(missing):
 					try:
-						metadata[cpv] = bintree._pkgindex_entry(cpv)
+						metadata[cpv] = bintree._pkgindex_entry(cpv,
+							pkg_data=next(pkg_data))
 					except portage.exception.InvalidDependString:
 						writemsg("!!! Invalid binary package: '%s'\n" % \
 							bintree.getname(cpv), noiselevel=-1)
@@ -819,18 +819,13 @@ def dir_get_metadata(baseurl, conn=None, chunk_size=3000, verbose=1, usingcache=
 	
 	return metadata[baseurl]["data"]
 
-def _cmp_cpv(d1, d2):
-	cpv1 = d1["CPV"]
-	cpv2 = d2["CPV"]
-	if cpv1 > cpv2:
-		return 1
-	elif cpv1 == cpv2:
-		return 0
-	else:
-		return -1
+def _cpv_key(d):
+	return d["CPV"]
 
 class PackageIndex(object):
 
+	_pickle_version = "1"
+
 	def __init__(self,
 		allowed_pkg_keys=None,
 		default_header_data=None,
@@ -888,10 +883,52 @@ class PackageIndex(object):
 				(self._write_translation_map.get(k, k), v))
 		pkgfile.write("\n")
 
+	def writeEntry(self, pkgfile, metadata):
+		"""
+		Write a single package entry which can be read by readBody,
+		including values that write omits because they are inherited
+		from the header or equal to the defaults.
+		"""
+		keys = list(metadata)
+		keys.sort()
+		self._writepkgindex(pkgfile,
+			[(k, metadata[k]) for k in keys if metadata[k]])
+
 	def read(self, pkgfile):
 		self.readHeader(pkgfile)
 		self.readBody(pkgfile)
 
+	def readPickle(self, pkgfile):
+		"""
+		Read an index that was written by writePickle, which is much
+		faster than parsing the equivalent Packages file.
+		"""
+		mypickle = pickle.Unpickler(pkgfile)
+		try:
+			mypickle.find_global = None
+		except AttributeError:
+			# TODO: If py3k, override Unpickler.find_class().
+			pass
+		data = mypickle.load()
+		if not isinstance(data, dict) or \
+			data.get("version") != self._pickle_version:
+			raise ValueError("unsupported pickle version")
+		self.header.update(data["header"])
+		for metadata in data["packages"]:
+			if self._pkg_slot_dict is None:
+				d = {}
+			else:
+				d = self._pkg_slot_dict()
+			d.update(metadata)
+			self.packages.append(d)
+
+	def writePickle(self, pkgfile):
+		pickle.dump({
+			"version" : self._pickle_version,
+			"header" : dict(self.header),
+			"packages" : [dict(d) for d in self.packages],
+		}, pkgfile, protocol=2)
+
 	def readHeader(self, pkgfile):
 		self.header.update(self._readpkgindex(pkgfile, pkg_entry=False))
 
@@ -921,8 +958,7 @@ class PackageIndex(object):
 		keys.sort()
 		self._writepkgindex(pkgfile, [(k, self.header[k]) \
 			for k in keys if self.header[k]])
-		for metadata in sorted(self.packages,
-			key=portage.util.cmp_sort_key(_cmp_cpv)):
+		for metadata in sorted(self.packages, key=_cpv_key):
 			metadata = metadata.copy()
 			cpv = metadata["CPV"]
 			if self._inherited_keys:
@@ -17,7 +17,7 @@ from portage.versions import best
 
 class QueryCommand(IpcCommand):
 
-	__slots__ = ('phase', 'settings',)
+	__slots__ = ('phase', 'settings', '_atom_cache',)
 
 	_db = None
 
@@ -31,6 +31,7 @@ class QueryCommand(IpcCommand):
 		IpcCommand.__init__(self)
 		self.settings = settings
 		self.phase = phase
+		self._atom_cache = {}
 
 	def __call__(self, argv):
 		"""
@@ -57,36 +58,40 @@ class QueryCommand(IpcCommand):
 		vardb = db[root]["vartree"].dbapi
 
 		if cmd in ('best_version', 'has_version'):
-			allow_repo = eapi_has_repo_deps(eapi)
-			try:
-				atom = Atom(args[0], allow_repo=allow_repo)
-			except InvalidAtom:
-				return ('', '%s: Invalid atom: %s\n' % (cmd, args[0]), 2)
-
-			try:
-				atom = Atom(args[0], allow_repo=allow_repo, eapi=eapi)
-			except InvalidAtom as e:
-				warnings.append("QA Notice: %s: %s" % (cmd, e))
-
-			use = self.settings.get('PORTAGE_BUILT_USE')
-			if use is None:
-				use = self.settings['PORTAGE_USE']
+			atoms = args[:1]
+		elif cmd in ('best_version_many', 'has_version_any'):
+			atoms = args
+		else:
+			atoms = ()
 
-			use = frozenset(use.split())
-			atom = atom.evaluate_conditionals(use)
+		results = []
+		for arg in atoms:
+			matches = self._match(cmd, root, vardb, eapi, arg, warnings)
+			if matches is None:
+				return ('', '%s: Invalid atom: %s\n' % (cmd, arg), 2)
+			results.append((arg, matches))
 
 		if warnings:
 			warnings_str = self._elog('eqawarn', warnings)
 
 		if cmd == 'has_version':
-			if vardb.match(atom):
+			if results[0][1]:
 				returncode = 0
 			else:
 				returncode = 1
 			return ('', warnings_str, returncode)
 		elif cmd == 'best_version':
-			m = best(vardb.match(atom))
+			m = best(results[0][1])
 			return ('%s\n' % m, warnings_str, 0)
+		elif cmd == 'has_version_any':
+			installed = [arg for arg, matches in results if matches]
+			if installed:
+				return (''.join('%s\n' % arg for arg in installed),
+					warnings_str, 0)
+			return ('', warnings_str, 1)
+		elif cmd == 'best_version_many':
+			return (''.join('%s\n' % best(matches)
+				for arg, matches in results), warnings_str, 0)
 		elif cmd in ('master_repositories', 'repository_path', 'available_eclasses', 'eclass_path', 'license_path'):
 			repo = _repo_name_re.match(args[0])
 			if repo is None:
@@ -117,6 +122,43 @@ class QueryCommand(IpcCommand):
 		else:
 			return ('', 'Invalid command: %s\n' % cmd, 3)
 
+	def _match(self, cmd, root, vardb, eapi, arg, warnings):
+		"""
+		Match the atom given by arg against vardb, and append any QA
+		warnings about it to the warnings list. Parsed atoms are cached
+		for the lifetime of the phase, since ebuilds tend to repeat the
+		same queries. Matches are not cached here, since other packages
+		may be merged or unmerged concurrently with --jobs, and
+		vardb.match() already caches them until the vdb changes.
+
+		@return: list of matching cpvs, or None if arg is not a valid atom
+		"""
+		cached = self._atom_cache.get(arg)
+		if cached is None:
+			allow_repo = eapi_has_repo_deps(eapi)
+			try:
+				atom = Atom(arg, allow_repo=allow_repo)
+			except InvalidAtom:
+				return None
+
+			errors = []
+			try:
+				atom = Atom(arg, allow_repo=allow_repo, eapi=eapi)
+			except InvalidAtom as e:
+				errors.append(e)
+
+			use = self.settings.get('PORTAGE_BUILT_USE')
+			if use is None:
+				use = self.settings['PORTAGE_USE']
+
+			use = frozenset(use.split())
+			cached = (errors, atom.evaluate_conditionals(use))
+			self._atom_cache[arg] = cached
+
+		errors, atom = cached
+		warnings.extend("QA Notice: %s: %s" % (cmd, e) for e in errors)
+		return vardb.match(atom)
+
 	def _elog(self, elog_funcname, lines):
 		"""
 		This returns a string, to be returned via ipc and displayed at the
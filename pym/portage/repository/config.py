@@ -213,7 +213,9 @@ class RepoConfig(object):
 		Reads layout.conf cache-formats from left to right and yields cache
 		instances for each supported type that's found. If no cache-formats
 		are specified in layout.conf, 'pms' type is assumed if the
-		metadata/cache directory exists or force is True.
+		metadata/cache directory exists or force is True. When readonly is
+		True, the 'md5-packed' type is skipped if its file does not exist,
+		so that the next format is used instead.
 		"""
 		formats = self.cache_formats
 		if not formats:
@@ -233,6 +235,12 @@ class RepoConfig(object):
 			elif fmt == 'md5-dict':
 				from portage.cache.flat_hash import md5_database as database
 				name = 'metadata/md5-cache'
+			elif fmt == 'md5-packed':
+				from portage.cache.flat_pack import md5_database as database
+				name = 'metadata/md5-cache.pack'
+				if readonly and not os.path.exists(
+					os.path.join(self.location, name)):
+					continue
 
 			if name is not None:
 				yield database(self.location, name,
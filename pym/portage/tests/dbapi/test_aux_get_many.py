@@ -0,0 +1,35 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from portage.tests import TestCase
+from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+
+class AuxGetManyTestCase(TestCase):
+
+	def testAuxGetMany(self):
+
+		ebuilds = {
+			"dev-libs/A-1": {"EAPI": "5", "SLOT": "1"},
+			"dev-libs/A-2": {"EAPI": "5", "SLOT": "2", "IUSE": "foo"},
+			"dev-libs/B-1": {"EAPI": "4", "DEPEND": "dev-libs/A"},
+		}
+
+		installed = {
+			"dev-libs/A-1": {"EAPI": "5", "SLOT": "1"},
+			"dev-libs/B-1": {"EAPI": "4", "DEPEND": "dev-libs/A"},
+		}
+
+		playground = ResolverPlayground(ebuilds=ebuilds,
+			installed=installed)
+		try:
+			trees = playground.trees[playground.eroot]
+			wants = ["EAPI", "SLOT", "IUSE", "DEPEND"]
+			for db, cpvs in (
+				(trees["porttree"].dbapi, sorted(ebuilds)),
+				(trees["vartree"].dbapi, sorted(installed))):
+				expected = [(cpv, db.aux_get(cpv, wants)) for cpv in cpvs]
+				self.assertEqual(
+					list(db.aux_get_many(cpvs + ["dev-libs/C-1"], wants)),
+					expected)
+		finally:
+			playground.cleanup()
@@ -0,0 +1,110 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import io
+import threading
+from email.utils import formatdate, mktime_tz, parsedate_tz
+
+try:
+	from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+	from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from portage import os
+from portage.const import CACHE_PATH
+from portage.tests import TestCase
+from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+
+class _BinhostHandler(BaseHTTPRequestHandler):
+
+	def do_GET(self):
+		server = self.server
+		server.requests.append(self.path)
+		content = server.files.get(self.path)
+		if content is None:
+			self.send_error(404)
+			return
+		since = self.headers.get("If-Modified-Since")
+		if since and mktime_tz(parsedate_tz(since)) >= server.timestamp:
+			self.send_response(304)
+			self.end_headers()
+			return
+		self.send_response(200)
+		self.send_header("Content-Length", str(len(content)))
+		self.send_header("Last-Modified",
+			formatdate(server.timestamp, usegmt=True))
+		self.end_headers()
+		self.wfile.write(content)
+
+	def log_message(self, *args):
+		pass
+
+class BinhostFetchTestCase(TestCase):
+
+	def testBinhostFetch(self):
+
+		playground = ResolverPlayground()
+		server = HTTPServer(("127.0.0.1", 0), _BinhostHandler)
+		server.requests = []
+		server.timestamp = 1000000000
+		server.files = {}
+		thread = threading.Thread(target=server.serve_forever)
+		thread.daemon = True
+		thread.start()
+		try:
+			settings = playground.settings
+			bintree = playground.trees[playground.eroot]["bintree"]
+
+			binhosts = {
+				"a": ("dev-libs/A-1", "dev-libs/B-1"),
+				"b": ("dev-libs/C-1",),
+			}
+			for name, cpvs in binhosts.items():
+				pkgindex = bintree._new_pkgindex()
+				pkgindex.modified = False
+				pkgindex.header["TIMESTAMP"] = str(server.timestamp)
+				pkgindex.header["VERSION"] = "0"
+				for cpv in cpvs:
+					pkgindex.packages.append({"CPV": cpv, "SLOT": "0",
+						"EAPI": "5", "SIZE": "1"})
+				f = io.StringIO()
+				pkgindex.write(f)
+				server.files["/%s/Packages" % name] = \
+					f.getvalue().encode("utf_8")
+
+			base_url = "http://127.0.0.1:%s" % (server.server_address[1],)
+			settings.unlock()
+			settings["PORTAGE_BINHOST"] = "%s/a %s/b" % (base_url, base_url)
+			settings.backup_changes("PORTAGE_BINHOST")
+			settings.lock()
+
+			cached_index = os.path.join(playground.eroot, CACHE_PATH,
+				"binhost", "127.0.0.1", "a", "Packages")
+			expected = ["dev-libs/A-1", "dev-libs/B-1", "dev-libs/C-1"]
+
+			bintree.populate(getbinpkgs=1)
+			self.assertEqual(sorted(bintree._remotepkgs), expected)
+			self.assertEqual(bintree._pkgindex_uri["dev-libs/C-1"],
+				base_url + "/b/Packages")
+			self.assertEqual(sorted(server.requests),
+				["/a/Packages", "/b/Packages"])
+			self.assertTrue(os.path.exists(cached_index + ".pickle"))
+
+			# Truncate the body of the cached copy, in order to check
+			# that the pickled copy is used while the remote index is
+			# not modified.
+			with io.open(cached_index, encoding="utf_8") as f:
+				header = f.read().split("\n\n")[0]
+			with io.open(cached_index, mode="w", encoding="utf_8") as f:
+				f.write(header + "\n\n")
+
+			del server.requests[:]
+			bintree.populated = 0
+			bintree.populate(getbinpkgs=1)
+			self.assertEqual(sorted(server.requests),
+				["/a/Packages", "/b/Packages"])
+			self.assertEqual(sorted(bintree._remotepkgs), expected)
+		finally:
+			server.shutdown()
+			server.server_close()
+			playground.cleanup()
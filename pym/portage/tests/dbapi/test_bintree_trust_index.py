@@ -0,0 +1,87 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import time
+
+import portage
+from portage import os
+from portage.tests import TestCase
+from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+from portage.util import ensure_dirs
+
+class BintreeTrustIndexTestCase(TestCase):
+
+	def testBintreeTrustIndex(self):
+
+		binpkgs = {
+			"dev-libs/A-1": {"EAPI": "5"},
+			"dev-libs/B-1": {"EAPI": "5", "RDEPEND": "dev-libs/A"},
+		}
+
+		user_config = {
+			"make.conf": ('FEATURES="${FEATURES} binpkg-trust-index"',),
+		}
+
+		playground = ResolverPlayground(binpkgs=binpkgs,
+			user_config=user_config)
+		try:
+			bintree = playground.trees[playground.eroot]["bintree"]
+			pkgdir = bintree.pkgdir
+
+			def create_binpkg(cpv, build_time):
+				cat, pf = cpv.split("/")
+				ensure_dirs(os.path.join(pkgdir, cat))
+				t = portage.xpak.tbz2(os.path.join(pkgdir, cat, pf + ".tbz2"))
+				t.recompose_mem(portage.xpak.xpak_mem({
+					"CATEGORY": cat, "PF": pf, "SLOT": "0", "EAPI": "5",
+					"KEYWORDS": "x86", "BUILD_TIME": build_time,
+					"repository": "test_repo"}))
+
+			def build_time(cpv):
+				return bintree.dbapi.aux_get(cpv, ["BUILD_TIME"])[0]
+
+			# Use a whole number of seconds, since os.utime may not be
+			# able to restore a more precise mtime.
+			dev_libs = os.path.join(pkgdir, "dev-libs")
+			os.utime(dev_libs, (1000000000, 1000000000))
+
+			bintree.populate()
+			self.assertTrue(os.path.exists(bintree._pkgindex_dir_mtimes_file))
+			self.assertEqual(sorted(bintree.dbapi.cpv_all()),
+				["dev-libs/A-1", "dev-libs/B-1"])
+
+			# Overwrite a package without changing the mtime of its
+			# directory, which is not detected unless all packages
+			# are scanned.
+			create_binpkg("dev-libs/A-1", "100")
+			os.utime(dev_libs, (1000000000, 1000000000))
+
+			bintree.populate()
+			self.assertEqual(build_time("dev-libs/A-1"), "0")
+
+			# New directories are scanned.
+			create_binpkg("dev-util/C-1", "2")
+			dev_util = os.path.join(pkgdir, "dev-util")
+			now = int(time.time())
+			os.utime(dev_util, (now, now))
+			bintree.populate()
+			self.assertEqual(sorted(bintree.dbapi.cpv_all()),
+				["dev-libs/A-1", "dev-libs/B-1", "dev-util/C-1"])
+			self.assertEqual(build_time("dev-util/C-1"), "2")
+			self.assertEqual(build_time("dev-libs/A-1"), "0")
+
+			# Directories that were modified within the last couple of
+			# seconds may be modified again without a change of their
+			# mtime, so their mtimes are not recorded.
+			dir_mtimes = bintree._load_pkgindex_dir_mtimes()[1]
+			self.assertTrue("dev-libs" in dir_mtimes)
+			self.assertFalse("dev-util" in dir_mtimes)
+			create_binpkg("dev-util/C-1", "30")
+			os.utime(dev_util, (now, now))
+			bintree.populate()
+			self.assertEqual(build_time("dev-util/C-1"), "30")
+
+			bintree.populate(full_scan=True)
+			self.assertEqual(build_time("dev-libs/A-1"), "100")
+		finally:
+			playground.cleanup()
@@ -0,0 +1,65 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from portage.dbapi._ContentsDict import ContentsDict
+from portage.tests import TestCase
+
+class ContentsDictTestCase(TestCase):
+
+	def testContentsDict(self):
+
+		entries = [
+			("/usr/bin/foo", "obj 1234 d41d8cd98f00b204e9800998ecf8427e"),
+			("/usr/lib/libfoo.so", "sym 1234 libfoo.so.1 with space"),
+			("/usr/share/doc", "dir"),
+			("/usr/bin/foo", "obj 5678 0123456789abcdef0123456789abcdef"),
+			("/dev/null", "dev"),
+		]
+		contents = ContentsDict(entries, eroot_split_len=1)
+
+		expected = {
+			"/usr": ("dir",),
+			"/usr/bin": ("dir",),
+			"/usr/bin/foo":
+				("obj", "5678", "0123456789abcdef0123456789abcdef"),
+			"/usr/lib": ("dir",),
+			"/usr/lib/libfoo.so": ("sym", "1234", "libfoo.so.1 with space"),
+			"/usr/share": ("dir",),
+			"/usr/share/doc": ("dir",),
+			"/dev": ("dir",),
+			"/dev/null": ("dev",),
+		}
+
+		self.assertEqual(contents.copy(), expected)
+		self.assertEqual(len(contents), len(expected))
+		self.assertEqual(list(contents), sorted(expected))
+		for path, entry in expected.items():
+			self.assertEqual(path in contents, True)
+			self.assertEqual(contents[path], entry)
+			# Entries are only unpacked once.
+			self.assertEqual(contents[path] is contents[path], True)
+		self.assertEqual(contents.copy(), expected)
+
+		for path in ("/", "/us", "/usr/bi", "/usr/bin/foo/bar",
+			"/usr/share/doc/foo", "/var"):
+			self.assertEqual(path in contents, False)
+			self.assertEqual(contents.get(path), None)
+			self.assertRaises(KeyError, contents.__getitem__, path)
+
+		self.assertEqual(list(contents.iter_prefix("/usr/")),
+			["/usr/bin/foo", "/usr/lib/libfoo.so", "/usr/share/doc"])
+		self.assertEqual(bool(contents), True)
+		self.assertEqual(bool(ContentsDict()), False)
+		self.assertEqual(len(ContentsDict()), 0)
+
+	def testEroot(self):
+
+		# Parent directories are not generated at or above EROOT.
+		contents = ContentsDict([
+			("/prefix/usr/bin/foo", "obj 1 d41d8cd98f00b204e9800998ecf8427e"),
+		], eroot_split_len=2)
+
+		self.assertEqual(sorted(contents),
+			["/prefix/usr", "/prefix/usr/bin", "/prefix/usr/bin/foo"])
+		self.assertEqual("/prefix" in contents, False)
+		self.assertEqual("/prefix/usr" in contents, True)
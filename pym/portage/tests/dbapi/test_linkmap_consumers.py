@@ -0,0 +1,81 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from portage import os
+from portage.tests import TestCase
+from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+from portage.util import ensure_dirs
+
+class LinkageMapConsumersTestCase(TestCase):
+
+	def testLinkageMapConsumers(self):
+
+		playground = ResolverPlayground()
+		try:
+			eprefix = playground.eprefix
+			eroot = playground.eroot
+			linkmap = playground.trees[eroot]["vartree"].dbapi._linkmap
+
+			lib = eprefix + "/usr/lib64"
+			opt = eprefix + "/opt/lib"
+			objs = {
+				# The installed version of libA, and an older one that is
+				# shadowed by the soname symlink.
+				lib + "/libA.so.1.1": ("libA.so.1", "", ""),
+				lib + "/libA.so.1.0": ("libA.so.1", "", ""),
+				# An alternative provider of libA in another directory.
+				opt + "/libA.so.1": ("libA.so.1", "", ""),
+				eprefix + "/usr/bin/b": ("", lib, "libA.so.1"),
+				eprefix + "/usr/bin/c": ("", "%s:%s" % (opt, lib), "libA.so.1"),
+				eprefix + "/usr/bin/d": ("", lib, "libA.so.1,libM.so.1"),
+			}
+			for path in objs:
+				ensure_dirs(os.path.dirname(path))
+				with open(path, "w"):
+					pass
+			os.symlink("libA.so.1.1", os.path.join(lib, "libA.so.1"))
+
+			needed = os.path.join(eroot, "NEEDED.ELF.2")
+			with open(needed, "w") as f:
+				for path, (soname, rpath, deps) in sorted(objs.items()):
+					f.write("X86_64;%s;%s;%s;%s\n" % (path, soname, rpath, deps))
+			linkmap.rebuild(include_file=needed)
+
+			libA = lib + "/libA.so.1.1"
+			libA_old = lib + "/libA.so.1.0"
+			libA_opt = opt + "/libA.so.1"
+			b, c, d = [eprefix + "/usr/bin/" + x for x in "bcd"]
+
+			self.assertEqual(linkmap.findConsumers(libA), set([b, c, d]))
+			self.assertEqual(linkmap.findConsumers(libA_old), set())
+			self.assertEqual(linkmap.findConsumers(libA_opt), set([c]))
+			# Every consumer can use libA_old instead.
+			self.assertEqual(linkmap.findConsumers(libA, greedy=False),
+				set())
+			self.assertEqual(linkmap.findConsumers(libA,
+				exclude_providers=(lambda x: True,)), set([b, c, d]))
+			self.assertEqual(linkmap.findConsumers(libA,
+				exclude_providers=(lambda x: x != libA_opt,)), set([b, d]))
+			self.assertEqual(
+				linkmap.findConsumers(linkmap._obj_key(libA_opt)), set([c]))
+			self.assertRaises(KeyError, linkmap.findConsumers,
+				eprefix + "/usr/lib64/libX.so")
+
+			calls = []
+			def exclude(path):
+				calls.append(path)
+				return path != libA_opt
+			self.assertEqual(linkmap.mapConsumers(
+				[libA, libA_old, libA_opt, eprefix + "/usr/lib64/libX.so"],
+				exclude_providers=(exclude,)),
+				{libA: set([b, d])})
+			self.assertEqual(sorted(calls), sorted(set(calls)))
+
+			self.assertEqual(linkmap.findProviders(c),
+				{"libA.so.1": set([libA, libA_old, libA_opt])})
+			self.assertEqual(linkmap.findProviders(d),
+				{"libA.so.1": set([libA, libA_old]), "libM.so.1": set()})
+			self.assertEqual(linkmap.listBrokenBinaries(),
+				{d: set(["libM.so.1"])})
+		finally:
+			playground.cleanup()
@@ -0,0 +1,85 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from portage import os
+from portage import shutil
+from portage.tests import TestCase
+from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+from portage.util import ensure_dirs
+
+class LinkageMapIndexTestCase(TestCase):
+
+	def _write_needed(self, playground, cpv, lines):
+		eprefix = playground.eprefix
+		vdb_pkg_dir = os.path.join(playground.vdbdir, cpv)
+		ensure_dirs(vdb_pkg_dir)
+		for k, v in (("SLOT", "0"), ("COUNTER", "1")):
+			if not os.path.exists(os.path.join(vdb_pkg_dir, k)):
+				with open(os.path.join(vdb_pkg_dir, k), "w") as f:
+					f.write("%s\n" % v)
+		with open(os.path.join(vdb_pkg_dir, "NEEDED.ELF.2"), "w") as f:
+			for line in lines:
+				arch, obj, rest = line.split(";", 2)
+				f.write("%s;%s%s;%s\n" % (arch, eprefix, obj, rest))
+
+	def _linkage(self, playground, linkmap):
+		eprefix = playground.eprefix
+		linkmap.rebuild()
+		result = []
+		for obj_props in linkmap._obj_properties.values():
+			for obj in obj_props.alt_paths:
+				result.append((obj[len(eprefix):], obj_props.owner,
+					obj_props.soname, tuple(sorted(obj_props.needed))))
+		result.sort()
+		return result
+
+	def testLinkageMapIndex(self):
+
+		installed = {
+			"dev-libs/A-1": {},
+			"app-misc/B-1": {},
+		}
+
+		playground = ResolverPlayground(installed=installed)
+		try:
+			vardb = playground.trees[playground.eroot]["vartree"].dbapi
+			linkmap = vardb._linkmap
+
+			self._write_needed(playground, "dev-libs/A-1",
+				["X86_64;/usr/lib64/libA.so.1;libA.so.1;;libc.so.6"])
+			self._write_needed(playground, "app-misc/B-1",
+				["X86_64;/usr/bin/b;;;libA.so.1,libc.so.6"])
+
+			expected = [
+				("/usr/bin/b", "app-misc/B-1", "", ("libA.so.1", "libc.so.6")),
+				("/usr/lib64/libA.so.1", "dev-libs/A-1", "libA.so.1",
+					("libc.so.6",)),
+			]
+			self.assertEqual(self._linkage(playground, linkmap), expected)
+			self.assertTrue(os.path.exists(vardb._linkmap_index_filename))
+			self.assertEqual(sorted(cpv for cpv, needed in
+				linkmap._index.entries()), ["app-misc/B-1", "dev-libs/A-1"])
+
+			# Packages that are merged, replaced or unmerged later must
+			# be reflected in the next rebuild.
+			shutil.rmtree(os.path.join(playground.vdbdir, "app-misc/B-1"))
+			self._write_needed(playground, "app-misc/C-1",
+				["X86_64;/usr/bin/c;;;libA.so.1"])
+			shutil.rmtree(os.path.join(playground.vdbdir, "dev-libs/A-1"))
+			self._write_needed(playground, "dev-libs/A-1",
+				["X86_64;/usr/lib64/libA.so.2;libA.so.2;;libc.so.6"])
+			vardb._clear_cache()
+			vardb.cpv_all(use_cache=0)
+
+			expected = [
+				("/usr/bin/c", "app-misc/C-1", "", ("libA.so.1",)),
+				("/usr/lib64/libA.so.2", "dev-libs/A-1", "libA.so.2",
+					("libc.so.6",)),
+			]
+			self.assertEqual(self._linkage(playground, linkmap), expected)
+
+			# The fallback implementation must produce the same results.
+			linkmap._index._disabled = True
+			self.assertEqual(self._linkage(playground, linkmap), expected)
+		finally:
+			playground.cleanup()
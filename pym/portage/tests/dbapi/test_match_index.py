@@ -0,0 +1,67 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import random
+
+from portage.dbapi._MatchIndex import MatchIndex
+from portage.dep import Atom, match_from_list
+from portage.exception import InvalidAtom
+from portage.tests import TestCase
+from portage.versions import _pkg_str
+
+class MatchIndexTestCase(TestCase):
+
+	versions = ("0", "01", "1", "1-r1", "1.0", "1.00", "1.0-r1", "1.0-r2",
+		"1.0.1", "1.01", "1.1", "1.10", "1.2_alpha-r3", "1_alpha",
+		"1_beta2", "1_rc1", "1_p1", "1a", "1b", "2_pre1", "2", "2-r1",
+		"10", "001.2")
+
+	def _candidates(self):
+		slots = ("0", "1", "1/2", "2")
+		repos = ("gentoo", "other")
+		candidates = []
+		for i, ver in enumerate(self.versions):
+			candidates.append(_pkg_str("dev-libs/A-%s" % ver,
+				slot=slots[i % len(slots)], repo=repos[i % len(repos)]))
+		random.Random(0).shuffle(candidates)
+		return candidates
+
+	def _atoms(self):
+		yield "dev-libs/A"
+		yield "!dev-libs/A:1"
+		yield "dev-libs/B"
+		yield "dev-libs/*"
+		for ver in self.versions:
+			for op in ("=", ">", ">=", "<", "<=", "~"):
+				yield "%sdev-libs/A-%s" % (op, ver)
+			if "-" not in ver:
+				yield "=dev-libs/A-%s*" % ver
+
+	def testMatchIndex(self):
+		candidates = self._candidates()
+		index = MatchIndex("dev-libs/A", candidates)
+		# The first query does not use the index.
+		index.match(Atom("dev-libs/C"))
+		for atom_str in self._atoms():
+			for suffix in ("", ":0", ":1", ":1/2", ":1/1", "::gentoo",
+				":2::other", "[foo]"):
+				try:
+					atom = Atom(atom_str + suffix, allow_wildcard=True,
+						allow_repo=True)
+				except InvalidAtom:
+					continue
+				expected = match_from_list(atom, candidates)
+				for i in range(2):
+					result = index.match(atom)
+					self.assertEqual(result, expected,
+						"%s: %s != %s" % (atom, result, expected))
+					for x, y in zip(result, expected):
+						self.assertTrue(x is y)
+
+	def testCandidates(self):
+		candidates = self._candidates()
+		index = MatchIndex("dev-libs/A", candidates)
+		self.assertTrue(index.same_candidates(list(candidates)))
+		self.assertFalse(index.same_candidates(candidates[:-1]))
+		self.assertFalse(index.same_candidates(
+			[_pkg_str(x) for x in candidates]))
@@ -0,0 +1,96 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from portage import os
+from portage import shutil
+from portage.tests import TestCase
+from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+from portage.util import ensure_dirs
+
+class OwnersTestCase(TestCase):
+
+	def _write_contents(self, playground, cpv, lines):
+		eprefix = playground.eprefix
+		with open(os.path.join(playground.vdbdir, cpv, "CONTENTS"), "w") as f:
+			for line in lines:
+				kind, path = line.split(" ", 1)
+				if kind == "obj":
+					f.write("obj %s%s d41d8cd98f00b204e9800998ecf8427e 0\n" %
+						(eprefix, path))
+				else:
+					f.write("dir %s%s\n" % (eprefix, path))
+
+	def _owners(self, vardb, paths):
+		return sorted((pkg.mycpv, path) for pkg, path in
+			vardb._owners.iter_owners(list(paths)))
+
+	def testOwners(self):
+
+		installed = {
+			"dev-libs/A-1": {},
+			"dev-libs/B-1": {},
+			"app-misc/C-1": {},
+		}
+
+		playground = ResolverPlayground(installed=installed)
+		try:
+			eprefix = playground.eprefix
+			ensure_dirs(os.path.join(playground.eroot, "usr/lib64"))
+			os.symlink("lib64", os.path.join(playground.eroot, "usr/lib"))
+
+			self._write_contents(playground, "dev-libs/A-1",
+				["dir /usr/lib64", "obj /usr/lib64/libA.so",
+				"obj /usr/share/doc/README"])
+			self._write_contents(playground, "dev-libs/B-1",
+				["obj /usr/lib/libB.so", "obj /usr/share/doc/B/README"])
+			self._write_contents(playground, "app-misc/C-1", [])
+
+			vardb = playground.trees[playground.eroot]["vartree"].dbapi
+			queries = [
+				eprefix + "/usr/lib64/libA.so",
+				eprefix + "/usr/lib/libA.so",
+				eprefix + "/usr/lib64/libB.so",
+				eprefix + "/usr/share/doc",
+				eprefix + "/usr/bin/missing",
+				"README",
+			]
+			expected = [
+				("dev-libs/A-1", eprefix + "/usr/lib/libA.so"),
+				("dev-libs/A-1", eprefix + "/usr/lib64/libA.so"),
+				("dev-libs/A-1", eprefix + "/usr/share/doc"),
+				("dev-libs/A-1", "usr/share/doc/README"),
+				("dev-libs/B-1", eprefix + "/usr/lib64/libB.so"),
+				("dev-libs/B-1", eprefix + "/usr/share/doc"),
+				("dev-libs/B-1", "usr/share/doc/B/README"),
+			]
+
+			self.assertEqual(self._owners(vardb, queries), expected)
+
+			# Packages that are merged or unmerged later must be
+			# reflected in subsequent queries.
+			shutil.rmtree(os.path.join(playground.vdbdir, "dev-libs/B-1"))
+			vdb_pkg_dir = os.path.join(playground.vdbdir, "app-misc/D-1")
+			ensure_dirs(vdb_pkg_dir)
+			for k, v in (("SLOT", "0"), ("COUNTER", "1")):
+				with open(os.path.join(vdb_pkg_dir, k), "w") as f:
+					f.write("%s\n" % v)
+			self._write_contents(playground, "app-misc/D-1",
+				["obj /usr/share/doc/D/README"])
+			vardb._clear_cache()
+			vardb.cpv_all(use_cache=0)
+
+			expected = [
+				("app-misc/D-1", eprefix + "/usr/share/doc"),
+				("app-misc/D-1", "usr/share/doc/D/README"),
+				("dev-libs/A-1", eprefix + "/usr/lib/libA.so"),
+				("dev-libs/A-1", eprefix + "/usr/lib64/libA.so"),
+				("dev-libs/A-1", eprefix + "/usr/share/doc"),
+				("dev-libs/A-1", "usr/share/doc/README"),
+			]
+			self.assertEqual(self._owners(vardb, queries), expected)
+
+			# The fallback implementation must produce the same results.
+			vardb._owners._contents_index._disabled = True
+			self.assertEqual(self._owners(vardb, queries), expected)
+		finally:
+			playground.cleanup()
@@ -0,0 +1,99 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import portage
+from portage import os
+from portage.dbapi.bintree import binarytree
+from portage.util import ensure_dirs
+from portage.tests import TestCase
+from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+
+class PkgindexJournalTestCase(TestCase):
+
+	def testPkgindexJournal(self):
+
+		binpkgs = {
+			"dev-libs/A-1": {"EAPI": "5"},
+			"dev-libs/B-1": {"EAPI": "5", "RDEPEND": "dev-libs/A"},
+		}
+
+		playground = ResolverPlayground(binpkgs=binpkgs)
+		try:
+			settings = playground.settings
+			bintree = playground.trees[playground.eroot]["bintree"]
+			bintree.populate()
+
+			def index_cpvs(path):
+				pkgindex = bintree._new_pkgindex()
+				with open(path) as f:
+					pkgindex.read(f)
+				return sorted(d["CPV"] for d in pkgindex.packages)
+
+			self.assertEqual(index_cpvs(bintree._pkgindex_file),
+				["dev-libs/A-1", "dev-libs/B-1"])
+
+			# Force journal updates regardless of the index size.
+			bintree._pkgindex_journal_ratio = 0
+			with open(bintree._pkgindex_file) as f:
+				classic_index = f.read()
+			bintree.inject("dev-libs/A-1", compact=False)
+			bintree.inject("dev-libs/B-1", compact=False)
+			bintree.inject("dev-libs/A-1", compact=False)
+
+			with open(bintree._pkgindex_file) as f:
+				self.assertEqual(f.read(), classic_index)
+			self.assertTrue(os.path.exists(bintree._pkgindex_journal_file))
+			self.assertEqual(
+				sorted(d["CPV"] for d in bintree._load_pkgindex().packages),
+				["dev-libs/A-1", "dev-libs/B-1"])
+
+			other_bintree = binarytree(pkgdir=bintree.pkgdir,
+				settings=settings)
+			other_bintree.populate()
+			self.assertEqual(sorted(other_bintree.dbapi.cpv_all()),
+				["dev-libs/A-1", "dev-libs/B-1"])
+
+			bintree._pkgindex_compact()
+			self.assertFalse(os.path.exists(bintree._pkgindex_journal_file))
+			self.assertEqual(index_cpvs(bintree._pkgindex_file),
+				["dev-libs/A-1", "dev-libs/B-1"])
+		finally:
+			playground.cleanup()
+
+	def testInjectCompact(self):
+		"""
+		Test that a package injected like quickpkg does is immediately
+		visible to clients that only read the Packages file, even if
+		the journal would otherwise be used.
+		"""
+
+		binpkgs = {
+			"dev-libs/A-1": {"EAPI": "5"},
+		}
+
+		playground = ResolverPlayground(binpkgs=binpkgs)
+		try:
+			bintree = playground.trees[playground.eroot]["bintree"]
+			bintree.populate()
+			bintree._pkgindex_journal_ratio = 0
+
+			# Like quickpkg, create the package in a temporary file.
+			cpv = "dev-libs/C-1"
+			binpkg_tmpfile = os.path.join(bintree.pkgdir,
+				cpv + ".tbz2." + str(os.getpid()))
+			ensure_dirs(os.path.dirname(binpkg_tmpfile))
+			portage.xpak.tbz2(binpkg_tmpfile).recompose_mem(
+				portage.xpak.xpak_mem({"CATEGORY": "dev-libs",
+				"PF": "C-1", "EAPI": "5", "SLOT": "0",
+				"KEYWORDS": "x86", "BUILD_TIME": "0",
+				"repository": "test_repo"}))
+			bintree.inject(cpv, filename=binpkg_tmpfile)
+
+			self.assertFalse(os.path.exists(bintree._pkgindex_journal_file))
+			pkgindex = bintree._new_pkgindex()
+			with open(bintree._pkgindex_file) as f:
+				pkgindex.read(f)
+			self.assertEqual(sorted(d["CPV"] for d in pkgindex.packages),
+				["dev-libs/A-1", "dev-libs/C-1"])
+		finally:
+			playground.cleanup()
@@ -34,6 +34,7 @@ class PortdbCacheTestCase(TestCase):
 		metadata_dir = os.path.join(portdir, "metadata")
 		md5_cache_dir = os.path.join(metadata_dir, "md5-cache")
 		pms_cache_dir = os.path.join(metadata_dir, "cache")
+		md5_pack_path = os.path.join(metadata_dir, "md5-cache.pack")
 		layout_conf_path = os.path.join(metadata_dir, "layout.conf")
 
 		portage_python = portage._python_interpreter
@@ -82,6 +83,29 @@ class PortdbCacheTestCase(TestCase):
 					sys.exit(1)
 			"""),),
 
+			(BASH_BINARY, "-c", "echo %s > %s" %
+				tuple(map(portage._shell_quote,
+				("cache-formats = md5-packed md5-dict", layout_conf_path,)))),
+			python_cmd + (textwrap.dedent("""
+				import os, sys, portage
+				from portage.cache.flat_hash import md5_database
+				if not isinstance(portage.portdb._pregen_auxdb[portage.portdb.porttree_root], md5_database):
+					sys.exit(1)
+			"""),),
+			egencache_cmd + ("--update",),
+			(lambda: os.path.exists(md5_pack_path),),
+			python_cmd + (textwrap.dedent("""
+				import os, sys, portage
+				from portage.cache.flat_pack import md5_database
+				cache = portage.portdb._pregen_auxdb[portage.portdb.porttree_root]
+				if not isinstance(cache, md5_database):
+					sys.exit(1)
+				if sorted(cache) != ["dev-libs/A-1", "dev-libs/A-2", "sys-apps/B-1", "sys-apps/B-2"]:
+					sys.exit(1)
+				if portage.portdb.aux_get("dev-libs/A-1", ["SLOT"]) != ["0"]:
+					sys.exit(1)
+			"""),),
+
 			# Don't use python -Wd, since the pms format triggers deprecation warnings
 			# in portdbapi._create_pregen_cache().
 			(BASH_BINARY, "-c", "echo %s > %s" %
@@ -0,0 +1,106 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import re
+import time
+
+from portage import os
+from portage.dbapi._SearchIndex import SearchIndex
+from portage.eclass_cache import hashed_path
+from portage.tests import TestCase
+from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+
+class SearchIndexTestCase(TestCase):
+
+	def testSearchIndex(self):
+
+		ebuilds = {
+			"dev-libs/A-1": {"DESCRIPTION": "A library for parsing XML"},
+			"dev-libs/B-1": {"DESCRIPTION": "Bindings for the foo library"},
+			"sys-apps/C-1": {"DESCRIPTION": "System utilities"},
+		}
+
+		playground = ResolverPlayground(ebuilds=ebuilds)
+		try:
+			settings = playground.settings
+			portdb = playground.trees[playground.eroot]["porttree"].dbapi
+			portdir = settings["PORTDIR"]
+			repo_config = settings.repositories.get_repo_for_location(portdir)
+			cache = repo_config.get_pregenerated_cache(portdb._known_keys,
+				readonly=False, force=True)
+
+			# Entries are only trusted if their mtimes are not racy.
+			past = int(time.time()) - 100
+
+			def ebuild_path(cpv):
+				cat, pf = cpv.split("/")
+				return os.path.join(portdir, cat, pf.split("-")[0],
+					pf + ".ebuild")
+
+			def write_cache(cpv, description):
+				ebuild_hash = hashed_path(ebuild_path(cpv))
+				cache[cpv] = {"DESCRIPTION": description, "EAPI": "0",
+					"_%s_" % cache.validation_chf:
+					getattr(ebuild_hash, cache.validation_chf),
+					"_eclasses_": {}}
+
+			for cpv in sorted(ebuilds):
+				os.utime(ebuild_path(cpv), (past, past))
+				os.utime(os.path.dirname(ebuild_path(cpv)), (past, past))
+				write_cache(cpv, ebuilds[cpv]["DESCRIPTION"])
+			portdb._pregen_auxdb[portdir] = cache
+
+			filename = os.path.join(playground.eroot,
+				"var", "cache", "edb", "search_index.sqlite")
+
+			def match(key, regexsearch=False):
+				index = SearchIndex(portdb, filename)
+				if regexsearch:
+					regex = re.compile(key, re.I)
+					words = None
+				else:
+					regex = re.compile(re.escape(key), re.I)
+					words = SearchIndex._token_re.findall(key.lower())
+				return sorted(index.match_description(regex, words=words))
+
+			self.assertEqual(match("librar"), ["dev-libs/A", "dev-libs/B"])
+			self.assertEqual(match("the FOO"), ["dev-libs/B"])
+			self.assertEqual(match("foo bindings"), [])
+			self.assertEqual(match("util"), ["sys-apps/C"])
+			self.assertEqual(match("^system", regexsearch=True),
+				["sys-apps/C"])
+
+			# Only the modified category is indexed again.
+			write_cache("sys-apps/C-1", "System tools")
+			cache_dir = os.path.join(cache.location, "sys-apps")
+			st = os.stat(cache_dir)
+			os.utime(cache_dir, (st.st_atime, st.st_mtime + 10))
+			self.assertEqual(match("util"), [])
+			self.assertEqual(match("tools"), ["sys-apps/C"])
+			self.assertEqual(match("librar"), ["dev-libs/A", "dev-libs/B"])
+
+			# Packages with ebuilds that were modified since they were
+			# indexed are always candidates.
+			os.utime(ebuild_path("dev-libs/A-1"), (past + 10, past + 10))
+			self.assertEqual(match("tools"), ["dev-libs/A", "sys-apps/C"])
+			os.utime(ebuild_path("dev-libs/A-1"), (past, past))
+			self.assertEqual(match("tools"), ["sys-apps/C"])
+
+			# So are packages with added ebuilds, and new packages.
+			for cpv in ("dev-libs/B-2", "dev-libs/D-1"):
+				path = ebuild_path(cpv)
+				if not os.path.isdir(os.path.dirname(path)):
+					os.makedirs(os.path.dirname(path))
+				with open(path, "w") as f:
+					f.write("EAPI=0\n")
+			self.assertEqual(match("tools"),
+				["dev-libs/B", "dev-libs/D", "sys-apps/C"])
+
+			# Without a pregenerated cache, the repository is not covered.
+			del portdb._pregen_auxdb[portdir]
+			index = SearchIndex(portdb, filename)
+			self.assertEqual(index.update(), set())
+			self.assertEqual(index.match_description(re.compile("librar")),
+				set())
+		finally:
+			playground.cleanup()
@@ -0,0 +1,70 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import portage
+from portage import os
+from portage import shutil
+from portage.dbapi._VdbAuxCache import VdbAuxCache
+from portage.tests import TestCase
+from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+
+class VdbAuxCacheTestCase(TestCase):
+
+	def _must_skip(self):
+		try:
+			__import__("sqlite3")
+		except ImportError:
+			try:
+				__import__("pysqlite2.dbapi2")
+			except ImportError:
+				return "sqlite is not available"
+		if portage.data.secpass < 2 or os.environ.get("SANDBOX_ON") == "1":
+			return "the cache is only written with superuser privileges"
+
+	def testVdbAuxCache(self):
+
+		installed = {
+			"dev-libs/A-1": {"EAPI": "5", "SLOT": "1"},
+			"dev-libs/B-1": {"EAPI": "5", "SLOT": "0"},
+		}
+
+		playground = ResolverPlayground(installed=installed)
+		try:
+			vardb = playground.trees[playground.eroot]["vartree"].dbapi
+			for cpv in sorted(installed):
+				self.assertEqual(vardb.aux_get(cpv, ["SLOT"]),
+					[installed[cpv]["SLOT"]])
+			self.assertEqual(vardb._aux_cache.modified,
+				set(installed))
+
+			vardb.flush_cache()
+			skip_reason = self._must_skip()
+			if skip_reason:
+				self.portage_skip = skip_reason
+				self.assertFalse(True, skip_reason)
+				return
+
+			# The cache has been written, so a fresh instance
+			# must be able to load individual entries from it.
+			self.assertEqual(vardb._aux_cache.modified, set())
+			aux_cache = VdbAuxCache(vardb._aux_cache_filename)
+			mtime, metadata = aux_cache.get("dev-libs/A-1")
+			self.assertEqual(mtime, os.stat(
+				vardb.getpath("dev-libs/A-1")).st_mtime)
+			self.assertEqual(metadata["SLOT"], "1")
+			self.assertEqual(metadata["EAPI"], "5")
+
+			# Entries of uninstalled packages are discarded.
+			shutil.rmtree(vardb.getpath("dev-libs/B-1"))
+			vardb._clear_cache()
+			vardb.cpv_all(use_cache=0)
+			vardb.aux_get("dev-libs/A-1", ["SLOT"])
+			vardb._aux_cache["dev-libs/A-1"] = \
+				vardb._aux_cache.get("dev-libs/A-1")
+			vardb.flush_cache()
+			aux_cache = VdbAuxCache(vardb._aux_cache_filename)
+			self.assertEqual(aux_cache.get("dev-libs/B-1"), None)
+			self.assertEqual(aux_cache.get("dev-libs/A-1")[1]["SLOT"],
+				"1")
+		finally:
+			playground.cleanup()
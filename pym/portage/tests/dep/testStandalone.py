@@ -4,6 +4,17 @@
 from portage.tests import TestCase
 from portage.dep import cpvequal
 from portage.exception import PortageException
+from portage.versions import _pkg_str
+
+class _PkgLike(object):
+	"""
+	Like a Package instance, this has cpv_split and version
+	attributes, but no version_key.
+	"""
+	def __init__(self, cpv):
+		cpv = _pkg_str(cpv)
+		self.cpv_split = cpv.cpv_split
+		self.version = cpv.version
 
 class TestStandalone(TestCase):
 	""" Test some small functions portage.dep
@@ -13,6 +24,8 @@ class TestStandalone(TestCase):
 
 		test_cases = (
 			("sys-apps/portage-2.1", "sys-apps/portage-2.1", True),
+			("sys-apps/portage-2.1", "sys-apps/portage-2.1.0", False),
+			("sys-apps/portage-2.01", "sys-apps/portage-2.010", True),
 			("sys-apps/portage-2.1", "sys-apps/portage-2.0", False),
 			("sys-apps/portage-2.1", "sys-apps/portage-2.1-r1", False),
 			("sys-apps/portage-2.1-r1", "sys-apps/portage-2.1", False),
@@ -31,6 +44,9 @@ class TestStandalone(TestCase):
 		for cpv1, cpv2, expected_result in test_cases:
 			self.assertEqual(cpvequal(cpv1, cpv2), expected_result,
 				"cpvequal('%s', '%s') != %s" % (cpv1, cpv2, expected_result))
+			if cpv1.count("/") == 1 and cpv2.count("/") == 1:
+				self.assertEqual(cpvequal(_PkgLike(cpv1), _PkgLike(cpv2)),
+					expected_result)
 
 		for cpv1, cpv2 in test_cases_xfail:
 			self.assertRaisesMsg("cpvequal(%s, %s)" % (cpv1, cpv2),
@@ -19,6 +19,7 @@ from portage.util._eventloop.global_event_loop import global_event_loop
 from _emerge.SpawnProcess import SpawnProcess
 from _emerge.EbuildBuildDir import EbuildBuildDir
 from _emerge.EbuildIpcDaemon import EbuildIpcDaemon
+from _emerge.EbuildIpcQueryDaemon import EbuildIpcQueryDaemon
 
 class SleepProcess(ForkProcess):
 	"""
@@ -139,6 +140,81 @@ class IpcDaemonTestCase(TestCase):
 				build_dir.unlock()
 			shutil.rmtree(tmpdir)
 
+	def testIpcQueryDaemon(self):
+		event_loop = global_event_loop()
+		tmpdir = tempfile.mkdtemp()
+		try:
+			build_dir = os.path.join(tmpdir, 'cat', 'pkg-1')
+			ensure_dirs(build_dir)
+			query_fifo = os.path.join(build_dir, '.ipc_query')
+			os.mkfifo(query_fifo)
+
+			env = {
+				'EAPI': '5',
+				'EPREFIX': '',
+				'PATH': os.environ.get('PATH', ''),
+				'PORTAGE_BIN_PATH': PORTAGE_BIN_PATH,
+				'PORTAGE_BUILDDIR': build_dir,
+				'PORTAGE_IPC_DAEMON': '1',
+				'ROOT': '/',
+			}
+
+			received = []
+			def has_version(argv):
+				received.append(argv)
+				if argv[2] == 'cat/pkg':
+					return ('', '', 0)
+				return ('', 'warning\n', 1)
+			def best_version(argv):
+				received.append(argv)
+				return ('%s-1\n' % argv[2], '', 0)
+			def has_version_any(argv):
+				received.append(argv)
+				installed = [x for x in argv[2:] if x.startswith('cat/pkg')]
+				return (''.join('%s\n' % x for x in installed), '',
+					0 if installed else 1)
+
+			daemon = EbuildIpcQueryDaemon(
+				commands={'has_version': has_version,
+					'best_version': best_version,
+					'has_version_any': has_version_any},
+				input_fifo=query_fifo)
+			script = """
+				source "${PORTAGE_BIN_PATH}"/isolated-functions.sh || exit 10
+				source "${PORTAGE_BIN_PATH}"/phase-helpers.sh || exit 10
+				__ebuild_ipc_query has_version / cat/pkg || exit 1
+				__ebuild_ipc_query has_version / 'cat/pkg[foo bar]' 2>/dev/null
+				[[ $? == 1 ]] || exit 2
+				[[ $(__ebuild_ipc_query has_version / cat/foo 2>&1) == warning ]] || exit 3
+				[[ $(__ebuild_ipc_query best_version / cat/pkg) == cat/pkg-1 ]] || exit 4
+				__ebuild_ipc_query foo 2>/dev/null
+				[[ $? == 3 ]] || exit 5
+				[[ $(has_version_any cat/foo 'cat/pkg[a]' cat/pkg:1) == \
+					$'cat/pkg[a]\ncat/pkg:1' ]] || exit 6
+				has_version_any cat/foo && exit 7
+				exit 0
+			"""
+			proc = SpawnProcess(args=[BASH_BINARY, '-c', script], env=env)
+			proc.addExitListener(lambda proc: daemon.cancel())
+			task_scheduler = TaskScheduler(iter([daemon, proc]),
+				max_jobs=2, event_loop=event_loop)
+			self._run(event_loop, task_scheduler, self._SCHEDULE_TIMEOUT)
+
+			self.assertEqual(proc.returncode, os.EX_OK)
+			self.assertEqual(received, [
+				['has_version', '/', 'cat/pkg'],
+				['has_version', '/', 'cat/pkg[foo bar]'],
+				['has_version', '/', 'cat/foo'],
+				['best_version', '/', 'cat/pkg'],
+				['has_version_any', '/', 'cat/foo', 'cat/pkg[a]', 'cat/pkg:1'],
+				['has_version_any', '/', 'cat/foo'],
+			])
+			# Without EBUILD_MASTER_PID, every reply fifo is removed.
+			self.assertEqual(len([x for x in os.listdir(build_dir)
+				if x.startswith('.ipc_reply_')]), 0)
+		finally:
+			shutil.rmtree(tmpdir)
+
 	def _timeout_callback(self):
 		self._timed_out = True
 
@@ -0,0 +1,73 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import portage
+from portage import os
+from portage.tests import TestCase
+from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+from portage.package.ebuild._ipc.QueryCommand import QueryCommand
+from portage.util import ensure_dirs
+
+class QueryCommandTestCase(TestCase):
+
+	def testQueryCommand(self):
+
+		installed = {
+			"dev-libs/A-1": {"SLOT": "1"},
+			"dev-libs/A-2": {"SLOT": "2"},
+			"dev-libs/B-1": {},
+		}
+
+		playground = ResolverPlayground(installed=installed)
+		try:
+			eroot = playground.eroot
+			QueryCommand._db = playground.trees
+			settings = portage.config(clone=playground.settings)
+			settings["EAPI"] = "5"
+			settings["PORTAGE_USE"] = ""
+
+			query = QueryCommand(settings, "setup")
+			self.assertEqual(query(["has_version", eroot, "dev-libs/A"]),
+				("", "", 0))
+			self.assertEqual(query(["has_version", eroot, "dev-libs/C"]),
+				("", "", 1))
+			self.assertEqual(query(["best_version", eroot, "dev-libs/A"]),
+				("dev-libs/A-2\n", "", 0))
+			self.assertEqual(query(["best_version", eroot, "dev-libs/C"]),
+				("\n", "", 0))
+
+			self.assertEqual(query(["has_version_any", eroot,
+				"dev-libs/C", "dev-libs/A:1", "dev-libs/B", ">=dev-libs/A-3"]),
+				("dev-libs/A:1\ndev-libs/B\n", "", 0))
+			self.assertEqual(query(["has_version_any", eroot,
+				"dev-libs/C", ">=dev-libs/A-3"]),
+				("", "", 1))
+			self.assertEqual(query(["best_version_many", eroot,
+				"dev-libs/A", "dev-libs/C", "dev-libs/A:1", "dev-libs/B"]),
+				("dev-libs/A-2\n\ndev-libs/A-1\ndev-libs/B-1\n", "", 0))
+			self.assertEqual(query(["best_version_many", eroot,
+				"dev-libs/A", "dev-libs/A["])[2], 2)
+
+			# Packages that are merged concurrently, as with --jobs,
+			# are visible to later queries of the same phase.
+			vdb_pkg_dir = os.path.join(playground.vdbdir, "dev-libs", "C-1")
+			ensure_dirs(vdb_pkg_dir)
+			for k, v in (("SLOT", "0"), ("COUNTER", "1")):
+				with open(os.path.join(vdb_pkg_dir, k), "w") as f:
+					f.write("%s\n" % v)
+			self.assertEqual(query(["has_version", eroot, "dev-libs/C"]),
+				("", "", 0))
+			self.assertEqual(query(["best_version", eroot, "dev-libs/C"]),
+				("dev-libs/C-1\n", "", 0))
+
+			# QA warnings are repeated for cached atoms.
+			settings["EAPI"] = "0"
+			query = QueryCommand(settings, "setup")
+			for i in range(2):
+				out, err, returncode = query(["has_version_any", eroot,
+					"dev-libs/A:1"])
+				self.assertEqual((out, returncode), ("dev-libs/A:1\n", 0))
+				self.assertTrue("QA Notice: has_version_any" in err)
+		finally:
+			QueryCommand._db = None
+			playground.cleanup()
@@ -0,0 +1,58 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from __future__ import unicode_literals
+
+import io
+import shutil
+import tempfile
+
+from portage import os
+from portage import _encodings
+from portage import _unicode_encode
+from portage.tests import TestCase
+from _emerge._build_history import _build_durations, _build_peak_rss
+
+class BuildHistoryTestCase(TestCase):
+
+	def testBuildHistory(self):
+		log_content = """\
+1000: Started emerge on: Jan 01, 1970 00:16:40
+1000:  *** emerge --jobs=2 sys-devel/llvm dev-libs/A
+1010:  >>> emerge (1 of 3) sys-devel/llvm-3.3 to /
+1011:  >>> emerge (2 of 3) dev-libs/A-1 to /
+1020:  === (2 of 3) Compiling/Merging (dev-libs/A-1::gentoo/var/tmp/a.ebuild)
+1071:  ::: completed emerge (2 of 3) dev-libs/A-1 to /
+1900:  ::: completed emerge (1 of 3) sys-devel/llvm-3.3 to /
+1901:  >>> emerge (3 of 3) dev-libs/B-1 to /
+1902:  ::: completed emerge (3 of 3) dev-libs/B-2 to /
+2000:  >>> emerge (1 of 1) dev-libs/A-2 to /
+2010:  ::: completed emerge (1 of 1) dev-libs/A-2 to /
+2100:  ::: completed emerge (1 of 1) invalid to /
+2200:  ::: peak rss sys-devel/llvm-3.3 to /: 2000000 KiB
+2300:  ::: peak rss dev-libs/A-1 to /: 5000 KiB
+2400:  ::: peak rss dev-libs/A-2 to /: 6000 KiB
+2500:  ::: peak rss invalid to /: 1 KiB
+"""
+		tmpdir = tempfile.mkdtemp()
+		try:
+			log_path = os.path.join(tmpdir, "emerge.log")
+			with io.open(_unicode_encode(log_path,
+				encoding=_encodings['fs'], errors='strict'),
+				mode='w', encoding=_encodings['content']) as f:
+				f.write(log_content)
+
+			self.assertEqual(_build_durations(log_path), {
+				"sys-devel/llvm": 890,
+				"dev-libs/A": 10,
+			})
+			self.assertEqual(_build_durations(
+				os.path.join(tmpdir, "missing.log")), {})
+			self.assertEqual(_build_peak_rss(log_path), {
+				"sys-devel/llvm": 2000000,
+				"dev-libs/A": 6000,
+			})
+			self.assertEqual(_build_peak_rss(
+				os.path.join(tmpdir, "missing.log")), {})
+		finally:
+			shutil.rmtree(tmpdir)
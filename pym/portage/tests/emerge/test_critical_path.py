@@ -0,0 +1,129 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from portage.tests import TestCase
+from portage.util.digraph import digraph
+from _emerge.Package import Package
+from _emerge.Scheduler import Scheduler
+
+def _package(cp, operation="merge", type_name="ebuild"):
+	"""
+	Create a Package with only the attributes that the Scheduler uses
+	for the critical path and the choice of packages.
+	"""
+	pkg = Package.__new__(Package)
+	pkg.cp = cp
+	pkg.type_name = type_name
+	pkg.installed = operation != "merge"
+	pkg.operation = operation
+	pkg.onlydeps = False
+	pkg._hash_key = (type_name, "/", cp + "-1", operation)
+	pkg._hash_value = hash(pkg._hash_key)
+	return pkg
+
+class CriticalPathTestCase(TestCase):
+
+	def _scheduler(self, graph, mergelist, history):
+		scheduler = Scheduler.__new__(Scheduler)
+		scheduler._digraph = graph
+		scheduler._mergelist = mergelist
+		scheduler._build_duration_history = history
+		scheduler._critical_path = {}
+		scheduler._completed_tasks = set()
+		scheduler._pending_deps = {}
+		scheduler._pending_dep_parents = {}
+		scheduler._choose_pkg_return_early = False
+		scheduler._memory_reserve = None
+		scheduler._jobs = 1
+		scheduler._resource_wait = ""
+		scheduler._pkg_queue = [pkg for pkg in mergelist
+			if pkg.operation == "merge"]
+		return scheduler
+
+	def testCriticalPath(self):
+		a = _package("dev-libs/A")
+		b = _package("dev-libs/B")
+		c = _package("dev-libs/C")
+		# Depends on a. Its duration is unknown.
+		d = _package("dev-libs/D")
+		# A circular dependency.
+		e = _package("dev-libs/E")
+		f = _package("dev-libs/F")
+		# An installed package that depends on b, which is not merged.
+		g = _package("dev-libs/G", operation="nomerge")
+		# A binary package that depends on c.
+		h = _package("dev-libs/H", type_name="binary")
+
+		graph = digraph()
+		for pkg in (a, b, c, d, e, f, g, h):
+			graph.add(pkg, None)
+		graph.add(a, d)
+		graph.add(e, f)
+		graph.add(f, e)
+		graph.add(b, g)
+		graph.add(c, h)
+
+		history = {"dev-libs/A": 100, "dev-libs/B": 1, "dev-libs/C": 5,
+			"dev-libs/H": 50}
+		scheduler = self._scheduler(graph,
+			[b, c, a, d, e, f, g, h], history)
+		scheduler._calc_critical_path()
+		critical_path = scheduler._critical_path
+
+		# Unknown durations are the median of the known ones, and
+		# binary packages take a unit of time.
+		self.assertEqual(critical_path[d], 50)
+		self.assertEqual(critical_path[a], 150)
+		self.assertEqual(critical_path[h], 1)
+		self.assertEqual(critical_path[c], 6)
+		self.assertEqual(critical_path[b], 1)
+		self.assertFalse(g in critical_path)
+		# The circular dependency is ignored for one of the packages.
+		self.assertEqual(sorted([critical_path[e], critical_path[f]]),
+			[50, 100])
+
+	def testChoosePkg(self):
+		a = _package("dev-libs/A")
+		b = _package("dev-libs/B")
+		c = _package("dev-libs/C")
+		d = _package("dev-libs/D")
+
+		graph = digraph()
+		for pkg in (a, b, c, d):
+			graph.add(pkg, None)
+		graph.add(a, d)
+
+		history = {"dev-libs/A": 100, "dev-libs/B": 1, "dev-libs/C": 5,
+			"dev-libs/D": 5}
+		scheduler = self._scheduler(graph, [b, c, a, d], history)
+		scheduler._calc_critical_path()
+
+		checked = []
+		dependent = scheduler._dependent_on_scheduled_merges
+		def dependent_on_scheduled_merges(pkg, later):
+			checked.append(pkg)
+			return dependent(pkg, later)
+		scheduler._dependent_on_scheduled_merges = \
+			dependent_on_scheduled_merges
+
+		# The longest critical path is preferred to the head of the
+		# queue even when nothing is running, and no later package is
+		# examined once none of them can have a longer one.
+		scheduler._is_work_scheduled = lambda: False
+		self.assertTrue(scheduler._choose_pkg() is a)
+		self.assertEqual(checked, [b, c, a])
+
+		scheduler._is_work_scheduled = lambda: True
+		del checked[:]
+		self.assertTrue(scheduler._choose_pkg() is c)
+		self.assertEqual(checked, [b, c])
+
+		# d waits for a to complete.
+		self.assertTrue(scheduler._choose_pkg() is b)
+		self.assertTrue(scheduler._choose_pkg() is None)
+		self.assertEqual(scheduler._pkg_queue, [d])
+
+		scheduler._choose_pkg_return_early = False
+		scheduler._completed_tasks.add(a)
+		scheduler._discard_pending_deps(a)
+		self.assertTrue(scheduler._choose_pkg() is d)
@@ -0,0 +1,106 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import random
+
+from portage.tests import TestCase
+from portage.util.digraph import digraph
+from _emerge.Package import Package
+from _emerge.Scheduler import Scheduler
+
+def _dependent_on_scheduled_merges(graph, completed_tasks, pkg, later):
+	"""
+	The traversal that Scheduler._dependent_on_scheduled_merges() did
+	before its results were memoized.
+	"""
+	traversed_nodes = set([pkg])
+	direct_deps = graph.child_nodes(pkg)
+	node_stack = direct_deps
+	direct_deps = frozenset(direct_deps)
+	while node_stack:
+		node = node_stack.pop()
+		if node in traversed_nodes:
+			continue
+		traversed_nodes.add(node)
+		if not ((node.installed and node.operation == "nomerge") or \
+			(node.operation == "uninstall" and \
+			node not in direct_deps) or \
+			node in completed_tasks or \
+			node in later):
+			return True
+
+		if node.operation != "uninstall":
+			node_stack.extend(graph.child_nodes(node))
+
+	return False
+
+def _package(i, operation, onlydeps):
+	"""
+	Create a Package with only the attributes that the Scheduler uses
+	for the dependency checks.
+	"""
+	pkg = Package.__new__(Package)
+	pkg.installed = operation != "merge"
+	pkg.operation = operation
+	pkg.onlydeps = onlydeps
+	pkg._hash_key = ("ebuild", "/", "dev-libs/P%d-1" % i, operation)
+	pkg._hash_value = hash(pkg._hash_key)
+	return pkg
+
+class PendingDepsTestCase(TestCase):
+
+	def testPendingDeps(self):
+		"""
+		Compare the memoized Scheduler._dependent_on_scheduled_merges()
+		with the full traversal on random graphs, while tasks complete
+		and root nodes are pruned, and check that the memoized data
+		only refers to nodes that are still in the graph.
+		"""
+		rand = random.Random(0)
+
+		for i in range(50):
+			graph = digraph()
+			pkgs = []
+			for j in range(30):
+				pkg = _package(j,
+					rand.choice(("merge", "merge", "nomerge", "uninstall")),
+					rand.random() < 0.1)
+				pkgs.append(pkg)
+				graph.add(pkg, None)
+				for child in rand.sample(pkgs[:-1], min(j, rand.randint(0, 3))):
+					graph.add(child, pkg, priority=rand.randint(0, 3))
+
+			scheduler = Scheduler.__new__(Scheduler)
+			scheduler._digraph = graph
+			scheduler._completed_tasks = set()
+			scheduler._pending_deps = {}
+			scheduler._pending_dep_parents = {}
+
+			for j in range(60):
+				nodes = graph.all_nodes()
+				if not nodes:
+					break
+				op = rand.randint(0, 5)
+				if op == 0:
+					# Like Scheduler._task_complete().
+					pkg = rand.choice(nodes)
+					scheduler._completed_tasks.add(pkg)
+					scheduler._discard_pending_deps(pkg)
+				elif op == 1:
+					scheduler._prune_digraph()
+					for pkg, deps in scheduler._pending_deps.items():
+						self.assertTrue(pkg in graph)
+						for dep in deps:
+							self.assertTrue(dep in graph)
+					for dep, parents in scheduler._pending_dep_parents.items():
+						self.assertTrue(dep in graph)
+						for parent in parents:
+							self.assertTrue(parent in graph)
+				else:
+					pkg = rand.choice(nodes)
+					later = set(rand.sample(nodes,
+						rand.randint(0, len(nodes))))
+					self.assertEqual(
+						scheduler._dependent_on_scheduled_merges(pkg, later),
+						_dependent_on_scheduled_merges(graph,
+						scheduler._completed_tasks, pkg, later))
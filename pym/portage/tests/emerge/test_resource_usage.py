@@ -0,0 +1,78 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import subprocess
+
+from portage import os
+from portage.tests import TestCase
+from _emerge._resource_usage import (_mem_available, _parse_meminfo,
+	_parse_pressure, _parse_proc_stat, _process_tree_rss)
+
+class ResourceUsageTestCase(TestCase):
+
+	def testParseMeminfo(self):
+		meminfo = """MemTotal:        8056452 kB
+MemFree:          370944 kB
+MemAvailable:    5207712 kB
+Buffers:          312248 kB
+Cached:          4233564 kB
+SwapCached:            0 kB
+""".splitlines()
+		self.assertEqual(_parse_meminfo(meminfo), 5207712)
+
+		# Kernels older than 3.14 do not provide MemAvailable.
+		meminfo = [line for line in meminfo
+			if not line.startswith("MemAvailable:")]
+		self.assertEqual(_parse_meminfo(meminfo),
+			370944 + 312248 + 4233564)
+
+		self.assertRaises(OSError, _parse_meminfo, meminfo[:2])
+		self.assertRaises(OSError, _parse_meminfo, ["MemFree: x kB"])
+
+	def testParsePressure(self):
+		pressure = """some avg10=12.50 avg60=3.01 avg300=0.62 total=4513200
+full avg10=1.25 avg60=0.40 avg300=0.08 total=1180043
+""".splitlines()
+		self.assertEqual(_parse_pressure(pressure), 12.5)
+		self.assertEqual(_parse_pressure(pressure[:1]), 12.5)
+		self.assertRaises(OSError, _parse_pressure, pressure[1:])
+		self.assertRaises(OSError, _parse_pressure,
+			["some avg10=x avg60=0.00"])
+
+	def testParseProcStat(self):
+		# The command name may contain spaces and parentheses.
+		stat = (b"4242 (a) b (c)) S 4200 4242 4200 34817 4242 4194304 "
+			b"1107 0 0 0 2 0 0 0 20 0 1 0 8262017 10334208 1536 "
+			b"18446744073709551615 1 1 0 0 0 0 0 0 0 0 0 0 17 3 0 0 0 0 0\n")
+		self.assertEqual(_parse_proc_stat(stat), (4200, 1536))
+		self.assertRaises(ValueError, _parse_proc_stat, b"4242 (a) S 1")
+
+	def testProcessTreeRss(self):
+		if not os.path.isfile("/proc/meminfo"):
+			self.portage_skip = "/proc is unavailable"
+			self.assertFalse(True, self.portage_skip)
+
+		self.assertTrue(_mem_available() > 0)
+
+		pid = os.getpid()
+		own_rss = _process_tree_rss([pid])[pid]
+		self.assertTrue(own_rss > 0)
+
+		# The child exits as soon as its stdin is closed.
+		child = subprocess.Popen(["cat"],
+			stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+		try:
+			# Wait until the child echoes a line, which means that it
+			# has called exec, so that its rss is its own.
+			child.stdin.write(b"\n")
+			child.stdin.flush()
+			child.stdout.readline()
+			totals = _process_tree_rss([pid, child.pid])
+			self.assertTrue(totals[child.pid] > 0)
+			self.assertTrue(totals[pid] > totals[child.pid])
+		finally:
+			child.stdin.close()
+			child.wait()
+			child.stdout.close()
+
+		self.assertEqual(_process_tree_rss([child.pid]), {child.pid: 0})
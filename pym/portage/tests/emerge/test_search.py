@@ -0,0 +1,83 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import sys
+import time
+
+from portage import os
+from portage.eclass_cache import hashed_path
+from portage.tests import TestCase
+from portage.tests.resolver.ResolverPlayground import ResolverPlayground
+from _emerge.search import search
+
+class SearchTestCase(TestCase):
+
+	def testSearchDescStaleCache(self):
+		"""
+		Test that emerge --searchdesc finds packages with ebuilds that
+		were modified without updating the pregenerated cache, which
+		the search index is built from.
+		"""
+
+		ebuilds = {
+			"dev-libs/A-1": {"DESCRIPTION": "A library for parsing XML"},
+			"dev-libs/B-1": {"DESCRIPTION": "Bindings for the foo library"},
+			"sys-apps/C-1": {"DESCRIPTION": "System utilities"},
+		}
+
+		playground = ResolverPlayground(ebuilds=ebuilds)
+		try:
+			settings = playground.settings
+			root_config = playground.trees[playground.eroot]["root_config"]
+			portdb = root_config.trees["porttree"].dbapi
+			portdir = settings["PORTDIR"]
+			repo_config = settings.repositories.get_repo_for_location(portdir)
+			cache = repo_config.get_pregenerated_cache(portdb._known_keys,
+				readonly=False, force=True)
+
+			past = int(time.time()) - 100
+			for cpv, metadata in ebuilds.items():
+				cat, pf = cpv.split("/")
+				ebuild_path = os.path.join(portdir, cat, pf.split("-")[0],
+					pf + ".ebuild")
+				os.utime(ebuild_path, (past, past))
+				os.utime(os.path.dirname(ebuild_path), (past, past))
+				ebuild_hash = hashed_path(ebuild_path)
+				cache[cpv] = {"DESCRIPTION": metadata["DESCRIPTION"],
+					"EAPI": "0", "KEYWORDS": "x86", "SLOT": "0",
+					"_%s_" % cache.validation_chf:
+					getattr(ebuild_hash, cache.validation_chf),
+					"_eclasses_": {}}
+			portdb._pregen_auxdb[portdir] = cache
+
+			def desc_matches(key):
+				searcher = search(root_config, None, True, False,
+					False, False)
+				stdout = sys.stdout
+				sys.stdout = open(os.devnull, "w")
+				try:
+					searcher.execute(key)
+				finally:
+					sys.stdout.close()
+					sys.stdout = stdout
+				return sorted(cpv for cpv, masked in searcher.matches["desc"])
+
+			self.assertEqual(desc_matches("library"),
+				["dev-libs/A-1", "dev-libs/B-1"])
+			self.assertEqual(desc_matches("fast"), [])
+
+			# Modify an ebuild, but not the pregenerated cache. Only the
+			# mtime of the ebuild itself tells that it was modified.
+			ebuild_path = os.path.join(portdir, "dev-libs", "A", "A-1.ebuild")
+			with open(ebuild_path, "w") as f:
+				f.write("EAPI=\"0\"\nDESCRIPTION=\"A fast XML parser\"\n"
+					"KEYWORDS=\"x86\"\nSLOT=\"0\"\n")
+			playground._create_ebuild_manifests({"dev-libs/A-1": {}})
+			os.utime(ebuild_path, (past + 10, past + 10))
+			os.utime(os.path.dirname(ebuild_path), (past, past))
+			portdb.melt()
+			portdb.freeze()
+			self.assertEqual(desc_matches("fast"), ["dev-libs/A-1"])
+			self.assertEqual(desc_matches("library"), ["dev-libs/B-1"])
+		finally:
+			playground.cleanup()
@@ -237,6 +237,11 @@ pkg_preinst() {
 			emerge_cmd + ("-p", "dev-libs/B"),
 			emerge_cmd + ("-B", "dev-libs/B",),
 			emerge_cmd + ("--oneshot", "--usepkg", "dev-libs/B",),
+			emerge_cmd + ("--oneshot", "--jobs", "2",
+				"--jobs-order", "critical-path", "dev-libs/B",),
+			emerge_cmd + ("--oneshot", "--jobs", "2",
+				"--memory-reserve", "0", "--max-pressure", "90",
+				"dev-libs/B",),
 
 			# trigger clean prior to pkg_pretend as in bug #390711
 			ebuild_cmd + (test_ebuild, "unpack"), 
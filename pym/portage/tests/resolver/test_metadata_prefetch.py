@@ -0,0 +1,87 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from portage.tests import TestCase
+from portage.tests.resolver.ResolverPlayground import (ResolverPlayground,
+	ResolverPlaygroundTestCase)
+from _emerge.depgraph import depgraph
+
+class MetadataPrefetchTestCase(TestCase):
+
+	def testMetadataPrefetch(self):
+
+		ebuilds = {
+			"dev-libs/A-1": {"EAPI": "5", "IUSE": "foo",
+				"RDEPEND": "dev-libs/B foo? ( dev-libs/C )"},
+			"dev-libs/B-1": {"EAPI": "5",
+				"RDEPEND": "|| ( dev-libs/D dev-libs/E ) !dev-libs/F"},
+			"dev-libs/B-2": {"EAPI": "5", "KEYWORDS": "~x86",
+				"RDEPEND": "dev-libs/D"},
+			"dev-libs/C-1": {},
+			"dev-libs/D-1": {"DEPEND": "dev-libs/E"},
+			"dev-libs/E-1": {},
+			"dev-libs/F-1": {},
+		}
+
+		# The dependencies of dev-libs/A and their dependencies, except
+		# for the USE-conditional dev-libs/C and the blocker dev-libs/F.
+		prefetch = ["dev-libs/B-1", "dev-libs/B-2", "dev-libs/D-1",
+			"dev-libs/E-1"]
+
+		test_cases = (
+			(ResolverPlaygroundTestCase(
+				["dev-libs/A"],
+				options={"--jobs": 3},
+				success=True,
+				mergelist=["dev-libs/E-1", "dev-libs/D-1",
+					"dev-libs/B-1", "dev-libs/A-1"]), prefetch),
+
+			(ResolverPlaygroundTestCase(
+				["dev-libs/A"],
+				options={"--jobs": 3, "--autounmask": "n"},
+				success=True,
+				mergelist=["dev-libs/E-1", "dev-libs/D-1",
+					"dev-libs/B-1", "dev-libs/A-1"]), prefetch),
+
+			# Without parallel jobs, nothing is prefetched.
+			(ResolverPlaygroundTestCase(
+				["dev-libs/A"],
+				success=True,
+				mergelist=["dev-libs/E-1", "dev-libs/D-1",
+					"dev-libs/B-1", "dev-libs/A-1"]), []),
+		)
+
+		prefetched = []
+		metadata_prefetch_procs = depgraph._metadata_prefetch_procs
+
+		def _metadata_prefetch_procs(self, pkgs):
+			for proc in metadata_prefetch_procs(self, pkgs):
+				prefetched.append(proc.cpv)
+				yield proc
+
+		playground = ResolverPlayground(ebuilds=ebuilds)
+		portdb = playground.trees[playground.eroot]["porttree"].dbapi
+		depgraph._metadata_prefetch_procs = _metadata_prefetch_procs
+		try:
+			for test_case, expected_prefetch in test_cases:
+				# Ensure that the metadata needs to be generated.
+				for auxdb in portdb.auxdb.values():
+					for cpv in list(auxdb):
+						del auxdb[cpv]
+				portdb._aux_cache.clear()
+				del prefetched[:]
+				playground.run_TestCase(test_case)
+				self.assertEqual(test_case.test_success, True,
+					test_case.fail_msg)
+				# Each ebuild is sourced at most once.
+				self.assertEqual(sorted(prefetched), expected_prefetch)
+				# The prefetched metadata was written to the cache.
+				for cpv in expected_prefetch:
+					for auxdb in portdb.auxdb.values():
+						if cpv in auxdb:
+							break
+					else:
+						self.fail("%s is not in the metadata cache" % cpv)
+		finally:
+			depgraph._metadata_prefetch_procs = metadata_prefetch_procs
+			playground.cleanup()
@@ -0,0 +1,51 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import tempfile
+
+from portage import os
+from portage import shutil
+from portage.checksum import (hashfunc_map, perform_checksum,
+	perform_multiple_checksums, verify_all)
+from portage.exception import DigestException
+from portage.tests import TestCase
+
+class ChecksumTestCase(TestCase):
+
+	def setUp(self):
+		self._tmpdir = tempfile.mkdtemp()
+		self._path = os.path.join(self._tmpdir, "distfile")
+		# Span several HASHING_BLOCKSIZE reads, with a partial block
+		# at the end.
+		with open(self._path, 'wb') as f:
+			f.write(b"portage" * 20000)
+
+	def tearDown(self):
+		shutil.rmtree(self._tmpdir)
+
+	def testPerformMultipleChecksums(self):
+		hashes = [k for k in hashfunc_map if k != "size"]
+		digests = perform_multiple_checksums(self._path, hashes=hashes)
+		self.assertEqual(sorted(digests), sorted(hashes))
+		for k in hashes:
+			self.assertEqual(digests[k],
+				perform_checksum(self._path, k)[0])
+
+		digests = perform_multiple_checksums(self._path,
+			hashes=["MD5", "size"])
+		self.assertEqual(digests["size"], os.stat(self._path).st_size)
+
+	def testVerifyAll(self):
+		hashes = ["MD5", "SHA1", "SHA256", "SHA512"]
+		digests = perform_multiple_checksums(self._path, hashes=hashes)
+		digests["size"] = os.stat(self._path).st_size
+		self.assertEqual(verify_all(self._path, digests)[0], True)
+
+		bad_digests = dict(digests)
+		bad_digests["SHA256"] = "0" * 64
+		ok, reason = verify_all(self._path, bad_digests)
+		self.assertEqual(ok, False)
+		self.assertEqual(reason,
+			("Failed on SHA256 verification", digests["SHA256"], "0" * 64))
+		self.assertRaises(DigestException, verify_all,
+			self._path, bad_digests, strict=1)
@@ -235,3 +235,62 @@ class DigraphTest(TestCase):
 		self.assertEqual(g.root_nodes(), ["B"])
 		self.assertEqual(g.root_nodes(ignore_priority=always_false), ["B"])
 		self.assertEqual(g.root_nodes(ignore_priority=always_true), ["A", "B"])
+
+	def testDigraphIndexPriorities(self):
+		"""
+		An indexed graph must return the same leaf and root nodes as an
+		unindexed one, after any sequence of modifications.
+		"""
+		import random
+
+		def ignore_odd(priority):
+			return priority % 2 == 1
+
+		ignore_priorities = (None, 1, ignore_odd)
+		rand = random.Random(0)
+		nodes = list(range(30))
+
+		for i in range(20):
+			g = digraph()
+			for j in range(40):
+				g.add(rand.choice(nodes), rand.choice(nodes),
+					priority=rand.randint(0, 3))
+			indexed = g.clone()
+			indexed.index_priorities(ignore_priorities)
+
+			for j in range(60):
+				op = rand.randint(0, 4)
+				if op == 0:
+					node = rand.choice(nodes)
+					parent = rand.choice(nodes + [None])
+					priority = rand.randint(0, 3)
+					g.add(node, parent, priority=priority)
+					indexed.add(node, parent, priority=priority)
+				elif op == 1 and g:
+					node = rand.choice(g.order)
+					g.remove(node)
+					indexed.remove(node)
+				elif op == 2 and g:
+					removed = rand.sample(g.order, min(3, len(g.order)))
+					g.difference_update(removed)
+					indexed.difference_update(removed)
+				elif op == 3 and g:
+					child = rand.choice(g.order)
+					parents = g.parent_nodes(child)
+					if parents:
+						parent = rand.choice(parents)
+						g.remove_edge(child, parent)
+						indexed.remove_edge(child, parent)
+				else:
+					leaves = g.leaf_nodes()
+					g.difference_update(leaves)
+					indexed.difference_update(leaves)
+
+				self.assertEqual(indexed.order, g.order)
+				for ignore_priority in ignore_priorities:
+					self.assertEqual(
+						indexed.leaf_nodes(ignore_priority=ignore_priority),
+						g.leaf_nodes(ignore_priority=ignore_priority))
+					self.assertEqual(
+						indexed.root_nodes(ignore_priority=ignore_priority),
+						g.root_nodes(ignore_priority=ignore_priority))
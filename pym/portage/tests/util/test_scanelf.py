@@ -0,0 +1,106 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import shutil
+import struct
+import tempfile
+
+from portage import os
+from portage.tests import TestCase
+from portage.util._dyn_libs.scanelf import scan_elf, scan_elf_tree
+
+def _make_elf(elf_class, byte_order, machine, dynamic):
+	"""
+	Build a minimal ELF object with one PT_LOAD segment, which is mapped
+	at a non-zero address, and a PT_DYNAMIC segment containing the given
+	(tag, string) entries.
+	"""
+	if elf_class == 1:
+		ehdr = struct.Struct(byte_order + "16sHHIIIIIHHHHHH")
+		phdr = struct.Struct(byte_order + "IIIIIIII")
+		dyn = struct.Struct(byte_order + "iI")
+	else:
+		ehdr = struct.Struct(byte_order + "16sHHIQQQIHHHHHH")
+		phdr = struct.Struct(byte_order + "IIQQQQQQ")
+		dyn = struct.Struct(byte_order + "qQ")
+
+	vaddr = 0x400000
+	strtab = b"\0"
+	entries = []
+	for tag, value in dynamic:
+		entries.append((tag, len(strtab)))
+		strtab += value.encode("utf_8") + b"\0"
+
+	dyn_offset = ehdr.size + 2 * phdr.size
+	strtab_offset = dyn_offset + (len(entries) + 2) * dyn.size
+	size = strtab_offset + len(strtab)
+	entries.append((5, vaddr + strtab_offset))
+	entries.append((0, 0))
+
+	ident = b"\x7fELF" + struct.pack("BBB", elf_class,
+		1 if byte_order == "<" else 2, 1) + b"\0" * 9
+	data = ehdr.pack(ident, 3, machine, 1, 0, ehdr.size, 0, 0,
+		ehdr.size, phdr.size, 2, 0, 0, 0)
+	if elf_class == 1:
+		data += phdr.pack(1, 0, vaddr, vaddr, size, size, 5, 0x1000)
+		data += phdr.pack(2, dyn_offset, vaddr + dyn_offset,
+			vaddr + dyn_offset, size - dyn_offset, size - dyn_offset, 6, 4)
+	else:
+		data += phdr.pack(1, 5, 0, vaddr, vaddr, size, size, 0x1000)
+		data += phdr.pack(2, 6, dyn_offset, vaddr + dyn_offset,
+			vaddr + dyn_offset, size - dyn_offset, size - dyn_offset, 8)
+	for tag, value in entries:
+		data += dyn.pack(tag, value)
+	return data + strtab
+
+class ScanElfTestCase(TestCase):
+
+	def testScanElf(self):
+		tmpdir = tempfile.mkdtemp()
+		try:
+			cases = (
+				((2, "<", 62), [(14, "libA.so.1"), (1, "libc.so.6")],
+					"EM_X86_64;usr/lib64/libA.so.1;libA.so.1;;libc.so.6"),
+				((1, "<", 3), [(15, "/opt/a"), (1, "libA.so.1"),
+					(1, "libc.so.6")],
+					"EM_386;usr/lib/b;;/opt/a;libA.so.1,libc.so.6"),
+				((1, ">", 20), [(29, "$ORIGIN"), (15, "$ORIGIN"),
+					(1, "libc.so.6")],
+					"EM_PPC;usr/lib/c;;$ORIGIN;libc.so.6"),
+				((2, ">", 43), [(15, "/a"), (29, "/b")],
+					"EM_SPARCV9;usr/lib/d;;{/a,/b};"),
+				((2, "<", 0xffff), [(14, "libE.so")],
+					"UNKNOWN_TYPE;usr/lib/e;libE.so;;"),
+			)
+			expected = []
+			for (elf_class, byte_order, machine), dynamic, line in cases:
+				path = os.path.join(tmpdir, line.split(";")[1])
+				if not os.path.isdir(os.path.dirname(path)):
+					os.makedirs(os.path.dirname(path))
+				with open(path, "wb") as f:
+					f.write(_make_elf(elf_class, byte_order, machine, dynamic))
+				elf = scan_elf(path)
+				self.assertEqual(elf.scanelf_line(line.split(";")[1]), line)
+				expected.append(line)
+
+			self.assertEqual(scan_elf(os.path.join(tmpdir,
+				"usr/lib64/libA.so.1")).needed_elf_2_line("/usr/lib64/libA.so.1"),
+				"X86_64;/usr/lib64/libA.so.1;libA.so.1;;libc.so.6")
+
+			# Files without dynamic linking information, files that
+			# are not ELF objects, and symlinks are skipped.
+			static_path = os.path.join(tmpdir, "usr/bin/static")
+			os.makedirs(os.path.dirname(static_path))
+			with open(static_path, "wb") as f:
+				f.write(_make_elf(2, "<", 62, []))
+			with open(os.path.join(tmpdir, "usr/bin/script"), "wb") as f:
+				f.write(b"#!/bin/sh\n" + b"\0" * 100)
+			os.symlink("libA.so.1", os.path.join(tmpdir, "usr/lib64/libA.so"))
+			self.assertEqual(scan_elf(static_path), None)
+			self.assertEqual(scan_elf(os.path.join(tmpdir, "missing")), None)
+
+			top = os.path.join(tmpdir, "")
+			self.assertEqual(sorted(elf.scanelf_line(path[len(top):])
+				for path, elf in scan_elf_tree(top)), sorted(expected))
+		finally:
+			shutil.rmtree(tmpdir)
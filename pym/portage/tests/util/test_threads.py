@@ -0,0 +1,57 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import threading
+import time
+
+from portage.tests import TestCase
+from portage.util._threads import thread_imap
+
+class ThreadImapTestCase(TestCase):
+
+	def testThreadImap(self):
+		self.assertEqual(list(thread_imap(lambda x: x * 2, range(100), 4)),
+			[x * 2 for x in range(100)])
+		self.assertEqual(list(thread_imap(lambda x: x * 2, range(100), 1)),
+			[x * 2 for x in range(100)])
+
+		def fail(x):
+			if x == 5:
+				raise ValueError(x)
+			return x
+
+		results = []
+		try:
+			for x in thread_imap(fail, range(10), 4):
+				results.append(x)
+		except ValueError:
+			pass
+		else:
+			self.assertTrue(False, "ValueError not raised")
+		self.assertEqual(results, [0, 1, 2, 3, 4])
+
+	def testReadAhead(self):
+		"""
+		Test that the threads do not get more than 2 * max_threads
+		items ahead of a slow consumer.
+		"""
+		max_threads = 4
+		lock = threading.Lock()
+		started = []
+
+		def func(x):
+			with lock:
+				started.append(x)
+			return x
+
+		consumed = 0
+		max_ahead = 0
+		for x in thread_imap(func, range(50), max_threads):
+			consumed += 1
+			# Give the threads time to run ahead.
+			time.sleep(0.01)
+			with lock:
+				max_ahead = max(max_ahead, len(started) - consumed)
+		self.assertEqual(consumed, 50)
+		self.assertTrue(max_ahead <= 2 * max_threads, max_ahead)
+		self.assertTrue(max_ahead > 0)
@@ -1,4 +1,4 @@
-# Copyright 2011 Gentoo Foundation
+# Copyright 2011-2013 Gentoo Foundation
 # Distributed under the terms of the GNU General Public License v2
 
 import subprocess
@@ -7,6 +7,39 @@ import portage
 from portage import os
 from portage.const import PORTAGE_PYM_PATH
 from portage.tests import TestCase
+from portage.util.whirlpool import Whirlpool
+
+# Test vectors from the ISO/IEC 10118-3 reference implementation.
+_iso_vectors = (
+	(b"",
+	"19fa61d75522a4669b44e39c1d2e1726c530232130d407f89afee0964997f7a7"
+	"3e83be698b288febcf88e3e03c4f0757ea8964e59b63d93708b138cc42a66eb3"),
+	(b"a",
+	"8aca2602792aec6f11a67206531fb7d7f0dff59413145e6973c45001d0087b42"
+	"d11bc645413aeff63a42391a39145a591a92200d560195e53b478584fdae231a"),
+	(b"abc",
+	"4e2448a4c6f486bb16b6562c73b4020bf3043e3a731bce721ae1b303d97e6d4c"
+	"7181eebdb6c57e277d0e34957114cbd6c797fc9d95d8b582d225292076d4eef5"),
+	(b"message digest",
+	"378c84a4126e2dc6e56dcc7458377aac838d00032230f53ce1f5700c0ffb4d3b"
+	"8421557659ef55c106b4b52ac5a4aaa692ed920052838f3362e86dbd37a8903e"),
+	(b"abcdefghijklmnopqrstuvwxyz",
+	"f1d754662636ffe92c82ebb9212a484a8d38631ead4238f5442ee13b8054e41b"
+	"08bf2a9251c30b6a0b8aae86177ab4a6f68f673e7207865d5d9819a3dba4eb3b"),
+	(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789",
+	"dc37e008cf9ee69bf11f00ed9aba26901dd7c28cdec066cc6af42e40f82f3a1e"
+	"08eba26629129d8fb7cb57211b9281a65517cc879d7b962142c65f5a7af01467"),
+	(b"1234567890" * 8,
+	"466ef18babb0154d25b9d38a6414f5c08784372bccb204d6549c4afadb601429"
+	"4d5bd8df2a6c44e538cd047b2681a51a2c60481e88c5a20b2c2a80cf3a9a083b"),
+	(b"abcdbcdecdefdefgefghfghighijhijk",
+	"2a987ea40f917061f5d6f0a0e4644f488a7a5a52deee656207c562f988e95c69"
+	"16bdc8031bc5be1b7b947639fe050b56939baaa0adff9ae6745b7b181c3be3fd"),
+)
+
+_million_a = (b"a" * 1000000,
+	"0c99005beb57eff50a7cf005560ddf5d29057fd86b20bfd62deca0f1ccea4af5"
+	"1fc15490eddc47af32bb2b66c34ff9ad8c6008ad677f77126953b226e4ed8b01")
 
 class WhirlpoolTestCase(TestCase):
 	def testBundledWhirlpool(self):
@@ -14,3 +47,34 @@ class WhirlpoolTestCase(TestCase):
 		retval = subprocess.call([portage._python_interpreter, "-Wd",
 			os.path.join(PORTAGE_PYM_PATH, "portage/util/whirlpool.py")])
 		self.assertEqual(retval, os.EX_OK)
+
+	def testIsoVectors(self):
+		for data, digest in _iso_vectors:
+			self.assertEqual(Whirlpool(data).hexdigest(), digest)
+
+	def testSplitUpdates(self):
+		# The long vector is only hashed once, since this implementation
+		# is slow, in pieces that are not a multiple of the block size.
+		data, digest = _million_a
+		w = Whirlpool()
+		for i in range(0, len(data), 4099):
+			w.update(data[i:i+4099])
+		self.assertEqual(w.hexdigest(), digest)
+
+		# Feed the input in pieces that do not line up with the 64 byte
+		# blocks, so that partial blocks are buffered across update() calls.
+		for data, digest in _iso_vectors:
+			for chunk_size in (1, 7, 63, 64, 65):
+				w = Whirlpool()
+				for i in range(0, len(data), chunk_size):
+					w.update(data[i:i+chunk_size])
+				self.assertEqual(w.hexdigest(), digest,
+					"chunk size %d" % chunk_size)
+
+		# digest() must not disturb the state used by later update() calls.
+		data, digest = _iso_vectors[6]
+		w = Whirlpool(data[:40])
+		w.digest()
+		w.copy().digest()
+		w.update(data[40:])
+		self.assertEqual(w.hexdigest(), digest)
@@ -3,7 +3,7 @@
 # Distributed under the terms of the GNU General Public License v2
 
 from portage.tests import TestCase
-from portage.versions import vercmp
+from portage.versions import vercmp, _get_version_key
 
 class VerCmpTestCase(TestCase):
 	""" A simple testCase for portage.versions.vercmp()
@@ -82,3 +82,27 @@ class VerCmpTestCase(TestCase):
 		]
 		for test in tests:
 			self.assertFalse(vercmp(test[0], test[1]) == 0, msg="%s == %s? Wrong!" % (test[0], test[1]))
+
+	def testVersionKey(self):
+		"""
+		Keys must order every pair of versions exactly like vercmp().
+		"""
+		versions = ["0", "00", "0.0", "01", "1", "1.0", "1.00", "1.0.0",
+			"1.01", "1.010", "1.02", "1.1", "1.10", "1.2", "1.0b", "1b",
+			"1.1b", "1a", "12.2.5", "12.2b", "1_alpha", "1_alpha1",
+			"1_beta", "1_beta2", "1_pre", "1_pre0", "1_rc1", "1_p", "1_p0",
+			"1_p1", "1_p1_alpha", "1_alpha_p1", "1_alpha1_beta2",
+			"1b_p1", "2", "10", "cvs.1", "cvs.9999", "9999",
+			"999999999999999999999999999999", "1.001000000000000000001"]
+		versions.extend([v + "-r1" for v in versions])
+		versions.extend(["1-r0", "1.0-r0", "1-r01", "1-r10"])
+
+		self.assertEqual(_get_version_key("1.0-"), None)
+		for v1 in versions:
+			for v2 in versions:
+				expected = vercmp(v1, v2)
+				expected = (expected > 0) - (expected < 0)
+				key1 = _get_version_key(v1)
+				key2 = _get_version_key(v2)
+				self.assertEqual((key1 > key2) - (key1 < key2), expected,
+					msg="%s <=> %s" % (v1, v2))
@@ -0,0 +1,41 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+import shutil
+import tempfile
+
+from portage import os
+from portage.tests import TestCase
+from portage.xpak import get_tbz2_data, tbz2, xpak_mem
+
+class GetTbz2DataTestCase(TestCase):
+
+	def testGetTbz2Data(self):
+		tmpdir = tempfile.mkdtemp()
+		try:
+			tbz2_path = os.path.join(tmpdir, "A-1.tbz2")
+			with open(tbz2_path, "wb") as f:
+				f.write(b"\0" * 1000)
+			metadata = {
+				"CATEGORY": "dev-libs\n",
+				"PF": "A-1\n",
+				"DESCRIPTION": "x" * 5000,
+			}
+			tbz2(tbz2_path).recompose_mem(xpak_mem(metadata))
+			expected = tbz2(tbz2_path).get_data()
+			self.assertEqual(len(expected), 3)
+
+			# The xpak segment fits in the tail, does not fit in the
+			# tail, and is the whole tail.
+			for tail_size in (65536, 100, 16):
+				self.assertEqual(
+					get_tbz2_data(tbz2_path, tail_size=tail_size), expected)
+
+			not_tbz2_path = os.path.join(tmpdir, "B-1.tbz2")
+			with open(not_tbz2_path, "wb") as f:
+				f.write(b"\0" * 1000)
+			self.assertEqual(get_tbz2_data(not_tbz2_path), {})
+			self.assertEqual(
+				get_tbz2_data(os.path.join(tmpdir, "C-1.tbz2")), {})
+		finally:
+			shutil.rmtree(tmpdir)
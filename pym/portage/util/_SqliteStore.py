@@ -0,0 +1,127 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from __future__ import unicode_literals
+
+import portage
+from portage import os
+from portage import _unicode_decode
+from portage.data import portage_gid, secpass
+from portage.util import apply_secpass_permissions, ensure_dirs
+
+class SqliteStore(object):
+	"""
+	Base class for persistent sqlite databases that only serve to speed
+	up queries, so that they can be reset at any time. The database is
+	opened by _connect() when it is first needed, and it is reset with
+	_create_tables() if its schema version differs from _version. It is
+	only modified when the current user has superuser privileges.
+
+	If sqlite is unavailable, or if the database can not be opened,
+	_connect() returns None. Subclasses call _disable() when a query
+	fails, and are expected to fall back to the data that they would
+	otherwise have read from the database in both cases.
+	"""
+
+	# Subclasses must set this, and change it whenever the schema
+	# created by _create_tables() changes.
+	_version = None
+
+	def __init__(self, filename):
+		self._filename = filename
+		self._db_module = None
+		self._db_error = None
+		self._connection = None
+		self._connection_pid = None
+		self._writable = False
+		self._disabled = False
+
+	def _import_sqlite(self):
+		# sqlite3 is optional with >=python-2.5
+		try:
+			import sqlite3 as db_module
+		except ImportError:
+			try:
+				from pysqlite2 import dbapi2 as db_module
+			except ImportError:
+				return False
+		self._db_module = db_module
+		self._db_error = db_module.Error
+		return True
+
+	def _connect(self):
+		"""
+		Open the database, creating or resetting it if necessary and
+		permitted. Returns None if the database is unavailable.
+		"""
+		if self._connection is not None and \
+			self._connection_pid != os.getpid():
+			# A connection must not be used across fork, so leave
+			# the inherited one to the parent process.
+			self._connection = None
+			self._disabled = False
+
+		if self._disabled:
+			return None
+		if self._connection is not None:
+			return self._connection
+
+		self._disabled = True
+		if not self._import_sqlite():
+			return None
+
+		writable = secpass >= 2 and os.environ.get("SANDBOX_ON") != "1"
+		if not writable and not os.path.exists(self._filename):
+			return None
+
+		try:
+			if writable:
+				ensure_dirs(os.path.dirname(self._filename))
+			connection = self._db_module.connect(
+				database=_unicode_decode(self._filename), timeout=15)
+			cursor = connection.cursor()
+			cursor.execute("PRAGMA synchronous = OFF")
+			version = None
+			try:
+				cursor.execute("SELECT value FROM metadata WHERE key = 'version'")
+				row = cursor.fetchone()
+				if row is not None:
+					version = row[0]
+			except self._db_error:
+				pass
+
+			if version != self._version:
+				if not writable:
+					connection.close()
+					return None
+				self._create_tables(cursor)
+				connection.commit()
+
+			if writable:
+				apply_secpass_permissions(self._filename,
+					gid=portage_gid, mode=0o644)
+		except (self._db_error, EnvironmentError,
+			portage.exception.PortageException):
+			return None
+
+		self._connection = connection
+		self._connection_pid = os.getpid()
+		self._writable = writable
+		self._disabled = False
+		return connection
+
+	def _create_tables(self, cursor):
+		"""
+		Drop any existing tables and create the current schema, including
+		a metadata table that maps the 'version' key to _version.
+		"""
+		raise NotImplementedError(self)
+
+	def _disable(self):
+		if self._connection is not None:
+			try:
+				self._connection.close()
+			except self._db_error:
+				pass
+		self._connection = None
+		self._disabled = True
@@ -1,30 +1,30 @@
 # Copyright 1998-2013 Gentoo Foundation
 # Distributed under the terms of the GNU General Public License v2
 
-import errno
 import logging
-import subprocess
 
 import portage
 from portage import _encodings
 from portage import _os_merge
-from portage import _unicode_decode
 from portage import _unicode_encode
 from portage.cache.mappings import slot_dict_class
-from portage.exception import CommandNotFound
 from portage.localization import _
 from portage.util import getlibpaths
 from portage.util import grabfile
 from portage.util import normalize_path
 from portage.util import writemsg_level
+from portage.util._dyn_libs.LinkageMapIndex import LinkageMapIndex
+from portage.util._dyn_libs.scanelf import scan_elf_files
 
 class LinkageMapELF(object):
 
 	"""Models dynamic linker dependencies."""
 
 	_needed_aux_key = "NEEDED.ELF.2"
+	_scan_threads = 4
 	_soname_map_class = slot_dict_class(
-		("consumers", "providers"), prefix="")
+		("consumers", "providers", "consumer_dirs", "provider_dirs"),
+		prefix="")
 
 	class _obj_properties_class(object):
 
@@ -47,6 +47,35 @@ class LinkageMapELF(object):
 		self._obj_key_cache = {}
 		self._defpath = set()
 		self._path_key_cache = {}
+		self._search_path_keys_cache = {}
+		self._index_obj = None
+
+	@property
+	def _index(self):
+		if self._index_obj is None:
+			self._index_obj = LinkageMapIndex(self._dbapi,
+				self._needed_aux_key, self._dbapi._linkmap_index_filename)
+		return self._index_obj
+
+	def _hash_pkg(self, cpv):
+		return self._dbapi._owners_cache(self._dbapi)._hash_pkg(cpv)
+
+	def _index_add(self, pkg_dblink):
+		"""
+		Record the NEEDED.ELF.2 entry of a package that has just been
+		merged in the persistent index, so that the next rebuild does
+		not have to read it.
+		"""
+		try:
+			pkg_hash = self._hash_pkg(pkg_dblink.mycpv)
+			needed = self._dbapi.aux_get(pkg_dblink.mycpv,
+				[self._needed_aux_key])[0]
+		except KeyError:
+			return
+		self._index.add(pkg_hash, needed)
+
+	def _index_remove(self, pkg_dblink):
+		self._index.remove(pkg_dblink.mycpv)
 
 	def _clear_cache(self):
 		self._libs.clear()
@@ -54,6 +83,7 @@ class LinkageMapELF(object):
 		self._obj_key_cache.clear()
 		self._defpath.clear()
 		self._path_key_cache.clear()
+		self._search_path_keys_cache.clear()
 
 	def _path_key(self, path):
 		key = self._path_key_cache.get(path)
@@ -69,6 +99,62 @@ class LinkageMapELF(object):
 			self._obj_key_cache[path] = key
 		return key
 
+	def _search_path_keys(self, obj_key):
+		"""
+		Return a frozenset containing the keys of the directories that
+		are searched for the needed sonames of an object, which are its
+		runpaths and the default library path. Since identical runpaths
+		share the same frozenset instance, results are cached by runpaths.
+		"""
+		runpaths = self._obj_properties[obj_key].runpaths
+		keys = self._search_path_keys_cache.get(runpaths)
+		if keys is None:
+			keys = frozenset(self._path_key(x)
+				for x in runpaths.union(self._defpath))
+			self._search_path_keys_cache[runpaths] = keys
+		return keys
+
+	def _consumer_dirs(self, soname_node):
+		"""
+		Return a mapping from the keys of directories to the keys of
+		the consumers of soname_node which search those directories.
+		The mapping is built on demand and kept until the next rebuild.
+		"""
+		consumer_dirs = soname_node.consumer_dirs
+		if consumer_dirs is None:
+			consumer_dirs = {}
+			for consumer_key in soname_node.consumers:
+				for dir_key in self._search_path_keys(consumer_key):
+					consumers = consumer_dirs.get(dir_key)
+					if consumers is None:
+						consumers = []
+						consumer_dirs[dir_key] = consumers
+					consumers.append(consumer_key)
+			soname_node.consumer_dirs = consumer_dirs
+		return consumer_dirs
+
+	def _provider_dirs(self, soname_node):
+		"""
+		Return a mapping from the keys of directories to lists of
+		(provider_key, path) tuples for the providers of soname_node
+		which reside in those directories. The mapping is built on
+		demand and kept until the next rebuild.
+		"""
+		os = _os_merge
+		provider_dirs = soname_node.provider_dirs
+		if provider_dirs is None:
+			provider_dirs = {}
+			for provider_key in soname_node.providers:
+				for path in self._obj_properties[provider_key].alt_paths:
+					dir_key = self._path_key(os.path.dirname(path))
+					providers = provider_dirs.get(dir_key)
+					if providers is None:
+						providers = []
+						provider_dirs[dir_key] = providers
+					providers.append((provider_key, path))
+			soname_node.provider_dirs = provider_dirs
+		return provider_dirs
+
 	class _ObjectKey(object):
 
 		"""Helper class used as _obj_properties keys for objects."""
@@ -165,8 +251,8 @@ class LinkageMapELF(object):
 	def rebuild(self, exclude_pkgs=None, include_file=None,
 		preserve_paths=None):
 		"""
-		Raises CommandNotFound if there are preserved libs
-		and the scanelf binary is not available.
+		Preserved libs are not registered in NEEDED.ELF.2 files, so
+		their dynamic sections are read directly.
 
 		@param exclude_pkgs: A set of packages that should be excluded from
 			the LinkageMap, since they are being unmerged and their NEEDED
@@ -200,23 +286,38 @@ class LinkageMapELF(object):
 			for line in grabfile(include_file):
 				lines.append((None, include_file, line))
 
+		# The NEEDED.ELF.2 entries are taken from the persistent index,
+		# which only needs to read the entries of packages that have
+		# changed since it was last updated. If the index is unavailable,
+		# the entries of all packages are read from the vdb.
 		aux_keys = [self._needed_aux_key]
+		needed_entries = None
 		can_lock = os.access(os.path.dirname(self._dbapi._dbroot), os.W_OK)
 		if can_lock:
 			self._dbapi.lock()
 		try:
-			for cpv in self._dbapi.cpv_all():
-				if exclude_pkgs is not None and cpv in exclude_pkgs:
-					continue
-				needed_file = self._dbapi.getpath(cpv,
-					filename=self._needed_aux_key)
-				for line in self._dbapi.aux_get(cpv, aux_keys)[0].splitlines():
-					lines.append((cpv, needed_file, line))
+			if self._index.sync(self._hash_pkg):
+				needed_entries = self._index.entries()
+			if needed_entries is None:
+				needed_entries = []
+				for cpv in self._dbapi.cpv_all():
+					if exclude_pkgs is not None and cpv in exclude_pkgs:
+						continue
+					needed_entries.append(
+						(cpv, self._dbapi.aux_get(cpv, aux_keys)[0]))
 		finally:
 			if can_lock:
 				self._dbapi.unlock()
 
-		# have to call scanelf for preserved libs here as they aren't 
+		for cpv, needed in needed_entries:
+			if exclude_pkgs is not None and cpv in exclude_pkgs:
+				continue
+			needed_file = self._dbapi.getpath(cpv,
+				filename=self._needed_aux_key)
+			for line in needed.splitlines():
+				lines.append((cpv, needed_file, line))
+
+		# have to scan preserved libs here as they aren't
 		# registered in NEEDED.ELF.2 files
 		plibs = {}
 		if preserve_paths is not None:
@@ -234,43 +335,17 @@ class LinkageMapELF(object):
 					continue
 				plibs.update((x, cpv) for x in items)
 		if plibs:
-			args = ["/usr/bin/scanelf", "-qF", "%a;%F;%S;%r;%n"]
-			args.extend(os.path.join(root, x.lstrip("." + os.sep)) \
-				for x in plibs)
-			try:
-				proc = subprocess.Popen(args, stdout=subprocess.PIPE)
-			except EnvironmentError as e:
-				if e.errno != errno.ENOENT:
-					raise
-				raise CommandNotFound(args[0])
-			else:
-				for l in proc.stdout:
-					try:
-						l = _unicode_decode(l,
-							encoding=_encodings['content'], errors='strict')
-					except UnicodeDecodeError:
-						l = _unicode_decode(l,
-							encoding=_encodings['content'], errors='replace')
-						writemsg_level(_("\nError decoding characters " \
-							"returned from scanelf: %s\n\n") % (l,),
-							level=logging.ERROR, noiselevel=-1)
-					l = l[3:].rstrip("\n")
-					if not l:
-						continue
-					fields = l.split(";")
-					if len(fields) < 5:
-						writemsg_level(_("\nWrong number of fields " \
-							"returned from scanelf: %s\n\n") % (l,),
-							level=logging.ERROR, noiselevel=-1)
-						continue
-					fields[1] = fields[1][root_len:]
-					owner = plibs.pop(fields[1], None)
-					lines.append((owner, "scanelf", ";".join(fields)))
-				proc.wait()
-				proc.stdout.close()
+			for x, elf in scan_elf_files(
+				[os.path.join(root, x.lstrip("." + os.sep)) for x in plibs],
+				max_workers=self._scan_threads):
+				if elf is None:
+					continue
+				x = x[root_len:]
+				owner = plibs.pop(x, None)
+				lines.append((owner, "scanelf", elf.needed_elf_2_line(x)))
 
 		if plibs:
-			# Preserved libraries that did not appear in the scanelf output.
+			# Preserved libraries that have no dynamic section.
 			# This is known to happen with statically linked libraries.
 			# Generate dummy lines for these, so we can assume that every
 			# preserved library has an entry in self._obj_properties. This
@@ -337,14 +412,16 @@ class LinkageMapELF(object):
 				soname_map = arch_map.get(soname)
 				if soname_map is None:
 					soname_map = self._soname_map_class(
-						providers=[], consumers=[])
+						providers=[], consumers=[],
+						consumer_dirs=None, provider_dirs=None)
 					arch_map[soname] = soname_map
 				soname_map.providers.append(obj_key)
 			for needed_soname in needed:
 				soname_map = arch_map.get(needed_soname)
 				if soname_map is None:
 					soname_map = self._soname_map_class(
-						providers=[], consumers=[])
+						providers=[], consumers=[],
+						consumer_dirs=None, provider_dirs=None)
 					arch_map[needed_soname] = soname_map
 				soname_map.consumers.append(obj_key)
 
@@ -421,61 +498,71 @@ class LinkageMapELF(object):
 		rValue = {}
 		cache = _LibraryCache()
 		providers = self.listProviders()
+		# Objects with the same arch and runpaths search the same
+		# directories for a given soname, so the result of the search
+		# is shared between them.
+		search_cache = {}
 
 		# Iterate over all obj_keys and their providers.
 		for obj_key, sonames in providers.items():
 			obj_props = self._obj_properties[obj_key]
 			arch = obj_props.arch
-			path = obj_props.runpaths
+			runpaths = obj_props.runpaths
 			objs = obj_props.alt_paths
-			path = path.union(self._defpath)
+			path = None
 			# Iterate over each needed soname and the set of library paths that
 			# fulfill the soname to determine if the dependency is broken.
 			for soname, libraries in sonames.items():
-				# validLibraries is used to store libraries, which satisfy soname,
-				# so if no valid libraries are found, the soname is not satisfied
-				# for obj_key.  If unsatisfied, objects associated with obj_key
-				# must be emerged.
-				validLibraries = set()
-				# It could be the case that the library to satisfy the soname is
-				# not in the obj's runpath, but a symlink to the library is (eg
-				# libnvidia-tls.so.1 in nvidia-drivers).  Also, since LinkageMap
-				# does not catalog symlinks, broken or missing symlinks may go
-				# unnoticed.  As a result of these cases, check that a file with
-				# the same name as the soname exists in obj's runpath.
-				# XXX If we catalog symlinks in LinkageMap, this could be improved.
-				for directory in path:
-					cachedArch, cachedSoname, cachedKey, cachedExists = \
-							cache.get(os.path.join(directory, soname))
-					# Check that this library provides the needed soname.  Doing
-					# this, however, will cause consumers of libraries missing
-					# sonames to be unnecessarily emerged. (eg libmix.so)
-					if cachedSoname == soname and cachedArch == arch:
-						validLibraries.add(cachedKey)
-						if debug and cachedKey not in \
-								set(map(self._obj_key_cache.get, libraries)):
-							# XXX This is most often due to soname symlinks not in
-							# a library's directory.  We could catalog symlinks in
-							# LinkageMap to avoid checking for this edge case here.
-							writemsg_level(
-								_("Found provider outside of findProviders:") + \
-								(" %s -> %s %s\n" % (os.path.join(directory, soname),
-								self._obj_properties[cachedKey].alt_paths, libraries)),
+				search_key = (arch, runpaths, soname)
+				validLibraries = search_cache.get(search_key)
+				if validLibraries is None:
+					if path is None:
+						path = runpaths.union(self._defpath)
+					# validLibraries is used to store libraries, which satisfy soname,
+					# so if no valid libraries are found, the soname is not satisfied
+					# for obj_key.  If unsatisfied, objects associated with obj_key
+					# must be emerged.
+					validLibraries = set()
+					# It could be the case that the library to satisfy the soname is
+					# not in the obj's runpath, but a symlink to the library is (eg
+					# libnvidia-tls.so.1 in nvidia-drivers).  Also, since LinkageMap
+					# does not catalog symlinks, broken or missing symlinks may go
+					# unnoticed.  As a result of these cases, check that a file with
+					# the same name as the soname exists in obj's runpath.
+					# XXX If we catalog symlinks in LinkageMap, this could be improved.
+					for directory in path:
+						cachedArch, cachedSoname, cachedKey, cachedExists = \
+								cache.get(os.path.join(directory, soname))
+						# Check that this library provides the needed soname.  Doing
+						# this, however, will cause consumers of libraries missing
+						# sonames to be unnecessarily emerged. (eg libmix.so)
+						if cachedSoname == soname and cachedArch == arch:
+							validLibraries.add(cachedKey)
+							if debug and cachedKey not in \
+									set(map(self._obj_key_cache.get, libraries)):
+								# XXX This is most often due to soname symlinks not in
+								# a library's directory.  We could catalog symlinks in
+								# LinkageMap to avoid checking for this edge case here.
+								writemsg_level(
+									_("Found provider outside of findProviders:") + \
+									(" %s -> %s %s\n" % (os.path.join(directory, soname),
+									self._obj_properties[cachedKey].alt_paths, libraries)),
+									level=logging.DEBUG,
+									noiselevel=-1)
+							# A valid library has been found, so there is no need to
+							# continue.
+							break
+						if debug and cachedArch == arch and \
+								cachedKey in self._obj_properties:
+							writemsg_level((_("Broken symlink or missing/bad soname: " + \
+								"%(dir_soname)s -> %(cachedKey)s " + \
+								"with soname %(cachedSoname)s but expecting %(soname)s") % \
+								{"dir_soname":os.path.join(directory, soname),
+								"cachedKey": self._obj_properties[cachedKey],
+								"cachedSoname": cachedSoname, "soname":soname}) + "\n",
 								level=logging.DEBUG,
 								noiselevel=-1)
-						# A valid library has been found, so there is no need to
-						# continue.
-						break
-					if debug and cachedArch == arch and \
-							cachedKey in self._obj_properties:
-						writemsg_level((_("Broken symlink or missing/bad soname: " + \
-							"%(dir_soname)s -> %(cachedKey)s " + \
-							"with soname %(cachedSoname)s but expecting %(soname)s") % \
-							{"dir_soname":os.path.join(directory, soname),
-							"cachedKey": self._obj_properties[cachedKey],
-							"cachedSoname": cachedSoname, "soname":soname}) + "\n",
-							level=logging.DEBUG,
-							noiselevel=-1)
+					search_cache[search_key] = validLibraries
 				# This conditional checks if there are no libraries to satisfy the
 				# soname (empty set).
 				if not validLibraries:
@@ -643,8 +730,6 @@ class LinkageMapELF(object):
 
 		"""
 
-		os = _os_merge
-
 		rValue = {}
 
 		if not self._libs:
@@ -661,21 +746,20 @@ class LinkageMapELF(object):
 				raise KeyError("%s (%s) not in object list" % (obj_key, obj))
 
 		obj_props = self._obj_properties[obj_key]
-		arch = obj_props.arch
-		needed = obj_props.needed
-		path = obj_props.runpaths
-		path_keys = set(self._path_key(x) for x in path.union(self._defpath))
-		for soname in needed:
-			rValue[soname] = set()
-			if arch not in self._libs or soname not in self._libs[arch]:
+		arch_map = self._libs.get(obj_props.arch, {})
+		path_keys = self._search_path_keys(obj_key)
+		for soname in obj_props.needed:
+			providers = set()
+			rValue[soname] = providers
+			soname_node = arch_map.get(soname)
+			if soname_node is None:
 				continue
 			# For each potential provider of the soname, add it to rValue if it
 			# resides in the obj's runpath.
-			for provider_key in self._libs[arch][soname].providers:
-				providers = self._obj_properties[provider_key].alt_paths
-				for provider in providers:
-					if self._path_key(os.path.dirname(provider)) in path_keys:
-						rValue[soname].add(provider)
+			provider_dirs = self._provider_dirs(soname_node)
+			for dir_key in path_keys:
+				for provider_key, provider in provider_dirs.get(dir_key, ()):
+					providers.add(provider)
 		return rValue
 
 	def findConsumers(self, obj, exclude_providers=None, greedy=True):
@@ -724,11 +808,52 @@ class LinkageMapELF(object):
 
 		"""
 
-		os = _os_merge
+		if not self._libs:
+			self.rebuild()
+		return self._find_consumers(obj, exclude_providers, greedy, {}, {})
+
+	def mapConsumers(self, objs, exclude_providers=None, greedy=True):
+		"""
+		Find consumers of several objects or object keys at once. This
+		is equivalent to calling findConsumers for each object, except
+		that objects which are not in the object list are ignored rather
+		than raising KeyError, and that exclude_providers is called at
+		most once for each library path, and alternative providers are
+		determined at most once for each soname.
+
+		@param objs: absolute paths to objects or keys from _obj_properties
+		@type objs: iterable
+		@param exclude_providers: see findConsumers
+		@type exclude_providers: collection
+		@param greedy: see findConsumers
+		@type greedy: Boolean
+		@rtype: dict (example: {'/usr/lib/libbar.so.1': set(['/bin/foo'])})
+		@return: The return value is an object -> set-of-consumers mapping,
+		which only contains the objects that have consumers.
+
+		"""
 
 		if not self._libs:
 			self.rebuild()
 
+		rValue = {}
+		excluded_cache = {}
+		satisfied_cache = {}
+		for obj in objs:
+			try:
+				consumers = self._find_consumers(obj, exclude_providers,
+					greedy, excluded_cache, satisfied_cache)
+			except KeyError:
+				continue
+			if consumers:
+				rValue[obj] = consumers
+		return rValue
+
+	def _find_consumers(self, obj, exclude_providers, greedy,
+		excluded_cache, satisfied_cache):
+
+		os = _os_merge
+
 		# Determine the obj_key and the set of objects matching the arguments.
 		if isinstance(obj, self._ObjectKey):
 			obj_key = obj
@@ -741,79 +866,67 @@ class LinkageMapELF(object):
 			if obj_key not in self._obj_properties:
 				raise KeyError("%s (%s) not in object list" % (obj_key, obj))
 
+		obj_props = self._obj_properties[obj_key]
+		arch = obj_props.arch
+		soname = obj_props.soname
+
 		# If there is another version of this lib with the
 		# same soname and the soname symlink points to that
 		# other version, this lib will be shadowed and won't
 		# have any consumers.
 		if not isinstance(obj, self._ObjectKey):
-			soname = self._obj_properties[obj_key].soname
-			soname_link = os.path.join(self._root,
-				os.path.dirname(obj).lstrip(os.path.sep), soname)
-			obj_path = os.path.join(self._root, obj.lstrip(os.sep))
-			try:
-				soname_st = os.stat(soname_link)
-				obj_st = os.stat(obj_path)
-			except OSError:
-				pass
-			else:
-				if (obj_st.st_dev, obj_st.st_ino) != \
-					(soname_st.st_dev, soname_st.st_ino):
-					return set()
-
-		obj_props = self._obj_properties[obj_key]
-		arch = obj_props.arch
-		soname = obj_props.soname
-
-		soname_node = None
-		arch_map = self._libs.get(arch)
-		if arch_map is not None:
-			soname_node = arch_map.get(soname)
-
-		defpath_keys = set(self._path_key(x) for x in self._defpath)
-		satisfied_consumer_keys = set()
-		if soname_node is not None:
-			if exclude_providers is not None or not greedy:
-				relevant_dir_keys = set()
-				for provider_key in soname_node.providers:
-					if not greedy and provider_key == obj_key:
-						continue
-					provider_objs = self._obj_properties[provider_key].alt_paths
-					for p in provider_objs:
-						provider_excluded = False
+			soname_key = self._path_key(
+				os.path.join(os.path.dirname(obj), soname))
+			if obj_key.file_exists() and soname_key.file_exists() and \
+				soname_key._key != obj_key._key:
+				return set()
+
+		soname_node = self._libs.get(arch, {}).get(soname)
+		if soname_node is None:
+			return set()
+		consumer_dirs = self._consumer_dirs(soname_node)
+
+		satisfied_consumer_keys = None
+		if exclude_providers is not None or not greedy:
+			cache_key = (arch, soname, None if greedy else obj_key)
+			satisfied_consumer_keys = satisfied_cache.get(cache_key)
+			if satisfied_consumer_keys is None:
+				satisfied_consumer_keys = set()
+				for dir_key, providers in \
+					self._provider_dirs(soname_node).items():
+					for provider_key, p in providers:
+						if not greedy and provider_key == obj_key:
+							continue
 						if exclude_providers is not None:
-							for excluded_provider_isowner in exclude_providers:
-								if excluded_provider_isowner(p):
-									provider_excluded = True
-									break
-						if not provider_excluded:
-							# This provider is not excluded. It will
-							# satisfy a consumer of this soname if it
-							# is in the default ld.so path or the
-							# consumer's runpath.
-							relevant_dir_keys.add(
-								self._path_key(os.path.dirname(p)))
-
-				if relevant_dir_keys:
-					for consumer_key in soname_node.consumers:
-						path = self._obj_properties[consumer_key].runpaths
-						path_keys = defpath_keys.copy()
-						path_keys.update(self._path_key(x) for x in path)
-						if relevant_dir_keys.intersection(path_keys):
-							satisfied_consumer_keys.add(consumer_key)
+							provider_excluded = excluded_cache.get(p)
+							if provider_excluded is None:
+								provider_excluded = False
+								for excluded_provider_isowner in \
+									exclude_providers:
+									if excluded_provider_isowner(p):
+										provider_excluded = True
+										break
+								excluded_cache[p] = provider_excluded
+							if provider_excluded:
+								continue
+						# This provider is not excluded. It will
+						# satisfy a consumer of this soname if it
+						# is in the default ld.so path or the
+						# consumer's runpath.
+						satisfied_consumer_keys.update(
+							consumer_dirs.get(dir_key, ()))
+						break
+				satisfied_cache[cache_key] = satisfied_consumer_keys
 
 		rValue = set()
-		if soname_node is not None:
-			# For each potential consumer, add it to rValue if an object from the
-			# arguments resides in the consumer's runpath.
-			objs_dir_keys = set(self._path_key(os.path.dirname(x))
-				for x in objs)
-			for consumer_key in soname_node.consumers:
-				if consumer_key in satisfied_consumer_keys:
+		# For each potential consumer, add it to rValue if an object from the
+		# arguments resides in the consumer's runpath.
+		objs_dir_keys = set(self._path_key(os.path.dirname(x))
+			for x in objs)
+		for dir_key in objs_dir_keys:
+			for consumer_key in consumer_dirs.get(dir_key, ()):
+				if satisfied_consumer_keys is not None and \
+					consumer_key in satisfied_consumer_keys:
 					continue
-				consumer_props = self._obj_properties[consumer_key]
-				path = consumer_props.runpaths
-				consumer_objs = consumer_props.alt_paths
-				path_keys = defpath_keys.union(self._path_key(x) for x in path)
-				if objs_dir_keys.intersection(path_keys):
-					rValue.update(consumer_objs)
+				rValue.update(self._obj_properties[consumer_key].alt_paths)
 		return rValue
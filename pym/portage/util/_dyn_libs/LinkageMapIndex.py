@@ -0,0 +1,223 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+from __future__ import unicode_literals
+
+import stat
+import sys
+import time
+
+from portage import os
+from portage.const import VDB_PATH
+from portage.util._SqliteStore import SqliteStore
+from portage.versions import catsplit
+
+if sys.hexversion >= 0x3000000:
+	_unicode = str
+else:
+	_unicode = unicode
+
+class LinkageMapIndex(SqliteStore):
+	"""
+	A persistent sqlite store for the NEEDED.ELF.2 entries of installed
+	packages, so that LinkageMapELF.rebuild() does not have to read the
+	entries of every installed package while it holds the vdb lock.
+
+	Since packages are merged and unmerged by adding and removing their
+	directories, the mtimes of the vdb category directories are recorded,
+	and sync() only examines the packages of categories whose mtime has
+	changed. Each package is recorded together with its (cpv, COUNTER,
+	_mtime_) hash, and only the entries of packages whose hash differs
+	from the recorded one are read. When the schema version changes, the
+	store is reset and every package is read again.
+
+	The store is only modified when the current user has superuser
+	privileges. If it is stale and cannot be updated, or if sqlite is
+	unavailable, sync() returns False and callers are expected to read
+	the entries from the vdb.
+	"""
+
+	_version = "1"
+
+	def __init__(self, vardb, needed_aux_key, filename):
+		self._vardb = vardb
+		self._needed_aux_key = needed_aux_key
+		SqliteStore.__init__(self, filename)
+
+	def _create_tables(self, cursor):
+		for table in ("categories", "packages", "metadata"):
+			cursor.execute("DROP TABLE IF EXISTS %s" % table)
+		cursor.execute("CREATE TABLE metadata "
+			"(key TEXT PRIMARY KEY, value TEXT)")
+		cursor.execute("CREATE TABLE categories "
+			"(category TEXT PRIMARY KEY, mtime REAL)")
+		cursor.execute("CREATE TABLE packages "
+			"(cpv TEXT PRIMARY KEY, counter INTEGER, mtime REAL, "
+			"needed TEXT)")
+		cursor.execute("INSERT INTO metadata (key, value) VALUES (?, ?)",
+			("version", self._version))
+
+	def sync(self, hash_pkg):
+		"""
+		Ensure that the store corresponds to the packages that are
+		currently installed, reading the entries of any packages that
+		are missing and discarding stale ones. This should be called
+		while the vdb is locked.
+
+		@param hash_pkg: callable that returns a (cpv, counter, mtime)
+			tuple for a given installed cpv
+		@type hash_pkg: callable
+		@rtype: bool
+		@return: True if the store is valid and entries() can be used
+		"""
+		connection = self._connect()
+		if connection is None:
+			return False
+
+		try:
+			cursor = connection.cursor()
+			cursor.execute("SELECT category, mtime FROM categories")
+			cached_mtimes = dict((_unicode(category), mtime)
+				for category, mtime in cursor.fetchall())
+
+			current_mtimes = self._category_mtimes()
+			changed = set(category for category, mtime in
+				current_mtimes.items() if cached_mtimes.get(category) != mtime)
+			changed.update(set(cached_mtimes).difference(current_mtimes))
+			if not changed:
+				return True
+
+			cursor.execute("SELECT cpv, counter, mtime FROM packages")
+			cached = set((_unicode(cpv), counter, mtime)
+				for cpv, counter, mtime in cursor.fetchall()
+				if catsplit(cpv)[0] in changed)
+
+			current = set()
+			for cpv in self._vardb.cpv_all():
+				if catsplit(cpv)[0] not in changed:
+					continue
+				try:
+					current.add(hash_pkg(cpv))
+				except KeyError:
+					# Removed concurrently.
+					pass
+
+			stale = cached.difference(current)
+			uncached = current.difference(cached)
+			if not self._writable:
+				return not stale and not uncached
+
+			for cpv, counter, mtime in stale:
+				self._remove(cursor, cpv)
+			for pkg_hash in uncached:
+				try:
+					needed = self._vardb.aux_get(pkg_hash[0],
+						[self._needed_aux_key])[0]
+				except KeyError:
+					continue
+				self._add(cursor, pkg_hash, needed)
+
+			# A directory that was modified within the last couple of
+			# seconds may be modified again without a change of its
+			# mtime, so such categories are examined again next time.
+			now = time.time()
+			for category in changed:
+				mtime = current_mtimes.get(category)
+				if mtime is None or now - mtime < 2:
+					cursor.execute("DELETE FROM categories "
+						"WHERE category = ?", (category,))
+				else:
+					cursor.execute("INSERT OR REPLACE INTO categories "
+						"(category, mtime) VALUES (?, ?)", (category, mtime))
+			connection.commit()
+		except self._db_error:
+			self._disable()
+			return False
+
+		return True
+
+	def _category_mtimes(self):
+		"""
+		@rtype: dict
+		@return: a mapping of vdb category directory names to their
+			mtimes
+		"""
+		vdb_path = os.path.join(self._vardb._eroot, VDB_PATH)
+		mtimes = {}
+		try:
+			categories = os.listdir(vdb_path)
+		except OSError:
+			return mtimes
+		for category in categories:
+			if self._vardb._excluded_dirs.match(category) is not None or \
+				not self._vardb._category_re.match(category):
+				continue
+			try:
+				st = os.stat(os.path.join(vdb_path, category))
+			except OSError:
+				continue
+			if stat.S_ISDIR(st.st_mode):
+				mtimes[category] = st.st_mtime
+		return mtimes
+
+	def entries(self):
+		"""
+		Return a list of (cpv, needed) tuples for all installed
+		packages, where needed is the content of the NEEDED.ELF.2
+		entry. This method should only be called after sync() has
+		returned True.
+
+		@rtype: list
+		@return: (cpv, needed) tuples, or None if the store has become
+			unavailable
+		"""
+		connection = self._connect()
+		if connection is None:
+			return None
+		try:
+			cursor = connection.cursor()
+			cursor.execute("SELECT cpv, needed FROM packages")
+			return [(_unicode(cpv), needed)
+				for cpv, needed in cursor.fetchall()]
+		except self._db_error:
+			self._disable()
+			return None
+
+	def add(self, pkg_hash, needed):
+		"""
+		Record the NEEDED.ELF.2 entry of a newly installed package,
+		replacing any previous entry for the same cpv.
+		"""
+		connection = self._connect()
+		if connection is None or not self._writable:
+			return
+		try:
+			cursor = connection.cursor()
+			self._add(cursor, pkg_hash, needed)
+			connection.commit()
+		except self._db_error:
+			self._disable()
+
+	def remove(self, cpv):
+		"""
+		Discard the entry of an uninstalled package.
+		"""
+		connection = self._connect()
+		if connection is None or not self._writable:
+			return
+		try:
+			cursor = connection.cursor()
+			self._remove(cursor, cpv)
+			connection.commit()
+		except self._db_error:
+			self._disable()
+
+	def _add(self, cursor, pkg_hash, needed):
+		cpv, counter, mtime = pkg_hash
+		cursor.execute("INSERT OR REPLACE INTO packages "
+			"(cpv, counter, mtime, needed) VALUES (?, ?, ?, ?)",
+			(_unicode(cpv), counter, mtime, _unicode(needed)))
+
+	def _remove(self, cursor, cpv):
+		cursor.execute("DELETE FROM packages WHERE cpv = ?",
+			(_unicode(cpv),))
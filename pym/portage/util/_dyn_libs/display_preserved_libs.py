@@ -3,9 +3,6 @@
 
 from __future__ import print_function
 
-import logging
-
-import portage
 from portage.output import colorize
 
 def display_preserved_libs(vardb):
@@ -17,38 +14,32 @@ def display_preserved_libs(vardb):
 	consumer_map = {}
 	owners = {}
 
-	try:
-		linkmap.rebuild()
-	except portage.exception.CommandNotFound as e:
-		portage.util.writemsg_level("!!! Command Not Found: %s\n" % (e,),
-			level=logging.ERROR, noiselevel=-1)
-	else:
-		search_for_owners = set()
-		for cpv in plibdata:
-			internal_plib_keys = set(linkmap._obj_key(f) \
-				for f in plibdata[cpv])
-			for f in plibdata[cpv]:
-				if f in consumer_map:
-					continue
-				consumers = []
-				for c in linkmap.findConsumers(f, greedy=False):
-					# Filter out any consumers that are also preserved libs
-					# belonging to the same package as the provider.
-					if linkmap._obj_key(c) not in internal_plib_keys:
-						consumers.append(c)
-				consumers.sort()
-				consumer_map[f] = consumers
-				search_for_owners.update(consumers[:MAX_DISPLAY+1])
+	linkmap.rebuild()
+	search_for_owners = set()
+	for cpv in plibdata:
+		internal_plib_keys = set(linkmap._obj_key(f) \
+			for f in plibdata[cpv])
+		for f in plibdata[cpv]:
+			if f in consumer_map:
+				continue
+			consumers = []
+			for c in linkmap.findConsumers(f, greedy=False):
+				# Filter out any consumers that are also preserved libs
+				# belonging to the same package as the provider.
+				if linkmap._obj_key(c) not in internal_plib_keys:
+					consumers.append(c)
+			consumers.sort()
+			consumer_map[f] = consumers
+			search_for_owners.update(consumers[:MAX_DISPLAY+1])
 
-		owners = {}
-		for f in search_for_owners:
-			owner_set = set()
-			for owner in linkmap.getOwners(f):
-				owner_dblink = vardb._dblink(owner)
-				if owner_dblink.exists():
-					owner_set.add(owner_dblink)
-			if owner_set:
-				owners[f] = owner_set
+	for f in search_for_owners:
+		owner_set = set()
+		for owner in linkmap.getOwners(f):
+			owner_dblink = vardb._dblink(owner)
+			if owner_dblink.exists():
+				owner_set.add(owner_dblink)
+		if owner_set:
+			owners[f] = owner_set
 
 	all_preserved = set()
 	all_preserved.update(*plibdata.values())
@@ -0,0 +1,302 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+"""
+A pure python replacement for the parts of scanelf(1) from pax-utils that
+are needed in order to generate NEEDED.ELF.2 entries. Files are mapped with
+mmap, and only the ELF header, the program headers, the dynamic segment
+and the strings that it refers to are accessed.
+"""
+
+__all__ = ['ElfDynamic', 'scan_elf', 'scan_elf_files', 'scan_elf_tree']
+
+import errno
+import mmap
+import stat
+import struct
+
+from portage import os
+from portage import _encodings
+from portage import _unicode_decode
+from portage import _unicode_encode
+from portage.util._threads import thread_imap
+
+# Names of e_machine values, as reported by scanelf's %a format.
+_machine_names = {
+	1: "EM_M32",
+	2: "EM_SPARC",
+	3: "EM_386",
+	4: "EM_68K",
+	5: "EM_88K",
+	7: "EM_860",
+	8: "EM_MIPS",
+	9: "EM_S370",
+	10: "EM_MIPS_RS3_LE",
+	15: "EM_PARISC",
+	17: "EM_VPP500",
+	18: "EM_SPARC32PLUS",
+	19: "EM_960",
+	20: "EM_PPC",
+	21: "EM_PPC64",
+	22: "EM_S390",
+	36: "EM_V800",
+	37: "EM_FR20",
+	38: "EM_RH32",
+	39: "EM_RCE",
+	40: "EM_ARM",
+	41: "EM_FAKE_ALPHA",
+	42: "EM_SH",
+	43: "EM_SPARCV9",
+	44: "EM_TRICORE",
+	45: "EM_ARC",
+	46: "EM_H8_300",
+	47: "EM_H8_300H",
+	48: "EM_H8S",
+	49: "EM_H8_500",
+	50: "EM_IA_64",
+	51: "EM_MIPS_X",
+	52: "EM_COLDFIRE",
+	53: "EM_68HC12",
+	62: "EM_X86_64",
+	75: "EM_VAX",
+	76: "EM_CRIS",
+	87: "EM_V850",
+	88: "EM_M32R",
+	89: "EM_MN10300",
+	92: "EM_OPENRISC",
+	94: "EM_XTENSA",
+	106: "EM_BLACKFIN",
+	113: "EM_ALTERA_NIOS2",
+	140: "EM_TI_C6000",
+	183: "EM_AARCH64",
+	188: "EM_TILEPRO",
+	189: "EM_MICROBLAZE",
+	191: "EM_TILEGX",
+	0x5441: "EM_FRV",
+	0x9026: "EM_ALPHA",
+	0x9080: "EM_CYGNUS_V850",
+	0x9041: "EM_CYGNUS_M32R",
+	0xa390: "EM_S390_OLD",
+	0xbeef: "EM_CYGNUS_MN10300",
+}
+
+_PT_LOAD = 1
+_PT_DYNAMIC = 2
+
+_DT_NULL = 0
+_DT_NEEDED = 1
+_DT_STRTAB = 5
+_DT_SONAME = 14
+_DT_RPATH = 15
+_DT_RUNPATH = 29
+
+class _ElfFormat(object):
+	"""
+	struct formats for one combination of ELF class and data encoding.
+	"""
+
+	__slots__ = ("ehdr", "phdr", "phdr_fields", "dyn")
+
+	def __init__(self, elf_class, byte_order):
+		if elf_class == 1:
+			self.ehdr = struct.Struct(byte_order + "HHIIIIIHHHHHH")
+			self.phdr = struct.Struct(byte_order + "IIIIIIII")
+			# p_type, p_offset, p_vaddr, p_filesz
+			self.phdr_fields = (0, 1, 2, 4)
+			self.dyn = struct.Struct(byte_order + "iI")
+		else:
+			self.ehdr = struct.Struct(byte_order + "HHIQQQIHHHHHH")
+			self.phdr = struct.Struct(byte_order + "IIQQQQQQ")
+			self.phdr_fields = (0, 2, 3, 5)
+			self.dyn = struct.Struct(byte_order + "qQ")
+
+_elf_formats = {}
+for _elf_class in (1, 2):
+	for _elf_data, _byte_order in ((1, "<"), (2, ">")):
+		_elf_formats[(_elf_class, _elf_data)] = \
+			_ElfFormat(_elf_class, _byte_order)
+del _elf_class, _elf_data, _byte_order
+
+class ElfDynamic(object):
+	"""
+	The dynamic linking information of an ELF object.
+
+	@ivar arch: the scanelf name of the machine type (example: 'EM_X86_64')
+	@ivar soname: DT_SONAME, or an empty string
+	@ivar rpath: DT_RPATH and/or DT_RUNPATH, formatted like scanelf's %r
+	@ivar needed: a list of DT_NEEDED entries
+	"""
+
+	__slots__ = ("arch", "soname", "rpath", "needed")
+
+	def __init__(self, arch, soname, rpath, needed):
+		self.arch = arch
+		self.soname = soname
+		self.rpath = rpath
+		self.needed = needed
+
+	def scanelf_line(self, path):
+		"""
+		@rtype: str
+		@return: a line like the output of scanelf -qF '%a;%F;%S;%r;%n'
+		"""
+		return ";".join((self.arch, path, self.soname, self.rpath,
+			",".join(self.needed)))
+
+	def needed_elf_2_line(self, obj):
+		"""
+		@rtype: str
+		@return: a NEEDED.ELF.2 line for the object installed at obj
+		"""
+		return ";".join((self.arch[3:], obj, self.soname, self.rpath,
+			",".join(self.needed)))
+
+def _read_string(mm, offset):
+	end = mm.find(b"\0", offset)
+	if end == -1:
+		raise ValueError("unterminated string")
+	return _unicode_decode(mm[offset:end],
+		encoding=_encodings['content'], errors='replace')
+
+def _parse(mm):
+	if mm[:4] != b"\x7fELF":
+		return None
+	fmt = _elf_formats.get((ord(mm[4:5]), ord(mm[5:6])))
+	if fmt is None:
+		return None
+
+	(e_type, e_machine, e_version, e_entry, e_phoff, e_shoff, e_flags,
+		e_ehsize, e_phentsize, e_phnum, e_shentsize, e_shnum,
+		e_shstrndx) = fmt.ehdr.unpack_from(mm, 16)
+
+	type_i, offset_i, vaddr_i, filesz_i = fmt.phdr_fields
+	loads = []
+	dynamic = None
+	for i in range(e_phnum):
+		phdr = fmt.phdr.unpack_from(mm, e_phoff + i * e_phentsize)
+		if phdr[type_i] == _PT_LOAD:
+			loads.append((phdr[vaddr_i], phdr[filesz_i], phdr[offset_i]))
+		elif phdr[type_i] == _PT_DYNAMIC:
+			dynamic = (phdr[offset_i], phdr[filesz_i])
+	if dynamic is None:
+		return None
+
+	entries = []
+	strtab = None
+	offset, size = dynamic
+	end = offset + size
+	while offset + fmt.dyn.size <= end:
+		tag, val = fmt.dyn.unpack_from(mm, offset)
+		offset += fmt.dyn.size
+		if tag == _DT_NULL:
+			break
+		if tag == _DT_STRTAB:
+			strtab = val
+		elif tag in (_DT_NEEDED, _DT_SONAME, _DT_RPATH, _DT_RUNPATH):
+			entries.append((tag, val))
+	if strtab is None:
+		return None
+
+	# Translate the address of the string table into a file offset.
+	for vaddr, filesz, file_offset in loads:
+		if vaddr <= strtab < vaddr + filesz:
+			strtab = strtab - vaddr + file_offset
+			break
+	else:
+		return None
+
+	soname = ""
+	rpath = None
+	runpath = None
+	needed = []
+	for tag, val in entries:
+		s = _read_string(mm, strtab + val)
+		if tag == _DT_NEEDED:
+			needed.append(s)
+		elif tag == _DT_SONAME:
+			if not soname:
+				soname = s
+		elif tag == _DT_RPATH:
+			if rpath is None:
+				rpath = s
+		elif runpath is None:
+			runpath = s
+
+	if rpath is not None and runpath is not None:
+		if rpath == runpath:
+			rpath = runpath
+		else:
+			rpath = "{%s,%s}" % (rpath, runpath)
+	elif runpath is not None:
+		rpath = runpath
+	elif rpath is None:
+		rpath = ""
+
+	if not (soname or rpath or needed):
+		# scanelf -q omits objects that have none of these.
+		return None
+
+	return ElfDynamic(_machine_names.get(e_machine, "UNKNOWN_TYPE"),
+		soname, rpath, needed)
+
+def scan_elf(path):
+	"""
+	Read the dynamic linking information of an ELF object.
+
+	@param path: path of the file to scan
+	@type path: str
+	@rtype: ElfDynamic
+	@return: the dynamic linking information, or None if path is not
+		a readable, dynamically linked ELF object
+	"""
+	try:
+		f = open(_unicode_encode(path,
+			encoding=_encodings['fs'], errors='strict'), 'rb')
+	except EnvironmentError:
+		return None
+	try:
+		try:
+			if os.fstat(f.fileno()).st_size < 64:
+				return None
+			mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		except (EnvironmentError, ValueError):
+			return None
+		try:
+			return _parse(mm)
+		except (struct.error, ValueError, IndexError):
+			return None
+		finally:
+			mm.close()
+	finally:
+		f.close()
+
+def scan_elf_files(paths, max_workers=4):
+	"""
+	Generate (path, ElfDynamic or None) tuples for the given paths, in
+	order, scanning the files in a pool of max_workers threads.
+	"""
+	paths = list(paths)
+	return zip(paths, thread_imap(scan_elf, paths, max_workers))
+
+def scan_elf_tree(top, max_workers=4):
+	"""
+	Recursively scan the regular files below top, like scanelf -yR,
+	and generate (path, ElfDynamic) tuples for the dynamically linked
+	ELF objects, in sorted order. Symlinks are not followed.
+	"""
+	paths = []
+	for parent, dirs, files in os.walk(top):
+		dirs.sort()
+		for name in sorted(files):
+			path = os.path.join(parent, name)
+			try:
+				st = os.lstat(path)
+			except OSError as e:
+				if e.errno not in (errno.ENOENT, errno.ESTALE):
+					raise
+				continue
+			if stat.S_ISREG(st.st_mode):
+				paths.append(path)
+	for path, elf in scan_elf_files(paths, max_workers=max_workers):
+		if elf is not None:
+			yield path, elf
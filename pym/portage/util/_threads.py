@@ -0,0 +1,72 @@
+# Copyright 2013 Gentoo Foundation
+# Distributed under the terms of the GNU General Public License v2
+
+__all__ = ['thread_imap']
+
+try:
+	import threading
+except ImportError:
+	import dummy_threading as threading
+
+def thread_imap(func, items, max_threads):
+	"""
+	Like map(func, items), but calls func in up to max_threads threads,
+	for I/O bound functions. Results are generated in the order of the
+	items, as soon as they are available. An exception raised by func
+	is raised when the corresponding result is reached. The threads
+	do not get more than 2 * max_threads items ahead of the consumer,
+	so that results do not accumulate in memory when the consumer is
+	slower than func.
+	"""
+	items = list(items)
+	if max_threads < 2 or len(items) < 2:
+		for item in items:
+			yield func(item)
+		return
+
+	results = {}
+	max_pending = 2 * max_threads
+	cond = threading.Condition()
+	# [index of the next item to process, whether to stop,
+	#  index of the next result to yield]
+	state = [0, False, 0]
+
+	def worker():
+		while True:
+			with cond:
+				while not state[1] and state[0] - state[2] >= max_pending:
+					cond.wait()
+				i = state[0]
+				if state[1] or i >= len(items):
+					return
+				state[0] += 1
+			try:
+				result = (True, func(items[i]))
+			except Exception as e:
+				result = (False, e)
+			with cond:
+				results[i] = result
+				cond.notify_all()
+
+	for i in range(min(max_threads, len(items))):
+		thread = threading.Thread(target=worker)
+		thread.daemon = True
+		thread.start()
+
+	try:
+		for i in range(len(items)):
+			with cond:
+				while i not in results:
+					# Wait with a timeout, so that KeyboardInterrupt
+					# is delivered.
+					cond.wait(1)
+				success, result = results.pop(i)
+				state[2] = i + 1
+				cond.notify_all()
+			if not success:
+				raise result
+			yield result
+	finally:
+		with cond:
+			state[1] = True
+			cond.notify_all()
@@ -5,6 +5,7 @@ from __future__ import unicode_literals
 
 __all__ = ['digraph']
 
+from bisect import bisect_left, insort
 from collections import deque
 import sys
 
@@ -21,6 +22,10 @@ class digraph(object):
 		# { node : ( { child : priority } , { parent : priority } ) }
 		self.nodes = {}
 		self.order = []
+		# ignore_priority values registered by index_priorities()
+		self._indexed_priorities = None
+		# { ignore_priority : _degree_index }
+		self._indexes = None
 
 	def add(self, node, parent, priority=0):
 		"""Adds the specified node with the specified parent.
@@ -31,6 +36,9 @@ class digraph(object):
 		if node not in self.nodes:
 			self.nodes[node] = ({}, {}, node)
 			self.order.append(node)
+			if self._indexes:
+				for index in self._indexes.values():
+					index.add_node(node)
 		
 		if not parent:
 			return
@@ -38,14 +46,24 @@ class digraph(object):
 		if parent not in self.nodes:
 			self.nodes[parent] = ({}, {}, parent)
 			self.order.append(parent)
+			if self._indexes:
+				for index in self._indexes.values():
+					index.add_node(parent)
 
 		priorities = self.nodes[node][1].get(parent)
 		if priorities is None:
 			priorities = []
 			self.nodes[node][1][parent] = priorities
 			self.nodes[parent][0][node] = priorities
+		if self._indexes:
+			counted = [(index, index.counts(priorities))
+				for index in self._indexes.values()]
 		priorities.append(priority)
 		priorities.sort()
+		if self._indexes:
+			for index, was_counted in counted:
+				if not was_counted and index.counts(priorities):
+					index.add_edge(node, parent)
 
 	def remove(self, node):
 		"""Removes the specified node from the digraph, also removing
@@ -55,6 +73,9 @@ class digraph(object):
 		if node not in self.nodes:
 			raise KeyError(node)
 		
+		if self._indexes:
+			for index in self._indexes.values():
+				index.remove_node(node, self.nodes[node])
 		for parent in self.nodes[node][1]:
 			del self.nodes[parent][0][node]
 		for child in self.nodes[node][0]:
@@ -76,6 +97,9 @@ class digraph(object):
 			if node not in t:
 				order.append(node)
 				continue
+			if self._indexes:
+				for index in self._indexes.values():
+					index.remove_node(node, self.nodes[node])
 			for parent in self.nodes[node][1]:
 				del self.nodes[parent][0][node]
 			for child in self.nodes[node][0]:
@@ -102,9 +126,48 @@ class digraph(object):
 			raise KeyError(parent)
 
 		# Remove the edge.
+		if self._indexes:
+			priorities = self.nodes[child][1][parent]
+			for index in self._indexes.values():
+				if index.counts(priorities):
+					index.remove_edge(child, parent)
 		del self.nodes[child][1][parent]
 		del self.nodes[parent][0][child]
 
+	def index_priorities(self, ignore_priorities):
+		"""
+		Keep track of leaf and root nodes for each of the given
+		ignore_priority values, so that leaf_nodes() and root_nodes()
+		calls with one of these values do not need to scan every node
+		and edge of the graph. This is intended for graphs that have
+		leaf or root nodes removed repeatedly. The priorities of edges
+		that are already in the graph must not be modified afterwards,
+		and the order attribute must not be reordered, since results are
+		returned in the order that is recorded when nodes are added.
+
+		The index for a given value is only built when leaf_nodes() or
+		root_nodes() is first called with it, since each index has to be
+		updated whenever the graph is modified.
+		"""
+		if self._indexed_priorities is None:
+			self._indexed_priorities = set()
+			self._indexes = {}
+		self._indexed_priorities.update(ignore_priorities)
+
+	def _get_index(self, ignore_priority):
+		"""
+		Return the _degree_index for the given ignore_priority value,
+		building it if necessary, or None if the value has not been
+		registered by index_priorities().
+		"""
+		if ignore_priority not in self._indexed_priorities:
+			return None
+		index = self._indexes.get(ignore_priority)
+		if index is None:
+			index = _degree_index(self, ignore_priority)
+			self._indexes[ignore_priority] = index
+		return index
+
 	def __iter__(self):
 		return iter(self.order)
 
@@ -162,6 +225,11 @@ class digraph(object):
 		If ignore_soft_deps is True, soft deps are not counted as
 		children in calculations."""
 		
+		if self._indexed_priorities:
+			index = self._get_index(ignore_priority)
+			if index is not None:
+				return index.leaf_nodes()
+
 		leaf_nodes = []
 		if ignore_priority is None:
 			for node in self.order:
@@ -196,6 +264,11 @@ class digraph(object):
 		If ignore_soft_deps is True, soft deps are not counted as
 		parents in calculations."""
 		
+		if self._indexed_priorities:
+			index = self._get_index(ignore_priority)
+			if index is not None:
+				return index.root_nodes()
+
 		root_nodes = []
 		if ignore_priority is None:
 			for node in self.order:
@@ -347,3 +420,107 @@ class digraph(object):
 
 	if sys.hexversion < 0x3000000:
 		__nonzero__ = __bool__
+
+class _degree_index(object):
+	"""
+	Counts the children and parents of each node of a digraph, only
+	counting edges that have at least one priority that is not ignored
+	by a given ignore_priority value, and keeps track of the nodes that
+	have no such children (leaves) or parents (roots).
+
+	Leaves and roots are kept as sorted lists of the positions at which
+	nodes were added, so that they are returned in graph order without
+	sorting them on every call. A node is inserted into or removed from
+	these lists only when one of its counts changes to or from zero.
+	"""
+
+	__slots__ = ("_ignore_priority", "_children", "_parents",
+		"_leaves", "_roots", "_positions", "_nodes", "_next_position")
+
+	def __init__(self, graph, ignore_priority):
+		self._ignore_priority = ignore_priority
+		self._children = {}
+		self._parents = {}
+		self._leaves = []
+		self._roots = []
+		self._positions = {}
+		self._nodes = {}
+		self._next_position = 0
+		for node in graph.order:
+			self.add_node(node)
+		for node in graph.order:
+			for parent, priorities in graph.nodes[node][1].items():
+				if self.counts(priorities):
+					self.add_edge(node, parent)
+
+	def counts(self, priorities):
+		"""
+		Return True if an edge with the given priorities is counted.
+		"""
+		if not priorities:
+			return False
+		ignore_priority = self._ignore_priority
+		if ignore_priority is None:
+			return True
+		if hasattr(ignore_priority, '__call__'):
+			for priority in priorities:
+				if not ignore_priority(priority):
+					return True
+			return False
+		return ignore_priority < priorities[-1]
+
+	@staticmethod
+	def _discard(positions, position):
+		i = bisect_left(positions, position)
+		if i < len(positions) and positions[i] == position:
+			del positions[i]
+
+	def add_node(self, node):
+		position = self._next_position
+		self._next_position += 1
+		self._children[node] = 0
+		self._parents[node] = 0
+		# New nodes have the highest position.
+		self._leaves.append(position)
+		self._roots.append(position)
+		self._positions[node] = position
+		self._nodes[position] = node
+
+	def add_edge(self, child, parent):
+		self._children[parent] += 1
+		if self._children[parent] == 1:
+			self._discard(self._leaves, self._positions[parent])
+		self._parents[child] += 1
+		if self._parents[child] == 1:
+			self._discard(self._roots, self._positions[child])
+
+	def remove_edge(self, child, parent):
+		self._children[parent] -= 1
+		if not self._children[parent]:
+			insort(self._leaves, self._positions[parent])
+		self._parents[child] -= 1
+		if not self._parents[child]:
+			insort(self._roots, self._positions[child])
+
+	def remove_node(self, node, node_data):
+		children, parents = node_data[:2]
+		for parent, priorities in parents.items():
+			if parent is not node and self.counts(priorities):
+				self.remove_edge(node, parent)
+		for child, priorities in children.items():
+			if child is not node and self.counts(priorities):
+				self.remove_edge(child, node)
+		position = self._positions.pop(node)
+		if not self._children.pop(node):
+			self._discard(self._leaves, position)
+		if not self._parents.pop(node):
+			self._discard(self._roots, position)
+		del self._nodes[position]
+
+	def leaf_nodes(self):
+		nodes = self._nodes
+		return [nodes[position] for position in self._leaves]
+
+	def root_nodes(self):
+		nodes = self._nodes
+		return [nodes[position] for position in self._roots]
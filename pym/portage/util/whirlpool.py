@@ -25,6 +25,8 @@
 ##
 ## This Python implementation is therefore also placed in the public domain.
 
+import binascii
+import struct
 import sys
 if sys.hexversion >= 0x3000000:
     xrange = range
@@ -45,7 +47,7 @@ class Whirlpool:
 
     def update(self, arg):
         """update(arg)"""
-        WhirlpoolAdd(arg, len(arg)*8, self.ctx)
+        WhirlpoolAdd(arg, self.ctx)
         self.digest_status = 0
 
     def digest(self):
@@ -57,12 +59,7 @@ class Whirlpool:
 
     def hexdigest(self):
         """hexdigest()"""
-        dig = self.digest()
-        tempstr = ''
-        for d in dig:
-            xxx = '%02x' % (ord(d))
-            tempstr = tempstr + xxx
-        return tempstr
+        return binascii.hexlify(self.digest()).decode('ascii')
 
     def copy(self):
         """copy()"""
@@ -628,160 +625,113 @@ rc = [
 DIGESTBYTES = 64
 class WhirlpoolStruct:
     def __init__(self):
-        self.bitLength = [0]*32
-        self.buffer = [0]*64
-        self.bufferBits = 0
-        self.bufferPos = 0
+        self.bitLength = 0
+        self.buffer = b''
         self.hash = [0]*8
 
 def WhirlpoolInit(ctx):
     ctx = WhirlpoolStruct()
     return
 
-def WhirlpoolAdd(source, sourceBits, ctx):
+def WhirlpoolAdd(source, ctx):
     if not isinstance(source, bytes):
         raise TypeError("Expected %s, got %s" % (bytes, type(source)))
-    if sys.hexversion < 0x3000000:
-        source = [ord(s)&0xff for s in source]
 
-    carry = 0
-    value = sourceBits
-    i = 31
-    while i >= 0 and (carry != 0 or value != 0):
-        carry += ctx.bitLength[i] + ((value % 0x100000000) & 0xff)
-        ctx.bitLength[i] = carry % 0x100
-        carry >>= 8
-        value >>= 8
-        i -= 1
+    ctx.bitLength += len(source) * 8
+    if ctx.buffer:
+        # Complete the pending partial block first.
+        need = 64 - len(ctx.buffer)
+        block = ctx.buffer + source[:need]
+        if len(block) < 64:
+            ctx.buffer = block
+            return
+        processBlocks(ctx, block, 64)
+        source = source[need:]
 
-    bufferBits = ctx.bufferBits
-    bufferPos = ctx.bufferPos
-    sourcePos = 0
-    sourceGap = (8 - (sourceBits & 7)) & 7
-    bufferRem = ctx.bufferBits & 7
-    buffr = ctx.buffer
-
-    while sourceBits > 8:
-        b = ((source[sourcePos] << sourceGap) & 0xff) | ((source[sourcePos + 1] & 0xff) >> (8 - sourceGap))
-        buffr[bufferPos] |= (b >> bufferRem) % 0x100
-        bufferPos += 1
-        bufferBits += 8 - bufferRem
-        if bufferBits == 512:
-            processBuffer(ctx)
-            bufferBits = 0
-            bufferPos = 0
-
-        buffr[bufferPos] = b << (8 - bufferRem)
-        bufferBits += bufferRem
-
-        sourceBits -= 8
-        sourcePos += 1
-
-    b = (source[sourcePos] << sourceGap) & 0xff
-    buffr[bufferPos] |= b >> bufferRem
-    if bufferRem + sourceBits < 8:
-        bufferBits += sourceBits
-    else:
-        bufferPos += 1
-        bufferBits += 8 - bufferRem
-        sourceBits -= 8 - bufferRem
-        if bufferBits == 512:
-            processBuffer(ctx)
-            bufferBits = 0
-            bufferPos = 0
-        buffr[bufferPos] = b << (8 - bufferRem)
-        bufferBits += sourceBits
-    ctx.bufferBits = bufferBits
-    ctx.bufferPos = bufferPos
+    end = len(source) & ~63
+    if end:
+        processBlocks(ctx, source, end)
+    ctx.buffer = source[end:]
 
 def WhirlpoolFinalize(ctx):
-    bufferPos = ctx.bufferPos
-    ctx.buffer[bufferPos] |= 0x80 >> (ctx.bufferBits & 7)
-    bufferPos += 1
-    if bufferPos > 32:
-        if bufferPos < 64:
-            for i in xrange(64 - bufferPos):
-                ctx.buffer[bufferPos+i] = 0
-        processBuffer(ctx)
-        bufferPos = 0
-    if bufferPos < 32:
-        for i in xrange(32 - bufferPos):
-            ctx.buffer[bufferPos+i] = 0
-    bufferPos = 32
-    for i in xrange(32):
-        ctx.buffer[32+i] = ctx.bitLength[i]
-    processBuffer(ctx)
-    digest = ''
-    for i in xrange(8):
-        digest += chr((ctx.hash[i] >> 56) % 0x100)
-        digest += chr((ctx.hash[i] >> 48) % 0x100)
-        digest += chr((ctx.hash[i] >> 40) % 0x100)
-        digest += chr((ctx.hash[i] >> 32) % 0x100)
-        digest += chr((ctx.hash[i] >> 24) % 0x100)
-        digest += chr((ctx.hash[i] >> 16) % 0x100)
-        digest += chr((ctx.hash[i] >> 8) % 0x100)
-        digest += chr((ctx.hash[i]) % 0x100)
-    ctx.bufferPos = bufferPos
-    return digest
-
-def CDo(buf, a0, a1, a2, a3, a4, a5, a6, a7):
-    return C0[((buf[a0] >> 56) % 0x100000000) & 0xff] ^ \
-           C1[((buf[a1] >> 48) % 0x100000000) & 0xff] ^ \
-           C2[((buf[a2] >> 40) % 0x100000000) & 0xff] ^ \
-           C3[((buf[a3] >> 32) % 0x100000000) & 0xff] ^ \
-           C4[((buf[a4] >> 24) % 0x100000000) & 0xff] ^ \
-           C5[((buf[a5] >> 16) % 0x100000000) & 0xff] ^ \
-           C6[((buf[a6] >>  8) % 0x100000000) & 0xff] ^ \
-           C7[((buf[a7] >>  0) % 0x100000000) & 0xff]
+    # Pad a copy of the state, so that more data may still be
+    # added to ctx after the digest has been computed.
+    final = WhirlpoolStruct()
+    final.hash = list(ctx.hash)
+    buffr = ctx.buffer + b'\x80'
+    if len(buffr) > 32:
+        buffr += b'\x00' * (64 - len(buffr))
+        processBlocks(final, buffr, 64)
+        buffr = b''
+    buffr += b'\x00' * (32 - len(buffr))
+    bitLength = ctx.bitLength
+    buffr += struct.pack('>4Q', *[(bitLength >> shift) & 0xffffffffffffffff
+        for shift in (192, 128, 64, 0)])
+    processBlocks(final, buffr, 64)
+    return struct.pack('>8Q', *final.hash)
 
-def processBuffer(ctx):
-    i, r = 0, 0
-    K = [0]*8
-    block = [0]*8
-    state = [0]*8
-    L = [0]*8
-    buffr = ctx.buffer
+def processBlocks(ctx, source, end,
+    pack=struct.pack, unpack_from=struct.unpack_from, C0=C0, C1=C1, C2=C2, C3=C3, C4=C4, C5=C5, C6=C6, C7=C7, rc=tuple(rc[1:R+1])):
+    # Process all complete 64-byte blocks in source[:end]. The state
+    # is kept in 64-bit words held in local variables and the round
+    # function is unrolled. Each round packs the 8 words into a
+    # bytearray once, so that every table index is a plain byte
+    # subscript instead of a shift and mask per lookup.
+    h0, h1, h2, h3, h4, h5, h6, h7 = ctx.hash
+    for offset in xrange(0, end, 64):
+        b0, b1, b2, b3, b4, b5, b6, b7 = unpack_from('>8Q', source, offset)
+        k0, k1, k2, k3, k4, k5, k6, k7 = h0, h1, h2, h3, h4, h5, h6, h7
+        s0, s1, s2, s3 = b0 ^ k0, b1 ^ k1, b2 ^ k2, b3 ^ k3
+        s4, s5, s6, s7 = b4 ^ k4, b5 ^ k5, b6 ^ k6, b7 ^ k7
 
-    buf_cnt = 0
-    for i in xrange(8):
-        block[i] = ((buffr[buf_cnt+0] & 0xff) << 56) ^ \
-                   ((buffr[buf_cnt+1] & 0xff) << 48) ^ \
-                   ((buffr[buf_cnt+2] & 0xff) << 40) ^ \
-                   ((buffr[buf_cnt+3] & 0xff) << 32) ^ \
-                   ((buffr[buf_cnt+4] & 0xff) << 24) ^ \
-                   ((buffr[buf_cnt+5] & 0xff) << 16) ^ \
-                   ((buffr[buf_cnt+6] & 0xff) <<  8) ^ \
-                   ((buffr[buf_cnt+7] & 0xff) <<  0)
-        buf_cnt += 8
-    for i in xrange(8):
-        K[i] = ctx.hash[i]
-        state[i] = block[i] ^ K[i]
+        for rcr in rc:
+            kb = bytearray(pack('>8Q', k0, k1, k2, k3, k4, k5, k6, k7))
+            L0 = C0[kb[0]] ^ C1[kb[57]] ^ C2[kb[50]] ^ C3[kb[43]] ^ \
+                 C4[kb[36]] ^ C5[kb[29]] ^ C6[kb[22]] ^ C7[kb[15]] ^ rcr
+            L1 = C0[kb[8]] ^ C1[kb[1]] ^ C2[kb[58]] ^ C3[kb[51]] ^ \
+                 C4[kb[44]] ^ C5[kb[37]] ^ C6[kb[30]] ^ C7[kb[23]]
+            L2 = C0[kb[16]] ^ C1[kb[9]] ^ C2[kb[2]] ^ C3[kb[59]] ^ \
+                 C4[kb[52]] ^ C5[kb[45]] ^ C6[kb[38]] ^ C7[kb[31]]
+            L3 = C0[kb[24]] ^ C1[kb[17]] ^ C2[kb[10]] ^ C3[kb[3]] ^ \
+                 C4[kb[60]] ^ C5[kb[53]] ^ C6[kb[46]] ^ C7[kb[39]]
+            L4 = C0[kb[32]] ^ C1[kb[25]] ^ C2[kb[18]] ^ C3[kb[11]] ^ \
+                 C4[kb[4]] ^ C5[kb[61]] ^ C6[kb[54]] ^ C7[kb[47]]
+            L5 = C0[kb[40]] ^ C1[kb[33]] ^ C2[kb[26]] ^ C3[kb[19]] ^ \
+                 C4[kb[12]] ^ C5[kb[5]] ^ C6[kb[62]] ^ C7[kb[55]]
+            L6 = C0[kb[48]] ^ C1[kb[41]] ^ C2[kb[34]] ^ C3[kb[27]] ^ \
+                 C4[kb[20]] ^ C5[kb[13]] ^ C6[kb[6]] ^ C7[kb[63]]
+            L7 = C0[kb[56]] ^ C1[kb[49]] ^ C2[kb[42]] ^ C3[kb[35]] ^ \
+                 C4[kb[28]] ^ C5[kb[21]] ^ C6[kb[14]] ^ C7[kb[7]]
+            k0, k1, k2, k3, k4, k5, k6, k7 = L0, L1, L2, L3, L4, L5, L6, L7
+            sb = bytearray(pack('>8Q', s0, s1, s2, s3, s4, s5, s6, s7))
+            L0 = C0[sb[0]] ^ C1[sb[57]] ^ C2[sb[50]] ^ C3[sb[43]] ^ \
+                 C4[sb[36]] ^ C5[sb[29]] ^ C6[sb[22]] ^ C7[sb[15]] ^ k0
+            L1 = C0[sb[8]] ^ C1[sb[1]] ^ C2[sb[58]] ^ C3[sb[51]] ^ \
+                 C4[sb[44]] ^ C5[sb[37]] ^ C6[sb[30]] ^ C7[sb[23]] ^ k1
+            L2 = C0[sb[16]] ^ C1[sb[9]] ^ C2[sb[2]] ^ C3[sb[59]] ^ \
+                 C4[sb[52]] ^ C5[sb[45]] ^ C6[sb[38]] ^ C7[sb[31]] ^ k2
+            L3 = C0[sb[24]] ^ C1[sb[17]] ^ C2[sb[10]] ^ C3[sb[3]] ^ \
+                 C4[sb[60]] ^ C5[sb[53]] ^ C6[sb[46]] ^ C7[sb[39]] ^ k3
+            L4 = C0[sb[32]] ^ C1[sb[25]] ^ C2[sb[18]] ^ C3[sb[11]] ^ \
+                 C4[sb[4]] ^ C5[sb[61]] ^ C6[sb[54]] ^ C7[sb[47]] ^ k4
+            L5 = C0[sb[40]] ^ C1[sb[33]] ^ C2[sb[26]] ^ C3[sb[19]] ^ \
+                 C4[sb[12]] ^ C5[sb[5]] ^ C6[sb[62]] ^ C7[sb[55]] ^ k5
+            L6 = C0[sb[48]] ^ C1[sb[41]] ^ C2[sb[34]] ^ C3[sb[27]] ^ \
+                 C4[sb[20]] ^ C5[sb[13]] ^ C6[sb[6]] ^ C7[sb[63]] ^ k6
+            L7 = C0[sb[56]] ^ C1[sb[49]] ^ C2[sb[42]] ^ C3[sb[35]] ^ \
+                 C4[sb[28]] ^ C5[sb[21]] ^ C6[sb[14]] ^ C7[sb[7]] ^ k7
+            s0, s1, s2, s3, s4, s5, s6, s7 = L0, L1, L2, L3, L4, L5, L6, L7
 
-    for r in xrange(1, R+1):
-        L[0] = CDo(K, 0, 7, 6, 5, 4, 3, 2, 1) ^ rc[r]
-        L[1] = CDo(K, 1, 0, 7, 6, 5, 4, 3, 2)
-        L[2] = CDo(K, 2, 1, 0, 7, 6, 5, 4, 3)
-        L[3] = CDo(K, 3, 2, 1, 0, 7, 6, 5, 4)
-        L[4] = CDo(K, 4, 3, 2, 1, 0, 7, 6, 5)
-        L[5] = CDo(K, 5, 4, 3, 2, 1, 0, 7, 6)
-        L[6] = CDo(K, 6, 5, 4, 3, 2, 1, 0, 7)
-        L[7] = CDo(K, 7, 6, 5, 4, 3, 2, 1, 0)
-        for i in xrange(8):
-            K[i] = L[i]
-        L[0] = CDo(state, 0, 7, 6, 5, 4, 3, 2, 1) ^ K[0]
-        L[1] = CDo(state, 1, 0, 7, 6, 5, 4, 3, 2) ^ K[1]
-        L[2] = CDo(state, 2, 1, 0, 7, 6, 5, 4, 3) ^ K[2]
-        L[3] = CDo(state, 3, 2, 1, 0, 7, 6, 5, 4) ^ K[3]
-        L[4] = CDo(state, 4, 3, 2, 1, 0, 7, 6, 5) ^ K[4]
-        L[5] = CDo(state, 5, 4, 3, 2, 1, 0, 7, 6) ^ K[5]
-        L[6] = CDo(state, 6, 5, 4, 3, 2, 1, 0, 7) ^ K[6]
-        L[7] = CDo(state, 7, 6, 5, 4, 3, 2, 1, 0) ^ K[7]
-        for i in xrange(8):
-            state[i] = L[i]
-    # apply the Miyaguchi-Preneel compression function
-    for i in xrange(8):
-        ctx.hash[i] ^= state[i] ^ block[i]
-    return
+        # apply the Miyaguchi-Preneel compression function
+        h0 ^= s0 ^ b0
+        h1 ^= s1 ^ b1
+        h2 ^= s2 ^ b2
+        h3 ^= s3 ^ b3
+        h4 ^= s4 ^ b4
+        h5 ^= s5 ^ b5
+        h6 ^= s6 ^ b6
+        h7 ^= s7 ^ b7
+    ctx.hash = [h0, h1, h2, h3, h4, h5, h6, h7]
 
 #
 # Tests.
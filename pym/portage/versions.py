@@ -267,6 +267,60 @@ def vercmp(ver1, ver2, silent=1):
 	rval = (r1 > r2) - (r1 < r2)
 	return rval
 	
+_version_key_cache = {}
+
+def _get_version_key(ver):
+	"""
+	Return a tuple that orders versions exactly like vercmp() does, so
+	that sorting or comparing many versions does not require them to be
+	parsed again for every comparison. Versions that vercmp() considers
+	equal (such as 1.0 and 1.00) have equal keys. Keys are cached by
+	version string.
+
+	@param ver: version (see ver_regexp in portage.versions.py)
+	@type ver: string (example: "2.1.2-r3")
+	@rtype: tuple or None
+	@return: key for ver, or None if ver is invalid
+	"""
+	try:
+		return _version_key_cache[ver]
+	except KeyError:
+		pass
+
+	match = ver_regexp.match(ver)
+	if match is None:
+		key = None
+	else:
+		main = [int(match.group(2))]
+		if match.group(3):
+			for part in match.group(3)[1:].split("."):
+				if part[0] == "0":
+					# vercmp compares these as decimal fractions
+					# against any other component, so 0.02 < 0.1, and
+					# any such component is less than a component
+					# without a leading zero.
+					main.append((0, part.rstrip("0")))
+				else:
+					main.append((1, int(part)))
+		# This terminates the components, so that it compares less
+		# than any further component (implicit components have a value
+		# of -1 in vercmp), and compares the final letter otherwise.
+		letter = match.group(5)
+		main.append((-1, ord(letter) if letter else -1))
+
+		suffixes = []
+		for suffix in match.group(6).split("_")[1:]:
+			name, num = suffix_regexp.match(suffix).groups()
+			suffixes.append((suffix_value[name], int(num or 0)))
+		# Implicit _p0 is given a value of -1, so that 1 < 1_p0
+		suffixes.append((suffix_value["p"], -1))
+
+		key = (1 if match.group(1) else 0, tuple(main), tuple(suffixes),
+			int(match.group(10) or 0))
+
+	_version_key_cache[ver] = key
+	return key
+
 def pkgcmp(pkg1, pkg2):
 	"""
 	Compare 2 package versions created in pkgsplit format.
@@ -419,6 +473,19 @@ class _pkg_str(_unicode):
 		raise AttributeError("_pkg_str instances are immutable",
 			self.__class__, name, value)
 
+	@property
+	def version_key(self):
+		"""
+		A key that orders versions like vercmp() does (see
+		_get_version_key).
+		"""
+		try:
+			return self._version_key
+		except AttributeError:
+			version_key = _get_version_key(self.version)
+			self.__dict__['_version_key'] = version_key
+			return version_key
+
 	@property
 	def stable(self):
 		try:
@@ -534,7 +601,9 @@ def cpv_sort_key(eapi=None):
 		if split1 is None or split2 is None or split1.cp != split2.cp:
 			return (cpv1 > cpv2) - (cpv1 < cpv2)
 
-		return vercmp(split1.version, split2.version)
+		key1 = split1.version_key
+		key2 = split2.version_key
+		return (key1 > key2) - (key1 < key2)
 
 	return cmp_sort_key(cmp_cpv)
 
@@ -549,15 +618,15 @@ def best(mymatches, eapi=None):
 		return mymatches[0]
 	bestmatch = mymatches[0]
 	try:
-		v2 = bestmatch.version
+		v2 = bestmatch.cpv.version_key
 	except AttributeError:
-		v2 = _pkg_str(bestmatch, eapi=eapi).version
+		v2 = _pkg_str(bestmatch, eapi=eapi).version_key
 	for x in mymatches[1:]:
 		try:
-			v1 = x.version
+			v1 = x.cpv.version_key
 		except AttributeError:
-			v1 = _pkg_str(x, eapi=eapi).version
-		if vercmp(v1, v2) > 0:
+			v1 = _pkg_str(x, eapi=eapi).version_key
+		if v1 > v2:
 			bestmatch = x
 			v2 = v1
 	return bestmatch
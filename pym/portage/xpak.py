@@ -15,7 +15,7 @@
 # (integer) == encodeint(integer)  ===> 4 characters (big-endian copy)
 # '+' means concatenate the fields ===> All chunks are strings
 
-__all__ = ['addtolist', 'decodeint', 'encodeint', 'getboth',
+__all__ = ['addtolist', 'decodeint', 'encodeint', 'get_tbz2_data', 'getboth',
 	'getindex', 'getindex_mem', 'getitem', 'listindex',
 	'searchindex', 'tbz2', 'xpak_mem', 'xpak', 'xpand',
 	'xsplit', 'xsplit_mem']
@@ -203,6 +203,52 @@ def getboth(infile):
 	myfile.close()
 	return myindex, mydata
 
+def get_tbz2_data(infile, tail_size=65536):
+	"""(infile, tail_size) -- Returns all the files from the xpak segment of
+	the tbz2 'infile' as a map object, like tbz2.get_data(). The last
+	'tail_size' bytes of the file are read at once, which usually covers
+	the whole xpak segment, so that a single read is needed in most cases.
+	Returns an empty map if the file is not a valid tbz2."""
+	try:
+		myfile = open(_unicode_encode(infile,
+			encoding=_encodings['fs'], errors='strict'), 'rb')
+	except EnvironmentError:
+		return {}
+	try:
+		filesize = os.fstat(myfile.fileno()).st_size
+		if filesize < 16:
+			return {}
+		myfile.seek(max(filesize - tail_size, 0))
+		mytail = myfile.read()
+		if mytail[-4:] != b'STOP' or mytail[-16:-8] != b'XPAKSTOP':
+			return {}
+		xpaksize = decodeint(mytail[-8:-4]) + 8
+		if xpaksize > filesize:
+			return {}
+		if xpaksize > len(mytail):
+			myfile.seek(filesize - xpaksize)
+			mytail = myfile.read(xpaksize - len(mytail)) + mytail
+	except EnvironmentError:
+		return {}
+	finally:
+		myfile.close()
+
+	splits = xsplit_mem(mytail[-xpaksize:-8])
+	if not splits:
+		return {}
+	myindex, mydat = splits
+	mydata = {}
+	myindexlen = len(myindex)
+	startpos = 0
+	while ((startpos + 8) < myindexlen):
+		namelen = decodeint(myindex[startpos:startpos + 4])
+		datapos = decodeint(myindex[startpos + 4 + namelen:startpos + 8 + namelen])
+		datalen = decodeint(myindex[startpos + 8 + namelen:startpos + 12 + namelen])
+		myname = myindex[startpos + 4:startpos + 4 + namelen]
+		mydata[myname] = mydat[datapos:datapos + datalen]
+		startpos = startpos + namelen + 12
+	return mydata
+
 def listindex(myindex):
 	"""Print to the terminal the filenames listed in the indexglob passed in."""
 	for x in getindex_mem(myindex):